@@ -1,108 +1,109 @@
 import os
-import cv2
 import gradio as gr
 import numpy as np
 import random
 import time
 from PIL import Image
 import io
-from gradio_client import Client, handle_file
-import tempfile
 import base64
 import json
 import requests
 
+from tryon_backends import get_backend
+from tryon_cache import TryOnCache
+from tryon_jobs import DONE, FAILED, QUEUED, JobScheduler, QueueFull
+from tryon_pipeline import StageTimer, decode_image, encode_jpeg_b64, prepare_inputs
+
 # ============================================
 # Hugging Face Inference API (IDM-VTON)
 # Uses the free HF Inference API - no API key needed!
+# TRYON_BACKEND=stub switches to an offline stub for local testing,
+# TRYON_BACKEND=http to the JSON service (or fake_tryon_server.py).
 # ============================================
-print("Initializing Hugging Face Inference API client...")
+print("Initializing try-on backend...")
 
-# Initialize the client for IDM-VTON (free tier)
 try:
-    hf_client = Client("yisol/IDM-VTON", hf_token=os.environ.get("HF_TOKEN"))
-    print("[OK] Connected to IDM-VTON Inference API")
+    backend = get_backend()
+    print(f"[OK] Using {backend.name} backend")
     API_AVAILABLE = True
 except Exception as e:
     print(f"[WARN] Could not connect to API: {e}")
     print("Falling back to stub mode")
-    hf_client = None
+    backend = None
     API_AVAILABLE = False
 
+# Results keyed by input pixels + seed + params; see tryon_cache.py
+result_cache = TryOnCache()
+print(f"[OK] Result cache at {result_cache.root} ({result_cache.stats()['entries']} entries)")
+
+# At most TRYON_WORKERS inference calls upstream; everyone else waits in the queue
+scheduler = None
+if backend is not None:
+    scheduler = JobScheduler(
+        backend,
+        result_cache,
+        workers=int(os.environ.get("TRYON_WORKERS", 4)),
+        max_queue=int(os.environ.get("TRYON_MAX_QUEUE", 200)),
+        timeout=float(os.environ.get("TRYON_TIMEOUT", 120)),
+    ).start()
+    print(f"[OK] Job scheduler with {scheduler.workers} workers")
+
 
 def tryon(person_img, garment_img, seed, randomize_seed):
     """
     Virtual try-on using Hugging Face Inference API (IDM-VTON).
     No local GPU required - uses cloud inference.
+    Requests go through the job scheduler; this generator streams queue
+    position / progress into the Response box until the job finishes.
     """
     if person_img is None or garment_img is None:
         gr.Warning("Empty image")
-        return None, None, "Empty image"
+        yield None, None, "Empty image"
+        return
     
     if randomize_seed:
         seed = random.randint(0, MAX_SEED)
     
     # If API not available, return stub
-    if not API_AVAILABLE or hf_client is None:
-        return person_img, seed, "API not available - returning original"
+    if not API_AVAILABLE or scheduler is None:
+        yield person_img, seed, "API not available - returning original"
+        return
     
+    start_time = time.time()
     try:
-        start_time = time.time()
-        print(f"Starting inference with seed {seed}...")
-        
-        # Convert numpy arrays to PIL and save to temp files
-        person_pil = Image.fromarray(person_img).convert("RGB")
-        garment_pil = Image.fromarray(garment_img).convert("RGB")
-        
-        # Save to temporary files (required for gradio_client)
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as person_file:
-            person_pil.save(person_file.name)
-            person_path = person_file.name
-        
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as garment_file:
-            garment_pil.save(garment_file.name)
-            garment_path = garment_file.name
-        
-        # Call the IDM-VTON API
-        # API signature: process_dc(dict, garm_img, garment_des, is_checked, is_checked_crop, denoise_steps, seed)
-        result = hf_client.predict(
-            dict(background=handle_file(person_path), layers=[], composite=None),  # person image dict
-            handle_file(garment_path),  # garment image
-            "A stylish garment",  # garment description
-            True,   # is_checked (auto-mask)
-            True,   # is_checked_crop (auto-crop)
-            30,     # denoise_steps
-            seed,   # seed
-            api_name="/tryon"
-        )
-        
-        # Clean up temp files
-        os.unlink(person_path)
-        os.unlink(garment_path)
-        
-        # The result is a tuple, first element is the output image path
-        if result and len(result) > 0:
-            result_path = result[0]
-            result_img = np.array(Image.open(result_path).convert("RGB"))
-            
-            end_time = time.time()
-            inference_time = end_time - start_time
-            
-            return result_img, seed, f"Success! ({inference_time:.1f}s)"
+        job_id = scheduler.submit(person_img, garment_img, seed)
+    except QueueFull as e:
+        raise gr.Error(str(e))
+    print(f"Queued job {job_id} with seed {seed}...")
+
+    job = None
+    for job in scheduler.wait(job_id):
+        if job is None or job["status"] in (DONE, FAILED):
+            break
+        if job["status"] == QUEUED:
+            info = f"Queued: position {job['position']}, ~{job['eta_seconds']:.0f}s"
         else:
-            return person_img, seed, "No result returned from API"
-        
-    except Exception as e:
-        print(f"Inference error: {e}")
-        # Clean up temp files on error
-        try:
-            if 'person_path' in locals():
-                os.unlink(person_path)
-            if 'garment_path' in locals():
-                os.unlink(garment_path)
-        except:
-            pass
-        return person_img, seed, f"Error: {str(e)}"
+            info = f"Running (attempt {job['attempts']})... {time.time() - start_time:.0f}s"
+        yield gr.update(), seed, info
+
+    if job is None or job["status"] == FAILED:
+        error = job["error"] if job else "Job not found"
+        print(f"Inference error: {error}")
+        yield person_img, seed, f"Error: {error}"
+        return
+
+    result_img = scheduler.result(job_id)
+    if result_img is None:
+        yield person_img, seed, "No result returned from API"
+        return
+    inference_time = time.time() - start_time
+    yield result_img, seed, f"Success! ({inference_time:.1f}s; {job['stages']})"
+
+
+def queue_metrics():
+    if scheduler is None:
+        return {"backend": None}
+    return {**scheduler.metrics(), "cache": result_cache.stats()}
 
 def start_tryon(person_img, garment_img, seed, randomize_seed):
     start_time = time.time()
@@ -110,10 +111,11 @@ def start_tryon(person_img, garment_img, seed, randomize_seed):
         return None, None, "Empty image"
     if randomize_seed:
         seed = random.randint(0, MAX_SEED)
-    encoded_person_img = cv2.imencode('.jpg', cv2.cvtColor(person_img, cv2.COLOR_RGB2BGR))[1].tobytes()
-    encoded_person_img = base64.b64encode(encoded_person_img).decode('utf-8')
-    encoded_garment_img = cv2.imencode('.jpg', cv2.cvtColor(garment_img, cv2.COLOR_RGB2BGR))[1].tobytes()
-    encoded_garment_img = base64.b64encode(encoded_garment_img).decode('utf-8')
+    timer = StageTimer()
+    person_img, garment_img = prepare_inputs(person_img, garment_img, timer)
+    with timer.stage("encode"):
+        encoded_person_img = encode_jpeg_b64(person_img)
+        encoded_garment_img = encode_jpeg_b64(garment_img)
 
     url = "http://" + os.environ['tryon_url']
     token = os.environ['token']
@@ -130,16 +132,15 @@ def start_tryon(person_img, garment_img, seed, randomize_seed):
     result_img = None
     try:
         session = requests.Session()
-        response = session.post(url, headers=headers, data=json.dumps(data), timeout=60)
+        with timer.stage("inference"):
+            response = session.post(url, headers=headers, data=json.dumps(data), timeout=60)
         print("response code", response.status_code)
         if response.status_code == 200:
             result = response.json()['result']
             status = result['status']
             if status == "success":
-                result = base64.b64decode(result['result'])
-                result_np = np.frombuffer(result, np.uint8)
-                result_img = cv2.imdecode(result_np, cv2.IMREAD_UNCHANGED)
-                result_img = cv2.cvtColor(result_img, cv2.COLOR_RGB2BGR)
+                with timer.stage("decode"):
+                    result_img = decode_image(base64.b64decode(result['result']))
                 info = "Success"
             else:
                 info = "Try again latter"
@@ -154,7 +155,7 @@ def start_tryon(person_img, garment_img, seed, randomize_seed):
         print(f"其他错误: {err}")
         info = "Error, pleace contact the admin"
     end_time = time.time()
-    print(f"time used: {end_time-start_time}")
+    print(f"time used: {end_time-start_time} ({timer.summary()})")
 
     return result_img, seed, info
 
@@ -364,8 +365,14 @@ with gr.Blocks() as Tryon:
 
 
     # try_button.click(fn=start_tryon, inputs=[imgs, garm_img, seed, randomize_seed], outputs=[image_out, seed_used, result_info], api_name='tryon',concurrency_limit=10)
+    # concurrency_limit only bounds waiting sessions; upstream calls are capped by TRYON_WORKERS
     test_button.click(fn=tryon, inputs=[imgs, garm_img, seed, randomize_seed], outputs=[image_out, seed_used, result_info], api_name=False, concurrency_limit=45)
 
+    with gr.Accordion("Queue metrics", open=False):
+        metrics_out = gr.JSON(label="Scheduler")
+        metrics_button = gr.Button(value="Refresh")
+    metrics_button.click(fn=queue_metrics, inputs=None, outputs=metrics_out, api_name="metrics")
+
     with gr.Column(elem_id = "col-showcase"):
         gr.HTML("""
         <div style="display: flex; justify-content: center; align-items: center; text-align: center; font-size: 20px;">
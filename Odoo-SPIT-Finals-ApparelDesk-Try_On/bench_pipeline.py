@@ -0,0 +1,115 @@
+"""
+Benchmark request pre-processing on the bundled example assets.
+
+Compares the original path (full-resolution PNG temp files per request,
+full-resolution JPEG+base64 for the HTTP endpoint) with tryon_pipeline
+(crop/downsize to model resolution, in-memory buffers, reused scratch files).
+
+    python bench_pipeline.py [--repeat 5]
+"""
+import argparse
+import base64
+import io
+import os
+import shutil
+import statistics
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from tryon_pipeline import encode_jpeg_b64, prepare_inputs, scratch_file
+
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets")
+SCRATCH = tempfile.mkdtemp(prefix="tryon-bench-")
+
+
+def load_pairs():
+    humans = sorted(os.listdir(os.path.join(ASSETS, "human")))
+    cloths = sorted(os.listdir(os.path.join(ASSETS, "cloth")))
+    pairs = [
+        (os.path.join(ASSETS, "examples", f"model{i}.png"), os.path.join(ASSETS, "examples", f"garment{i}.png"))
+        for i in (1, 2, 3)
+    ]
+    pairs += [
+        (os.path.join(ASSETS, "human", human), os.path.join(ASSETS, "cloth", cloth))
+        for human, cloth in zip(humans, cloths)
+    ]
+    return [
+        (np.array(Image.open(person).convert("RGB")), np.array(Image.open(garment).convert("RGB")))
+        for person, garment in pairs
+    ]
+
+
+def legacy_files(person, garment):
+    """What tryon() did before: PNG temp files at full resolution, read back."""
+    paths = []
+    for img in (person, garment):
+        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as f:
+            Image.fromarray(img).convert("RGB").save(f.name)
+            paths.append(f.name)
+    size = sum(os.path.getsize(path) for path in paths)
+    # Stand-in for reading the result back from disk
+    np.array(Image.open(paths[0]).convert("RGB"))
+    for path in paths:
+        os.unlink(path)
+    return size
+
+
+def pipeline_files(person, garment):
+    person, garment = prepare_inputs(person, garment)
+    paths = [scratch_file(person, root=SCRATCH), scratch_file(garment, root=SCRATCH)]
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def legacy_jpeg(person, garment):
+    """What start_tryon() did before: full-resolution JPEG + base64."""
+    size = 0
+    for img in (person, garment):
+        buf = io.BytesIO()
+        Image.fromarray(img).save(buf, format="JPEG", quality=95)
+        size += len(base64.b64encode(buf.getvalue()))
+    return size
+
+
+def pipeline_jpeg(person, garment):
+    person, garment = prepare_inputs(person, garment)
+    return len(encode_jpeg_b64(person)) + len(encode_jpeg_b64(garment))
+
+
+def run(name, func, pairs, repeat, before=None):
+    timings = []
+    size = 0
+    for _ in range(repeat):
+        if before:
+            before()
+        start = time.perf_counter()
+        size = sum(func(person, garment) for person, garment in pairs)
+        timings.append((time.perf_counter() - start) * 1000 / len(pairs))
+    print(f"{name:<28} {statistics.median(timings):8.1f} ms/request {size / len(pairs) / 1024:8.0f} KiB/request")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pairs = load_pairs()
+    print(f"{len(pairs)} person/garment pairs, median of {args.repeat} runs\n")
+
+    def clear_scratch():
+        shutil.rmtree(SCRATCH, ignore_errors=True)
+
+    try:
+        run("legacy temp-file PNG", legacy_files, pairs, args.repeat)
+        run("pipeline scratch (cold)", pipeline_files, pairs, args.repeat, before=clear_scratch)
+        run("pipeline scratch (warm)", pipeline_files, pairs, args.repeat)
+        run("legacy JPEG+base64", legacy_jpeg, pairs, args.repeat)
+        run("pipeline JPEG+base64", pipeline_jpeg, pairs, args.repeat)
+    finally:
+        clear_scratch()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Local stand-in for the HTTP try-on service, for exercising the job
+scheduler without a GPU or network.
+
+Speaks the same JSON protocol as tryon_backends.HTTPBackend, with
+configurable latency, random failures and an upstream concurrency cap
+(requests beyond it get HTTP 503, like an overloaded Space).
+
+    python fake_tryon_server.py --port 8765 --latency 2 --fail-rate 0.1 --max-concurrent 4
+    TRYON_BACKEND=http tryon_url=127.0.0.1:8765 python app.py
+"""
+import argparse
+import base64
+import io
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from PIL import Image
+
+
+class FakeTryOnServer:
+    def __init__(self, host="127.0.0.1", port=0, latency=1.0, fail_rate=0.0, max_concurrent=None):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.max_concurrent = max_concurrent
+        self.requests = 0
+        self.rejected = 0
+        self.active = 0
+        self.peak_concurrency = 0
+        self._lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, code, body):
+                payload = json.dumps(body).encode()
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                data = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                with server._lock:
+                    server.requests += 1
+                    if server.max_concurrent and server.active >= server.max_concurrent:
+                        server.rejected += 1
+                        busy = True
+                    else:
+                        busy = False
+                        server.active += 1
+                        server.peak_concurrency = max(server.peak_concurrency, server.active)
+                if busy:
+                    return self._reply(503, {"detail": "Too many users"})
+                try:
+                    time.sleep(server.latency)
+                    if random.random() < server.fail_rate:
+                        return self._reply(500, {"detail": "Inference failed"})
+                    # Echo the person image back as the "result"
+                    person = Image.open(io.BytesIO(base64.b64decode(data["humanImage"])))
+                    buf = io.BytesIO()
+                    person.convert("RGB").save(buf, format="JPEG")
+                    result = base64.b64encode(buf.getvalue()).decode("utf-8")
+                    self._reply(200, {"result": {"status": "success", "result": result}})
+                finally:
+                    with server._lock:
+                        server.active -= 1
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrent", type=int, default=None)
+    args = parser.parse_args()
+
+    server = FakeTryOnServer(
+        port=args.port, latency=args.latency, fail_rate=args.fail_rate, max_concurrent=args.max_concurrent
+    )
+    print(f"Fake try-on server on {server.url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
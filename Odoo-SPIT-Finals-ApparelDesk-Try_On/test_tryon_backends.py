@@ -0,0 +1,71 @@
+import socket
+import unittest
+
+import numpy as np
+
+from fake_tryon_server import FakeTryOnServer
+from tryon_backends import BackendError, HTTPBackend, StubBackend, get_backend
+
+
+def gradient(width=60, height=80):
+    x = np.linspace(0, 255, width, dtype=np.uint8)
+    return np.stack([np.tile(x, (height, 1))] * 3, axis=-1)
+
+
+class HTTPBackendTests(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeTryOnServer(latency=0).start()
+        self.addCleanup(self.server.stop)
+        self.backend = HTTPBackend(self.server.url, timeout=5)
+
+    def test_result_is_decoded_at_the_input_size(self):
+        person = gradient()
+        result = self.backend.predict(person, gradient(30, 40), seed=1)
+        self.assertEqual((result.shape, result.dtype), (person.shape, np.uint8))
+        # The fake server echoes the person photo through JPEG
+        self.assertLess(np.abs(result.astype(int) - person).mean(), 4)
+
+    def test_server_errors_are_retryable_and_a_retry_succeeds(self):
+        self.server.fail_rate = 1.0
+        with self.assertRaises(BackendError) as failed:
+            self.backend.predict(gradient(), gradient(), seed=1)
+        self.assertTrue(failed.exception.retryable)
+
+        self.server.fail_rate = 0.0
+        self.assertIsNotNone(self.backend.predict(gradient(), gradient(), seed=1))
+        self.assertEqual(self.server.requests, 2)
+
+    def test_busy_upstream_is_retryable(self):
+        self.server.max_concurrent = 1
+        self.server.active = 1  # one request already in flight
+        with self.assertRaises(BackendError) as busy:
+            self.backend.predict(gradient(), gradient(), seed=1)
+        self.assertIn("503", str(busy.exception))
+        self.assertTrue(busy.exception.retryable)
+        self.assertEqual(self.server.rejected, 1)
+
+    def test_unreachable_service_is_retryable(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        with self.assertRaises(BackendError) as down:
+            HTTPBackend(f"http://127.0.0.1:{port}/", timeout=2).predict(gradient(), gradient(), seed=1)
+        self.assertTrue(down.exception.retryable)
+
+
+class StubBackendTests(unittest.TestCase):
+    def test_output_depends_on_the_seed_and_honours_the_timeout(self):
+        person, garment = gradient(), np.zeros((40, 30, 3), dtype=np.uint8)
+        backend = StubBackend()
+        self.assertFalse(np.array_equal(backend.predict(person, garment, 1), backend.predict(person, garment, 2)))
+        with self.assertRaises(TimeoutError):
+            StubBackend(delay=1).predict(person, garment, 1, timeout=0.01)
+
+    def test_get_backend_by_name(self):
+        self.assertIsInstance(get_backend("stub"), StubBackend)
+        with self.assertRaises(ValueError):
+            get_backend("magic")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+from tryon_cache import TryOnCache, cache_key
+
+
+def noise(seed, width=32, height=48):
+    # Random pixels barely compress, so every entry has about the same PNG size
+    return np.random.default_rng(seed).integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+class CacheKeyTests(unittest.TestCase):
+    def test_key_depends_on_pixels_seed_params_and_backend(self):
+        person, garment = noise(1), noise(2)
+        key = cache_key(person, garment, 42, {"denoise_steps": 30}, "http")
+        self.assertEqual(key, cache_key(person.copy(), garment.copy(), "42", {"denoise_steps": 30}, "http"))
+        variants = [
+            cache_key(garment, person, 42, {"denoise_steps": 30}, "http"),
+            cache_key(person, garment, 43, {"denoise_steps": 30}, "http"),
+            cache_key(person, garment, 42, {"denoise_steps": 20}, "http"),
+            cache_key(person, garment, 42, {"denoise_steps": 30}, "stub"),
+            # Same bytes, different shape
+            cache_key(person.reshape(24, 64, 3), garment, 42, {"denoise_steps": 30}, "http"),
+        ]
+        self.assertNotIn(key, variants)
+        self.assertEqual(len(set(variants)), len(variants))
+
+
+class TryOnCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp(prefix="tryon-cache-test-")
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+
+    def test_hit_returns_the_stored_pixels_and_counts(self):
+        cache = TryOnCache(root=self.root, max_bytes=10 * 1024 * 1024)
+        image = noise(1)
+        self.assertIsNone(cache.get("ab" * 32))
+        self.assertFalse(cache.contains("ab" * 32))
+        cache.put("ab" * 32, image)
+        self.assertTrue(cache.contains("ab" * 32))
+        np.testing.assert_array_equal(cache.get("ab" * 32), image)
+        self.assertTrue(os.path.exists(os.path.join(self.root, "ab", "ab" * 32 + ".png")))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["hits"], stats["misses"]), (1, 1, 1))
+
+    def test_least_recently_used_entries_are_evicted_first(self):
+        probe = TryOnCache(root=tempfile.mkdtemp(dir=self.root), max_bytes=10 * 1024 * 1024)
+        probe.put("00" * 32, noise(0))
+        entry = probe.stats()["bytes"]
+
+        cache = TryOnCache(root=os.path.join(self.root, "lru"), max_bytes=int(entry * 2.5))
+        first, second, third = ("a1" * 32, "b2" * 32, "c3" * 32)
+        cache.put(first, noise(1))
+        cache.put(second, noise(2))
+        self.assertIsNotNone(cache.get(first))  # now the most recent
+        cache.put(third, noise(3))
+
+        self.assertIsNone(cache.get(second))
+        self.assertIsNotNone(cache.get(first))
+        self.assertIsNotNone(cache.get(third))
+        self.assertFalse(os.path.exists(cache._path(second)))
+        self.assertLessEqual(cache.stats()["bytes"], cache.max_bytes)
+
+    def test_index_and_order_survive_a_restart(self):
+        cache = TryOnCache(root=self.root, max_bytes=10 * 1024 * 1024)
+        keys = [f"{n:02d}" * 32 for n in range(3)]
+        for n, key in enumerate(keys):
+            cache.put(key, noise(n))
+            # File mtimes carry the order across restarts
+            os.utime(cache._path(key), (time.time() - 100 + n, time.time() - 100 + n))
+        os.utime(cache._path(keys[0]))
+
+        entry = cache.stats()["bytes"] // 3
+        reopened = TryOnCache(root=self.root, max_bytes=int(entry * 2.5))
+        self.assertEqual(reopened.stats()["entries"], 2)
+        self.assertIsNone(reopened.get(keys[1]))
+        np.testing.assert_array_equal(reopened.get(keys[0]), noise(0))
+
+    def test_file_removed_behind_the_cache_is_a_miss(self):
+        cache = TryOnCache(root=self.root, max_bytes=10 * 1024 * 1024)
+        cache.put("dd" * 32, noise(4))
+        os.unlink(cache._path("dd" * 32))
+        self.assertFalse(cache.contains("dd" * 32))
+        self.assertIsNone(cache.get("dd" * 32))
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["bytes"], stats["misses"]), (0, 0, 1))
+
+        cache.put("ee" * 32, noise(5))
+        cache.clear()
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertFalse(os.path.exists(cache._path("ee" * 32)))
+
+
+if __name__ == "__main__":
+    unittest.main()
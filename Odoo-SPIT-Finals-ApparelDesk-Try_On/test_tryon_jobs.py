@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from tryon_backends import BackendError, StubBackend
+from tryon_cache import TryOnCache
+from tryon_jobs import DONE, FAILED, QUEUED, RUNNING, JobScheduler, QueueFull
+
+
+def image(value, width=48, height=64):
+    return np.full((height, width, 3), value, dtype=np.uint8)
+
+
+class FlakyBackend(StubBackend):
+    """Stub that fails the first ``failures`` calls, recording when each call was made."""
+
+    name = "flaky"
+
+    def __init__(self, failures, retryable=True):
+        super().__init__()
+        self.failures = failures
+        self.retryable = retryable
+        self.calls = []
+
+    def predict(self, person_img, garment_img, seed, params=None, timer=None, timeout=None):
+        self.calls.append(time.monotonic())
+        if len(self.calls) <= self.failures:
+            raise BackendError("upstream hiccup", retryable=self.retryable)
+        return super().predict(person_img, garment_img, seed, params, timer, timeout)
+
+
+class JobSchedulerTests(unittest.TestCase):
+    def setUp(self):
+        self.state_dir = tempfile.mkdtemp(prefix="tryon-jobs-test-")
+        self.addCleanup(shutil.rmtree, self.state_dir, ignore_errors=True)
+        self.cache = TryOnCache(root=os.path.join(self.state_dir, "cache"), max_bytes=10 * 1024 * 1024)
+
+    def scheduler(self, backend=None, **kwargs):
+        scheduler = JobScheduler(backend or StubBackend(), self.cache, workers=2, state_dir=self.state_dir, **kwargs)
+        self.addCleanup(scheduler.stop)
+        return scheduler
+
+    def finish(self, scheduler, job_id):
+        for job in scheduler.wait(job_id, poll_interval=0.01, timeout=10):
+            pass
+        return job
+
+    def test_identical_requests_share_a_job_and_later_ones_hit_the_cache(self):
+        scheduler = self.scheduler()
+        person, garment = image(200), image(30)
+        first = scheduler.submit(person, garment, 7)
+        self.assertEqual(scheduler.submit(person.copy(), garment.copy(), 7), first)
+        other = scheduler.submit(person, garment, 8)
+        self.assertNotEqual(other, first)
+        metrics = scheduler.metrics()
+        self.assertEqual((metrics["submitted"], metrics["deduplicated"], metrics["queue_depth"]), (3, 1, 2))
+
+        scheduler.start()
+        self.assertEqual(self.finish(scheduler, first)["status"], DONE)
+        self.assertEqual(self.finish(scheduler, other)["status"], DONE)
+        self.assertEqual(scheduler.result(first).shape, (64, 48, 3))
+
+        # Finished work is answered from the cache without decoding it at submit time
+        with mock.patch.object(self.cache, "get", side_effect=AssertionError("decoded on submit")):
+            cached = scheduler.submit(person, garment, 7)
+        job = scheduler.status(cached)
+        self.assertNotEqual(cached, first)
+        self.assertEqual((job["status"], job["stages"]), (DONE, "cached"))
+        self.assertEqual(scheduler.metrics()["cache_hits"], 1)
+
+    def test_retryable_failures_back_off_exponentially(self):
+        backend = FlakyBackend(failures=2)
+        scheduler = self.scheduler(backend, backoff=0.05, max_attempts=3)
+        scheduler.start()
+        with mock.patch("tryon_jobs.random.uniform", return_value=1.0):
+            job = self.finish(scheduler, scheduler.submit(image(1), image(2), 1))
+        self.assertEqual((job["status"], job["attempts"]), (DONE, 3))
+        gaps = [later - earlier for earlier, later in zip(backend.calls, backend.calls[1:])]
+        self.assertGreaterEqual(gaps[0], 0.05)
+        self.assertGreaterEqual(gaps[1], 0.1)
+        self.assertEqual(scheduler.metrics()["retries"], 2)
+
+    def test_failures_give_up_after_max_attempts_or_when_not_retryable(self):
+        scheduler = self.scheduler(FlakyBackend(failures=5), backoff=0.01, max_attempts=2)
+        scheduler.start()
+        job = self.finish(scheduler, scheduler.submit(image(1), image(2), 1))
+        self.assertEqual((job["status"], job["attempts"], job["error"]), (FAILED, 2, "upstream hiccup"))
+        scheduler.stop()
+
+        fatal = self.scheduler(FlakyBackend(failures=1, retryable=False), backoff=0.01, max_attempts=3)
+        fatal.start()
+        job = self.finish(fatal, fatal.submit(image(3), image(4), 1))
+        self.assertEqual((job["status"], job["attempts"]), (FAILED, 1))
+        self.assertEqual(os.listdir(fatal.input_dir), [])
+
+    def test_queued_and_running_jobs_are_recovered_after_a_restart(self):
+        before = self.scheduler()
+        queued = before.submit(image(10), image(20), 1)
+        running = before.submit(image(11), image(21), 2)
+        before._update(running, status=RUNNING, started_at=time.time())
+        self.assertEqual(before.status(queued)["position"], 1)
+        before._db.close()
+
+        after = self.scheduler()
+        self.assertEqual(after.status(running)["status"], QUEUED)
+        self.assertEqual(after.metrics()["inflight"], 2)
+        # A resubmission after the restart still joins the recovered job
+        self.assertEqual(after.submit(image(10), image(20), 1), queued)
+
+        after.start()
+        for job_id in (queued, running):
+            self.assertEqual(self.finish(after, job_id)["status"], DONE)
+            self.assertIsNotNone(after.result(job_id))
+
+    def test_full_queue_rejects_new_work(self):
+        scheduler = self.scheduler(max_queue=1)
+        scheduler.submit(image(1), image(2), 1)
+        with self.assertRaises(QueueFull):
+            scheduler.submit(image(1), image(2), 2)
+        self.assertEqual(len(os.listdir(scheduler.input_dir)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
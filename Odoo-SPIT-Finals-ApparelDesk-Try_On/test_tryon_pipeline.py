@@ -0,0 +1,51 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from tryon_pipeline import MODEL_HEIGHT, MODEL_WIDTH, StageTimer, decode_image, encode_image, prepare_inputs
+
+
+def photo(width, height, mode="RGB"):
+    shape = (height, width) if mode == "L" else (height, width, len(mode))
+    arr = np.random.default_rng(width * height).integers(0, 256, shape, dtype=np.uint8)
+    return arr if mode == "RGB" else Image.fromarray(arr, mode)
+
+
+def no_disk(*args, **kwargs):
+    raise AssertionError("pre-processing touched the filesystem")
+
+
+class PrepareInputsTests(unittest.TestCase):
+    def prepare(self, person, garment):
+        timer = StageTimer()
+        with mock.patch("builtins.open", side_effect=no_disk), mock.patch("os.replace", side_effect=no_disk):
+            person, garment = prepare_inputs(person, garment, timer)
+        self.assertIn("preprocess", timer.stages)
+        return person, garment
+
+    def test_large_uploads_come_out_at_model_resolution(self):
+        # A landscape phone photo is centre-cropped to 3:4 and scaled down; the garment keeps its aspect
+        person, garment = self.prepare(photo(4032, 3024), photo(3000, 2000))
+        self.assertEqual((person.shape, person.dtype), ((MODEL_HEIGHT, MODEL_WIDTH, 3), np.uint8))
+        self.assertEqual((garment.shape, garment.dtype), ((512, MODEL_WIDTH, 3), np.uint8))
+
+    def test_small_and_non_rgb_inputs_are_not_upscaled(self):
+        person, garment = self.prepare(photo(600, 600, "RGBA"), photo(200, 300, "L"))
+        self.assertEqual(person.shape, (600, 450, 3))
+        self.assertEqual(garment.shape, (300, 200, 3))
+        exact = photo(MODEL_WIDTH, MODEL_HEIGHT)
+        np.testing.assert_array_equal(self.prepare(exact, exact)[0], exact)
+
+    def test_encode_and_decode_round_trip_in_memory(self):
+        person, _ = self.prepare(photo(1536, 2048), photo(10, 10))
+        with mock.patch("builtins.open", side_effect=no_disk):
+            data = encode_image(person, "PNG")
+            self.assertEqual(data[:8], b"\x89PNG\r\n\x1a\n")
+            np.testing.assert_array_equal(decode_image(data), person)
+            self.assertEqual(decode_image(encode_image(person, "JPEG")).shape, person.shape)
+
+
+if __name__ == "__main__":
+    unittest.main()
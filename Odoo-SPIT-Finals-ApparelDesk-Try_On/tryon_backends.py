@@ -0,0 +1,183 @@
+import base64
+import json
+import os
+import threading
+import time
+
+import numpy as np
+import requests
+from PIL import Image
+
+from tryon_pipeline import StageTimer, decode_image, encode_jpeg_b64, scratch_file
+
+# ============================================
+# Inference backends for the try-on app
+# Every backend takes RGB numpy arrays (already at model resolution, see
+# tryon_pipeline.prepare_inputs) and returns an RGB numpy array.
+# Select one with TRYON_BACKEND=idm-vton (default), http or stub.
+# ============================================
+
+# Fixed IDM-VTON call parameters; they are part of the result cache key
+DEFAULT_PARAMS = {
+    "garment_des": "A stylish garment",
+    "is_checked": True,       # auto-mask
+    "is_checked_crop": True,  # auto-crop
+    "denoise_steps": 30,
+}
+
+
+class BackendError(Exception):
+    """Inference failure; ``retryable`` tells the scheduler whether to try again."""
+
+    def __init__(self, message, retryable=True):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class StubBackend:
+    """
+    Offline backend for development and tests.
+    Pastes the garment over the torso area of the person image, so the output
+    depends on both inputs and the seed but needs no network or GPU.
+    """
+
+    name = "stub"
+
+    def __init__(self, delay=0.0):
+        self.delay = float(delay)
+
+    def predict(self, person_img, garment_img, seed, params=None, timer=None, timeout=None):
+        timer = timer or StageTimer()
+        with timer.stage("inference"):
+            if self.delay:
+                if timeout is not None and self.delay > timeout:
+                    time.sleep(timeout)
+                    raise TimeoutError(f"Stub inference exceeded {timeout}s")
+                time.sleep(self.delay)
+            return self._composite(person_img, garment_img, seed)
+
+    def _composite(self, person_img, garment_img, seed):
+        person = Image.fromarray(person_img).convert("RGB")
+        width, height = person.size
+        box_w, box_h = max(1, width // 2), max(1, height // 3)
+        garment = Image.fromarray(garment_img).convert("RGB").resize((box_w, box_h))
+        # Shift the patch a little with the seed so different seeds differ
+        offset = int(seed) % max(1, width // 8)
+        person.paste(garment, (width // 4 + offset - width // 16, height // 4))
+        return np.array(person)
+
+
+class IDMVTONBackend:
+    """Remote IDM-VTON Space called through gradio_client."""
+
+    name = "idm-vton"
+
+    def __init__(self, space="yisol/IDM-VTON", hf_token=None):
+        from gradio_client import Client
+
+        self.client = Client(space, hf_token=hf_token)
+
+    def predict(self, person_img, garment_img, seed, params=None, timer=None, timeout=None):
+        from gradio_client import handle_file
+
+        params = {**DEFAULT_PARAMS, **(params or {})}
+        timer = timer or StageTimer()
+
+        # gradio_client uploads files; reuse content-named scratch files
+        with timer.stage("encode"):
+            person_path = scratch_file(person_img)
+            garment_path = scratch_file(garment_img)
+
+        with timer.stage("inference"):
+            # API signature: process_dc(dict, garm_img, garment_des, is_checked, is_checked_crop, denoise_steps, seed)
+            job = self.client.submit(
+                dict(background=handle_file(person_path), layers=[], composite=None),
+                handle_file(garment_path),
+                params["garment_des"],
+                params["is_checked"],
+                params["is_checked_crop"],
+                params["denoise_steps"],
+                seed,
+                api_name="/tryon",
+            )
+            result = job.result(timeout=timeout)
+
+        # The result is a tuple, first element is the output image path
+        if not result:
+            return None
+        with timer.stage("decode"):
+            return decode_image(result[0])
+
+
+class HTTPBackend:
+    """
+    JSON-over-HTTP try-on service (the protocol start_tryon speaks):
+    POST {"humanImage": b64 jpeg, "clothImage": b64 jpeg, "seed": n}
+    -> {"result": {"status": "success", "result": b64 image}}
+    """
+
+    name = "http"
+
+    def __init__(self, url, headers=None, timeout=60):
+        self.url = url
+        self.headers = {"Content-Type": "application/json", **(headers or {})}
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _session(self):
+        # requests.Session is not thread-safe; keep one per worker thread
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def predict(self, person_img, garment_img, seed, params=None, timer=None, timeout=None):
+        timer = timer or StageTimer()
+        with timer.stage("encode"):
+            data = json.dumps(
+                {
+                    "clothImage": encode_jpeg_b64(garment_img),
+                    "humanImage": encode_jpeg_b64(person_img),
+                    "seed": seed,
+                }
+            )
+
+        with timer.stage("inference"):
+            try:
+                response = self._session().post(
+                    self.url, headers=self.headers, data=data, timeout=timeout or self.timeout
+                )
+            except requests.exceptions.Timeout:
+                raise BackendError("Too many users, please try again later")
+            except requests.exceptions.ConnectionError as exc:
+                raise BackendError(f"Could not reach try-on service: {exc}")
+
+        if response.status_code == 429 or response.status_code >= 500:
+            raise BackendError(f"Try-on service busy (HTTP {response.status_code})")
+        if response.status_code != 200:
+            raise BackendError(f"URL error (HTTP {response.status_code})", retryable=False)
+        result = response.json()["result"]
+        if result["status"] != "success":
+            raise BackendError("Try again later")
+        with timer.stage("decode"):
+            return decode_image(base64.b64decode(result["result"]))
+
+
+def get_backend(name=None):
+    """Build the backend named by ``name`` or the TRYON_BACKEND env var."""
+    name = (name or os.environ.get("TRYON_BACKEND") or "idm-vton").lower()
+    if name == "stub":
+        return StubBackend(delay=os.environ.get("TRYON_STUB_DELAY", 0))
+    if name == "idm-vton":
+        return IDMVTONBackend(hf_token=os.environ.get("HF_TOKEN"))
+    if name == "http":
+        url = os.environ["tryon_url"]
+        if "://" not in url:
+            url = "http://" + url
+        headers = {
+            header: os.environ[env]
+            for header, env in (("token", "token"), ("Cookie", "Cookie"), ("referer", "referer"))
+            if env in os.environ
+        }
+        return HTTPBackend(url, headers=headers)
+    raise ValueError(f"Unknown try-on backend: {name}")
@@ -0,0 +1,149 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from PIL import Image
+
+# ============================================
+# Content-addressed cache for try-on results
+# Key = hash of the decoded person/garment pixels + seed + call parameters,
+# so re-clicking an example (or re-uploading the same photo) is a disk read.
+# ============================================
+
+DEFAULT_CACHE_DIR = os.path.join(tempfile.gettempdir(), "tryon-cache")
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _hash_array(digest, img):
+    arr = np.ascontiguousarray(img)
+    digest.update(f"{arr.shape}|{arr.dtype.str}|".encode())
+    digest.update(memoryview(arr).cast("B"))
+
+
+def cache_key(person_img, garment_img, seed, params=None, backend=""):
+    """Stable hex key for one try-on request."""
+    digest = hashlib.sha256()
+    _hash_array(digest, person_img)
+    _hash_array(digest, garment_img)
+    meta = {"seed": int(seed), "params": params or {}, "backend": backend}
+    digest.update(json.dumps(meta, sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class TryOnCache:
+    """
+    Size-bounded LRU cache of result images stored as PNG files.
+
+    Entries live at <root>/<key[:2]>/<key>.png. The LRU order is kept in
+    memory and rebuilt from file mtimes on start-up; hits touch the file so
+    the order survives restarts. Safe to share between Gradio worker threads.
+    """
+
+    def __init__(self, root=None, max_bytes=None):
+        self.root = root or os.environ.get("TRYON_CACHE_DIR") or DEFAULT_CACHE_DIR
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("TRYON_CACHE_MAX_MB", DEFAULT_MAX_BYTES // (1024 * 1024))) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> size in bytes, oldest first
+        self._total = 0
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], f"{key}.png")
+
+    def _load_index(self):
+        found = []
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if not filename.endswith(".png"):
+                    continue
+                stat = os.stat(os.path.join(dirpath, filename))
+                found.append((stat.st_mtime, filename[:-4], stat.st_size))
+        for _, key, size in sorted(found):
+            self._entries[key] = size
+            self._total += size
+        self._evict()
+
+    def _evict(self):
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.unlink(self._path(key))
+            except OSError:
+                pass
+
+    def contains(self, key):
+        """True if ``key`` is cached; checks the index and the file without decoding it."""
+        with self._lock:
+            if key not in self._entries:
+                return False
+        if os.path.exists(self._path(key)):
+            return True
+        with self._lock:
+            self._total -= self._entries.pop(key, 0)
+        return False
+
+    def get(self, key):
+        """Return the cached RGB array for ``key`` or None."""
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+        path = self._path(key)
+        try:
+            with Image.open(path) as img:
+                result = np.array(img.convert("RGB"))
+            os.utime(path)
+        except OSError:
+            # File removed behind our back; forget it
+            with self._lock:
+                self._total -= self._entries.pop(key, 0)
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        return result
+
+    def put(self, key, image):
+        """Store an RGB array under ``key`` and evict old entries if needed."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write to a temp name first so readers never see half a file
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        Image.fromarray(image).save(tmp_path, format="PNG", compress_level=1)
+        os.replace(tmp_path, path)
+        size = os.path.getsize(path)
+        with self._lock:
+            self._total += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                try:
+                    os.unlink(self._path(key))
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._total = 0
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
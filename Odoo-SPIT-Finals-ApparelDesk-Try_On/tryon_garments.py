@@ -0,0 +1,75 @@
+import hashlib
+import os
+import threading
+
+import numpy as np
+from PIL import Image, ImageFilter
+
+from tryon_pipeline import decode_image, encode_image, fit_to_model
+
+# ============================================
+# Garment pre-processing for batch pre-rendering
+# Catalog product shots are resized and cut out from their background
+# once, then reused for every model photo and every later run.
+# ============================================
+
+
+def remove_background(img, tolerance=28, smooth=5):
+    """
+    Cut a garment out of a flat studio background.
+
+    The background colour is estimated from the image border; pixels close
+    to it become white and drop out of the mask. Good enough for catalog
+    shots on plain backdrops, not a general segmentation model.
+    Returns (RGB array on white, uint8 mask with 255 = garment).
+    """
+    arr = np.asarray(img.convert("RGB") if isinstance(img, Image.Image) else img).astype(np.int16)
+    border = np.concatenate([arr[0], arr[-1], arr[:, 0], arr[:, -1]])
+    background = np.median(border, axis=0)
+    distance = np.abs(arr - background).max(axis=2)
+    mask = Image.fromarray(((distance > tolerance) * 255).astype(np.uint8))
+    # Close small holes and drop speckles
+    mask = mask.filter(ImageFilter.MaxFilter(smooth)).filter(ImageFilter.MinFilter(smooth))
+    mask = np.asarray(mask)
+    garment = np.where(mask[..., None] > 0, arr, 255).astype(np.uint8)
+    return garment, mask
+
+
+class GarmentCache:
+    """
+    Pre-processed garments on disk, keyed by source (e.g. image URL).
+    <root>/<sha1(source)>/garment.png holds the cut-out garment on white.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+
+    def _dir(self, source):
+        return os.path.join(self.root, hashlib.sha1(source.encode("utf-8")).hexdigest())
+
+    def get(self, source, loader):
+        """
+        Return the garment array for ``source``, calling ``loader()`` for the
+        raw image (array or PIL image) only when it is not cached yet.
+        """
+        directory = self._dir(source)
+        garment_path = os.path.join(directory, "garment.png")
+        if os.path.exists(garment_path):
+            with self._lock:
+                self.hits += 1
+            return decode_image(garment_path)
+
+        with self._lock:
+            self.misses += 1
+        # The backend masks the garment itself (auto-mask), so only the cut-out is kept
+        garment, _ = remove_background(fit_to_model(loader(), crop=False))
+        os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{garment_path}.{os.getpid()}-{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(encode_image(garment, "PNG"))
+        os.replace(tmp_path, garment_path)
+        return garment
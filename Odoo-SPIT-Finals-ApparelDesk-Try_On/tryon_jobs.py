@@ -0,0 +1,414 @@
+import os
+import queue
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+import uuid
+from collections import deque
+
+from tryon_backends import DEFAULT_PARAMS
+from tryon_cache import cache_key
+from tryon_pipeline import StageTimer, decode_image, encode_image, prepare_inputs
+
+# ============================================
+# Queued, concurrency-limited try-on job scheduler
+# Requests are submitted as jobs to a bounded queue and served by a fixed
+# pool of worker threads, so at most ``workers`` inference calls are in
+# flight upstream however many users are waiting. Jobs are persisted in a
+# small SQLite database (inputs as PNG files next to it), so queued work
+# survives a restart. Identical requests (same cache key) share one job,
+# results go into the TryOnCache, and failures are retried with
+# exponential backoff.
+#
+# Try it against the fake server:
+#     python tryon_jobs.py --jobs 40 --workers 4 --latency 0.5 --fail-rate 0.2
+# ============================================
+
+DEFAULT_STATE_DIR = os.path.join(tempfile.gettempdir(), "tryon-jobs")
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATUSES = (QUEUED, RUNNING)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    cache_key TEXT NOT NULL,
+    seed INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    stages TEXT,
+    submitted_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, submitted_at);
+"""
+
+
+class QueueFull(Exception):
+    pass
+
+
+def _percentiles(values):
+    if not values:
+        return {"count": 0, "p50": None, "p95": None, "max": None}
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    return {
+        "count": len(ordered),
+        "p50": round(ordered[int(last * 0.5)], 1),
+        "p95": round(ordered[int(last * 0.95)], 1),
+        "max": round(ordered[-1], 1),
+    }
+
+
+class JobScheduler:
+    def __init__(
+        self,
+        backend,
+        cache,
+        workers=4,
+        max_queue=200,
+        timeout=120,
+        max_attempts=3,
+        backoff=2.0,
+        queue_timeout=600,
+        state_dir=None,
+        params=None,
+    ):
+        self.backend = backend
+        self.cache = cache
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.queue_timeout = queue_timeout
+        self.params = params or DEFAULT_PARAMS
+        self.state_dir = state_dir or os.environ.get("TRYON_JOBS_DIR") or DEFAULT_STATE_DIR
+        self.input_dir = os.path.join(self.state_dir, "inputs")
+        os.makedirs(self.input_dir, exist_ok=True)
+
+        self._db = sqlite3.connect(os.path.join(self.state_dir, "jobs.db"), check_same_thread=False)
+        self._db.executescript(SCHEMA)
+        self._db_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._inflight = {}  # cache key -> job id
+        self._counters = {"submitted": 0, "completed": 0, "failed": 0, "deduplicated": 0, "cache_hits": 0, "retries": 0}
+        self._queue_wait_ms = deque(maxlen=1000)
+        self._service_ms = deque(maxlen=1000)
+        self._running = 0
+        self._stopping = threading.Event()
+        self._threads = []
+
+        self._recover()
+
+    # ---------- persistence ----------
+
+    def _execute(self, sql, params=()):
+        with self._db_lock:
+            cursor = self._db.execute(sql, params)
+            self._db.commit()
+            return cursor.fetchall()
+
+    def _update(self, job_id, **fields):
+        columns = ", ".join(f"{name} = ?" for name in fields)
+        self._execute(f"UPDATE jobs SET {columns} WHERE job_id = ?", (*fields.values(), job_id))
+
+    def _input_paths(self, job_id):
+        return (
+            os.path.join(self.input_dir, f"{job_id}-person.png"),
+            os.path.join(self.input_dir, f"{job_id}-garment.png"),
+        )
+
+    def _recover(self):
+        """Re-queue jobs left queued or running by a previous process."""
+        cutoff = time.time() - 86400
+        self._execute("DELETE FROM jobs WHERE status IN (?, ?) AND finished_at < ?", (DONE, FAILED, cutoff))
+        rows = self._execute(
+            "SELECT job_id, cache_key FROM jobs WHERE status IN (?, ?) ORDER BY submitted_at",
+            ACTIVE_STATUSES,
+        )
+        for job_id, key in rows:
+            self._update(job_id, status=QUEUED, started_at=None)
+            self._inflight[key] = job_id
+            self._queue.put(job_id)
+        if rows:
+            print(f"[OK] Recovered {len(rows)} try-on jobs")
+
+    # ---------- lifecycle ----------
+
+    def start(self):
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker, name=f"tryon-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, wait=True):
+        self._stopping.set()
+        for _ in self._threads:
+            self._queue.put(None)
+        if wait:
+            for thread in self._threads:
+                thread.join()
+        self._threads = []
+
+    # ---------- public API ----------
+
+    def submit(self, person_img, garment_img, seed):
+        """
+        Queue a try-on and return its job id.
+        Returns the existing job for an identical in-flight request and a
+        finished job straight away when the result is already cached.
+        Raises QueueFull when max_queue jobs are waiting.
+        """
+        key = cache_key(person_img, garment_img, seed, self.params, self.backend.name)
+        with self._lock:
+            self._counters["submitted"] += 1
+            existing = self._inflight.get(key)
+            if existing is not None:
+                self._counters["deduplicated"] += 1
+                return existing
+
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        if self.cache.contains(key):
+            with self._lock:
+                self._counters["cache_hits"] += 1
+            self._execute(
+                "INSERT INTO jobs (job_id, cache_key, seed, status, submitted_at, started_at, finished_at, stages) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, key, int(seed), DONE, now, now, now, "cached"),
+            )
+            return job_id
+
+        if self._queue.qsize() >= self.max_queue:
+            raise QueueFull("Too many users, please try again later")
+
+        # Inputs are written before the job becomes visible to workers
+        timer = StageTimer()
+        person, garment = prepare_inputs(person_img, garment_img, timer)
+        paths = self._input_paths(job_id)
+        with timer.stage("encode"):
+            for path, img in zip(paths, (person, garment)):
+                with open(path, "wb") as f:
+                    f.write(encode_image(img, "PNG"))
+
+        with self._lock:
+            existing = self._inflight.get(key)
+            full = existing is None and self._queue.qsize() >= self.max_queue
+            if existing is None and not full:
+                self._execute(
+                    "INSERT INTO jobs (job_id, cache_key, seed, status, submitted_at, stages) VALUES (?, ?, ?, ?, ?, ?)",
+                    (job_id, key, int(seed), QUEUED, now, timer.summary()),
+                )
+                self._inflight[key] = job_id
+                self._queue.put(job_id)
+                return job_id
+            if existing is not None:
+                self._counters["deduplicated"] += 1
+
+        # Lost the race to an identical submission, or the queue filled up
+        for path in paths:
+            os.unlink(path)
+        if full:
+            raise QueueFull("Too many users, please try again later")
+        return existing
+
+    def status(self, job_id):
+        """Job state as a dict, with queue position and a rough ETA while queued."""
+        rows = self._execute(
+            "SELECT job_id, cache_key, seed, status, attempts, error, stages, submitted_at, started_at, finished_at "
+            "FROM jobs WHERE job_id = ?",
+            (job_id,),
+        )
+        if not rows:
+            return None
+        fields = ("job_id", "cache_key", "seed", "status", "attempts", "error", "stages", "submitted_at", "started_at", "finished_at")
+        job = dict(zip(fields, rows[0]))
+        if job["status"] == QUEUED:
+            ahead = self._execute(
+                "SELECT COUNT(*) FROM jobs WHERE status = ? AND submitted_at < ?",
+                (QUEUED, job["submitted_at"]),
+            )[0][0]
+            job["position"] = ahead + 1
+            service = _percentiles(self._service_ms)["p50"] or 0
+            job["eta_seconds"] = round((ahead // max(1, self.workers) + 1) * service / 1000, 1)
+        return job
+
+    def result(self, job_id):
+        """Result image for a finished job, or None (not done / evicted from cache)."""
+        job = self.status(job_id)
+        if not job or job["status"] != DONE:
+            return None
+        return self.cache.get(job["cache_key"])
+
+    def wait(self, job_id, poll_interval=0.5, timeout=None):
+        """Yield the job status every poll_interval until it finishes."""
+        deadline = time.time() + timeout if timeout else None
+        while True:
+            job = self.status(job_id)
+            yield job
+            if job is None or job["status"] in (DONE, FAILED):
+                return
+            if deadline and time.time() > deadline:
+                return
+            time.sleep(poll_interval)
+
+    def metrics(self):
+        with self._lock:
+            counters = dict(self._counters)
+            running = self._running
+            inflight = len(self._inflight)
+        return {
+            "backend": self.backend.name,
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize(),
+            "running": running,
+            "inflight": inflight,
+            **counters,
+            "queue_wait_ms": _percentiles(self._queue_wait_ms),
+            "service_time_ms": _percentiles(self._service_ms),
+        }
+
+    # ---------- workers ----------
+
+    def _worker(self):
+        while not self._stopping.is_set():
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            with self._lock:
+                self._running += 1
+            try:
+                self._run_job(job_id)
+            except Exception as e:
+                print(f"Job {job_id} crashed: {e}")
+                self._finish(job_id, FAILED, error=str(e))
+            finally:
+                with self._lock:
+                    self._running -= 1
+
+    def _run_job(self, job_id):
+        rows = self._execute("SELECT cache_key, seed, submitted_at, stages FROM jobs WHERE job_id = ?", (job_id,))
+        if not rows:
+            return
+        key, seed, submitted_at, stages = rows[0]
+        started_at = time.time()
+        self._queue_wait_ms.append((started_at - submitted_at) * 1000)
+        if started_at - submitted_at > self.queue_timeout:
+            self._finish(job_id, FAILED, error="Timed out waiting in queue")
+            return
+        self._update(job_id, status=RUNNING, started_at=started_at)
+
+        person_path, garment_path = self._input_paths(job_id)
+        try:
+            person, garment = decode_image(person_path), decode_image(garment_path)
+        except OSError:
+            self._finish(job_id, FAILED, error="Job inputs are missing")
+            return
+
+        for attempt in range(1, self.max_attempts + 1):
+            self._update(job_id, attempts=attempt)
+            timer = StageTimer()
+            try:
+                result = self.backend.predict(person, garment, seed, self.params, timer=timer, timeout=self.timeout)
+                if result is None:
+                    raise ValueError("No result returned from API")
+            except Exception as e:
+                retryable = getattr(e, "retryable", True)
+                if not retryable or attempt == self.max_attempts:
+                    self._finish(job_id, FAILED, error=str(e))
+                    return
+                with self._lock:
+                    self._counters["retries"] += 1
+                delay = self.backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5)
+                print(f"Job {job_id} attempt {attempt} failed ({e}); retrying in {delay:.1f}s")
+                if self._stopping.wait(delay):
+                    # Leave it queued for the next process
+                    self._update(job_id, status=QUEUED)
+                    return
+                continue
+
+            with timer.stage("cache"):
+                self.cache.put(key, result)
+            self._service_ms.append((time.time() - started_at) * 1000)
+            summary = ", ".join(part for part in (stages, timer.summary()) if part)
+            self._finish(job_id, DONE, stages=summary)
+            return
+
+    def _finish(self, job_id, status, error=None, stages=None):
+        fields = {"status": status, "finished_at": time.time(), "error": error}
+        if stages is not None:
+            fields["stages"] = stages
+        self._update(job_id, **fields)
+        for path in self._input_paths(job_id):
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._counters["completed" if status == DONE else "failed"] += 1
+            for key, inflight_id in list(self._inflight.items()):
+                if inflight_id == job_id:
+                    del self._inflight[key]
+
+
+def main():
+    import argparse
+
+    import numpy as np
+    from PIL import Image
+
+    from fake_tryon_server import FakeTryOnServer
+    from tryon_backends import HTTPBackend
+    from tryon_cache import TryOnCache
+
+    parser = argparse.ArgumentParser(description="Run try-on jobs through the scheduler against the fake server")
+    parser.add_argument("--jobs", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--fail-rate", type=float, default=0.1)
+    parser.add_argument("--duplicates", type=float, default=0.25, help="share of submissions that repeat an earlier one")
+    args = parser.parse_args()
+
+    server = FakeTryOnServer(latency=args.latency, fail_rate=args.fail_rate, max_concurrent=args.workers).start()
+    state_dir = tempfile.mkdtemp(prefix="tryon-jobs-")
+    cache = TryOnCache(root=os.path.join(state_dir, "cache"))
+    scheduler = JobScheduler(
+        HTTPBackend(server.url), cache, workers=args.workers, backoff=0.2, state_dir=state_dir
+    ).start()
+
+    assets = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "examples")
+    person = np.array(Image.open(os.path.join(assets, "model1.png")).convert("RGB"))
+    garment = np.array(Image.open(os.path.join(assets, "garment1.png")).convert("RGB"))
+
+    start = time.time()
+    job_ids, seeds = [], []
+    for index in range(args.jobs):
+        seed = random.choice(seeds) if seeds and random.random() < args.duplicates else index
+        seeds.append(seed)
+        job_ids.append(scheduler.submit(person, garment, seed))
+    for job_id in set(job_ids):
+        for _ in scheduler.wait(job_id, poll_interval=0.05):
+            pass
+
+    elapsed = time.time() - start
+    scheduler.stop()
+    server.stop()
+    print(f"{args.jobs} submissions, {len(set(job_ids))} jobs in {elapsed:.1f}s")
+    print(f"upstream: {server.requests} requests, {server.rejected} rejected, peak concurrency {server.peak_concurrency}")
+    for name, value in scheduler.metrics().items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    main()
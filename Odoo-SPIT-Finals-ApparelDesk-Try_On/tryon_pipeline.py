@@ -0,0 +1,152 @@
+import base64
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+from PIL import Image
+
+# ============================================
+# Pre-processing for try-on requests
+# IDM-VTON works at 768x1024 (3:4), so full-resolution uploads are cropped
+# and downsized here before anything is encoded or sent over the wire.
+# ============================================
+
+MODEL_WIDTH = 768
+MODEL_HEIGHT = 1024
+
+SCRATCH_DIR = os.environ.get("TRYON_SCRATCH_DIR") or os.path.join(tempfile.gettempdir(), "tryon-scratch")
+SCRATCH_MAX_FILES = 256
+
+
+class StageTimer:
+    """Collects wall-clock milliseconds per named pipeline stage."""
+
+    def __init__(self):
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def total(self):
+        return sum(self.stages.values())
+
+    def summary(self):
+        return ", ".join(f"{name} {ms:.0f}ms" for name, ms in self.stages.items())
+
+
+def _as_rgb(img):
+    if isinstance(img, Image.Image):
+        return img.convert("RGB")
+    return Image.fromarray(img).convert("RGB")
+
+
+def crop_to_aspect(img, width=MODEL_WIDTH, height=MODEL_HEIGHT):
+    """Center-crop a PIL image to the width:height aspect ratio."""
+    w, h = img.size
+    target = width / height
+    if abs(w / h - target) < 1e-3:
+        return img
+    if w / h > target:
+        new_w = int(round(h * target))
+        left = (w - new_w) // 2
+        return img.crop((left, 0, left + new_w, h))
+    new_h = int(round(w / target))
+    top = (h - new_h) // 2
+    return img.crop((0, top, w, top + new_h))
+
+
+def fit_to_model(img, crop=True, width=MODEL_WIDTH, height=MODEL_HEIGHT):
+    """
+    Return an RGB array no larger than the model input.
+    With crop=True the image is center-cropped to 3:4 first (what IDM-VTON's
+    auto-crop does to the person photo); otherwise the aspect is kept.
+    Images are only ever scaled down.
+    """
+    pil = _as_rgb(img)
+    if crop:
+        pil = crop_to_aspect(pil, width, height)
+    if pil.width > width or pil.height > height:
+        pil.thumbnail((width, height), Image.Resampling.BICUBIC)
+    return np.asarray(pil)
+
+
+def prepare_inputs(person_img, garment_img, timer=None):
+    """Downsize both inputs to model resolution; person is cropped, garment is not."""
+    timer = timer or StageTimer()
+    with timer.stage("preprocess"):
+        person = fit_to_model(person_img, crop=True)
+        garment = fit_to_model(garment_img, crop=False)
+    return person, garment
+
+
+def encode_image(img, fmt="PNG", **save_kwargs):
+    """Encode an RGB array into an in-memory buffer and return the bytes."""
+    buf = io.BytesIO()
+    if fmt.upper() == "PNG":
+        save_kwargs.setdefault("compress_level", 1)
+    if fmt.upper() == "JPEG":
+        save_kwargs.setdefault("quality", 92)
+    _as_rgb(img).save(buf, format=fmt, **save_kwargs)
+    return buf.getvalue()
+
+
+def encode_jpeg_b64(img, quality=92):
+    return base64.b64encode(encode_image(img, "JPEG", quality=quality)).decode("utf-8")
+
+
+def decode_image(data):
+    """Decode image bytes (or a file path) into an RGB array."""
+    if isinstance(data, (bytes, bytearray)):
+        data = io.BytesIO(data)
+    with Image.open(data) as img:
+        return np.array(img.convert("RGB"))
+
+
+def scratch_file(img, root=SCRATCH_DIR):
+    """
+    Write an RGB array to the reusable scratch directory and return its path.
+    Files are named by content hash, so re-sending the same (pre-processed)
+    image skips the encode entirely. Clients that need a file path
+    (gradio_client uploads) use this instead of a fresh temp file per call.
+    """
+    arr = np.ascontiguousarray(img)
+    name = hashlib.sha1(memoryview(arr).cast("B")).hexdigest()
+    path = os.path.join(root, f"{name}-{arr.shape[1]}x{arr.shape[0]}.png")
+    if os.path.exists(path):
+        os.utime(path)
+        return path
+    os.makedirs(root, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(encode_image(arr, "PNG"))
+    os.replace(tmp_path, path)
+    _trim_scratch(root)
+    return path
+
+
+def _trim_scratch(root, max_files=SCRATCH_MAX_FILES):
+    entries = []
+    try:
+        for entry in os.scandir(root):
+            if entry.name.endswith(".png"):
+                entries.append((entry.stat().st_mtime, entry.path))
+    except OSError:
+        return
+    if len(entries) <= max_files:
+        return
+    entries.sort()
+    for _, path in entries[: len(entries) - max_files]:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
@@ -0,0 +1,155 @@
+"""
+JWT authentication without a User query per request.
+
+CachedJWTAuthentication validates the token like simplejwt's
+JWTAuthentication but returns a Principal: user id, role, staff flags and
+the contact's id and type, read with one joined query and then kept in a
+per-process cache for PRINCIPAL_CACHE_SECONDS. That is enough for the
+permission checks and ownership filters most endpoints run. Saves and
+deletes of users and contacts in this process drop the affected entries
+at once; other workers pick the change up within the TTL.
+
+Views that need the full rows use ``principal.user`` / ``principal.contact``,
+loaded on first use. Any other User attribute (username, email, ...) is
+read from the full row too, so code written against request.user keeps
+working. Filter by ``request.user.pk`` / ``request.user.contact_id`` rather
+than passing request.user to the ORM.
+"""
+
+import threading
+import time
+
+from django.conf import settings
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import Contact, User
+
+PRINCIPAL_FIELDS = ("user_id", "user_role", "contact_id", "contact__contact_type", "is_staff", "is_superuser", "is_active")
+
+
+class Principal:
+    """The authenticated user as far as permissions and ownership filters need it."""
+
+    is_authenticated = True
+    is_anonymous = False
+
+    def __init__(self, user_id, user_role, contact_id, contact_type, is_staff, is_superuser, is_active):
+        self.user_id = user_id
+        self.user_role = user_role
+        self.contact_id = contact_id
+        self.contact_type = contact_type
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+        self.is_active = is_active
+
+    @property
+    def pk(self):
+        return self.user_id
+
+    id = pk
+
+    @cached_property
+    def user(self):
+        """The full User row (with its contact), loaded on first use."""
+        return User.objects.select_related("contact").get(pk=self.user_id)
+
+    @cached_property
+    def contact(self):
+        if self.contact_id is None:
+            return None
+        if "user" in self.__dict__:
+            return self.user.contact
+        return Contact.objects.get(pk=self.contact_id)
+
+    def __getattr__(self, name):
+        # Only User attributes fall through, so probes like hasattr(principal, "resolve_expression") stay cheap
+        if name.startswith("_") or not hasattr(User, name):
+            raise AttributeError(name)
+        return getattr(self.user, name)
+
+    def __eq__(self, other):
+        if isinstance(other, (Principal, User)):
+            return self.pk == other.pk
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.user_id)
+
+    def __str__(self):
+        return f"Principal {self.user_id}"
+
+
+class PrincipalCache:
+    """Per-process {user id: (principal fields, expiry)}; a TTL of 0 disables caching."""
+
+    def __init__(self, ttl=None, max_entries=10_000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.loads = 0
+
+    def _ttl(self):
+        if self.ttl is not None:
+            return self.ttl
+        return getattr(settings, "PRINCIPAL_CACHE_SECONDS", 30.0)
+
+    def get(self, user_id):
+        """A fresh Principal for ``user_id``, or None if there is no such user."""
+        entry = self._entries.get(user_id)
+        now = time.monotonic()
+        if entry is None or entry[1] <= now:
+            fields = (
+                User.objects.filter(**{api_settings.USER_ID_FIELD: user_id}).values_list(*PRINCIPAL_FIELDS).first()
+            )
+            self.loads += 1
+            if fields is None:
+                return None
+            ttl = self._ttl()
+            if ttl > 0:
+                with self._lock:
+                    if len(self._entries) >= self.max_entries:
+                        self._entries = {k: v for k, v in self._entries.items() if v[1] > now}
+                    if len(self._entries) < self.max_entries:
+                        self._entries[user_id] = (fields, now + ttl)
+            return Principal(*fields)
+        return Principal(*entry[0])
+
+    def invalidate(self, user_ids=None, contact_ids=None):
+        """Drop the given users, the users of the given contacts, or (no arguments) everything."""
+        with self._lock:
+            if user_ids is None and contact_ids is None:
+                self._entries = {}
+                return
+            user_ids = set(user_ids or ())
+            contact_ids = set(contact_ids or ())
+            self._entries = {
+                user_id: entry
+                for user_id, entry in self._entries.items()
+                if user_id not in user_ids and entry[0][2] not in contact_ids
+            }
+
+
+principals = PrincipalCache()
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash of the full row
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        principal = principals.get(user_id)
+        if principal is None:
+            raise AuthenticationFailed(_("User not found"), code="user_not_found")
+        if not principal.is_active:
+            raise AuthenticationFailed(_("User is inactive"), code="user_inactive")
+        return principal
@@ -15,7 +15,20 @@ class IsVendorUser(BasePermission):
         # internal role or vendor/both contact
         if getattr(user, "user_role", None) == "internal":
             return True
-        contact = getattr(user, "contact", None)
-        if contact and contact.contact_type in ("vendor", "both"):
-            return True
-        return False
+        # A cached principal carries its contact type; a full User has to load the contact
+        contact_type = getattr(user, "contact_type", None)
+        if contact_type is None and getattr(user, "contact_id", None):
+            contact_type = user.contact.contact_type
+        return contact_type in ("vendor", "both")
+
+
+class IsInternalUser(BasePermission):
+    """
+    Allows access to staff, superusers and users with the internal role.
+    """
+
+    def has_permission(self, request, view):
+        user = request.user
+        if not user or not user.is_authenticated:
+            return False
+        return bool(user.is_staff or user.is_superuser or getattr(user, "user_role", None) == "internal")
@@ -0,0 +1,21 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import principals
+from .models import Contact, User
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # Now, and again after commit so a principal read mid-transaction is not kept
+    principals.invalidate(user_ids=[instance.pk])
+    transaction.on_commit(lambda: principals.invalidate(user_ids=[instance.pk]))
+
+
+@receiver(post_save, sender=Contact)
+@receiver(post_delete, sender=Contact)
+def contact_changed(sender, instance, **kwargs):
+    principals.invalidate(contact_ids=[instance.pk])
+    transaction.on_commit(lambda: principals.invalidate(contact_ids=[instance.pk]))
@@ -1,3 +1,55 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
 
-# Create your tests here.
+from .authentication import Principal, principals
+from .models import Address, Contact, User
+
+
+@override_settings(PRINCIPAL_CACHE_SECONDS=30)
+class CachedPrincipalTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.contact = Contact.objects.create(
+            contact_name="Vendor Co", contact_type="vendor", email="vendor@example.com", mobile="9000000000"
+        )
+        cls.user = User.objects.create_user(
+            username="vendor-user", email="vendor-user@example.com", password="x", user_role="portal", contact=cls.contact
+        )
+        Address.objects.create(contact=cls.contact, address_line1="1 Main St", city="Pune")
+
+    def setUp(self):
+        principals.invalidate()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def query_count(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content[:200])
+        return int(response["X-Query-Count"])
+
+    def test_second_request_skips_the_user_lookup(self):
+        loads = principals.loads
+        first = self.query_count("/api/auth/addresses/")
+        self.assertEqual(self.query_count("/api/auth/addresses/"), first - 1)
+        self.assertEqual(principals.loads, loads + 1)
+
+    def test_principal_resolves_permissions_and_loads_rows_on_demand(self):
+        principal = principals.get(self.user.pk)
+        self.assertIsInstance(principal, Principal)
+        self.assertEqual((principal.contact_id, principal.contact_type), (self.contact.pk, "vendor"))
+        self.assertEqual(principal, self.user)
+        with self.assertNumQueries(1):
+            self.assertEqual(principal.username, "vendor-user")
+            self.assertEqual(principal.contact.contact_name, "Vendor Co")
+        self.assertEqual(self.client.get("/api/inventory/reorder/").status_code, 200)
+
+    def test_saving_user_or_contact_invalidates(self):
+        self.assertEqual(self.client.get("/api/inventory/reorder/").status_code, 200)
+        self.contact.contact_type = "customer"
+        self.contact.save()
+        self.assertEqual(self.client.get("/api/inventory/reorder/").status_code, 403)
+
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get("/api/auth/addresses/").status_code, 401)
@@ -117,11 +117,11 @@ class AddressListCreateView(generics.ListCreateAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Address.objects.filter(contact=self.request.user.contact).order_by("-created_at")
+        return Address.objects.filter(contact_id=self.request.user.contact_id).order_by("-created_at")
 
     def perform_create(self, serializer):
         # Only allow creating addresses for the authenticated user's contact
-        serializer.save(contact=self.request.user.contact)
+        serializer.save(contact_id=self.request.user.contact_id)
 
 
 class AddressDetailView(generics.RetrieveUpdateDestroyAPIView):
@@ -130,7 +130,7 @@ class AddressDetailView(generics.RetrieveUpdateDestroyAPIView):
     lookup_field = "address_id"
 
     def get_queryset(self):
-        return Address.objects.filter(contact=self.request.user.contact)
+        return Address.objects.filter(contact_id=self.request.user.contact_id)
 
 
 class PortalUsersListView(generics.ListAPIView):
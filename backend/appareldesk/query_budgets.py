@@ -0,0 +1,74 @@
+"""
+Maximum queries per request for every endpoint in appareldesk/urls.py, by
+URL name (or {method: budget} where methods differ a lot). Counts include
+the JWT principal lookup, which is cached outside tests. Enforced by
+system.querybudget.QueryBudgetMiddleware: overruns are logged in debug and
+fail in tests. A budget must not depend on page size or on the number of
+lines in a request; when one has to grow, look for a query in a loop first.
+"""
+
+QUERY_BUDGETS = {
+    # accounts
+    "token_obtain_pair": 3,
+    "token_refresh": 2,
+    "register": 9,
+    "vendor-register": 9,
+    "profile": 4,
+    "address-list-create": 4,
+    "address-detail": 5,
+    "portal-users-list": 4,
+    "portal-user-detail": 4,
+    "customers-list": 4,
+    "vendors-list": 4,
+    # catalog
+    "product-list": 6,
+    "product-facets": 8,
+    "product-detail": 5,
+    "vendor-product-list-create": {"GET": 6, "POST": 10},
+    "vendor-product-bulk-create": 14,
+    # pricing
+    "payment-terms": 4,
+    "coupon-validate": 4,
+    "offers": 4,
+    "offers-create": 4,
+    "coupon-list": 4,
+    "coupon-generate": 10,
+    # sales
+    "sales-orders": 7,
+    "sales-order-detail": 7,
+    "sales-order-status": 10,
+    "customer-invoices": 4,
+    "vendor-invoices": 4,
+    "checkout": 30,
+    "contact-lookup": 3,
+    "customer-summary": 7,
+    "order-customers": 4,
+    "cart": {"GET": 7, "POST": 14},
+    "invoice-bill-report": 6,
+    "invoice-bill-summary": 6,
+    # purchases
+    "purchase-orders": 5,
+    "purchase-orders-create": 16,
+    "purchase-orders-import": 15,
+    "purchase-orders-create-bill": 15,
+    "vendor-bills": 4,
+    "vendor-bills-pay": 16,
+    "vendor-bills-generate": 13,
+    "payment-runs": 14,
+    "vendors": 3,
+    # payments
+    "payments": 5,
+    "payment-create": 14,
+    "payment-reconcile": 15,
+    "payment-aging": 3,
+    # inventory
+    "stock-movements": 4,
+    "stock-at-date": 5,
+    "inventory-valuation": 5,
+    "reorder-suggestions": 3,
+    "reorder-purchase-orders": 6,
+    # system
+    "system-settings": 3,
+    "health": 2,
+    "metrics": 2,
+}
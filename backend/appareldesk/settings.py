@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "system.metrics.RequestMetricsMiddleware",
+    "system.querybudget.QueryBudgetMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
@@ -50,6 +52,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "system.middleware.AuditContextMiddleware",
 ]
 
 ROOT_URLCONF = "appareldesk.urls"
@@ -77,6 +80,10 @@ DATABASES = {
         conn_max_age=600,
     )
 }
+if DATABASES["default"].get("ENGINE") == "django.db.backends.sqlite3":
+    # Take the write lock when a transaction starts: concurrent writers then wait up to the timeout
+    # instead of failing at once with "database is locked" when a read lock cannot be upgraded
+    DATABASES["default"].setdefault("OPTIONS", {}).update({"transaction_mode": "IMMEDIATE", "timeout": 20})
 
 AUTH_USER_MODEL = "accounts.User"
 
@@ -102,7 +109,7 @@ CORS_ALLOW_CREDENTIALS = True
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "accounts.authentication.CachedJWTAuthentication",
     ),
     "DEFAULT_PERMISSION_CLASSES": ("rest_framework.permissions.IsAuthenticatedOrReadOnly",),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
@@ -122,4 +129,33 @@ DEFAULT_FROM_EMAIL = env("DEFAULT_FROM_EMAIL", default="noreply@appareldesk.loca
 
 FRONTEND_URL = env("FRONTEND_URL", default="http://localhost:5173")
 
+# How often each worker checks system_settings for changes made elsewhere
+SYSTEM_SETTINGS_POLL_SECONDS = env.float("SYSTEM_SETTINGS_POLL_SECONDS", default=5.0)
+
+# How long a worker trusts its cached JWT principal (role, contact) after a change made in another worker
+PRINCIPAL_CACHE_SECONDS = env.float("PRINCIPAL_CACHE_SECONDS", default=30.0)
+
+# Audit trail (system.audit): "async" (background writer), "sync" or "off"
+AUDIT_LOG_MODE = env("AUDIT_LOG_MODE", default="async")
+AUDIT_LOG_BATCH_SIZE = env.int("AUDIT_LOG_BATCH_SIZE", default=500)
+AUDIT_LOG_FLUSH_SECONDS = env.float("AUDIT_LOG_FLUSH_SECONDS", default=1.0)
+AUDIT_LOG_MAX_QUEUE = env.int("AUDIT_LOG_MAX_QUEUE", default=10000)
+# Batches that fail this many writes are appended to AUDIT_LOG_SPILL_PATH (load back with `manage.py loaddata`)
+AUDIT_LOG_MAX_ATTEMPTS = env.int("AUDIT_LOG_MAX_ATTEMPTS", default=5)
+AUDIT_LOG_SPILL_PATH = env("AUDIT_LOG_SPILL_PATH", default=str(BASE_DIR / "audit_log_spill.jsonl"))
+AUDIT_LOG_RETENTION_DAYS = env.int("AUDIT_LOG_RETENTION_DAYS", default=365)
+
+# Request metrics (system.metrics, served at /api/system/metrics)
+SLOW_REQUEST_SECONDS = env.float("SLOW_REQUEST_SECONDS", default=1.0)
+SLOW_REQUEST_SAMPLE_RATE = env.float("SLOW_REQUEST_SAMPLE_RATE", default=1.0)
+# Bearer token a scraper can use instead of an internal user's JWT; empty disables it
+METRICS_SCRAPE_TOKEN = env("METRICS_SCRAPE_TOKEN", default="")
+
+# Query budgets and N+1 detection (system.querybudget, budgets in appareldesk/query_budgets.py):
+# "warn" logs offending requests, "raise" fails them (tests), "off" removes the middleware
+QUERY_BUDGET_MODE = env("QUERY_BUDGET_MODE", default="warn" if DEBUG else "off")
+QUERY_REPEAT_THRESHOLD = env.int("QUERY_REPEAT_THRESHOLD", default=5)
+
+TEST_RUNNER = "appareldesk.test_runner.TestRunner"
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
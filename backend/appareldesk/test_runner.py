@@ -0,0 +1,13 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        # The background audit writer would use its own connection, outside the test transaction
+        settings.AUDIT_LOG_MODE = "sync"
+        # Every request a test makes must stay within its query budget
+        settings.QUERY_BUDGET_MODE = "raise"
+        # Rolled-back tests reuse user ids, so a cached principal could outlive its user
+        settings.PRINCIPAL_CACHE_SECONDS = 0
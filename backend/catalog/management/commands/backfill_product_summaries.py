@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from catalog.models import Product
+from catalog.services import refresh_product_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the denormalized primary_image_url / color_summary / color_count on products "
+        "from their images and colors. Safe to re-run."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+        parser.add_argument("--product", type=int, action="append", help="Only these product ids (repeatable)")
+
+    def handle(self, *args, **options):
+        ids = Product.objects.order_by("pk").values_list("pk", flat=True)
+        if options["product"]:
+            ids = ids.filter(pk__in=options["product"])
+        ids = list(ids)
+        batch_size = options["batch_size"]
+        done = 0
+        for start in range(0, len(ids), batch_size):
+            done += refresh_product_summaries(ids[start : start + batch_size])
+            self.stdout.write(f"  {done}/{len(ids)} products")
+        self.stdout.write(self.style.SUCCESS(f"Refreshed summaries for {done} products"))
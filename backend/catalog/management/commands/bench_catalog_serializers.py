@@ -0,0 +1,107 @@
+import json
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from catalog.models import Product, ProductColor, ProductImage
+from catalog.renderers import FastJSONRenderer
+from catalog.serializers import ProductSerializer
+from catalog.services import PRODUCT_FIELDS, product_rows
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare ProductSerializer + JSONRenderer with the values()-based catalog read path. "
+        "Synthetic products are created inside a transaction that is rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--colors", type=int, default=4, help="Colors per product")
+        parser.add_argument("--images", type=int, default=4, help="Images per product")
+        parser.add_argument("--page-sizes", type=int, nargs="*", default=[50, 500])
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--keep", action="store_true", help="Commit generated rows instead of rolling back")
+
+    def _timed(self, label, fn, repeat):
+        fn()  # warm-up
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        elapsed = (time.perf_counter() - start) / repeat
+        self.stdout.write(f"{label:<45} {elapsed * 1000:10.2f} ms")
+        return result, elapsed
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                if not options["keep"]:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.WARNING("Rolled back benchmark data"))
+
+    def _run(self, options):
+        Product.objects.bulk_create(
+            [
+                Product(
+                    product_name=f"Bench Catalog {i}",
+                    product_code=f"BENCHCAT-{i:06d}",
+                    product_category="unisex",
+                    product_type="shirt",
+                    material="cotton",
+                    description="Synthetic product for serializer benchmarks",
+                    sales_price=Decimal("999.00"),
+                    purchase_price=Decimal("450.00"),
+                    is_published=True,
+                )
+                for i in range(options["products"])
+            ],
+            batch_size=1000,
+        )
+        ids = list(Product.objects.filter(product_code__startswith="BENCHCAT-").values_list("pk", flat=True))
+        ProductColor.objects.bulk_create(
+            [
+                ProductColor(product_id=pid, color_name=f"Color {c}", color_code="#000000", display_order=c)
+                for pid in ids
+                for c in range(options["colors"])
+            ],
+            batch_size=2000,
+        )
+        ProductImage.objects.bulk_create(
+            [
+                ProductImage(
+                    product_id=pid,
+                    image_url=f"https://img.example.com/{pid}/{n}.jpg",
+                    image_alt_text="Bench",
+                    display_order=n,
+                    is_primary=n == 0,
+                )
+                for pid in ids
+                for n in range(options["images"])
+            ],
+            batch_size=2000,
+        )
+        base = Product.objects.filter(product_code__startswith="BENCHCAT-", is_active=True).order_by("product_id")
+        self.stdout.write(f"{len(ids)} products, {options['colors']} colors and {options['images']} images each\n")
+
+        for size in options["page_sizes"]:
+            def serializer_path():
+                page = base.prefetch_related("colors", "images")[:size]
+                return JSONRenderer().render(ProductSerializer(page, many=True).data)
+
+            def values_path():
+                return FastJSONRenderer().render(product_rows(base.values(*PRODUCT_FIELDS)[:size]))
+
+            old, old_time = self._timed(f"page {size}: ProductSerializer", serializer_path, options["repeat"])
+            new, new_time = self._timed(f"page {size}: values() + FastJSONRenderer", values_path, options["repeat"])
+            if json.loads(old) != json.loads(new):
+                raise CommandError(f"Output mismatch at page size {size}")
+            self.stdout.write(self.style.SUCCESS(f"page {size}: identical JSON, {old_time / new_time:.1f}x faster\n"))
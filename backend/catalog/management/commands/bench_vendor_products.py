@@ -0,0 +1,95 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.test import APIRequestFactory
+
+from catalog.models import Product, ProductColor, ProductImage
+from catalog.views import VendorProductBulkCreateView, VendorProductListCreateView
+
+
+class _Rollback(Exception):
+    pass
+
+
+def vendor_payload(prefix, i):
+    return {
+        "product_name": f"Bench Vendor {i}",
+        "product_code": f"{prefix}-{i:06d}",
+        "product_category": "Male",
+        "product_type": "Casual Shirts",
+        "material": "cotton",
+        "sales_price": "799.00",
+        "purchase_price": "420.00",
+        "colors": ["Red", "Blue", "red"],
+        "images": [f"https://img.example.com/{prefix}/{i}/{n}.jpg" for n in range(3)],
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare vendor product throughput of the single-item POST /api/catalog/vendor/products/ "
+        "with the bulk endpoint (JSON array and NDJSON). Rows are rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--products", type=int, default=1000)
+        parser.add_argument("--keep", action="store_true", help="Commit generated rows instead of rolling back")
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options["products"])
+                if not options["keep"]:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.WARNING("Rolled back benchmark data"))
+
+    def _timed(self, label, count, fn):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        self.stdout.write(f"{label:<30} {elapsed * 1000:10.1f} ms  {count / elapsed:10,.0f} products/s")
+        return elapsed
+
+    def _check(self, prefix, count):
+        products = Product.objects.filter(product_code__startswith=f"{prefix}-")
+        found = (
+            products.count(),
+            ProductColor.objects.filter(product__in=products).count(),
+            ProductImage.objects.filter(product__in=products).count(),
+        )
+        if found != (count, count * 2, count * 3):
+            raise CommandError(f"{prefix}: expected {count} products, got {found}")
+
+    def _run(self, count):
+        factory = APIRequestFactory()
+        single_view = VendorProductListCreateView.as_view()
+        bulk_view = VendorProductBulkCreateView.as_view()
+
+        def single():
+            for i in range(count):
+                response = single_view(factory.post("/", vendor_payload("BENCHV1", i), format="json"))
+                if response.status_code != 201:
+                    raise CommandError(f"Single create failed: {response.data}")
+
+        def bulk_array():
+            payload = [vendor_payload("BENCHV2", i) for i in range(count)]
+            response = bulk_view(factory.post("/", payload, format="json"))
+            if response.data["created"] != count:
+                raise CommandError(f"Bulk create failed: {response.data['results'][:3]}")
+
+        def bulk_ndjson():
+            body = "\n".join(json.dumps(vendor_payload("BENCHV3", i)) for i in range(count))
+            response = bulk_view(factory.post("/", body, content_type="application/x-ndjson"))
+            if response.data["created"] != count:
+                raise CommandError(f"Bulk create failed: {response.data['results'][:3]}")
+
+        self.stdout.write(f"{count} products, 2 colors and 3 images each\n")
+        base = self._timed("single-item POST x N", count, single)
+        for label, prefix, fn in (("bulk JSON array", "BENCHV2", bulk_array), ("bulk NDJSON", "BENCHV3", bulk_ndjson)):
+            elapsed = self._timed(label, count, fn)
+            self._check(prefix, count)
+            self.stdout.write(self.style.SUCCESS(f"{label}: {base / elapsed:.1f}x faster"))
+        self._check("BENCHV1", count)
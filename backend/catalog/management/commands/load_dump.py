@@ -1,9 +1,12 @@
-import json
+import time
+from decimal import Decimal
 from pathlib import Path
 
 from django.core.management.base import BaseCommand, CommandError
 from django.db import connection, transaction
 
+from catalog.services import iter_json_records, write_product_batch
+
 
 def map_type(cat: str) -> str:
     c = (cat or "").lower()
@@ -22,8 +25,33 @@ def map_type(cat: str) -> str:
     return "other"
 
 
+def dump_entry(p, idx):
+    price = Decimal(str(p["price"]))
+    return {
+        "product_name": p["name"],
+        "product_code": p.get("sku") or f"LUV-{idx:05d}",
+        "product_category": p.get("gender", "unisex").lower(),
+        "product_type": map_type(p.get("category")),
+        "material": p.get("material") or "Cotton",
+        "description": p.get("description") or "",
+        "current_stock": 50,
+        "minimum_stock": 5,
+        "sales_price": price,
+        "sales_tax_percentage": 0,
+        "purchase_price": (price * Decimal("0.6")).quantize(Decimal("0.01")),
+        "purchase_tax_percentage": 0,
+        "is_published": True,
+        "is_active": True,
+        "colors": p.get("colors", []),
+        "images": p.get("images") or [p.get("image")],
+    }
+
+
 class Command(BaseCommand):
-    help = "Load products_dump.json into products/product_colors/product_images using raw SQL (bypasses created_at/updated_at columns)."
+    help = (
+        "Stream products_dump.json (JSON array or NDJSON) into products/product_colors/product_images "
+        "in batches. Existing product codes are updated in place, so cart lines survive a re-import."
+    )
 
     def add_arguments(self, parser):
         parser.add_argument(
@@ -31,78 +59,62 @@ class Command(BaseCommand):
             default="../frontend/products_dump.json",
             help="Path to products_dump.json (default: ../frontend/products_dump.json)",
         )
+        parser.add_argument("--batch-size", type=int, default=1000, help="Products per INSERT batch")
+        parser.add_argument(
+            "--replace",
+            action="store_true",
+            help="Delete all products, colors, images and cart lines first (old behaviour)",
+        )
 
     def handle(self, *args, **options):
         path = Path(options["path"]).resolve()
         if not path.exists():
             raise CommandError(f"File not found: {path}")
+        batch_size = options["batch_size"]
 
-        data = json.loads(path.read_text(encoding="utf-8"))
-
-        with transaction.atomic(), connection.cursor() as cur:
-            # Clear dependent rows that reference products before deleting products.
-            cur.execute("DELETE FROM cart_items")
-            cur.execute("DELETE FROM product_images")
-            cur.execute("DELETE FROM product_colors")
-            cur.execute("DELETE FROM products")
+        if options["replace"]:
+            with transaction.atomic(), connection.cursor() as cur:
+                # Clear dependent rows that reference products before deleting products.
+                cur.execute("DELETE FROM cart_items")
+                cur.execute("DELETE FROM product_images")
+                cur.execute("DELETE FROM product_colors")
+                cur.execute("DELETE FROM products")
+                cur.execute("DELETE FROM product_facets")
+                cur.execute("DELETE FROM product_facet_counts")
+            self.stdout.write(self.style.WARNING("Cleared existing products"))
 
-            for idx, p in enumerate(data, start=1):
-                insert_sql = """
-                    INSERT INTO products
-                    (product_name, product_code, product_category, product_type, material, description,
-                     current_stock, minimum_stock, sales_price, sales_tax_percentage, purchase_price,
-                     purchase_tax_percentage, is_published, is_active, created_at, updated_at)
-                    VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,CURRENT_TIMESTAMP,CURRENT_TIMESTAMP)
-                    """
-                params = [
-                    p["name"],
-                    p.get("sku") or f"LUV-{idx:05d}",
-                    p.get("gender", "unisex").lower(),
-                    map_type(p.get("category")),
-                    p.get("material") or "Cotton",
-                    p.get("description") or "",
-                    50,
-                    5,
-                    p["price"],
-                    0,
-                    float(p["price"]) * 0.6,
-                    0,
-                    True,
-                    True,
-                ]
+        started = time.perf_counter()
+        products = colors = images = skipped = 0
+        batch = []
 
-                if connection.features.can_return_columns_from_insert:
-                    cur.execute(insert_sql + " RETURNING product_id", params)
-                    product_id = cur.fetchone()[0]
-                else:
-                    cur.execute(insert_sql, params)
-                    product_id = cur.lastrowid
+        def flush():
+            nonlocal products, colors, images
+            written = write_product_batch(batch)
+            products += len(written["ids"])
+            colors += written["colors"]
+            images += written["images"]
+            batch.clear()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"  {products} products ({products / elapsed:,.0f}/s)")
 
-                seen = set()
-                for c in p.get("colors", []):
-                    norm = (c or "").strip()
-                    key = norm.lower()
-                    if not norm or key in seen:
-                        continue
-                    seen.add(key)
-                    cur.execute(
-                        """
-                        INSERT INTO product_colors (product_id, color_name, color_code, display_order, is_active)
-                        VALUES (%s,%s,%s,%s,%s)
-                        """,
-                        [product_id, norm, None, 0, True],
-                    )
+        with open(path, encoding="utf-8") as fp:
+            for idx, record in enumerate(iter_json_records(fp), start=1):
+                try:
+                    batch.append(dump_entry(record, idx))
+                except (KeyError, TypeError, ValueError, ArithmeticError) as exc:
+                    skipped += 1
+                    self.stdout.write(self.style.WARNING(f"Skipping record {idx}: {exc!r}"))
+                    continue
+                if len(batch) >= batch_size:
+                    flush()
+        if batch:
+            flush()
 
-                imgs = p.get("images") or [p.get("image")]
-                for i_order, img in enumerate(imgs):
-                    if not img:
-                        continue
-                    cur.execute(
-                        """
-                        INSERT INTO product_images (product_id, image_url, image_alt_text, display_order, is_primary, is_active)
-                        VALUES (%s,%s,%s,%s,%s,%s)
-                        """,
-                        [product_id, img, p["name"], i_order, i_order == 0, True],
-                    )
-
-        self.stdout.write(self.style.SUCCESS(f"Imported {len(data)} products from {path}"))
+        elapsed = time.perf_counter() - started
+        rows = products + colors + images
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {products} products, {colors} colors, {images} images from {path} "
+                f"in {elapsed:.2f}s ({rows / elapsed if elapsed else rows:,.0f} rows/s); {skipped} skipped"
+            )
+        )
@@ -0,0 +1,188 @@
+import io
+import sys
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import ProductImage
+from catalog.services import GENERATED_IMAGE_ORDER, refresh_product_summaries
+
+TRYON_MEDIA_DIR = "tryon"
+
+
+class Command(BaseCommand):
+    help = (
+        "Pre-render virtual try-on previews of catalog product images on a set of model photos "
+        "and save them as extra ProductImage rows. Safe to re-run: finished renders are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--tryon-dir",
+            default="../Odoo-SPIT-Finals-ApparelDesk-Try_On",
+            help="Path to the try-on app (relative to manage.py)",
+        )
+        parser.add_argument(
+            "--models",
+            nargs="*",
+            help="Model photos to render on (default: the try-on app's assets/examples/model*.png)",
+        )
+        parser.add_argument("--backend", default="stub", help="Inference backend: stub, http or idm-vton")
+        parser.add_argument("--workers", type=int, default=4)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--product", type=int, action="append", help="Only these product ids (repeatable)")
+        parser.add_argument("--all-images", action="store_true", help="Use every active image, not just primaries")
+        parser.add_argument("--limit", type=int, default=None, help="Max source images to process")
+        parser.add_argument("--cache-dir", default=None, help="Garment/result cache (default: MEDIA_ROOT/tryon/cache)")
+        parser.add_argument("--base-url", default="", help="Prefix for image_url, e.g. https://cdn.example.com")
+        parser.add_argument("--batch-size", type=int, default=50, help="ProductImage rows per insert")
+        parser.add_argument("--dry-run", action="store_true", help="Report what would be rendered and stop")
+
+    def handle(self, *args, **options):
+        tryon_dir = Path(options["tryon_dir"])
+        if not tryon_dir.is_absolute():
+            tryon_dir = Path(__file__).resolve().parent.parent.parent.parent / tryon_dir
+        if not (tryon_dir / "tryon_backends.py").exists():
+            raise CommandError(f"Try-on app not found at {tryon_dir}")
+        sys.path.insert(0, str(tryon_dir))
+        try:
+            import numpy as np
+            from PIL import Image
+
+            from tryon_backends import DEFAULT_PARAMS, get_backend
+            from tryon_cache import TryOnCache, cache_key
+            from tryon_garments import GarmentCache
+            from tryon_pipeline import fit_to_model
+        except ImportError as exc:
+            raise CommandError(f"Try-on dependencies missing ({exc}); install the try-on app requirements")
+
+        model_paths = [Path(p) for p in options["models"] or sorted((tryon_dir / "assets" / "examples").glob("model*.png"))]
+        if not model_paths:
+            raise CommandError("No model photos found")
+        models = [(path.stem, fit_to_model(Image.open(path), crop=True)) for path in model_paths]
+
+        media_root = Path(settings.MEDIA_ROOT)
+        cache_dir = Path(options["cache_dir"] or media_root / TRYON_MEDIA_DIR / "cache")
+        base_url = options["base_url"].rstrip("/") + settings.MEDIA_URL if options["base_url"] else settings.MEDIA_URL
+
+        sources = ProductImage.objects.filter(is_active=True, product__is_active=True).exclude(
+            image_url__contains=f"/{TRYON_MEDIA_DIR}/"
+        )
+        if not options["all_images"]:
+            sources = sources.filter(is_primary=True)
+        if options["product"]:
+            sources = sources.filter(product_id__in=options["product"])
+        sources = list(sources.order_by("product_id", "display_order", "image_id").values("image_id", "product_id", "image_url"))
+        if options["limit"]:
+            sources = sources[: options["limit"]]
+
+        def relative_path(source, model_name):
+            return f"{TRYON_MEDIA_DIR}/{source['product_id']}/{source['image_id']}-{model_name}.png"
+
+        # Idempotency: one query for every preview that already has a row
+        existing = set(
+            ProductImage.objects.filter(
+                product_id__in={s["product_id"] for s in sources},
+                image_url__contains=f"/{TRYON_MEDIA_DIR}/",
+            ).values_list("image_url", flat=True)
+        )
+        jobs = [
+            (source, index, model_name, person)
+            for source in sources
+            for index, (model_name, person) in enumerate(models)
+            if base_url + relative_path(source, model_name) not in existing
+        ]
+        self.stdout.write(
+            f"{len(sources)} source images x {len(models)} models: "
+            f"{len(jobs)} to render, {len(sources) * len(models) - len(jobs)} already done"
+        )
+        if not jobs or options["dry_run"]:
+            return
+
+        try:
+            backend = get_backend(options["backend"])
+        except Exception as exc:
+            raise CommandError(f"Could not start {options['backend']} backend: {exc}")
+
+        garments = GarmentCache(str(cache_dir / "garments"))
+        results = TryOnCache(root=str(cache_dir / "results"), max_bytes=1 << 40)
+
+        def load_garment(url):
+            with urllib.request.urlopen(url, timeout=30) as response:
+                return Image.open(io.BytesIO(response.read()))
+
+        def render(source, index, model_name, person):
+            garment = garments.get(source["image_url"], lambda: load_garment(source["image_url"]))
+            key = cache_key(person, garment, options["seed"], DEFAULT_PARAMS, backend.name)
+            result = results.get(key)
+            if result is None:
+                result = backend.predict(person, garment, options["seed"], DEFAULT_PARAMS)
+                if result is None:
+                    raise ValueError("No result returned from backend")
+                results.put(key, result)
+            target = media_root / relative_path(source, model_name)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            Image.fromarray(np.asarray(result)).save(target, format="PNG")
+            return ProductImage(
+                product_id=source["product_id"],
+                image_url=base_url + relative_path(source, model_name),
+                image_alt_text=f"Try-on preview on {model_name}",
+                display_order=GENERATED_IMAGE_ORDER + index,
+                is_primary=False,
+                is_active=True,
+            )
+
+        def prepare(source):
+            garments.get(source["image_url"], lambda: load_garment(source["image_url"]))
+
+        pending = []
+        created = failed = 0
+        with ThreadPoolExecutor(max_workers=options["workers"]) as pool:
+            # Phase 1: each garment is downloaded and pre-processed once, before the fan-out
+            to_prepare = {job[0]["image_id"]: job[0] for job in jobs}
+            broken = set()
+            futures = {pool.submit(prepare, source): source for source in to_prepare.values()}
+            for future in as_completed(futures):
+                source = futures[future]
+                try:
+                    future.result()
+                except Exception as exc:
+                    broken.add(source["image_id"])
+                    self.stdout.write(self.style.WARNING(f"Image {source['image_id']} could not be prepared: {exc}"))
+            runnable = [job for job in jobs if job[0]["image_id"] not in broken]
+            failed += len(jobs) - len(runnable)
+
+            # Phase 2: one render per (garment, model photo)
+            futures = {pool.submit(render, *job): job for job in runnable}
+            for future in as_completed(futures):
+                source, _, model_name, _ = futures[future]
+                try:
+                    pending.append(future.result())
+                except Exception as exc:
+                    failed += 1
+                    self.stdout.write(
+                        self.style.WARNING(f"Image {source['image_id']} on {model_name} failed: {exc}")
+                    )
+                    continue
+                # Rows are written as renders finish so an interrupted run resumes where it stopped
+                if len(pending) >= options["batch_size"]:
+                    ProductImage.objects.bulk_create(pending)
+                    created += len(pending)
+                    pending = []
+                    self.stdout.write(f"  {created}/{len(jobs)} rendered")
+        if pending:
+            ProductImage.objects.bulk_create(pending)
+            created += len(pending)
+        # bulk_create skips signals; previews only matter for products without other images
+        refresh_product_summaries({source["product_id"] for source, *_ in runnable})
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {created} try-on images ({failed} failed); "
+                f"garments pre-processed {garments.misses}, reused {garments.hits}; "
+                f"cached results reused {results.hits}"
+            )
+        )
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from catalog.models import Product
+from catalog.services import facet_counts, live_facet_counts, rebuild_facets
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the catalog facet index (product_facets / product_facet_counts) from the products table. "
+        "Needed after writes that bypass model signals, e.g. raw SQL or queryset.update()."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--check",
+            action="store_true",
+            help="Only compare the stored counts with a live aggregate and fail on any difference",
+        )
+
+    def handle(self, *args, **options):
+        if options["check"]:
+            stored = facet_counts()
+            live = live_facet_counts(Product.objects.filter(is_active=True, is_published=True))
+            if stored != live:
+                raise CommandError("Facet counts are out of date; run rebuild_facets")
+            self.stdout.write(self.style.SUCCESS("Facet counts match the products table"))
+            return
+        indexed = rebuild_facets()
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} published products"))
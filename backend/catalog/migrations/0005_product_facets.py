@@ -0,0 +1,67 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0004_remove_productimage_created_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductFacet",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("product_id", models.BigIntegerField()),
+                ("product_category", models.CharField(max_length=20)),
+                ("product_type", models.CharField(max_length=20)),
+                (
+                    "facet",
+                    models.CharField(
+                        choices=[
+                            ("total", "Total"),
+                            ("material", "Material"),
+                            ("color", "Color"),
+                            ("price", "Price bucket"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("value", models.CharField(max_length=100)),
+            ],
+            options={
+                "db_table": "product_facets",
+                "unique_together": {("product_id", "facet", "value")},
+            },
+        ),
+        migrations.CreateModel(
+            name="ProductFacetCount",
+            fields=[
+                ("id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("product_category", models.CharField(max_length=20)),
+                ("product_type", models.CharField(max_length=20)),
+                (
+                    "facet",
+                    models.CharField(
+                        choices=[
+                            ("total", "Total"),
+                            ("material", "Material"),
+                            ("color", "Color"),
+                            ("price", "Price bucket"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("value", models.CharField(max_length=100)),
+                ("product_count", models.IntegerField(default=0)),
+            ],
+            options={
+                "db_table": "product_facet_counts",
+                "unique_together": {
+                    ("product_category", "product_type", "facet", "value")
+                },
+            },
+        ),
+    ]
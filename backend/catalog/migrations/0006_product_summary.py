@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:37
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0005_product_facets"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="color_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="color_summary",
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="primary_image_url",
+            field=models.URLField(blank=True, max_length=500, null=True),
+        ),
+    ]
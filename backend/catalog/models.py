@@ -36,6 +36,10 @@ class Product(TimeStampedModel):
     is_active = models.BooleanField(default=True)
     created_by = models.BigIntegerField(null=True, blank=True, db_column="created_by")
     updated_by = models.BigIntegerField(null=True, blank=True, db_column="updated_by")
+    # Denormalized from images/colors for list views (catalog.services.refresh_product_summaries)
+    primary_image_url = models.URLField(max_length=500, blank=True, null=True)
+    color_summary = models.JSONField(default=list, blank=True)
+    color_count = models.IntegerField(default=0)
 
     class Meta:
         db_table = "products"
@@ -89,3 +93,51 @@ class ProductImage(models.Model):
 
     def __str__(self) -> str:
         return f"{self.product} image {self.image_id}"
+
+
+# "total" has a single value "" and counts each product once
+FACET_CHOICES = (
+    ("total", "Total"),
+    ("material", "Material"),
+    ("color", "Color"),
+    ("price", "Price bucket"),
+)
+
+
+class ProductFacet(models.Model):
+    """
+    Facet values a published product currently contributes to
+    ProductFacetCount. Kept so a product's counts can be diffed and
+    adjusted incrementally; product_id has no FK so the rows outlive a
+    cascading delete until the counts are corrected.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    product_id = models.BigIntegerField()
+    product_category = models.CharField(max_length=20)
+    product_type = models.CharField(max_length=20)
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.CharField(max_length=100)
+
+    class Meta:
+        db_table = "product_facets"
+        unique_together = (("product_id", "facet", "value"),)
+
+
+class ProductFacetCount(models.Model):
+    """
+    Number of published products per (category, type, facet, value). The
+    "total" facet (value "") counts every product of a (category, type),
+    which is what category and type counts are summed from.
+    """
+
+    id = models.BigAutoField(primary_key=True)
+    product_category = models.CharField(max_length=20)
+    product_type = models.CharField(max_length=20)
+    facet = models.CharField(max_length=20, choices=FACET_CHOICES)
+    value = models.CharField(max_length=100)
+    product_count = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = "product_facet_counts"
+        unique_together = (("product_category", "product_type", "facet", "value"),)
@@ -0,0 +1,20 @@
+import codecs
+
+from django.conf import settings
+from rest_framework.parsers import BaseParser
+
+from .services import iter_json_records
+
+
+class NDJSONParser(BaseParser):
+    """
+    Newline-delimited JSON. Returns a lazy iterator over the records so a
+    large upload is decoded as the view consumes it.
+    """
+
+    media_type = "application/x-ndjson"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        return iter_json_records(codecs.getreader(encoding)(stream))
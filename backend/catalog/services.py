@@ -0,0 +1,684 @@
+import json
+import uuid
+from collections import Counter, defaultdict
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from .models import Product, ProductColor, ProductFacet, ProductFacetCount, ProductImage
+
+# Same keys, in the same order, as ProductSerializer / ProductColorSerializer / ProductImageSerializer
+PRODUCT_FIELDS = (
+    "product_id",
+    "product_name",
+    "product_code",
+    "product_category",
+    "product_type",
+    "material",
+    "description",
+    "current_stock",
+    "minimum_stock",
+    "sales_price",
+    "sales_tax_percentage",
+    "purchase_price",
+    "purchase_tax_percentage",
+    "is_published",
+    "is_active",
+)
+DECIMAL_FIELDS = (
+    "current_stock",
+    "minimum_stock",
+    "sales_price",
+    "sales_tax_percentage",
+    "purchase_price",
+    "purchase_tax_percentage",
+)
+COLOR_FIELDS = ("color_id", "color_name", "color_code", "display_order", "is_active")
+IMAGE_FIELDS = ("image_id", "image_url", "image_alt_text", "display_order", "is_primary")
+
+
+def _grouped(model, fields, product_ids):
+    grouped = defaultdict(list)
+    rows = model.objects.filter(product_id__in=product_ids).order_by("pk").values_list("product_id", *fields)
+    for product_id, *values in rows:
+        grouped[product_id].append(dict(zip(fields, values)))
+    return grouped
+
+
+def product_rows(rows):
+    """
+    Turn product ``values(*PRODUCT_FIELDS)`` rows into the ProductSerializer
+    JSON shape without model instances or serializer objects: colors and
+    images come from one grouped query each, decimals are rendered as
+    strings like DRF does.
+    """
+    rows = list(rows)
+    if not rows:
+        return rows
+    ids = [row["product_id"] for row in rows]
+    colors = _grouped(ProductColor, COLOR_FIELDS, ids)
+    images = _grouped(ProductImage, IMAGE_FIELDS, ids)
+    for row in rows:
+        for field in DECIMAL_FIELDS:
+            value = row[field]
+            if value is not None:
+                row[field] = f"{value:f}"
+        row["colors"] = colors.get(row["product_id"], [])
+        row["images"] = images.get(row["product_id"], [])
+    return rows
+
+
+# Primary image first, then the gallery order
+PRIMARY_IMAGE_ORDERING = ("-is_primary", "display_order", "image_id")
+# Swatches kept in Product.color_summary; color_count has the full number
+COLOR_SUMMARY_LIMIT = 8
+SUMMARY_FIELDS = ("primary_image_url", "color_summary", "color_count")
+
+# display_order from here up is reserved for generated images (try-on previews); imports leave them alone
+GENERATED_IMAGE_ORDER = 100
+
+# Columns written by imports; on an upsert everything but the code, stock and created_at is refreshed
+PRODUCT_COLUMNS = (
+    "product_name",
+    "product_code",
+    "product_category",
+    "product_type",
+    "material",
+    "description",
+    "current_stock",
+    "minimum_stock",
+    "sales_price",
+    "sales_tax_percentage",
+    "purchase_price",
+    "purchase_tax_percentage",
+    "is_published",
+    "is_active",
+    "primary_image_url",
+    "color_summary",
+    "color_count",
+    "created_at",
+    "updated_at",
+)
+UPSERT_COLUMNS = tuple(
+    c for c in PRODUCT_COLUMNS if c not in ("product_code", "current_stock", "minimum_stock", "created_at")
+)
+COLOR_COLUMNS = ("product_id", "color_name", "color_code", "display_order", "is_active")
+IMAGE_COLUMNS = ("product_id", "image_url", "image_alt_text", "display_order", "is_primary", "is_active")
+
+
+def iter_json_records(fp, chunk_size=1 << 16):
+    """
+    Yield objects from a JSON array or an NDJSON stream, reading ``fp`` in
+    chunks so the whole file never has to be in memory.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+    in_array = False
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos < len(buf) and buf[pos] == "[" and not in_array:
+            in_array = True
+            pos += 1
+            continue
+        if pos < len(buf) and buf[pos] == "]":
+            return
+        if pos < len(buf):
+            try:
+                obj, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield obj
+                pos = end
+                continue
+        elif eof:
+            return
+        chunk = fp.read(chunk_size)
+        eof = not chunk
+        buf = buf[pos:] + chunk
+        pos = 0
+
+
+def _insert_rows(table, columns, rows, conflict=None, update=(), increment=()):
+    """
+    executemany() one parameterised INSERT. MySQLdb rewrites it into
+    multi-row VALUES statements; SQLite runs it in-process. With
+    ``conflict`` (a column or a tuple of columns), rows whose key already
+    exists overwrite the ``update`` columns and add to the ``increment``
+    columns, or are skipped when neither is given.
+    """
+    qn = connection.ops.quote_name
+    sql = "INSERT INTO {} ({}) VALUES ({})".format(
+        qn(table), ", ".join(qn(c) for c in columns), ", ".join(["%s"] * len(columns))
+    )
+    if conflict:
+        if isinstance(conflict, str):
+            conflict = (conflict,)
+        if connection.vendor == "mysql":
+            sets = [f"{qn(c)} = VALUES({qn(c)})" for c in update]
+            sets += [f"{qn(c)} = {qn(c)} + VALUES({qn(c)})" for c in increment]
+            # A self-assignment is a no-op that, unlike INSERT IGNORE, still raises other errors
+            sets = sets or [f"{qn(conflict[0])} = {qn(conflict[0])}"]
+            sql += " ON DUPLICATE KEY UPDATE " + ", ".join(sets)
+        else:
+            sets = [f"{qn(c)} = EXCLUDED.{qn(c)}" for c in update]
+            sets += [f"{qn(c)} = {qn(table)}.{qn(c)} + EXCLUDED.{qn(c)}" for c in increment]
+            action = "DO UPDATE SET " + ", ".join(sets) if sets else "DO NOTHING"
+            sql += " ON CONFLICT ({}) {}".format(", ".join(qn(c) for c in conflict), action)
+    with connection.cursor() as cur:
+        cur.executemany(sql, rows)
+
+
+def _delete_rows(table, column=None, values=(), condition=None, chunk_size=1000):
+    """
+    DELETE rows of ``table`` whose ``column`` is in ``values`` (every row
+    when ``column`` is None), optionally narrowed by a literal SQL
+    ``condition``. Rows are not loaded and no delete signals are sent.
+    """
+    qn = connection.ops.quote_name
+    sql = f"DELETE FROM {qn(table)}"
+    with connection.cursor() as cur:
+        if column is None:
+            cur.execute(sql + (f" WHERE {condition}" if condition else ""))
+            return
+        values = list(values)
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start : start + chunk_size]
+            where = "{} IN ({})".format(qn(column), ", ".join(["%s"] * len(chunk)))
+            if condition:
+                where += f" AND {condition}"
+            cur.execute(f"{sql} WHERE {where}", chunk)
+
+
+def _copy_rows(table, columns, rows):
+    """COPY rows into ``table`` on PostgreSQL (psycopg 3); returns False when unavailable."""
+    if connection.vendor != "postgresql":
+        return False
+    with connection.cursor() as cur:
+        raw = getattr(cur, "cursor", cur)
+        if not hasattr(raw, "copy"):
+            return False
+        with raw.copy(f"COPY {table} ({', '.join(columns)}) FROM STDIN") as copy:
+            for row in rows:
+                copy.write_row(row)
+    return True
+
+
+def write_rows(table, columns, rows):
+    """Append ``rows`` to ``table``: COPY on PostgreSQL, one executemany INSERT elsewhere."""
+    if rows and not _copy_rows(table, columns, rows):
+        _insert_rows(table, columns, rows)
+
+
+def _clean_colors(names):
+    seen = {}
+    for name in names or []:
+        name = str(name or "").strip()
+        if name and name.lower() not in seen:
+            seen[name.lower()] = name
+    return list(seen.values())
+
+
+def _clean_urls(urls):
+    return [str(url).strip() for url in urls or [] if url and str(url).strip()]
+
+
+def _entry_summary(entry):
+    """Summary columns for a write_product_batch entry, matching refresh_product_summaries()."""
+    colors = _clean_colors(entry.get("colors"))
+    urls = _clean_urls(entry.get("images"))
+    return {
+        "primary_image_url": urls[0] if urls else None,
+        "color_summary": [{"name": name, "code": None} for name in colors[:COLOR_SUMMARY_LIMIT]],
+        "color_count": len(colors),
+    }
+
+
+def refresh_product_summaries(product_ids):
+    """
+    Recompute primary_image_url / color_summary / color_count for
+    ``product_ids`` from their images and active colors: two reads and
+    one bulk UPDATE. Returns the number of products updated.
+    """
+    product_ids = list(product_ids)
+    if not product_ids:
+        return 0
+    primary = {}
+    for pk, url in ProductImage.objects.filter(product_id__in=product_ids).order_by(
+        "product_id", *PRIMARY_IMAGE_ORDERING
+    ).values_list("product_id", "image_url"):
+        primary.setdefault(pk, url)
+    colors = defaultdict(list)
+    for pk, name, code in ProductColor.objects.filter(product_id__in=product_ids, is_active=True).order_by(
+        "product_id", "display_order", "color_id"
+    ).values_list("product_id", "color_name", "color_code"):
+        colors[pk].append({"name": name, "code": code})
+    products = [
+        Product(
+            pk=pk,
+            primary_image_url=primary.get(pk),
+            color_summary=colors[pk][:COLOR_SUMMARY_LIMIT],
+            color_count=len(colors[pk]),
+        )
+        for pk in Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True)
+    ]
+    Product.objects.bulk_update(products, SUMMARY_FIELDS, batch_size=500)
+    return len(products)
+
+
+def summary_rows(rows):
+    """``values(*PRODUCT_FIELDS, *SUMMARY_FIELDS)`` rows as JSON-ready dicts, no related queries."""
+    rows = list(rows)
+    for row in rows:
+        for field in DECIMAL_FIELDS:
+            value = row[field]
+            if value is not None:
+                row[field] = f"{value:f}"
+    return rows
+
+
+def write_product_batch(entries, upsert=True):
+    """
+    Insert one batch of products with their colors and images.
+
+    ``entries`` are dicts of Product field values plus "colors" (names) and
+    "images" (URLs). With ``upsert`` an existing product_code is updated in
+    place (id, stock and cart lines kept) and its colors/images replaced,
+    except generated images (display_order >= GENERATED_IMAGE_ORDER);
+    otherwise codes must be new. Products go in with one executemany INSERT
+    (... ON CONFLICT / ON DUPLICATE KEY UPDATE), ids are mapped back by code
+    with one query, children use COPY on PostgreSQL.
+    Returns {"ids": {product_code: product_id}, "colors": n, "images": n}.
+    """
+    # Last entry wins for a code repeated inside the batch
+    by_code = {entry["product_code"]: entry for entry in entries}
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    defaults = {c: Product._meta.get_field(c).get_default() for c in PRODUCT_COLUMNS}
+    summary_field = Product._meta.get_field("color_summary")
+    products = []
+    for entry in by_code.values():
+        row = {**defaults, **entry, **_entry_summary(entry), "created_at": now, "updated_at": now}
+        row["color_summary"] = summary_field.get_db_prep_save(row["color_summary"], connection)
+        products.append(tuple(row[c] for c in PRODUCT_COLUMNS))
+
+    with transaction.atomic():
+        if upsert:
+            _insert_rows(Product._meta.db_table, PRODUCT_COLUMNS, products, conflict="product_code", update=UPSERT_COLUMNS)
+        else:
+            _insert_rows(Product._meta.db_table, PRODUCT_COLUMNS, products)
+        ids = dict(Product.objects.filter(product_code__in=by_code.keys()).values_list("product_code", "pk"))
+        if upsert:
+            # Children are replaced wholesale; the facets and summaries are
+            # rewritten below, so no per-row delete signals are wanted
+            _delete_rows(ProductColor._meta.db_table, "product_id", ids.values())
+            _delete_rows(
+                ProductImage._meta.db_table,
+                "product_id",
+                ids.values(),
+                condition=f"{connection.ops.quote_name('display_order')} < {int(GENERATED_IMAGE_ORDER)}",
+            )
+
+        colors, images, facets = [], [], set()
+        for code, entry in by_code.items():
+            product_id = ids[code]
+            names = _clean_colors(entry.get("colors"))
+            for order, name in enumerate(names):
+                colors.append((product_id, name, None, order, True))
+            row = {**defaults, **entry}
+            if row["is_active"] and row["is_published"]:
+                facets |= _facet_rows(
+                    product_id, row["product_category"], row["product_type"], row["material"], row["sales_price"], names
+                )
+            for order, url in enumerate(_clean_urls(entry.get("images"))):
+                images.append((product_id, url, entry["product_name"], order, order == 0, True))
+
+        write_rows(ProductColor._meta.db_table, COLOR_COLUMNS, colors)
+        write_rows(ProductImage._meta.db_table, IMAGE_COLUMNS, images)
+        if upsert:
+            # Generated images survive an upsert and may be all a product has left
+            refresh_product_summaries([ids[code] for code, entry in by_code.items() if not _clean_urls(entry.get("images"))])
+        sync_product_facets(ids.values(), desired=facets)
+    return {"ids": ids, "colors": len(colors), "images": len(images)}
+
+
+# Free-text vendor values -> Product choices
+VENDOR_CATEGORY_MAP = {
+    "men": "men", "man": "men", "male": "men",
+    "women": "women", "woman": "women", "female": "women",
+    "child": "children", "children": "children", "kid": "children", "kids": "children",
+    "unisex": "unisex"
+}
+VENDOR_TYPE_MAP = {
+    "t-shirt": "t-shirt", "tshirt": "t-shirt", "tee": "t-shirt",
+    "shirt": "shirt", "casual shirt": "shirt", "formal shirt": "shirt", "casual shirts": "shirt",
+    "jeans": "jeans", "denim": "jeans",
+    "pant": "pant", "pants": "pant", "trouser": "pant", "trousers": "pant", "bottom": "pant",
+    "kurta": "kurta",
+    "dress": "dress",
+    "hoodie": "other", "sweatshirt": "other", "topwear": "shirt",
+    "other": "other"
+}
+
+
+def _as_list(value):
+    if hasattr(value, "all"):
+        value = list(value.all())
+    if not isinstance(value, (list, tuple)):
+        value = [value]
+    return value
+
+
+def normalize_vendor_product(data):
+    """
+    Map one vendor payload onto Product fields (plus "colors"/"images"),
+    normalizing category/type and filling defaults. Raises ValueError with
+    a user-facing message. product_code is left blank when not given.
+    """
+    name = (data.get("product_name") or "").strip()
+    if not name:
+        raise ValueError("product_name is required")
+
+    cat_raw = (data.get("product_category") or "men").lower()
+    type_raw = (data.get("product_type") or "other").lower()
+    norm_type = next((val for key, val in VENDOR_TYPE_MAP.items() if key in type_raw), "other")
+
+    try:
+        sales_price = Decimal(str(data.get("sales_price", 0)))
+        purchase_price = Decimal(str(data.get("purchase_price", 0)))
+        sales_tax = Decimal(str(data.get("sales_tax_percentage", 0) or 0))
+        purchase_tax = Decimal(str(data.get("purchase_tax_percentage", 0) or 0))
+    except (InvalidOperation, ValueError, TypeError):
+        raise ValueError("sales_price and purchase_price must be numbers")
+    if not sales_price.is_finite() or not purchase_price.is_finite():
+        raise ValueError("sales_price and purchase_price must be numbers")
+    if sales_price < 0 or purchase_price < 0:
+        raise ValueError("Prices must be non-negative")
+
+    entry = {
+        "product_name": name,
+        "product_code": str(data.get("product_code") or "").strip(),
+        "product_category": VENDOR_CATEGORY_MAP.get(cat_raw, "men"),
+        "product_type": norm_type,
+        "material": data.get("material") or "",
+        "description": data.get("description") or "",
+        "current_stock": 0,
+        "minimum_stock": 0,
+        "sales_price": sales_price,
+        "purchase_price": purchase_price,
+        "sales_tax_percentage": sales_tax,
+        "purchase_tax_percentage": purchase_tax,
+        "is_published": bool(data.get("is_published", True)),
+        "is_active": True,
+        "colors": [str(c) for c in _as_list(data.get("colors") or [])],
+        "images": [str(i) for i in _as_list(data.get("images") or [])],
+    }
+    for field in ("product_name", "product_code", "material"):
+        max_length = Product._meta.get_field(field).max_length
+        if len(entry[field]) > max_length:
+            raise ValueError(f"{field} must be at most {max_length} characters")
+    return entry
+
+
+# Batch inserts tried before create_vendor_products falls back to one item at a time
+CODE_ATTEMPTS = 3
+
+
+def create_vendor_products(items):
+    """
+    Create one batch of vendor products. Every item is normalized on its
+    own; codes that are missing, already taken (one query for the batch)
+    or repeated inside the batch get a random suffix like the single-item
+    endpoint does. Valid items are written with write_product_batch.
+
+    A code can still be taken by a concurrent request between the check
+    and the insert; the batch is then retried with codes re-drawn against
+    the table, up to CODE_ATTEMPTS times, before falling back to writing
+    item by item so only the items that keep failing are reported.
+
+    Returns one result per item, in order:
+    {"index", "status": "created", "product_id", "product_code"} or
+    {"index", "status": "error", "detail"}.
+    """
+    results = []
+    entries = []
+    for index, data in enumerate(items):
+        if not isinstance(data, dict):
+            results.append({"index": index, "status": "error", "detail": "Each product must be an object"})
+            continue
+        try:
+            entry = normalize_vendor_product(data)
+        except ValueError as exc:
+            results.append({"index": index, "status": "error", "detail": str(exc)})
+            continue
+        if not entry["product_code"]:
+            entry["product_code"] = f"LUV-{uuid.uuid4().hex[:8].upper()}"
+        results.append({"index": index, "status": "created"})
+        entries.append((results[-1], entry, entry["product_code"]))
+    if not entries:
+        return results
+
+    for _ in range(CODE_ATTEMPTS):
+        _assign_free_codes(entries)
+        try:
+            written = write_product_batch([entry for _, entry, _ in entries], upsert=False)
+        except IntegrityError:
+            continue
+        for result, entry, _ in entries:
+            result["product_id"] = written["ids"][entry["product_code"]]
+            result["product_code"] = entry["product_code"]
+        return results
+
+    for result, entry, requested in entries:
+        try:
+            written = write_product_batch([entry], upsert=False)
+        except IntegrityError as exc:
+            result.update(status="error", detail=f"Could not create product {requested}: {exc}")
+            continue
+        result["product_id"] = written["ids"][entry["product_code"]]
+        result["product_code"] = entry["product_code"]
+    return results
+
+
+def _assign_free_codes(entries):
+    """Give every (result, entry, requested_code) entry a code that is free in the table and the batch."""
+    requested = {code for _, _, code in entries}
+    taken = set(Product.objects.filter(product_code__in=requested).values_list("product_code", flat=True))
+    for _, entry, code in entries:
+        if code in taken:
+            code = f"{code[:43]}-{uuid.uuid4().hex[:6].upper()}"
+        taken.add(code)
+        entry["product_code"] = code
+
+
+# Lower bounds of the price facet buckets (sales_price), ascending
+PRICE_BUCKETS = (
+    (Decimal("0"), "0-499"),
+    (Decimal("500"), "500-999"),
+    (Decimal("1000"), "1000-1999"),
+    (Decimal("2000"), "2000-4999"),
+    (Decimal("5000"), "5000+"),
+)
+# Product fields that affect facet membership; saves touching none of them skip the resync
+FACET_SOURCE_FIELDS = frozenset(
+    ("product_category", "product_type", "material", "sales_price", "is_active", "is_published")
+)
+
+
+FACET_COLUMNS = ("product_id", "product_category", "product_type", "facet", "value")
+FACET_KEY = ("product_id", "facet", "value")
+FACET_COUNT_KEY = ("product_category", "product_type", "facet", "value")
+
+
+def price_bucket(price):
+    label = PRICE_BUCKETS[0][1]
+    for lower, bucket in PRICE_BUCKETS:
+        if price is not None and Decimal(price) >= lower:
+            label = bucket
+    return label
+
+
+def facet_value(value):
+    """Facet label for a material/color: whitespace collapsed, title case."""
+    return " ".join(str(value or "").split()).title()[:100]
+
+
+def _facet_rows(pk, category, product_type, material, price, color_names):
+    rows = {(pk, category, product_type, "total", ""), (pk, category, product_type, "price", price_bucket(price))}
+    if facet_value(material):
+        rows.add((pk, category, product_type, "material", facet_value(material)))
+    for name in color_names:
+        if facet_value(name):
+            rows.add((pk, category, product_type, "color", facet_value(name)))
+    return rows
+
+
+def _desired_facets(product_ids):
+    """(product_id, category, type, facet, value) rows the products should contribute now."""
+    products = list(
+        Product.objects.filter(pk__in=product_ids, is_active=True, is_published=True).values_list(
+            "pk", "product_category", "product_type", "material", "sales_price"
+        )
+    )
+    colors = defaultdict(list)
+    if products:
+        rows = ProductColor.objects.filter(product_id__in=[p[0] for p in products], is_active=True)
+        for pk, name in rows.values_list("product_id", "color_name"):
+            colors[pk].append(name)
+    desired = set()
+    for pk, category, product_type, material, price in products:
+        desired |= _facet_rows(pk, category, product_type, material, price, colors[pk])
+    return desired
+
+
+def _apply_facet_delta(delta):
+    """
+    Add ``delta`` ({(category, type, facet, value): n}) to ProductFacetCount
+    with one upsert, so concurrent commits touching the same row both
+    count; rows that drop to zero are deleted.
+    """
+    delta = {key: n for key, n in delta.items() if n}
+    if not delta:
+        return
+    _insert_rows(
+        ProductFacetCount._meta.db_table,
+        FACET_COUNT_KEY + ("product_count",),
+        [key + (n,) for key, n in delta.items()],
+        conflict=FACET_COUNT_KEY,
+        increment=("product_count",),
+    )
+    if any(n < 0 for n in delta.values()):
+        ProductFacetCount.objects.filter(
+            product_category__in={k[0] for k in delta},
+            product_type__in={k[1] for k in delta},
+            facet__in={k[2] for k in delta},
+            value__in={k[3] for k in delta},
+            product_count__lte=0,
+        ).delete()
+
+
+def sync_product_facets(product_ids, desired=None):
+    """
+    Bring the facet index in line with the current state of ``product_ids``
+    (new, edited, unpublished or deleted). Only the difference between the
+    recorded and the current facet rows is written, and ProductFacetCount
+    is adjusted by that difference. Callers that already hold the product
+    data can pass ``desired`` rows instead of having them re-read.
+    """
+    product_ids = set(product_ids)
+    if not product_ids:
+        return
+    with transaction.atomic():
+        current = {}
+        for row in ProductFacet.objects.filter(product_id__in=product_ids).values_list(
+            "pk", "product_id", "product_category", "product_type", "facet", "value"
+        ):
+            current[row[1:]] = row[0]
+        if desired is None:
+            desired = _desired_facets(product_ids)
+        removed = current.keys() - desired
+        added = desired - current.keys()
+        if removed:
+            ProductFacet.objects.filter(pk__in=[current[key] for key in removed]).delete()
+        if added:
+            # Two commits syncing the same product may both add a row; the
+            # later insert skips it rather than failing its on_commit callback
+            _insert_rows(ProductFacet._meta.db_table, FACET_COLUMNS, list(added), conflict=FACET_KEY)
+        delta = Counter(key[1:] for key in added)
+        delta.subtract(Counter(key[1:] for key in removed))
+        _apply_facet_delta(delta)
+
+
+def rebuild_facets(batch_size=2000):
+    """Recompute the whole facet index from the products table."""
+    with transaction.atomic():
+        _delete_rows(ProductFacet._meta.db_table)
+        _delete_rows(ProductFacetCount._meta.db_table)
+        totals = Counter()
+        ids = Product.objects.filter(is_active=True, is_published=True).order_by("pk").values_list("pk", flat=True)
+        ids = list(ids)
+        for start in range(0, len(ids), batch_size):
+            desired = _desired_facets(ids[start : start + batch_size])
+            _insert_rows(ProductFacet._meta.db_table, FACET_COLUMNS, list(desired))
+            totals.update(key[1:] for key in desired)
+        ProductFacetCount.objects.bulk_create(
+            [
+                ProductFacetCount(product_category=cat, product_type=typ, facet=facet, value=value, product_count=n)
+                for (cat, typ, facet, value), n in totals.items()
+            ],
+            batch_size=1000,
+        )
+    return len(ids)
+
+
+def _facet_groups(counts):
+    """{(category, type, facet, value): n} -> the facets payload, largest count first."""
+    facets = {"product_category": Counter(), "product_type": Counter(), "material": Counter(), "color": Counter(), "price": Counter()}
+    for (cat, typ, facet, value), n in counts.items():
+        if facet == "total":
+            facets["product_category"][cat] += n
+            facets["product_type"][typ] += n
+        else:
+            facets[facet][value] += n
+    order = {label: i for i, (_, label) in enumerate(PRICE_BUCKETS)}
+    payload = {}
+    for name, counter in facets.items():
+        items = [{"value": value, "count": n} for value, n in counter.items() if n > 0]
+        if name == "price":
+            items.sort(key=lambda item: order[item["value"]])
+        else:
+            items.sort(key=lambda item: (-item["count"], item["value"]))
+        payload[name] = items
+    return payload
+
+
+def facet_counts(category=None, types=None):
+    """
+    Facet counts for published products, optionally restricted to one
+    product_category and a set of product_types. Reads only the count
+    table, so the cost depends on the number of facet values, not products.
+    """
+    rows = ProductFacetCount.objects.filter(product_count__gt=0)
+    if category:
+        rows = rows.filter(product_category=category)
+    if types is not None:
+        rows = rows.filter(product_type__in=types)
+    counts = {
+        (r["product_category"], r["product_type"], r["facet"], r["value"]): r["n"]
+        for r in rows.values("product_category", "product_type", "facet", "value").annotate(n=Sum("product_count"))
+    }
+    return _facet_groups(counts)
+
+
+def live_facet_counts(queryset):
+    """Same payload as facet_counts(), aggregated from an arbitrary product queryset."""
+    ids = list(queryset.order_by().values_list("pk", flat=True))
+    counts = Counter()
+    for start in range(0, len(ids), 2000):
+        counts.update(key[1:] for key in _desired_facets(ids[start : start + 2000]))
+    return _facet_groups(counts)
@@ -0,0 +1,86 @@
+import threading
+import weakref
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Product, ProductColor, ProductImage
+from .services import FACET_SOURCE_FIELDS, refresh_product_summaries, sync_product_facets
+
+_pending = threading.local()
+_JOBS = {"facets": sync_product_facets, "summaries": refresh_product_summaries}
+
+
+class _Batch:
+    """Product ids collected during one transaction, run by one on_commit callback."""
+
+    def __init__(self):
+        self.ids = {job: set() for job in _JOBS}
+
+    def run(self):
+        # Saves made by the jobs themselves start a new batch
+        if _current_batch() is self:
+            _pending.batch = None
+        for job, fn in _JOBS.items():
+            if self.ids[job]:
+                fn(self.ids[job])
+
+
+def _current_batch():
+    # Only the registered on_commit callback keeps the batch alive; Django
+    # drops the callbacks of a rolled-back transaction (or savepoint), which
+    # frees the batch and leaves this weak reference empty
+    ref = getattr(_pending, "batch", None)
+    return ref() if ref is not None else None
+
+
+def schedule(job, product_id):
+    """
+    Run ``job`` ("facets" or "summaries") for the product once the current
+    transaction commits, so a product saved with several colors/images is
+    processed once. Ids scheduled in a transaction that rolls back are
+    discarded with it.
+    """
+    batch = _current_batch()
+    if batch is not None:
+        batch.ids[job].add(product_id)
+        return
+    batch = _Batch()
+    batch.ids[job].add(product_id)
+    _pending.batch = weakref.ref(batch)
+    # Outside a transaction this runs the batch straight away. A failing job
+    # is logged rather than raised into the code that has already committed.
+    transaction.on_commit(batch.run, robust=True)
+
+
+@receiver(post_save, sender=Product)
+def product_saved(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    # e.g. stock movements save with update_fields=["current_stock"]
+    if update_fields is not None and not FACET_SOURCE_FIELDS.intersection(update_fields):
+        return
+    schedule("facets", instance.pk)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted(sender, instance, **kwargs):
+    schedule("facets", instance.pk)
+
+
+@receiver(post_save, sender=ProductColor)
+@receiver(post_delete, sender=ProductColor)
+def product_color_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule("facets", instance.product_id)
+    schedule("summaries", instance.product_id)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def product_image_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    schedule("summaries", instance.product_id)
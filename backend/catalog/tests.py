@@ -1,3 +1,466 @@
-from django.test import TestCase
+import json
+import shutil
+import tempfile
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import IntegrityError, transaction
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import services, signals
+from .models import Product, ProductColor, ProductFacet, ProductFacetCount, ProductImage
+from .serializers import ProductSerializer
+from .services import (
+    GENERATED_IMAGE_ORDER,
+    SUMMARY_FIELDS,
+    facet_counts,
+    iter_json_records,
+    live_facet_counts,
+    write_product_batch,
+)
+
+
+class VendorProductBulkCreateTests(TestCase):
+    url = "/api/catalog/vendor/products/bulk/"
+
+    def setUp(self):
+        self.client = APIClient()
+        Product.objects.create(
+            product_name="Existing",
+            product_code="TAKEN-1",
+            product_category="men",
+            product_type="shirt",
+            sales_price=Decimal("10.00"),
+            purchase_price=Decimal("5.00"),
+        )
+
+    def item(self, code, **extra):
+        return {
+            "product_name": f"Item {code}",
+            "product_code": code,
+            "product_category": "Female",
+            "product_type": "Formal Shirt",
+            "sales_price": "100",
+            "purchase_price": "60",
+            "colors": ["Red", "red", "Blue"],
+            "images": ["https://img.example.com/a.jpg", "https://img.example.com/b.jpg"],
+            **extra,
+        }
+
+    def test_per_item_results_and_code_collisions(self):
+        payload = [self.item("NEW-1"), self.item("TAKEN-1"), self.item("NEW-1"), {"product_code": "NO-NAME"}]
+        response = self.client.post(self.url, payload, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["created"], response.data["failed"]), (3, 1))
+        results = response.data["results"]
+        self.assertEqual([r["index"] for r in results], [0, 1, 2, 3])
+        self.assertEqual(results[0]["product_code"], "NEW-1")
+        self.assertTrue(results[1]["product_code"].startswith("TAKEN-1-"))
+        self.assertTrue(results[2]["product_code"].startswith("NEW-1-"))
+        self.assertEqual(results[3], {"index": 3, "status": "error", "detail": "product_name is required"})
+
+        product = Product.objects.get(pk=results[0]["product_id"])
+        self.assertEqual((product.product_category, product.product_type), ("women", "shirt"))
+        self.assertEqual(list(product.colors.order_by("display_order").values_list("color_name", flat=True)), ["Red", "Blue"])
+        self.assertEqual(list(product.images.filter(is_primary=True).values_list("image_url", flat=True)), ["https://img.example.com/a.jpg"])
+
+    def test_code_taken_concurrently_is_redrawn_and_failing_items_are_reported(self):
+        real_write = services.write_product_batch
+
+        def racing_write(entries, upsert=True):
+            # Another request takes RACE-1 after the batch checked it was free
+            if not Product.objects.filter(product_code="RACE-1").exists():
+                Product.objects.create(
+                    product_name="Racer", product_code="RACE-1", product_category="men", product_type="shirt",
+                    sales_price=Decimal("1.00"), purchase_price=Decimal("1.00"),
+                )
+            if any(entry["product_name"] == "Item BROKEN" for entry in entries):
+                raise IntegrityError("simulated constraint failure")
+            return real_write(entries, upsert=upsert)
+
+        with mock.patch.object(services, "write_product_batch", side_effect=racing_write) as write:
+            race, ok = services.create_vendor_products([self.item("RACE-1"), self.item("OK-1")])
+        self.assertEqual(write.call_count, 2)
+        self.assertTrue(race["product_code"].startswith("RACE-1-"))
+        self.assertEqual(ok["product_code"], "OK-1")
+        self.assertEqual(Product.objects.get(pk=race["product_id"]).product_name, "Item RACE-1")
+
+        with mock.patch.object(services, "write_product_batch", side_effect=racing_write) as write:
+            ok, broken = services.create_vendor_products([self.item("OK-2"), self.item("BROKEN")])
+        # Every batch attempt fails, then each item is written on its own
+        self.assertEqual(write.call_count, services.CODE_ATTEMPTS + 2)
+        self.assertEqual((ok["status"], ok["product_code"]), ("created", "OK-2"))
+        self.assertEqual((broken["index"], broken["status"]), (1, "error"))
+        self.assertIn("Could not create product BROKEN", broken["detail"])
+        self.assertFalse(Product.objects.filter(product_name="Item BROKEN").exists())
+
+    def test_ndjson_stream(self):
+        body = "\n".join(json.dumps(self.item(f"ND-{i}")) for i in range(3))
+        response = self.client.post(self.url, body, content_type="application/x-ndjson")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["created"], 3)
+        self.assertEqual(Product.objects.filter(product_code__startswith="ND-").count(), 3)
+
+    def test_rejects_non_array(self):
+        for payload in ({"product_name": "x"}, {"products": {"product_name": "x"}}, 5, "NEW-1", None):
+            response = self.client.post(self.url, json.dumps(payload), content_type="application/json")
+            self.assertEqual(response.status_code, 400, payload)
+        self.assertFalse(Product.objects.exclude(product_code="TAKEN-1").exists())
+
+
+class FacetIndexTests(TestCase):
+    url = "/api/catalog/products/facets/"
+
+    def make(self, code, category="men", product_type="shirt", price="450", colors=(), material="cotton", **extra):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self._make(code, category, product_type, price, colors, material, **extra)
+
+    def _make(self, code, category, product_type, price, colors, material, **extra):
+        product = Product.objects.create(
+            product_name=code,
+            product_code=code,
+            product_category=category,
+            product_type=product_type,
+            material=material,
+            sales_price=Decimal(price),
+            purchase_price=Decimal("1"),
+            is_published=True,
+            **extra,
+        )
+        for order, name in enumerate(colors):
+            ProductColor.objects.create(product=product, color_name=name, display_order=order)
+        return product
+
+    def assert_index_matches_live(self):
+        live = live_facet_counts(Product.objects.filter(is_active=True, is_published=True))
+        self.assertEqual(facet_counts(), live)
+
+    def test_signals_keep_counts_incremental(self):
+        shirt = self.make("F-1", colors=["Red", "navy blue"])
+        self.make("F-2", category="women", product_type="dress", price="2500", colors=["red"])
+        facets = facet_counts()
+        self.assertEqual(facets["color"], [{"value": "Red", "count": 2}, {"value": "Navy Blue", "count": 1}])
+        self.assertEqual(facets["price"], [{"value": "0-499", "count": 1}, {"value": "2000-4999", "count": 1}])
+        self.assert_index_matches_live()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shirt.sales_price = Decimal("1200")
+            shirt.material = "Linen"
+            shirt.save()
+            shirt.colors.get(color_name="Red").delete()
+        self.assert_index_matches_live()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            shirt.is_published = False
+            shirt.save()
+        self.assertEqual(facet_counts()["product_type"], [{"value": "dress", "count": 1}])
+        with self.captureOnCommitCallbacks(execute=True):
+            Product.objects.get(product_code="F-2").delete()
+        self.assertFalse(ProductFacetCount.objects.exists())
+
+    def test_facet_rows_written_by_a_concurrent_sync_are_skipped(self):
+        shirt = self.make("C-1", colors=["Red"])
+        rows = services._desired_facets([shirt.pk])
+        ProductFacet.objects.filter(product_id=shirt.pk).delete()
+
+        def concurrent_sync(product_ids):
+            # Another commit inserts the same rows after this sync read the index
+            services._insert_rows(ProductFacet._meta.db_table, services.FACET_COLUMNS, list(rows))
+            return rows
+
+        with mock.patch.object(services, "_desired_facets", side_effect=concurrent_sync):
+            services.sync_product_facets([shirt.pk])
+        self.assertEqual(ProductFacet.objects.filter(product_id=shirt.pk).count(), len(rows))
+
+    def test_count_deltas_are_one_upsert(self):
+        ProductFacetCount.objects.create(product_category="men", product_type="shirt", facet="total", value="", product_count=2)
+        ProductFacetCount.objects.create(product_category="men", product_type="shirt", facet="color", value="Red", product_count=1)
+        with self.assertNumQueries(1):
+            services._apply_facet_delta({("men", "shirt", "total", ""): 3, ("men", "shirt", "color", "Blue"): 1})
+        with self.assertNumQueries(2):
+            services._apply_facet_delta({("men", "shirt", "color", "Red"): -1, ("men", "shirt", "total", ""): -1})
+        self.assertEqual(
+            sorted(ProductFacetCount.objects.values_list("facet", "value", "product_count")),
+            [("color", "Blue", 1), ("total", "", 4)],
+        )
+
+    def test_rolled_back_saves_are_not_synced_by_the_next_commit(self):
+        discarded = self.make("RB-1", colors=["Red"])
+        jobs = {"facets": mock.Mock(), "summaries": mock.Mock()}
+        with mock.patch.dict(signals._JOBS, jobs):
+            with self.captureOnCommitCallbacks(execute=True):
+                with self.assertRaises(IntegrityError), transaction.atomic():
+                    discarded.colors.create(color_name="Blue", display_order=1)
+                    raise IntegrityError("rolled back")
+            with self.captureOnCommitCallbacks(execute=True):
+                kept = self._make("RB-2", "men", "shirt", "450", ["Red"], "cotton")
+        jobs["facets"].assert_called_once_with({kept.pk})
+        jobs["summaries"].assert_called_once_with({kept.pk})
+
+    def test_batch_writes_update_index(self):
+        entry = {
+            "product_name": "Batch", "product_code": "B-1", "product_category": "men", "product_type": "pant",
+            "sales_price": Decimal("600"), "purchase_price": Decimal("1"), "is_published": True,
+            "colors": ["Black"], "images": [],
+        }
+        write_product_batch([entry])
+        write_product_batch([{**entry, "product_type": "jeans", "colors": ["Blue"]}])
+        self.assertEqual(facet_counts()["color"], [{"value": "Blue", "count": 1}])
+        self.assert_index_matches_live()
+
+    def test_facets_endpoint_cost_does_not_grow_with_products(self):
+        for i in range(3):
+            self.make(f"S-{i}", colors=["Red"])
+        self.make("D-1", category="women", product_type="dress", colors=["Red"])
+        # count, page, colors, images + one facet-count query
+        with self.assertNumQueries(5) as first:
+            self.client.get(self.url, {"gender": "men", "page_size": 1})
+        for i in range(3, 30):
+            self.make(f"S-{i}", colors=["Red"], material="Wool" if i % 2 else "cotton")
+        with self.assertNumQueries(len(first.captured_queries)):
+            response = self.client.get(self.url, {"gender": "men", "page_size": 1})
+        self.assertEqual(response.data["count"], 30)
+        self.assertEqual(response.data["facets"]["color"], [{"value": "Red", "count": 30}])
+        self.assertEqual(response.data["facets"]["product_category"], [{"value": "men", "count": 30}])
+
+        response = self.client.get(self.url, {"gender": "men", "material": "wool"})
+        self.assertEqual(response.data["count"], 14)
+        self.assertEqual(response.data["facets"]["material"], [{"value": "Cotton", "count": 16}, {"value": "Wool", "count": 14}])
+
+        response = self.client.get(self.url, {"search": "S-1"})
+        self.assertEqual(response.data["facets"]["product_category"], [{"value": "men", "count": response.data["count"]}])
+
+
+class ProductSummaryTests(TestCase):
+    url = "/api/catalog/products/"
+
+    def test_summary_follows_image_and_color_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.create(
+                product_name="Summary", product_code="SUM-1", product_category="men", product_type="shirt",
+                sales_price=Decimal("10"), purchase_price=Decimal("5"), is_published=True,
+            )
+            ProductImage.objects.create(product=product, image_url="https://img.example.com/1.jpg", display_order=0)
+            ProductImage.objects.create(product=product, image_url="https://img.example.com/2.jpg", display_order=1, is_primary=True)
+            ProductColor.objects.create(product=product, color_name="Red", color_code="#ff0000", display_order=1)
+            ProductColor.objects.create(product=product, color_name="Blue", display_order=0)
+        product.refresh_from_db()
+        self.assertEqual(product.primary_image_url, "https://img.example.com/2.jpg")
+        self.assertEqual(product.color_summary, [{"name": "Blue", "code": None}, {"name": "Red", "code": "#ff0000"}])
+        self.assertEqual(product.color_count, 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.images.filter(is_primary=True).get().delete()
+            product.colors.get(color_name="Blue").delete()
+        product.refresh_from_db()
+        self.assertEqual(product.primary_image_url, "https://img.example.com/1.jpg")
+        self.assertEqual((product.color_summary, product.color_count), ([{"name": "Red", "code": "#ff0000"}], 1))
+
+    def test_batch_writes_and_summary_mode(self):
+        write_product_batch(
+            [
+                {
+                    "product_name": f"Batch {i}", "product_code": f"SB-{i}", "product_category": "men",
+                    "product_type": "shirt", "sales_price": Decimal("12.50"), "purchase_price": Decimal("5"),
+                    "is_published": True, "colors": [f"C{n}" for n in range(10)],
+                    "images": [f"https://img.example.com/{i}/{n}.jpg" for n in range(3)],
+                }
+                for i in range(5)
+            ]
+        )
+        # count + page, nothing for colors/images
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url, {"fields": "summary"})
+        first = response.data["results"][0]
+        self.assertEqual(first["primary_image_url"], "https://img.example.com/0/0.jpg")
+        self.assertEqual(first["color_count"], 10)
+        self.assertEqual(len(first["color_summary"]), 8)
+        self.assertEqual(first["sales_price"], "12.50")
+        self.assertNotIn("images", first)
+
+        before = list(Product.objects.order_by("pk").values_list(*SUMMARY_FIELDS))
+        Product.objects.update(primary_image_url=None, color_summary=[], color_count=0)
+        call_command("backfill_product_summaries", stdout=StringIO())
+        self.assertEqual(list(Product.objects.order_by("pk").values_list(*SUMMARY_FIELDS)), before)
+
+
+class ProductPayloadTests(TestCase):
+    """The values()-based list and detail must return what ProductSerializer returned."""
+
+    @classmethod
+    def setUpTestData(cls):
+        prices = (("1234.5", "18", "0.125", "7"), ("0.99", "0", "100", "0.001"), ("10", "5.25", "0", "2.5"))
+        for n, (price, tax, stock, minimum) in enumerate(prices):
+            product = Product.objects.create(
+                product_name=f"Payload {n}", product_code=f"PAY-{n}", product_category="women", product_type="dress",
+                material="Linen" if n else None, description="" if n == 1 else None, sales_price=Decimal(price),
+                sales_tax_percentage=Decimal(tax), purchase_price=Decimal(price) / 2, current_stock=Decimal(stock),
+                minimum_stock=Decimal(minimum), is_published=True,
+            )
+            # Inserted out of display order, with the primary image last
+            for order in (2, 0, 1):
+                ProductImage.objects.create(
+                    product=product, image_url=f"https://img.example.com/{n}/{order}.jpg", display_order=order,
+                    is_primary=order == 1, image_alt_text=None if order else "front",
+                )
+            ProductColor.objects.create(product=product, color_name="Sand", color_code="#c2b280", display_order=1)
+            ProductColor.objects.create(product=product, color_name="Ink", display_order=0, is_active=n != 2)
+
+    def expected(self, queryset):
+        data = ProductSerializer(queryset.prefetch_related("colors", "images"), many=True).data
+        return json.loads(JSONRenderer().render(data))
+
+    def test_list_and_detail_match_the_serializer(self):
+        client = APIClient()
+        response = client.get("/api/catalog/products/", {"ordering": "-sales_price"})
+        self.assertEqual(response.status_code, 200)
+        expected = self.expected(Product.objects.order_by("-sales_price"))
+        self.assertEqual(json.loads(response.content)["results"], expected)
+        self.assertEqual(expected[0]["sales_price"], "1234.50")
+        self.assertEqual(expected[0]["current_stock"], "0.125")
+
+        product = Product.objects.get(product_code="PAY-2")
+        response = client.get(f"/api/catalog/products/{product.pk}/")
+        self.assertEqual(json.loads(response.content), self.expected(Product.objects.filter(pk=product.pk))[0])
+
+
+class JsonRecordStreamTests(SimpleTestCase):
+    records = [{"name": "a]b", "n": 1}, {"name": "c,\\n{d}", "nested": [1, {"x": "]"}]}, {"name": "é", "n": 3}]
+
+    def test_array_and_ndjson_stream_across_read_boundaries(self):
+        array = json.dumps(self.records, indent=2, ensure_ascii=False)
+        ndjson = "\n".join(json.dumps(r) for r in self.records) + "\n"
+        for text in (array, ndjson):
+            for chunk_size in (1, 7, 1 << 16):
+                self.assertEqual(list(iter_json_records(StringIO(text), chunk_size=chunk_size)), self.records)
+        self.assertEqual(list(iter_json_records(StringIO(" [ ] "))), [])
+        self.assertEqual(list(iter_json_records(StringIO(""))), [])
+
+    def test_truncated_input_raises(self):
+        with self.assertRaises(json.JSONDecodeError):
+            list(iter_json_records(StringIO('[{"name": "a"}, {"name": '), chunk_size=4))
+
+
+class LoadDumpTests(TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp(prefix="load-dump-test-"))
+        self.addCleanup(shutil.rmtree, self.dir, ignore_errors=True)
+
+    def dump(self, records):
+        path = self.dir / "products_dump.json"
+        path.write_text("\n".join(json.dumps(r) for r in records), encoding="utf-8")
+        return str(path)
+
+    def record(self, n, **extra):
+        return {
+            "sku": f"DUMP-{n}", "name": f"Dump {n}", "price": "499.00", "gender": "Women", "category": "Dresses",
+            "colors": ["Red", "red", "Blue"], "images": [f"https://img.example.com/{n}/a.jpg", f"https://img.example.com/{n}/b.jpg"],
+            **extra,
+        }
+
+    def load(self, path, batch_size=2):
+        out = StringIO()
+        call_command("load_dump", "--path", path, "--batch-size", str(batch_size), stdout=out)
+        return out.getvalue()
+
+    def test_streams_in_batches_and_reimport_is_idempotent(self):
+        records = [self.record(n) for n in range(5)] + [{"sku": "BROKEN"}]
+        path = self.dump(records)
+        output = self.load(path)
+        # 5 products over batches of 2, 2 and 1
+        self.assertIn("Imported 5 products, 10 colors, 10 images", output)
+        self.assertIn("1 skipped", output)
+        self.assertEqual(output.count(" products ("), 3)
+
+        def state():
+            return (
+                list(Product.objects.order_by("product_code").values_list("product_code", "pk", "sales_price", *SUMMARY_FIELDS)),
+                sorted(ProductColor.objects.values_list("product__product_code", "color_name", "display_order")),
+                sorted(ProductImage.objects.values_list("product__product_code", "image_url", "display_order", "is_primary")),
+            )
+
+        before = state()
+        self.assertEqual(before[0][0][2], Decimal("499.00"))
+        self.load(path, batch_size=4)
+        self.assertEqual(state(), before)
+
+    def test_upsert_updates_in_place_and_keeps_generated_images(self):
+        self.load(self.dump([self.record(1), self.record(2)]))
+        product = Product.objects.get(product_code="DUMP-1")
+        preview = ProductImage.objects.create(
+            product=product, image_url="/media/tryon/1/preview.png", display_order=GENERATED_IMAGE_ORDER
+        )
+        Product.objects.filter(pk=product.pk).update(current_stock=7)
+
+        self.load(self.dump([self.record(1, price="550", colors=["Green"], images=[])]))
+        product.refresh_from_db()
+        self.assertEqual((product.sales_price, product.current_stock), (Decimal("550.00"), Decimal("7.000")))
+        self.assertEqual(list(product.colors.values_list("color_name", flat=True)), ["Green"])
+        self.assertEqual(list(product.images.values_list("pk", flat=True)), [preview.pk])
+        # The preview is all the product has left, so it becomes the list image
+        self.assertEqual(product.primary_image_url, "/media/tryon/1/preview.png")
+        self.assertEqual(Product.objects.get(product_code="DUMP-2").images.count(), 2)
+
+        written = write_product_batch([{**self.record(1), "product_code": "DUMP-1", "product_name": "Renamed",
+                                        "product_category": "women", "product_type": "dress",
+                                        "sales_price": Decimal("1"), "purchase_price": Decimal("1"),
+                                        "colors": [], "images": ["https://img.example.com/new.jpg"]}])
+        self.assertEqual(written["ids"], {"DUMP-1": product.pk})
+        product.refresh_from_db()
+        self.assertEqual(product.product_name, "Renamed")
+        self.assertEqual(product.primary_image_url, "https://img.example.com/new.jpg")
+        self.assertTrue(ProductImage.objects.filter(pk=preview.pk).exists())
+
+
+class PrerenderTryOnTests(TestCase):
+    def setUp(self):
+        from PIL import Image
+
+        self.media = Path(tempfile.mkdtemp(prefix="prerender-test-"))
+        self.addCleanup(shutil.rmtree, self.media, ignore_errors=True)
+        override = override_settings(MEDIA_ROOT=self.media)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        # A red shirt on a white backdrop and a small grey model photo
+        shirt = Image.new("RGB", (120, 160), "white")
+        shirt.paste(Image.new("RGB", (60, 100), "red"), (30, 30))
+        shirt.save(self.media / "shirt.png")
+        Image.new("RGB", (90, 120), "grey").save(self.media / "model-a.png")
+        self.product = Product.objects.create(
+            product_name="Preview", product_code="PRE-1", product_category="men", product_type="shirt",
+            sales_price=Decimal("10"), purchase_price=Decimal("5"),
+        )
+        self.source = ProductImage.objects.create(
+            product=self.product, image_url=(self.media / "shirt.png").as_uri(), is_primary=True
+        )
+
+    def run_command(self, *args):
+        out = StringIO()
+        call_command("prerender_tryon", "--backend", "stub", "--models", str(self.media / "model-a.png"), *args, stdout=out)
+        return out.getvalue()
+
+    def test_dry_run_renders_nothing(self):
+        self.assertIn("1 to render, 0 already done", self.run_command("--dry-run"))
+        self.assertEqual(ProductImage.objects.count(), 1)
+        self.assertFalse((self.media / "tryon").exists())
+
+    def test_render_with_the_stub_backend_is_resumable(self):
+        output = self.run_command()
+        self.assertIn("Created 1 try-on images (0 failed); garments pre-processed 1", output)
+        preview = ProductImage.objects.exclude(is_primary=True).get()
+        self.assertEqual(preview.display_order, GENERATED_IMAGE_ORDER)
+        relative = f"tryon/{self.product.pk}/{self.source.image_id}-model-a.png"
+        self.assertEqual(preview.image_url, f"/media/{relative}")
+        self.assertTrue((self.media / relative).exists())
+        # Only the cut-out garment is cached; the backend masks it itself
+        cached = [path.name for path in (self.media / "tryon" / "cache" / "garments").rglob("*.png")]
+        self.assertEqual(cached, ["garment.png"])
+
+        self.assertIn("0 to render, 1 already done", self.run_command())
+        self.assertEqual(ProductImage.objects.count(), 2)
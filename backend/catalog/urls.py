@@ -1,8 +1,10 @@
 from django.urls import path
-from .views import ProductListView, ProductDetailView, VendorProductListCreateView
+from .views import ProductListView, ProductFacetView, ProductDetailView, VendorProductListCreateView, VendorProductBulkCreateView
 
 urlpatterns = [
     path("products/", ProductListView.as_view(), name="product-list"),
+    path("products/facets/", ProductFacetView.as_view(), name="product-facets"),
     path("products/<int:product_id>/", ProductDetailView.as_view(), name="product-detail"),
     path("vendor/products/", VendorProductListCreateView.as_view(), name="vendor-product-list-create"),
+    path("vendor/products/bulk/", VendorProductBulkCreateView.as_view(), name="vendor-product-bulk-create"),
 ]
@@ -1,12 +1,30 @@
 from rest_framework import generics, filters, serializers
+from rest_framework.parsers import JSONParser
 from rest_framework.permissions import AllowAny
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import BrowsableAPIRenderer
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework import status
+from collections.abc import Iterator
+from django.http import Http404
 from accounts.permissions import IsVendorUser
-from .models import Product, ProductColor, ProductImage
+from .models import Product, ProductColor, ProductFacet, ProductImage
 from .serializers import ProductSerializer, ProductCreateSerializer
+from .renderers import FastJSONRenderer
+from .parsers import NDJSONParser
+from .services import (
+    PRODUCT_FIELDS,
+    SUMMARY_FIELDS,
+    create_vendor_products,
+    facet_counts,
+    facet_value,
+    live_facet_counts,
+    normalize_vendor_product,
+    product_rows,
+    summary_rows,
+)
 from django.db import transaction
 from django.db import IntegrityError
 import uuid
@@ -28,6 +46,7 @@ class ProductListView(generics.ListAPIView):
     search_fields = ["product_name", "product_code", "description"]
     ordering_fields = ["sales_price", "product_name", "popularity"]
     pagination_class = ProductPagination
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
 
     def get_queryset(self):
         qs = super().get_queryset()
@@ -42,12 +61,72 @@ class ProductListView(generics.ListAPIView):
             qs = qs.filter(product_type__icontains=category)
         return qs
 
+    def list(self, request, *args, **kwargs):
+        # Plain values() rows + grouped color/image queries instead of nested serializers;
+        # ?fields=summary returns the denormalized image/color summary instead, with no extra queries
+        if request.query_params.get("fields") == "summary":
+            fields, to_rows = PRODUCT_FIELDS + SUMMARY_FIELDS, summary_rows
+        else:
+            fields, to_rows = PRODUCT_FIELDS, product_rows
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values(*fields)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(to_rows(page))
+        return Response(to_rows(queryset))
+
+
+class ProductFacetView(ProductListView):
+    """
+    Product page plus facet counts (category, type, material, color, price).
+
+    Counts cover the gender/group/category scope and come from the
+    precomputed ProductFacetCount table; with ?search= they are aggregated
+    live instead. ?material=, ?color= and ?price= narrow the page only, so
+    the other choices in those facets keep their counts.
+    """
+
+    facet_params = ("material", "color", "price")
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        for facet in self.facet_params:
+            value = self.request.query_params.get(facet)
+            if value:
+                if facet != "price":
+                    value = facet_value(value)
+                qs = qs.filter(pk__in=ProductFacet.objects.filter(facet=facet, value=value).values("product_id"))
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        params = request.query_params
+        if params.get(filters.SearchFilter.search_param):
+            scope = super().get_queryset()
+            response.data["facets"] = live_facet_counts(filters.SearchFilter().filter_queryset(request, scope, self))
+            return response
+        words = [w.lower() for w in (params.get("group"), params.get("category")) if w]
+        types = [t for t, _ in Product.TYPE_CHOICES if all(w in t for w in words)] if words else None
+        response.data["facets"] = facet_counts((params.get("gender") or "").lower() or None, types)
+        return response
+
 
 class ProductDetailView(generics.RetrieveAPIView):
     serializer_class = ProductSerializer
     permission_classes = [AllowAny]
     lookup_field = "product_id"
     queryset = Product.objects.filter(is_active=True).prefetch_related("colors", "images").order_by("product_id")
+    renderer_classes = [FastJSONRenderer, BrowsableAPIRenderer]
+
+    def retrieve(self, request, *args, **kwargs):
+        rows = product_rows(
+            self.get_queryset()
+            .prefetch_related(None)
+            .filter(product_id=kwargs[self.lookup_field])
+            .values(*PRODUCT_FIELDS)[:1]
+        )
+        if not rows:
+            raise Http404
+        return Response(rows[0])
 
 
 class VendorProductListCreateView(generics.ListCreateAPIView):
@@ -72,78 +151,37 @@ class VendorProductListCreateView(generics.ListCreateAPIView):
         data = request.data or {}
         try:
             with transaction.atomic():
-                name = (data.get("product_name") or "").strip()
-                if not name:
-                    return Response({"detail": "product_name is required"}, status=status.HTTP_400_BAD_REQUEST)
-
-                # Normalize enums with safe defaults
-                cat_raw = (data.get("product_category") or "men").lower()
-                type_raw = (data.get("product_type") or "other").lower()
-                cat_map = {
-                    "men": "men", "man": "men", "male": "men",
-                    "women": "women", "woman": "women", "female": "women",
-                    "child": "children", "children": "children", "kid": "children", "kids": "children",
-                    "unisex": "unisex"
-                }
-                type_map = {
-                    "t-shirt": "t-shirt", "tshirt": "t-shirt", "tee": "t-shirt",
-                    "shirt": "shirt", "casual shirt": "shirt", "formal shirt": "shirt", "casual shirts": "shirt",
-                    "jeans": "jeans", "denim": "jeans",
-                    "pant": "pant", "pants": "pant", "trouser": "pant", "trousers": "pant", "bottom": "pant",
-                    "kurta": "kurta",
-                    "dress": "dress",
-                    "hoodie": "other", "sweatshirt": "other", "topwear": "shirt",
-                    "other": "other"
-                }
-                norm_cat = cat_map.get(cat_raw, "men")
-                norm_type = None
-                for key, val in type_map.items():
-                    if key in type_raw:
-                        norm_type = val
-                        break
-                if norm_type is None:
-                    norm_type = "other"
-
-                # Prices
                 try:
-                    sales_price = float(data.get("sales_price", 0))
-                    purchase_price = float(data.get("purchase_price", 0))
-                except Exception:
-                    return Response({"detail": "sales_price and purchase_price must be numbers"}, status=status.HTTP_400_BAD_REQUEST)
-                if sales_price < 0 or purchase_price < 0:
-                    return Response({"detail": "Prices must be non-negative"}, status=status.HTTP_400_BAD_REQUEST)
+                    entry = normalize_vendor_product(data)
+                except ValueError as exc:
+                    return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
                 # Product code unique
-                code = (data.get("product_code") or "").strip()
+                code = entry["product_code"]
                 if not code:
                     code = f"LUV-{uuid.uuid4().hex[:8].upper()}"
                 if Product.objects.filter(product_code=code).exists():
                     code = f"{code}-{uuid.uuid4().hex[:6].upper()}"
 
                 prod = Product.objects.create(
-                    product_name=name,
+                    product_name=entry["product_name"],
                     product_code=code,
-                    product_category=norm_cat,
-                    product_type=norm_type,
-                    material=data.get("material") or "",
-                    description=data.get("description") or "",
+                    product_category=entry["product_category"],
+                    product_type=entry["product_type"],
+                    material=entry["material"],
+                    description=entry["description"],
                     current_stock=0,
                     minimum_stock=0,
-                    sales_price=sales_price,
-                    purchase_price=purchase_price,
-                    sales_tax_percentage=float(data.get("sales_tax_percentage", 0) or 0),
-                    purchase_tax_percentage=float(data.get("purchase_tax_percentage", 0) or 0),
-                    is_published=bool(data.get("is_published", True)),
+                    sales_price=entry["sales_price"],
+                    purchase_price=entry["purchase_price"],
+                    sales_tax_percentage=entry["sales_tax_percentage"],
+                    purchase_tax_percentage=entry["purchase_tax_percentage"],
+                    is_published=entry["is_published"],
                     is_active=True,
                 )
 
-                colors = data.get("colors") or []
-                if hasattr(colors, "all"):
-                    colors = list(colors.all())
-                if not isinstance(colors, (list, tuple)):
-                    colors = [colors]
                 seen = set()
-                for color in colors:
+                for color in entry["colors"]:
                     cstr = str(color).strip()
                     if not cstr:
                         continue
@@ -153,19 +191,14 @@ class VendorProductListCreateView(generics.ListCreateAPIView):
                     seen.add(key)
                     ProductColor.objects.create(product=prod, color_name=cstr, display_order=len(seen))
 
-                images = data.get("images") or []
-                if hasattr(images, "all"):
-                    images = list(images.all())
-                if not isinstance(images, (list, tuple)):
-                    images = [images]
-                for idx, img in enumerate(images):
+                for idx, img in enumerate(entry["images"]):
                     url = str(img).strip()
                     if not url:
                         continue
                     ProductImage.objects.create(
                         product=prod,
                         image_url=url,
-                        image_alt_text=name,
+                        image_alt_text=entry["product_name"],
                         display_order=idx,
                         is_primary=(idx == 0),
                         is_active=True,
@@ -177,3 +210,56 @@ class VendorProductListCreateView(generics.ListCreateAPIView):
             return Response({"detail": "Product code already exists"}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class VendorProductBulkCreateView(APIView):
+    """
+    Create many vendor products in one request: a JSON array (or
+    {"products": [...]}) or an application/x-ndjson stream. Items are
+    normalized like the single-item endpoint and written in batches;
+    the response has one result per item, in order.
+    """
+
+    permission_classes = [AllowAny]
+    parser_classes = [JSONParser, NDJSONParser]
+    batch_size = 500
+
+    def post(self, request, *args, **kwargs):
+        items = request.data
+        if isinstance(items, dict):
+            items = items.get("products")
+        # NDJSON parses to a lazy iterator of records
+        if not isinstance(items, (list, Iterator)):
+            return Response(
+                {"detail": "Expected a JSON array of products or an NDJSON stream"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        results = []
+        batch = []
+        try:
+            for data in items:
+                batch.append(data)
+                if len(batch) >= self.batch_size:
+                    results.extend(self._write(batch, offset=len(results)))
+                    batch = []
+            if batch:
+                results.extend(self._write(batch, offset=len(results)))
+        except ValueError as exc:
+            # Malformed NDJSON line; earlier batches are already committed
+            return Response(
+                {"detail": f"Invalid JSON after item {len(results) + len(batch)}: {exc}", "results": results},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        created = sum(1 for r in results if r["status"] == "created")
+        return Response(
+            {"created": created, "failed": len(results) - created, "results": results},
+            status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST,
+        )
+
+    def _write(self, batch, offset):
+        results = create_vendor_products(batch)
+        for result in results:
+            result["index"] += offset
+        return results
@@ -0,0 +1,139 @@
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from catalog.models import Product
+from inventory.models import StockMovement
+from inventory.services import net_quantity, build_stock_snapshots, inventory_valuation, stock_at
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark point-in-time stock and valuation queries against synthetic movements. "
+        "Runs inside a transaction that is rolled back unless --keep is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--movements", type=int, default=10_000_000)
+        parser.add_argument("--products", type=int, default=2000)
+        parser.add_argument("--days", type=int, default=730)
+        parser.add_argument("--batch-size", type=int, default=50_000)
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument("--keep", action="store_true", help="Commit generated rows instead of rolling back")
+
+    def _timed(self, label, fn, repeat=1):
+        start = time.perf_counter()
+        for _ in range(repeat):
+            result = fn()
+        elapsed = (time.perf_counter() - start) / repeat
+        self.stdout.write(f"{label:<45} {elapsed * 1000:10.2f} ms")
+        return result
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self._run(options)
+                if not options["keep"]:
+                    raise _Rollback
+        except _Rollback:
+            self.stdout.write(self.style.WARNING("Rolled back benchmark data"))
+
+    def _run(self, options):
+        rng = random.Random(options["seed"])
+        n_products = options["products"]
+        n_movements = options["movements"]
+        days = options["days"]
+        start_date = date.today() - timedelta(days=days)
+
+        products = Product.objects.bulk_create(
+            [
+                Product(
+                    product_name=f"Bench Product {i}",
+                    product_code=f"BENCH-{options['seed']}-{i:06d}",
+                    product_category="unisex",
+                    product_type="other",
+                    sales_price=Decimal("100.00"),
+                    purchase_price=Decimal(rng.randint(20, 80)),
+                )
+                for i in range(n_products)
+            ],
+            batch_size=options["batch_size"],
+        )
+        if products[0].pk is None:
+            products = list(Product.objects.filter(product_code__startswith=f"BENCH-{options['seed']}-").order_by("pk"))
+        ids = [p.pk for p in products]
+        stock = {pid: Decimal("0") for pid in ids}
+
+        started = time.perf_counter()
+        per_day = max(1, n_movements // days)
+        batch = []
+        written = 0
+        for day in range(days):
+            movement_date = start_date + timedelta(days=day)
+            for _ in range(per_day):
+                if written + len(batch) >= n_movements:
+                    break
+                pid = ids[rng.randrange(n_products)]
+                qty = Decimal(rng.randint(1, 20))
+                direction = "in" if stock[pid] < qty or rng.random() < 0.45 else "out"
+                before = stock[pid]
+                after = before + qty if direction == "in" else before - qty
+                stock[pid] = after
+                batch.append(
+                    StockMovement(
+                        product_id=pid,
+                        movement_type="purchase" if direction == "in" else "sale",
+                        movement_date=movement_date,
+                        quantity=qty,
+                        movement_direction=direction,
+                        reference_type="adjustment",
+                        reference_id=0,
+                        stock_before=before,
+                        stock_after=after,
+                    )
+                )
+            if len(batch) >= options["batch_size"] or day == days - 1:
+                StockMovement.objects.bulk_create(batch, batch_size=options["batch_size"])
+                written += len(batch)
+                batch = []
+        for p in products:
+            p.current_stock = stock[p.pk]
+        Product.objects.bulk_update(products, ["current_stock"], batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Generated {written} movements in {elapsed:.1f}s ({written / elapsed:,.0f} rows/s)")
+
+        month_ends = []
+        cursor = date(start_date.year, start_date.month, 1)
+        while cursor < date.today():
+            nxt = date(cursor.year + (cursor.month // 12), cursor.month % 12 + 1, 1)
+            month_ends.append(nxt - timedelta(days=1))
+            cursor = nxt
+        month_ends = [d for d in month_ends if d < date.today()]
+        probe_date = month_ends[-1] - timedelta(days=10) if month_ends else date.today()
+        probe_product = ids[len(ids) // 2]
+
+        def scan_stock():
+            net = StockMovement.objects.filter(
+                product_id=probe_product, movement_date__lte=probe_date
+            ).aggregate(net=net_quantity())["net"]
+            return net
+
+        def scan_valuation():
+            return list(
+                StockMovement.objects.filter(movement_date__lte=probe_date)
+                .values("product_id")
+                .annotate(net=net_quantity())
+            )
+
+        self._timed("stock_at (no snapshot, roll back)", lambda: stock_at(probe_product, probe_date), repeat=5)
+        self._timed("stock_at (full movement scan)", scan_stock, repeat=5)
+        self._timed("valuation (full movement scan)", scan_valuation)
+        self._timed(f"build snapshots x{len(month_ends)} month ends", lambda: [build_stock_snapshots(d) for d in month_ends])
+        self._timed("stock_at (snapshot + deltas)", lambda: stock_at(probe_product, probe_date), repeat=5)
+        self._timed("valuation (snapshot + deltas)", lambda: inventory_valuation(probe_date))
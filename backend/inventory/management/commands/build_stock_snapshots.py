@@ -0,0 +1,20 @@
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from inventory.services import build_stock_snapshots
+
+
+class Command(BaseCommand):
+    help = "Build stock-on-hand snapshots (quantity and valuation at purchase price) for every product"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Snapshot date YYYY-MM-DD (default: today)")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        try:
+            snapshot_date = date.fromisoformat(options["date"]) if options["date"] else timezone.localdate()
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD")
+        count = build_stock_snapshots(snapshot_date, batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Snapshot {snapshot_date}: {count} products"))
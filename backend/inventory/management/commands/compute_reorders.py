@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from inventory.services import compute_reorder_suggestions, create_reorder_purchase_orders
+
+
+class Command(BaseCommand):
+    help = "Recompute reorder suggestions from sales velocity and minimum_stock; optionally raise draft POs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--window-days", type=int, default=30, help="Rolling demand window")
+        parser.add_argument("--lead-days", type=int, default=7, help="Supplier lead time in days")
+        parser.add_argument("--cover-days", type=int, default=14, help="Days of demand to cover after arrival")
+        parser.add_argument("--full", action="store_true", help="Recompute every product, not just changed ones")
+        parser.add_argument("--create-pos", action="store_true", help="Raise draft purchase orders per vendor")
+
+    def handle(self, *args, **options):
+        count = compute_reorder_suggestions(
+            window_days=options["window_days"],
+            lead_days=options["lead_days"],
+            cover_days=options["cover_days"],
+            full=options["full"],
+        )
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {count} products"))
+        if options["create_pos"]:
+            orders = create_reorder_purchase_orders()
+            self.stdout.write(self.style.SUCCESS(f"Created {len(orders)} draft purchase orders"))
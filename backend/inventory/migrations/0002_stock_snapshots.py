@@ -0,0 +1,52 @@
+# Generated by Django 5.2.9 on 2026-10-19 16:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("catalog", "0004_remove_productimage_created_at_and_more"),
+        ("inventory", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="StockSnapshot",
+            fields=[
+                ("snapshot_id", models.BigAutoField(primary_key=True, serialize=False)),
+                ("snapshot_date", models.DateField()),
+                ("quantity", models.DecimalField(decimal_places=3, max_digits=15)),
+                ("unit_cost", models.DecimalField(decimal_places=2, max_digits=15)),
+                ("valuation", models.DecimalField(decimal_places=2, max_digits=18)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "db_table": "stock_snapshots",
+            },
+        ),
+        migrations.AddIndex(
+            model_name="stockmovement",
+            index=models.Index(
+                fields=["product", "movement_date"], name="idx_movement_product_date"
+            ),
+        ),
+        migrations.AddField(
+            model_name="stocksnapshot",
+            name="product",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="stock_snapshots",
+                to="catalog.product",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="stocksnapshot",
+            index=models.Index(fields=["snapshot_date"], name="idx_snapshot_date"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="stocksnapshot",
+            unique_together={("product", "snapshot_date")},
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("catalog", "0004_remove_productimage_created_at_and_more"),
+        ("inventory", "0002_stock_snapshots"),
+        ("purchases", "0003_remove_purchaseorderline_created_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ReorderSuggestion",
+            fields=[
+                (
+                    "suggestion_id",
+                    models.BigAutoField(primary_key=True, serialize=False),
+                ),
+                (
+                    "daily_velocity",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "on_hand",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "incoming",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "projected_stock",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "minimum_stock",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                (
+                    "suggested_quantity",
+                    models.DecimalField(decimal_places=3, default=0, max_digits=15),
+                ),
+                ("needs_reorder", models.BooleanField(default=False)),
+                ("computed_at", models.DateTimeField()),
+                (
+                    "product",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="reorder_suggestion",
+                        to="catalog.product",
+                    ),
+                ),
+                (
+                    "purchase_order",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reorder_suggestions",
+                        to="purchases.purchaseorder",
+                    ),
+                ),
+                (
+                    "vendor",
+                    models.ForeignKey(
+                        blank=True,
+                        null=True,
+                        on_delete=django.db.models.deletion.SET_NULL,
+                        related_name="reorder_suggestions",
+                        to="accounts.contact",
+                    ),
+                ),
+            ],
+            options={
+                "db_table": "reorder_suggestions",
+                "indexes": [
+                    models.Index(
+                        fields=["needs_reorder", "vendor"], name="idx_reorder_vendor"
+                    )
+                ],
+            },
+        ),
+    ]
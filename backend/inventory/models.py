@@ -1,6 +1,7 @@
 from django.db import models
 from catalog.models import Product
-from accounts.models import TimeStampedModel
+from accounts.models import Contact, TimeStampedModel
+from purchases.models import PurchaseOrder
 
 
 class StockMovement(TimeStampedModel):
@@ -36,7 +37,56 @@ class StockMovement(TimeStampedModel):
             models.Index(fields=["movement_date"], name="idx_movement_date"),
             models.Index(fields=["movement_type"], name="idx_movement_type"),
             models.Index(fields=["reference_type", "reference_id"], name="idx_movement_reference"),
+            models.Index(fields=["product", "movement_date"], name="idx_movement_product_date"),
         ]
 
     def __str__(self) -> str:
         return f"{self.product} {self.movement_type} {self.quantity}"
+
+
+class StockSnapshot(models.Model):
+    snapshot_id = models.BigAutoField(primary_key=True)
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name="stock_snapshots")
+    snapshot_date = models.DateField()
+    quantity = models.DecimalField(max_digits=15, decimal_places=3)
+    unit_cost = models.DecimalField(max_digits=15, decimal_places=2)
+    valuation = models.DecimalField(max_digits=18, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "stock_snapshots"
+        unique_together = (("product", "snapshot_date"),)
+        indexes = [
+            models.Index(fields=["snapshot_date"], name="idx_snapshot_date"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product} @ {self.snapshot_date}: {self.quantity}"
+
+
+class ReorderSuggestion(models.Model):
+    suggestion_id = models.BigAutoField(primary_key=True)
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name="reorder_suggestion")
+    vendor = models.ForeignKey(
+        Contact, on_delete=models.SET_NULL, null=True, blank=True, related_name="reorder_suggestions"
+    )
+    daily_velocity = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    on_hand = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    incoming = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    projected_stock = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    minimum_stock = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    suggested_quantity = models.DecimalField(max_digits=15, decimal_places=3, default=0)
+    needs_reorder = models.BooleanField(default=False)
+    purchase_order = models.ForeignKey(
+        PurchaseOrder, on_delete=models.SET_NULL, null=True, blank=True, related_name="reorder_suggestions"
+    )
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = "reorder_suggestions"
+        indexes = [
+            models.Index(fields=["needs_reorder", "vendor"], name="idx_reorder_vendor"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.product} reorder {self.suggested_quantity}"
@@ -1,8 +1,17 @@
 from rest_framework import serializers
-from .models import StockMovement
+from .models import StockMovement, ReorderSuggestion
 
 
 class StockMovementSerializer(serializers.ModelSerializer):
     class Meta:
         model = StockMovement
         fields = "__all__"
+
+
+class ReorderSuggestionSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source="product.product_name", read_only=True)
+    product_code = serializers.CharField(source="product.product_code", read_only=True)
+
+    class Meta:
+        model = ReorderSuggestion
+        fields = "__all__"
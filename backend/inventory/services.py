@@ -1,7 +1,18 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from decimal import Decimal, ROUND_CEILING
 from django.db import transaction
+from django.db.models import Case, DecimalField, F, Max, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from catalog.models import Product
-from purchases.models import PurchaseOrderLine
-from .models import StockMovement
+from purchases.models import PurchaseOrder, PurchaseOrderLine
+from sales.models import SalesOrderLine
+from system.models import SystemSetting
+from system.services import get_next_document_number
+from .models import StockMovement, StockSnapshot, ReorderSuggestion
+
+QTY_FIELD = DecimalField(max_digits=15, decimal_places=3)
 
 
 @transaction.atomic
@@ -27,3 +38,372 @@ def update_stock_from_purchase(purchase_order_id: int, movement_date=None):
             stock_before=stock_before,
             stock_after=stock_after,
         )
+
+
+def net_quantity():
+    """Signed sum of movement quantities (in = +, out = -)."""
+    return Coalesce(
+        Sum(
+            Case(
+                When(movement_direction="in", then=F("quantity")),
+                default=F("quantity") * Value(-1),
+                output_field=QTY_FIELD,
+            )
+        ),
+        Value(Decimal("0")),
+        output_field=QTY_FIELD,
+    )
+
+
+def _net_by_product(movements):
+    return dict(
+        movements.values("product_id").annotate(net=net_quantity()).values_list("product_id", "net")
+    )
+
+
+def latest_snapshot_date(as_of: date):
+    return StockSnapshot.objects.filter(snapshot_date__lte=as_of).aggregate(d=Max("snapshot_date"))["d"]
+
+
+def stock_at(product_id: int, as_of: date):
+    """
+    Stock on hand for one product at the end of ``as_of``.
+
+    Reads the nearest snapshot on or before the date and adds the movement
+    deltas after it. Without a snapshot the level is rolled back from
+    ``current_stock`` using the movements after the date.
+    """
+    snapshot = (
+        StockSnapshot.objects.filter(product_id=product_id, snapshot_date__lte=as_of)
+        .order_by("-snapshot_date")
+        .first()
+    )
+    movements = StockMovement.objects.filter(product_id=product_id)
+    if snapshot:
+        delta = movements.filter(
+            movement_date__gt=snapshot.snapshot_date, movement_date__lte=as_of
+        ).aggregate(net=net_quantity())["net"]
+        return {
+            "product_id": product_id,
+            "date": as_of,
+            "quantity": snapshot.quantity + delta,
+            "unit_cost": snapshot.unit_cost,
+            "snapshot_date": snapshot.snapshot_date,
+        }
+
+    product = Product.objects.only("current_stock", "purchase_price").get(pk=product_id)
+    later = movements.filter(movement_date__gt=as_of).aggregate(net=net_quantity())["net"]
+    return {
+        "product_id": product_id,
+        "date": as_of,
+        "quantity": product.current_stock - later,
+        "unit_cost": product.purchase_price,
+        "snapshot_date": None,
+    }
+
+
+def stock_levels_at(as_of: date, product_ids=None):
+    """
+    Stock and valuation for every product at the end of ``as_of``.
+
+    Returns ``(snapshot_date, rows)`` where rows are dicts keyed by product_id.
+    Products covered by the nearest snapshot roll forward from it; the rest
+    roll back from ``current_stock``. Each path is a single grouped query.
+    """
+    products = Product.objects.all()
+    movements = StockMovement.objects.all()
+    snapshots = StockSnapshot.objects.all()
+    if product_ids is not None:
+        products = products.filter(pk__in=product_ids)
+        movements = movements.filter(product_id__in=product_ids)
+        snapshots = snapshots.filter(product_id__in=product_ids)
+
+    snapshot_date = latest_snapshot_date(as_of)
+    rows = {}
+    if snapshot_date:
+        forward = _net_by_product(
+            movements.filter(movement_date__gt=snapshot_date, movement_date__lte=as_of)
+        )
+        for pid, qty, cost in snapshots.filter(snapshot_date=snapshot_date).values_list(
+            "product_id", "quantity", "unit_cost"
+        ):
+            quantity = qty + forward.get(pid, Decimal("0"))
+            rows[pid] = {"product_id": pid, "quantity": quantity, "unit_cost": cost, "valuation": quantity * cost}
+
+    backward = _net_by_product(movements.filter(movement_date__gt=as_of))
+    for pid, current, cost in products.values_list("product_id", "current_stock", "purchase_price"):
+        if pid in rows:
+            continue
+        quantity = current - backward.get(pid, Decimal("0"))
+        rows[pid] = {"product_id": pid, "quantity": quantity, "unit_cost": cost, "valuation": quantity * cost}
+    return snapshot_date, rows
+
+
+def inventory_valuation(as_of: date):
+    snapshot_date, rows = stock_levels_at(as_of)
+    total_quantity = sum((r["quantity"] for r in rows.values()), Decimal("0"))
+    total_valuation = sum((r["valuation"] for r in rows.values()), Decimal("0"))
+    return {
+        "date": as_of,
+        "snapshot_date": snapshot_date,
+        "product_count": len(rows),
+        "total_quantity": total_quantity,
+        "total_valuation": total_valuation.quantize(Decimal("0.01")),
+    }
+
+
+@transaction.atomic
+def build_stock_snapshots(snapshot_date: date, batch_size: int = 5000) -> int:
+    """
+    (Re)build the snapshot rows for ``snapshot_date`` for every product.
+    Existing rows for that date are replaced.
+    """
+    StockSnapshot.objects.filter(snapshot_date=snapshot_date).delete()
+    _, rows = stock_levels_at(snapshot_date)
+    StockSnapshot.objects.bulk_create(
+        [
+            StockSnapshot(
+                product_id=row["product_id"],
+                snapshot_date=snapshot_date,
+                quantity=row["quantity"],
+                unit_cost=row["unit_cost"],
+                valuation=row["valuation"].quantize(Decimal("0.01")),
+            )
+            for row in rows.values()
+        ],
+        batch_size=batch_size,
+    )
+    return len(rows)
+
+
+REPLENISHMENT_LAST_RUN_KEY = "replenishment_last_run"
+DEMAND_ORDER_STATUSES = ("confirmed", "invoiced", "completed")
+OPEN_PO_STATUSES = ("draft", "confirmed")
+
+
+def _chunks(items, size):
+    items = list(items)
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
+
+
+def _replenishment_last_run():
+    raw = (
+        SystemSetting.objects.filter(setting_key=REPLENISHMENT_LAST_RUN_KEY)
+        .values_list("setting_value", flat=True)
+        .first()
+    )
+    return datetime.fromisoformat(raw) if raw else None
+
+
+def _dirty_product_ids(since, window_days, now):
+    """
+    Products whose stock, demand, supply or thresholds changed after ``since``,
+    plus those with demand that has aged out of the velocity window since then.
+    """
+    ids = set(StockMovement.objects.filter(created_at__gt=since).values_list("product_id", flat=True).distinct())
+    ids.update(
+        SalesOrderLine.objects.filter(sales_order__updated_at__gt=since)
+        .values_list("product_id", flat=True)
+        .distinct()
+    )
+    ids.update(
+        SalesOrderLine.objects.filter(
+            sales_order__order_date__gte=timezone.localdate(since) - timedelta(days=window_days),
+            sales_order__order_date__lt=timezone.localdate(now) - timedelta(days=window_days),
+            sales_order__order_status__in=DEMAND_ORDER_STATUSES,
+        )
+        .values_list("product_id", flat=True)
+        .distinct()
+    )
+    ids.update(
+        PurchaseOrderLine.objects.filter(purchase_order__updated_at__gt=since)
+        .values_list("product_id", flat=True)
+        .distinct()
+    )
+    ids.update(Product.objects.filter(updated_at__gt=since).values_list("product_id", flat=True))
+    return ids
+
+
+def _compute_reorder_rows(products, window_days, lead_days, cover_days, now):
+    """Build unsaved ReorderSuggestion rows for a product queryset using grouped queries."""
+    window_start = timezone.localdate(now) - timedelta(days=window_days)
+    product_rows = list(products.values_list("product_id", "current_stock", "minimum_stock"))
+    ids = [pid for pid, _, _ in product_rows]
+
+    demand = dict(
+        SalesOrderLine.objects.filter(
+            product_id__in=ids,
+            sales_order__order_date__gte=window_start,
+            sales_order__order_status__in=DEMAND_ORDER_STATUSES,
+        )
+        .values("product_id")
+        .annotate(qty=Sum("quantity"))
+        .values_list("product_id", "qty")
+    )
+    incoming = dict(
+        PurchaseOrderLine.objects.filter(product_id__in=ids, purchase_order__po_status__in=OPEN_PO_STATUSES)
+        .values("product_id")
+        .annotate(qty=Sum(F("quantity") - F("received_quantity")))
+        .values_list("product_id", "qty")
+    )
+    last_po = dict(
+        PurchaseOrderLine.objects.filter(product_id__in=ids)
+        .values("product_id")
+        .annotate(po=Max("purchase_order_id"))
+        .values_list("product_id", "po")
+    )
+    po_vendor = dict(
+        PurchaseOrder.objects.filter(pk__in=set(last_po.values())).values_list("purchase_order_id", "vendor_id")
+    )
+
+    window = Decimal(window_days)
+    rows = []
+    for pid, on_hand, minimum in product_rows:
+        velocity = (Decimal(demand.get(pid) or 0) / window).quantize(Decimal("0.001"))
+        inbound = Decimal(incoming.get(pid) or 0)
+        projected = on_hand + inbound - velocity * lead_days
+        needs_reorder = projected < minimum
+        suggested = Decimal("0")
+        if needs_reorder:
+            target = minimum + velocity * (lead_days + cover_days)
+            suggested = max(Decimal("0"), (target - on_hand - inbound).to_integral_value(ROUND_CEILING))
+        rows.append(
+            ReorderSuggestion(
+                product_id=pid,
+                vendor_id=po_vendor.get(last_po.get(pid)),
+                daily_velocity=velocity,
+                on_hand=on_hand,
+                incoming=inbound,
+                projected_stock=projected,
+                minimum_stock=minimum,
+                suggested_quantity=suggested,
+                needs_reorder=needs_reorder,
+                computed_at=now,
+            )
+        )
+    return rows
+
+
+@transaction.atomic
+def compute_reorder_suggestions(window_days=30, lead_days=7, cover_days=14, full=False, chunk_size=2000):
+    """
+    Refresh ReorderSuggestion rows from sales velocity, open purchase orders and
+    ``Product.minimum_stock``. Unless ``full`` is set, only products touched since
+    the previous run are recomputed; suggestions for inactive products are
+    dropped either way. Returns the number of products recomputed.
+    """
+    now = timezone.now()
+    last_run = None if full else _replenishment_last_run()
+    active = Product.objects.filter(is_active=True)
+    if last_run is None:
+        target_ids = list(active.values_list("product_id", flat=True))
+    else:
+        dirty = _dirty_product_ids(last_run, window_days, now)
+        target_ids = list(active.filter(pk__in=dirty).values_list("product_id", flat=True))
+    ReorderSuggestion.objects.filter(product__is_active=False).delete()
+
+    for chunk in _chunks(target_ids, chunk_size):
+        rows = _compute_reorder_rows(active.filter(pk__in=chunk), window_days, lead_days, cover_days, now)
+        # Keep the link to any draft PO already raised for a product.
+        existing_po = dict(
+            ReorderSuggestion.objects.filter(
+                product_id__in=chunk, purchase_order__po_status__in=OPEN_PO_STATUSES
+            ).values_list(
+                "product_id", "purchase_order_id"
+            )
+        )
+        for row in rows:
+            row.purchase_order_id = existing_po.get(row.product_id)
+        ReorderSuggestion.objects.filter(product_id__in=chunk).delete()
+        ReorderSuggestion.objects.bulk_create(rows, batch_size=chunk_size)
+
+    SystemSetting.objects.update_or_create(
+        setting_key=REPLENISHMENT_LAST_RUN_KEY,
+        defaults={
+            "setting_value": now.isoformat(),
+            "setting_type": "string",
+            "description": "Timestamp of the last replenishment computation",
+        },
+    )
+    return len(target_ids)
+
+
+@transaction.atomic
+def create_reorder_purchase_orders(vendor_ids=None, user=None):
+    """
+    Raise one draft PurchaseOrder per vendor for all pending reorder suggestions.
+    Orders and lines are inserted with bulk_create. Returns the created orders.
+    """
+    suggestions = (
+        ReorderSuggestion.objects.select_for_update()
+        .filter(needs_reorder=True, suggested_quantity__gt=0, vendor__isnull=False, purchase_order__isnull=True)
+        .select_related("product")
+        .order_by("vendor_id", "product_id")
+    )
+    if vendor_ids:
+        suggestions = suggestions.filter(vendor_id__in=vendor_ids)
+
+    by_vendor = defaultdict(list)
+    for suggestion in suggestions:
+        by_vendor[suggestion.vendor_id].append(suggestion)
+    if not by_vendor:
+        return []
+
+    today = timezone.localdate()
+    created_by = getattr(user, "user_id", None) if user else None
+    orders = []
+    for vendor_id, items in by_vendor.items():
+        subtotal = Decimal("0")
+        tax_total = Decimal("0")
+        for item in items:
+            line_sub = item.suggested_quantity * item.product.purchase_price
+            subtotal += line_sub
+            tax_total += line_sub * item.product.purchase_tax_percentage / Decimal("100")
+        orders.append(
+            PurchaseOrder(
+                po_number=get_next_document_number("purchase_order"),
+                vendor_id=vendor_id,
+                order_date=today,
+                po_status="draft",
+                subtotal=subtotal,
+                tax_amount=tax_total,
+                total_amount=subtotal + tax_total,
+                notes="Generated by replenishment",
+                created_by=created_by,
+            )
+        )
+    PurchaseOrder.objects.bulk_create(orders)
+    # Not every backend returns primary keys from bulk_create; map them back by number.
+    po_ids = dict(
+        PurchaseOrder.objects.filter(po_number__in=[o.po_number for o in orders]).values_list(
+            "vendor_id", "purchase_order_id"
+        )
+    )
+
+    lines = []
+    for vendor_id, items in by_vendor.items():
+        for idx, item in enumerate(items, start=1):
+            price = item.product.purchase_price
+            tax_pct = item.product.purchase_tax_percentage
+            line_sub = item.suggested_quantity * price
+            line_tax = line_sub * tax_pct / Decimal("100")
+            lines.append(
+                PurchaseOrderLine(
+                    purchase_order_id=po_ids[vendor_id],
+                    product_id=item.product_id,
+                    line_number=idx,
+                    quantity=item.suggested_quantity,
+                    unit_price=price,
+                    tax_percentage=tax_pct,
+                    line_subtotal=line_sub,
+                    line_tax_amount=line_tax,
+                    line_total=line_sub + line_tax,
+                )
+            )
+            item.purchase_order_id = po_ids[vendor_id]
+    PurchaseOrderLine.objects.bulk_create(lines)
+    ReorderSuggestion.objects.bulk_update(
+        [item for items in by_vendor.values() for item in items], ["purchase_order"]
+    )
+    return list(PurchaseOrder.objects.filter(pk__in=po_ids.values()).order_by("purchase_order_id"))
@@ -1,3 +1,188 @@
+from datetime import timedelta
+from decimal import Decimal
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Contact, User
+from catalog.models import Product
+from pricing.models import PaymentTerm
+from sales.models import SalesOrder, SalesOrderLine
+from system.models import SystemSetting
+from .models import ReorderSuggestion, StockMovement, StockSnapshot
+from .services import (
+    REPLENISHMENT_LAST_RUN_KEY,
+    build_stock_snapshots,
+    compute_reorder_suggestions,
+    inventory_valuation,
+    stock_at,
+    stock_levels_at,
+)
+
+
+def move(product, days_ago, quantity, direction="in"):
+    StockMovement.objects.create(
+        product=product, movement_type="adjustment", movement_date=timezone.localdate() - timedelta(days=days_ago),
+        quantity=Decimal(quantity), movement_direction=direction, reference_type="adjustment", reference_id=0,
+        stock_before=0, stock_after=0,
+    )
+
+
+class StockSnapshotTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.user = User.objects.create_user(username="stock", email="stock@example.com", password="x")
+        cls.shirt = Product.objects.create(
+            product_name="Snapshot Shirt", product_code="SNAP-1", product_category="men", product_type="shirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("40.00"), current_stock=Decimal("11"),
+        )
+        cls.pant = Product.objects.create(
+            product_name="Snapshot Pant", product_code="SNAP-2", product_category="men", product_type="pant",
+            sales_price=Decimal("200.00"), purchase_price=Decimal("75.50"), current_stock=Decimal("6"),
+        )
+        # shirt: 10 in, 3 out, 4 in -> 11 on hand; pant: 8 in, 2 out -> 6 on hand
+        move(cls.shirt, 10, "10")
+        move(cls.shirt, 5, "3", "out")
+        move(cls.shirt, 1, "4")
+        move(cls.pant, 8, "8")
+        move(cls.pant, 2, "2", "out")
+
+    def day(self, days_ago):
+        return self.today - timedelta(days=days_ago)
+
+    def test_without_snapshots_levels_roll_back_from_current_stock(self):
+        for days_ago, expected in ((11, "0"), (10, "10"), (6, "10"), (5, "7"), (1, "11"), (0, "11")):
+            level = stock_at(self.shirt.pk, self.day(days_ago))
+            self.assertEqual(level["quantity"], Decimal(expected))
+            self.assertIsNone(level["snapshot_date"])
+        snapshot_date, rows = stock_levels_at(self.day(3))
+        self.assertIsNone(snapshot_date)
+        self.assertEqual({pid: row["quantity"] for pid, row in rows.items()}, {self.shirt.pk: 7, self.pant.pk: 8})
+
+    def test_snapshot_plus_deltas_matches_the_rolled_back_level(self):
+        expected = {days_ago: stock_at(self.shirt.pk, self.day(days_ago))["quantity"] for days_ago in range(12)}
+        self.assertEqual(build_stock_snapshots(self.day(7)), 2)
+        self.assertEqual(StockSnapshot.objects.get(product=self.pant, snapshot_date=self.day(7)).valuation, Decimal("604.00"))
+        for days_ago in range(8):
+            level = stock_at(self.shirt.pk, self.day(days_ago))
+            self.assertEqual(level["snapshot_date"], self.day(7))
+            self.assertEqual(level["quantity"], expected[days_ago])
+        # Before the only snapshot the level still rolls back
+        self.assertIsNone(stock_at(self.shirt.pk, self.day(9))["snapshot_date"])
+
+    def test_movements_after_the_snapshot_date_are_added(self):
+        build_stock_snapshots(self.day(4))
+        move(self.shirt, 2, "5", "out")
+        Product.objects.filter(pk=self.shirt.pk).update(current_stock=Decimal("6"))
+        self.assertEqual(stock_at(self.shirt.pk, self.day(4))["quantity"], Decimal("7"))
+        self.assertEqual(stock_at(self.shirt.pk, self.day(2))["quantity"], Decimal("2"))
+        self.assertEqual(stock_at(self.shirt.pk, self.today)["quantity"], Decimal("6"))
+        # Rebuilding the same date replaces its rows rather than adding to them
+        build_stock_snapshots(self.day(4))
+        self.assertEqual(StockSnapshot.objects.filter(snapshot_date=self.day(4)).count(), 2)
+
+    def test_products_missing_from_the_snapshot_roll_back(self):
+        build_stock_snapshots(self.day(4))
+        hat = Product.objects.create(
+            product_name="Late Hat", product_code="SNAP-3", product_category="unisex", product_type="other",
+            sales_price=Decimal("30.00"), purchase_price=Decimal("12.00"), current_stock=Decimal("9"),
+        )
+        move(hat, 3, "12")
+        move(hat, 1, "3", "out")
+        snapshot_date, rows = stock_levels_at(self.day(2))
+        self.assertEqual(snapshot_date, self.day(4))
+        self.assertEqual(rows[hat.pk]["quantity"], Decimal("12"))
+        self.assertEqual(rows[self.shirt.pk]["quantity"], Decimal("7"))
+        self.assertEqual(rows[self.pant.pk]["quantity"], Decimal("6"))
+        self.assertEqual(stock_at(hat.pk, self.day(2))["snapshot_date"], None)
+
+    def test_valuation_totals_and_endpoints(self):
+        build_stock_snapshots(self.day(4))
+        valuation = inventory_valuation(self.day(3))
+        # shirt 7 x 40.00 + pant 8 x 75.50
+        self.assertEqual(valuation["snapshot_date"], self.day(4))
+        self.assertEqual((valuation["product_count"], valuation["total_quantity"]), (2, Decimal("15")))
+        self.assertEqual(valuation["total_valuation"], Decimal("884.00"))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/inventory/stock-at/", {"product_id": self.pant.pk, "date": str(self.day(1))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["quantity"], response.data["valuation"]), (Decimal("6"), Decimal("453.00")))
+        response = client.get("/api/inventory/valuation/", {"date": str(self.day(3))})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["total_valuation"], Decimal("884.00"))
+        self.assertEqual(client.get("/api/inventory/stock-at/", {"product_id": 0}).status_code, 404)
+        self.assertEqual(client.get("/api/inventory/stock-at/", {"product_id": 1, "date": "soon"}).status_code, 400)
+        response = client.get("/api/inventory/stock-at/", {"product_id": "abc"})
+        self.assertEqual((response.status_code, response.data["detail"]), (400, "product_id must be an integer"))
+        response = client.get("/api/inventory/movements/", {"product_id": "abc"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("product_id", response.data)
+        self.assertEqual(client.get("/api/inventory/movements/", {"product_id": self.pant.pk}).data["count"], 2)
+
+
+class ReorderSuggestionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        customer = Contact.objects.create(contact_name="Reorder Buyer", contact_type="customer", email="ro@example.com", mobile="1")
+        term = PaymentTerm.objects.create(term_name="Immediate", net_days=0)
+        cls.products = [
+            Product.objects.create(
+                product_name=f"Reorder {n}", product_code=f"RO-{n}", product_category="men", product_type="shirt",
+                sales_price=Decimal("100.00"), purchase_price=Decimal("50.00"), current_stock=Decimal("20"),
+                minimum_stock=Decimal("10"),
+            )
+            for n in range(3)
+        ]
+        # 60 units a month each: 2/day over 7 lead days drops 20 on hand to 6, under the minimum of 10.
+        # Product 0's demand sits 28 days back and leaves a 30-day window within days; the others' stays.
+        for n, (product, days_ago) in enumerate(zip(cls.products, (28, 3, 3))):
+            order = SalesOrder.objects.create(
+                so_number=f"SO-RO-{n}", customer=customer, payment_term=term, order_status="confirmed",
+                order_date=timezone.now().date() - timedelta(days=days_ago),
+            )
+            SalesOrderLine.objects.create(
+                sales_order=order, product=product, line_number=1, quantity=Decimal("60"), unit_price=Decimal("100"),
+            )
+
+    def rewind(self, days):
+        """Let ``days`` days pass since the last run, with no changes in between."""
+        then = timezone.now() - timedelta(days=days)
+        SystemSetting.objects.filter(setting_key=REPLENISHMENT_LAST_RUN_KEY).update(setting_value=then.isoformat())
+        for order in SalesOrder.objects.all():
+            SalesOrder.objects.filter(pk=order.pk).update(order_date=order.order_date - timedelta(days=days))
+        SalesOrder.objects.update(updated_at=then - timedelta(hours=1))
+        Product.objects.update(updated_at=then - timedelta(hours=1))
+
+    def suggestions(self):
+        return {s.product_id: s for s in ReorderSuggestion.objects.all()}
+
+    def test_incremental_run_recomputes_products_whose_demand_left_the_window(self):
+        self.assertEqual(compute_reorder_suggestions(), 3)
+        self.assertTrue(all(s.needs_reorder for s in self.suggestions().values()))
+
+        self.rewind(5)
+        self.assertEqual(compute_reorder_suggestions(), 1)
+        after = self.suggestions()
+        self.assertEqual(after[self.products[0].pk].daily_velocity, 0)
+        self.assertFalse(after[self.products[0].pk].needs_reorder)
+        self.assertEqual(after[self.products[1].pk].daily_velocity, Decimal("2.000"))
+
+        # Nothing changed and nothing aged out since
+        self.rewind(0)
+        self.assertEqual(compute_reorder_suggestions(), 0)
+
+    def test_inactive_products_lose_their_suggestions(self):
+        compute_reorder_suggestions()
+        self.rewind(1)
+        Product.objects.filter(pk=self.products[1].pk).update(is_active=False)
+        self.assertEqual(compute_reorder_suggestions(), 0)
+        self.assertEqual(set(self.suggestions()), {self.products[0].pk, self.products[2].pk})
 
-# Create your tests here.
+        Product.objects.filter(pk=self.products[2].pk).update(is_active=False)
+        self.assertEqual(compute_reorder_suggestions(full=True), 1)
+        self.assertEqual(set(self.suggestions()), {self.products[0].pk})
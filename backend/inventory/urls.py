@@ -1,6 +1,16 @@
 from django.urls import path
-from .views import StockMovementListView
+from .views import (
+    StockMovementListView,
+    StockAtDateView,
+    InventoryValuationView,
+    ReorderSuggestionListView,
+    ReorderPurchaseOrderCreateView,
+)
 
 urlpatterns = [
     path("movements/", StockMovementListView.as_view(), name="stock-movements"),
+    path("stock-at/", StockAtDateView.as_view(), name="stock-at-date"),
+    path("valuation/", InventoryValuationView.as_view(), name="inventory-valuation"),
+    path("reorder/", ReorderSuggestionListView.as_view(), name="reorder-suggestions"),
+    path("reorder/purchase-orders/", ReorderPurchaseOrderCreateView.as_view(), name="reorder-purchase-orders"),
 ]
@@ -1,7 +1,24 @@
-from rest_framework import generics
+from datetime import date
+from django.db.models import prefetch_related_objects
+from django.utils import timezone
+from rest_framework import generics, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
-from .models import StockMovement
-from .serializers import StockMovementSerializer
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from catalog.models import Product
+from accounts.permissions import IsVendorUser
+from purchases.serializers import PurchaseOrderSerializer
+from .models import StockMovement, ReorderSuggestion
+from .serializers import StockMovementSerializer, ReorderSuggestionSerializer
+from .services import stock_at, stock_levels_at, inventory_valuation, create_reorder_purchase_orders
+
+
+def _parse_as_of(request):
+    raw = request.query_params.get("date")
+    if not raw:
+        return timezone.localdate()
+    return date.fromisoformat(raw)
 
 
 class StockMovementListView(generics.ListAPIView):
@@ -12,5 +29,100 @@ class StockMovementListView(generics.ListAPIView):
         product_id = self.request.query_params.get("product_id")
         qs = StockMovement.objects.all().order_by("-movement_date")
         if product_id:
-            qs = qs.filter(product_id=product_id)
+            try:
+                qs = qs.filter(product_id=int(product_id))
+            except ValueError:
+                raise ValidationError({"product_id": "product_id must be an integer"})
+        return qs
+
+
+class StockAtDateView(APIView):
+    """
+    Point-in-time stock: ?product_id=<id>&date=YYYY-MM-DD (date defaults to today).
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            as_of = _parse_as_of(request)
+        except ValueError:
+            return Response({"detail": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        product_id = request.query_params.get("product_id")
+        if not product_id:
+            return Response({"detail": "product_id required"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            product_id = int(product_id)
+        except ValueError:
+            return Response({"detail": "product_id must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            data = stock_at(product_id, as_of)
+        except Product.DoesNotExist:
+            return Response({"detail": "Product not found"}, status=status.HTTP_404_NOT_FOUND)
+        data["valuation"] = (data["quantity"] * data["unit_cost"]).quantize(data["unit_cost"])
+        return Response(data)
+
+
+class InventoryValuationView(APIView):
+    """
+    Inventory valuation at purchase price as of ?date=YYYY-MM-DD.
+    Pass ?detail=true to include per-product rows.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            as_of = _parse_as_of(request)
+        except ValueError:
+            return Response({"detail": "date must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        if request.query_params.get("detail") in ("1", "true", "yes"):
+            snapshot_date, rows = stock_levels_at(as_of)
+            return Response(
+                {
+                    "date": as_of,
+                    "snapshot_date": snapshot_date,
+                    "rows": sorted(rows.values(), key=lambda r: r["product_id"]),
+                }
+            )
+        return Response(inventory_valuation(as_of))
+
+
+class ReorderSuggestionListView(generics.ListAPIView):
+    """
+    Products whose projected stock falls below minimum_stock, as of the last
+    compute_reorders run. Filter with ?vendor_id= or ?pending=true (no PO raised yet).
+    """
+
+    serializer_class = ReorderSuggestionSerializer
+    permission_classes = [IsVendorUser]
+
+    def get_queryset(self):
+        qs = (
+            ReorderSuggestion.objects.filter(needs_reorder=True)
+            .select_related("product")
+            .order_by("vendor_id", "product_id")
+        )
+        vendor_id = self.request.query_params.get("vendor_id")
+        if vendor_id:
+            qs = qs.filter(vendor_id=vendor_id)
+        if self.request.query_params.get("pending") in ("1", "true", "yes"):
+            qs = qs.filter(purchase_order__isnull=True)
         return qs
+
+
+class ReorderPurchaseOrderCreateView(APIView):
+    """
+    Raise draft purchase orders (one per vendor) for pending reorder suggestions.
+    """
+
+    permission_classes = [IsVendorUser]
+
+    def post(self, request, *args, **kwargs):
+        vendor_ids = request.data.get("vendor_ids") or None
+        orders = create_reorder_purchase_orders(vendor_ids=vendor_ids, user=request.user)
+        prefetch_related_objects(orders, "lines")
+        return Response(
+            {"count": len(orders), "purchase_orders": PurchaseOrderSerializer(orders, many=True).data},
+            status=status.HTTP_201_CREATED if orders else status.HTTP_200_OK,
+        )
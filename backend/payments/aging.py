@@ -0,0 +1,166 @@
+"""
+Receivable and payable aging.
+
+Open customer invoices (receivable) or vendor bills (payable) are bucketed
+per contact by days past due: current, 1-30, 31-60, 61-90 and over 90.
+The buckets are conditional sums (SUM ... FILTER on PostgreSQL) computed
+in the database over total_amount - paid_amount, so no document is loaded
+into Python; the (contact, status, due_date, total, paid) indexes cover
+the scan and return it already grouped by contact. Grand totals and the
+ranking are added up from the per-contact rows, so the documents are read
+once.
+
+For a past ``as_of`` date the report is rebuilt from today's balances:
+documents issued after it are left out, and payment allocations dated
+after it (with any early-payment discount they took) are added back to
+the documents they settled.
+"""
+
+import heapq
+from dataclasses import dataclass
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, DecimalField, F, Q, Sum
+from django.utils import timezone
+
+from accounts.models import Contact
+from purchases.models import VendorBill
+from purchases.services import OPEN_BILL_STATUSES
+from sales.models import CustomerInvoice
+from sales.services import OPEN_INVOICE_STATUSES
+from .models import PaymentAllocation
+
+# (key, first day past due, last day past due); None is open-ended
+AGING_BUCKETS = (
+    ("current", None, 0),
+    ("1_30", 1, 30),
+    ("31_60", 31, 60),
+    ("61_90", 61, 90),
+    ("over_90", 91, None),
+)
+ZERO = Decimal("0.00")
+_MONEY = DecimalField(max_digits=15, decimal_places=2)
+
+
+@dataclass(frozen=True)
+class Ledger:
+    model: type
+    status: str
+    open_statuses: tuple
+    contact: str
+    allocation: str
+
+
+LEDGERS = {
+    "receivable": Ledger(CustomerInvoice, "invoice_status", OPEN_INVOICE_STATUSES, "customer_id", "customer_invoice"),
+    "payable": Ledger(VendorBill, "bill_status", OPEN_BILL_STATUSES, "vendor_id", "vendor_bill"),
+}
+
+
+def _bucket_sums(as_of, amount, due_date="due_date", prefix=""):
+    """One conditional Sum per bucket of ``amount`` by how far ``due_date`` lies before ``as_of``."""
+    sums = {}
+    for key, first, last in AGING_BUCKETS:
+        when = {}
+        if first is not None:
+            when[f"{prefix}{due_date}__lte"] = as_of - timedelta(days=first)
+        if last is not None:
+            when[f"{prefix}{due_date}__gte"] = as_of - timedelta(days=last)
+        sums[key] = Sum(amount, filter=Q(**when), output_field=_MONEY)
+    return sums
+
+
+def _money(value):
+    # SQLite sums decimals as floats
+    return Decimal(value or 0).quantize(ZERO)
+
+
+def _empty_row():
+    return {**{key: ZERO for key, _, _ in AGING_BUCKETS}, "total": ZERO, "documents": 0}
+
+
+def aging_report(ledger="receivable", as_of=None, contact_ids=None, limit=100):
+    """
+    Aging of ``ledger`` ("receivable" or "payable") on ``as_of`` (default
+    today): grand totals plus the ``limit`` contacts owing the most, each
+    with its buckets, total and open document count. ``contact_ids``
+    restricts the report to those contacts. Raises ValueError for an
+    unknown ledger.
+    """
+    if ledger not in LEDGERS:
+        raise ValueError(f"ledger must be one of: {', '.join(LEDGERS)}")
+    spec = LEDGERS[ledger]
+    today = timezone.localdate()
+    historical = as_of is not None
+    as_of = as_of or today
+
+    documents = spec.model.objects.filter(
+        **{f"{spec.status}__in": spec.open_statuses}, total_amount__gt=F("paid_amount")
+    )
+    if historical:
+        documents = documents.filter(invoice_date__lte=as_of)
+    if contact_ids is not None:
+        documents = documents.filter(**{f"{spec.contact}__in": list(contact_ids)})
+    balance = F("total_amount") - F("paid_amount")
+    # One pass over the (contact, status, ...) covering index, in contact
+    # order; grand totals and the ranking are summed up from these rows
+    grouped = (
+        documents.order_by()
+        .values(spec.contact)
+        .annotate(**_bucket_sums(as_of, balance), total=Sum(balance, output_field=_MONEY), documents=Count("pk"))
+    )
+    by_contact = {row.pop(spec.contact): row for row in grouped}
+
+    if historical:
+        # Allocations dated after as_of had not been paid yet on that day; "paid" documents were open then
+        later = PaymentAllocation.objects.filter(
+            allocation_date__gt=as_of,
+            **{
+                f"{spec.allocation}__invoice_date__lte": as_of,
+                f"{spec.allocation}__{spec.status}__in": spec.open_statuses + ("paid",),
+            },
+        )
+        if contact_ids is not None:
+            later = later.filter(**{f"{spec.allocation}__{spec.contact}__in": list(contact_ids)})
+        settled_now = ~Q(**{f"{spec.allocation}__{spec.status}__in": spec.open_statuses}) | Q(
+            **{f"{spec.allocation}__total_amount__lte": F(f"{spec.allocation}__paid_amount")}
+        )
+        for row in (
+            later.order_by()
+            .values(f"{spec.allocation}__{spec.contact}")
+            .annotate(
+                **_bucket_sums(as_of, F("allocated_amount") + F("discount_amount_applied"), prefix=f"{spec.allocation}__"),
+                documents=Count(spec.allocation, distinct=True, filter=settled_now),
+            )
+        ):
+            contact_id = row.pop(f"{spec.allocation}__{spec.contact}")
+            current = by_contact.setdefault(contact_id, _empty_row())
+            for key, value in row.items():
+                current[key] = (current[key] or 0) + (value or 0)
+        for row in by_contact.values():
+            row["total"] = sum((row[key] or ZERO for key, _, _ in AGING_BUCKETS), ZERO)
+
+    totals = _empty_row()
+    for row in by_contact.values():
+        for key in totals:
+            totals[key] += row[key] or 0
+    by_contact = dict(heapq.nsmallest(limit, by_contact.items(), key=lambda item: (-item[1]["total"], item[0])))
+
+    names = dict(Contact.objects.filter(pk__in=list(by_contact)).values_list("contact_id", "contact_name"))
+    return {
+        "ledger": ledger,
+        "as_of": as_of,
+        "buckets": [key for key, _, _ in AGING_BUCKETS],
+        "totals": {key: value if key == "documents" else _money(value) for key, value in totals.items()},
+        "contacts": [
+            {
+                "contact_id": contact_id,
+                "contact_name": names.get(contact_id),
+                **{key: _money(row[key]) for key, _, _ in AGING_BUCKETS},
+                "total": _money(row["total"]),
+                "documents": row["documents"],
+            }
+            for contact_id, row in by_contact.items()
+        ],
+    }
@@ -0,0 +1,37 @@
+import json
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from payments.services import parse_statement_csv, reconcile_statement
+
+
+class Command(BaseCommand):
+    help = "Match a bank-statement CSV (date, amount, reference, customer_id) to open invoices and post payments"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSON statement file")
+        parser.add_argument("--chunk-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true")
+        parser.add_argument("--report", help="Write the per-line results as JSON to this path")
+
+    def handle(self, *args, **options):
+        path = Path(options["path"]).resolve()
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        text = path.read_text(encoding="utf-8-sig")
+        lines = parse_statement_csv(text) if path.suffix.lower() == ".csv" else json.loads(text)
+
+        started = time.perf_counter()
+        report = reconcile_statement(lines, chunk_size=options["chunk_size"], dry_run=options["dry_run"])
+        elapsed = time.perf_counter() - started
+
+        if options["report"]:
+            Path(options["report"]).write_text(json.dumps(report, default=str, indent=2))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{report['lines']} lines: {report['matched']} matched, {report['partial']} partial, "
+                f"{report['unmatched']} unmatched, {report['invalid']} invalid; "
+                f"applied {report['applied_amount']} in {elapsed:.2f}s"
+                + (" (dry run)" if report["dry_run"] else "")
+            )
+        )
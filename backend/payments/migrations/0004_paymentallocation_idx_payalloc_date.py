@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payments", "0003_remove_paymentallocation_created_at_and_more"),
+        ("purchases", "0003_remove_purchaseorderline_created_at_and_more"),
+        ("sales", "0006_customersummary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="paymentallocation",
+            index=models.Index(fields=["allocation_date"], name="idx_payalloc_date"),
+        ),
+    ]
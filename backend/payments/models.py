@@ -69,6 +69,7 @@ class PaymentAllocation(models.Model):
             models.Index(fields=["payment"], name="idx_payalloc_payment"),
             models.Index(fields=["customer_invoice"], name="idx_payalloc_invoice"),
             models.Index(fields=["vendor_bill"], name="idx_payalloc_bill"),
+            models.Index(fields=["allocation_date"], name="idx_payalloc_date"),
         ]
 
     def __str__(self) -> str:
@@ -0,0 +1,437 @@
+import csv
+import io
+import re
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal, InvalidOperation
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from accounts.models import Contact
+from sales.models import CustomerInvoice
+from sales.services import (
+    OPEN_INVOICE_STATUSES,
+    add_open_balance_delta,
+    apply_customer_summary_deltas,
+    invoice_open_balance,
+)
+from system.services import reserve_document_numbers
+from .models import Payment, PaymentAllocation
+
+ZERO = Decimal("0.00")
+_TOKEN_RE = re.compile(r"[A-Za-z0-9@._+-]+")
+
+
+class _OpenInvoice:
+    __slots__ = ("pk", "customer_id", "invoice_number", "outstanding", "applied", "discount", "deadline", "discounted")
+
+    def __init__(self, pk, customer_id, invoice_number, outstanding, discount=ZERO, deadline=None):
+        self.pk = pk
+        self.customer_id = customer_id
+        self.invoice_number = invoice_number
+        self.outstanding = outstanding
+        self.applied = ZERO
+        # Early-payment discount still on offer, and what was taken of it
+        self.discount = discount
+        self.deadline = deadline
+        self.discounted = ZERO
+
+    def discount_on(self, day):
+        return self.discount if self.deadline and day <= self.deadline else ZERO
+
+
+def _invoice_status(total, paid):
+    return "paid" if (total or ZERO) - paid <= 0 else "partially_paid"
+
+
+def early_discount_taken(available, outstanding, amount):
+    """
+    Discount written off when ``amount`` is paid against ``outstanding``
+    with an early-payment discount of ``available`` on offer: whatever the
+    payment leaves unpaid, as long as that is within the discount.
+    """
+    short = outstanding - amount
+    return short if 0 < short <= available else ZERO
+
+
+def _close_early_discounts(invoice_ids, chunk_size=1000):
+    """A discount is taken once; the invoices it settled no longer offer one."""
+    for start in range(0, len(invoice_ids), chunk_size):
+        CustomerInvoice.objects.filter(pk__in=invoice_ids[start : start + chunk_size]).update(
+            early_payment_discount_applicable=False
+        )
+
+
+def _settle_invoices(updates, chunk_size=1000):
+    """
+    Apply payments to invoices with set-based UPDATEs.
+
+    ``updates`` maps invoice id to ``(amount, new_status)``. Invoices are
+    grouped by that pair so each distinct pair costs one UPDATE per chunk,
+    and paid_amount is incremented in the database rather than overwritten.
+    """
+    groups = defaultdict(list)
+    for invoice_id, key in updates.items():
+        groups[key].append(invoice_id)
+    now = timezone.now()
+    for (amount, new_status), ids in groups.items():
+        for start in range(0, len(ids), chunk_size):
+            # avoid touching generated columns like remaining_amount
+            CustomerInvoice.objects.filter(pk__in=ids[start : start + chunk_size]).update(
+                paid_amount=F("paid_amount") + amount, invoice_status=new_status, updated_at=now
+            )
+
+
+@transaction.atomic
+def record_customer_payment(
+    invoice_amounts,
+    payment_method="upi",
+    payment_date=None,
+    user=None,
+    reference_number=None,
+    transaction_id=None,
+):
+    """
+    Record one customer payment split across several invoices.
+
+    ``invoice_amounts`` maps invoice id to the amount applied to it. All
+    invoices must belong to the same customer. Invoices are locked, the
+    allocations are bulk-inserted and the invoices updated in one statement.
+    An amount that pays an invoice off except for its early-payment
+    discount, on or before the deadline, settles it with the discount.
+    Raises CustomerInvoice.DoesNotExist, or ValueError on bad input such as
+    an amount that is not positive or exceeds the invoice's open balance.
+    """
+    invoices = list(
+        CustomerInvoice.objects.select_for_update().filter(pk__in=invoice_amounts.keys()).order_by("pk")
+    )
+    if len(invoices) != len(invoice_amounts):
+        raise CustomerInvoice.DoesNotExist("Invoice not found")
+    if len({inv.customer_id for inv in invoices}) != 1:
+        raise ValueError("All invoices must belong to the same customer")
+    for inv in invoices:
+        amount = invoice_amounts[inv.pk]
+        if amount <= 0:
+            raise ValueError("Payment amounts must be positive")
+        if amount > inv.total_amount - (inv.paid_amount or ZERO):
+            raise ValueError(f"Amount exceeds the outstanding balance of invoice {inv.invoice_number}")
+
+    total = sum(invoice_amounts.values(), ZERO)
+    payment_date = payment_date or timezone.localdate()
+    discounts = {
+        inv.pk: early_discount_taken(
+            inv.early_payment_discount_amount
+            if inv.early_payment_discount_applicable and inv.early_payment_deadline and payment_date <= inv.early_payment_deadline
+            else ZERO,
+            inv.total_amount - (inv.paid_amount or ZERO),
+            invoice_amounts[inv.pk],
+        )
+        for inv in invoices
+    }
+    # What each invoice is settled by: the money plus any discount taken
+    settled = {inv.pk: invoice_amounts[inv.pk] + discounts[inv.pk] for inv in invoices}
+    payment = Payment.objects.create(
+        payment_number=reserve_document_numbers("payment", 1)[0],
+        payment_type="customer_payment",
+        contact_id=invoices[0].customer_id,
+        payment_date=payment_date,
+        payment_method=payment_method,
+        payment_amount=total,
+        payment_status="completed",
+        reference_number=reference_number,
+        transaction_id=transaction_id,
+        created_by=getattr(user, "user_id", None) if user else None,
+    )
+    PaymentAllocation.objects.bulk_create(
+        [
+            PaymentAllocation(
+                payment=payment,
+                customer_invoice=inv,
+                allocated_amount=invoice_amounts[inv.pk],
+                allocation_date=payment.payment_date,
+                early_payment_discount_applied=discounts[inv.pk] > 0,
+                discount_amount_applied=discounts[inv.pk],
+            )
+            for inv in invoices
+        ]
+    )
+    _settle_invoices(
+        {
+            inv.pk: (
+                settled[inv.pk],
+                _invoice_status(inv.total_amount, (inv.paid_amount or ZERO) + settled[inv.pk]),
+            )
+            for inv in invoices
+        }
+    )
+    _close_early_discounts([pk for pk, discount in discounts.items() if discount > 0])
+    deltas = {}
+    for inv in invoices:
+        paid = inv.paid_amount or ZERO
+        new_status = _invoice_status(inv.total_amount, paid + settled[inv.pk])
+        add_open_balance_delta(
+            deltas,
+            inv.customer_id,
+            invoice_open_balance(inv.invoice_status, inv.total_amount, paid),
+            invoice_open_balance(new_status, inv.total_amount, paid + settled[inv.pk]),
+        )
+    apply_customer_summary_deltas(deltas)
+    return payment
+
+
+def parse_statement_csv(text):
+    """
+    Parse a bank-statement CSV into line dicts. Recognised columns: date,
+    amount, reference, customer_id, payment_method, transaction_id.
+    """
+    lines = []
+    for row_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        row = {k.strip().lower(): (v or "").strip() for k, v in row.items() if k}
+        row["line"] = row_number
+        lines.append(row)
+    return lines
+
+
+def _to_decimal(value):
+    try:
+        return Decimal(str(value)).quantize(Decimal("0.01"))
+    except (InvalidOperation, TypeError, ValueError):
+        return None
+
+
+def _normalize_line(index, raw):
+    if not isinstance(raw, dict):
+        return None, "line must be an object"
+    amount = _to_decimal(raw.get("amount"))
+    if amount is None or amount <= 0:
+        return None, "amount must be a positive number"
+    line_date = raw.get("date") or None
+    if isinstance(line_date, str):
+        try:
+            line_date = date.fromisoformat(line_date)
+        except ValueError:
+            return None, "date must be YYYY-MM-DD"
+    customer_id = raw.get("customer_id") or None
+    try:
+        customer_id = int(customer_id) if customer_id else None
+    except (TypeError, ValueError):
+        return None, "customer_id must be an integer"
+    reference = str(raw.get("reference") or "")
+    return {
+        "line": raw.get("line", index),
+        "amount": amount,
+        "date": line_date,
+        "customer_id": customer_id,
+        "reference": reference,
+        "tokens": _TOKEN_RE.findall(reference),
+        "payment_method": raw.get("payment_method") or "bank_transfer",
+        "transaction_id": raw.get("transaction_id") or None,
+    }, None
+
+
+def _match_chunk(lines, user, dry_run):
+    """Match and post one chunk of statement lines inside a single transaction."""
+    tokens = {t for line in lines for t in line["tokens"]}
+    by_number = {
+        inv.invoice_number: inv
+        for inv in CustomerInvoice.objects.filter(invoice_number__in=tokens).only("invoice_number", "customer_id")
+    }
+    by_email = dict(
+        Contact.objects.filter(email__in=[t for t in tokens if "@" in t]).values_list("email", "contact_id")
+    )
+
+    for line in lines:
+        refs = [by_number[t] for t in line["tokens"] if t in by_number]
+        line["invoice_refs"] = [inv.pk for inv in refs]
+        customer_id = line["customer_id"]
+        if customer_id is None and refs:
+            customer_id = refs[0].customer_id
+        if customer_id is None:
+            customer_id = next((by_email[t] for t in line["tokens"] if t in by_email), None)
+        line["resolved_customer"] = customer_id
+
+    customers = {line["resolved_customer"] for line in lines if line["resolved_customer"]}
+    open_invoices = defaultdict(list)
+    rows = (
+        CustomerInvoice.objects.select_for_update()
+        .filter(
+            customer_id__in=customers,
+            invoice_status__in=OPEN_INVOICE_STATUSES,
+            total_amount__gt=F("paid_amount"),
+        )
+        .order_by("due_date", "pk")
+        .values_list(
+            "pk", "customer_id", "invoice_number", "total_amount", "paid_amount",
+            "early_payment_discount_applicable", "early_payment_discount_amount", "early_payment_deadline",
+        )
+    )
+    for pk, customer_id, number, total, paid, discountable, discount, deadline in rows:
+        open_invoices[customer_id].append(
+            _OpenInvoice(pk, customer_id, number, total - paid, discount if discountable else ZERO, deadline)
+        )
+
+    today = timezone.localdate()
+
+    results = []
+    touched = {}
+    postings = []
+    for line in lines:
+        customer_id = line["resolved_customer"]
+        candidates = [inv for inv in open_invoices.get(customer_id, []) if inv.outstanding > 0]
+        if not customer_id or not candidates:
+            results.append(
+                {
+                    "line": line["line"],
+                    "status": "unmatched",
+                    "amount": line["amount"],
+                    "reference": line["reference"],
+                    "detail": "No customer found" if not customer_id else "No open invoices",
+                }
+            )
+            continue
+
+        # Referenced invoices first, then an exact-amount match (with or without
+        # its early-payment discount), then oldest due date.
+        day = line["date"] or today
+        refs = set(line["invoice_refs"])
+        referenced = [inv for inv in candidates if inv.pk in refs]
+        exact = next(
+            (
+                inv
+                for inv in candidates
+                if line["amount"] in (inv.outstanding, inv.outstanding - inv.discount_on(day)) and inv.pk not in refs
+            ),
+            None,
+        )
+        first = referenced + ([exact] if exact else [])
+        first_ids = {inv.pk for inv in first}
+        ordered = first + [inv for inv in candidates if inv.pk not in first_ids]
+
+        remaining = line["amount"]
+        splits = []
+        for inv in ordered:
+            if remaining <= 0:
+                break
+            discount = early_discount_taken(inv.discount_on(day), inv.outstanding, remaining)
+            applied = min(remaining, inv.outstanding - discount)
+            inv.outstanding -= applied + discount
+            inv.applied += applied
+            if discount:
+                inv.discounted += discount
+                inv.discount = ZERO
+            touched[inv.pk] = inv
+            remaining -= applied
+            splits.append((inv, applied, discount))
+        postings.append((line, customer_id, splits))
+        results.append(
+            {
+                "line": line["line"],
+                "status": "matched" if remaining == 0 else "partial",
+                "amount": line["amount"],
+                "reference": line["reference"],
+                "customer_id": customer_id,
+                "allocations": [
+                    {"invoice_number": inv.invoice_number, "amount": amt, "discount": discount}
+                    for inv, amt, discount in splits
+                ],
+                "unapplied": remaining,
+            }
+        )
+
+    if dry_run or not postings:
+        return results
+
+    numbers = reserve_document_numbers("payment", len(postings))
+    created_by = getattr(user, "user_id", None) if user else None
+    payments = []
+    for (line, customer_id, _), number in zip(postings, numbers):
+        payments.append(
+            Payment(
+                payment_number=number,
+                payment_type="customer_payment",
+                contact_id=customer_id,
+                payment_date=line["date"] or today,
+                payment_method=line["payment_method"],
+                payment_amount=line["amount"],
+                payment_status="completed",
+                reference_number=line["reference"][:100] or None,
+                transaction_id=line["transaction_id"],
+                notes="Bank statement reconciliation",
+                created_by=created_by,
+            )
+        )
+    Payment.objects.bulk_create(payments, batch_size=1000)
+    # Not every backend returns primary keys from bulk_create; map them back by number.
+    payment_ids = dict(Payment.objects.filter(payment_number__in=numbers).values_list("payment_number", "payment_id"))
+    allocations = [
+        PaymentAllocation(
+            payment_id=payment_ids[number],
+            customer_invoice_id=inv.pk,
+            allocated_amount=amount,
+            allocation_date=line["date"] or today,
+            early_payment_discount_applied=discount > 0,
+            discount_amount_applied=discount,
+        )
+        for (line, _, splits), number in zip(postings, numbers)
+        for inv, amount, discount in splits
+    ]
+    PaymentAllocation.objects.bulk_create(allocations, batch_size=1000)
+    _settle_invoices(
+        {
+            pk: (inv.applied + inv.discounted, "paid" if inv.outstanding <= 0 else "partially_paid")
+            for pk, inv in touched.items()
+        }
+    )
+    _close_early_discounts([pk for pk, inv in touched.items() if inv.discounted])
+    deltas = {}
+    for inv in touched.values():
+        add_open_balance_delta(
+            deltas, inv.customer_id, inv.outstanding + inv.applied + inv.discounted, max(inv.outstanding, ZERO)
+        )
+    apply_customer_summary_deltas(deltas)
+    for result, number in zip([r for r in results if r["status"] != "unmatched"], numbers):
+        result["payment_number"] = number
+    return results
+
+
+def reconcile_statement(raw_lines, chunk_size=5000, dry_run=False, user=None):
+    """
+    Match bank-statement lines to open customer invoices and post payments.
+
+    A line is tied to a customer by an explicit customer_id, an invoice
+    number or a contact email in its reference. Its amount is applied to the
+    referenced invoices first, then an invoice with exactly that balance,
+    then the customer's open invoices by oldest due date, so one line may
+    settle several invoices. Lines are posted ``chunk_size`` at a time, each
+    chunk in one transaction with bulk inserts and bulk updates.
+    """
+    results = []
+    lines = []
+    for index, raw in enumerate(raw_lines, start=1):
+        line, error = _normalize_line(index, raw)
+        if error:
+            line_number = raw.get("line", index) if isinstance(raw, dict) else index
+            results.append({"line": line_number, "status": "invalid", "detail": error})
+        else:
+            lines.append(line)
+
+    for start in range(0, len(lines), chunk_size):
+        with transaction.atomic():
+            results.extend(_match_chunk(lines[start : start + chunk_size], user, dry_run))
+
+    summary = defaultdict(int)
+    applied = ZERO
+    for r in results:
+        summary[r["status"]] += 1
+        if r["status"] in ("matched", "partial"):
+            applied += r["amount"] - r["unapplied"]
+    return {
+        "lines": len(results),
+        "matched": summary["matched"],
+        "partial": summary["partial"],
+        "unmatched": summary["unmatched"],
+        "invalid": summary["invalid"],
+        "applied_amount": applied,
+        "dry_run": dry_run,
+        "results": results,
+    }
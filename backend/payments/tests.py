@@ -1,3 +1,306 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from io import StringIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Contact, User
+from catalog.models import Product
+from pricing.models import PaymentTerm
+from sales.models import CustomerInvoice
+from sales.services import create_checkout, refresh_early_payment_discounts
+from .aging import AGING_BUCKETS, aging_report
+from .models import Payment, PaymentAllocation
+from .services import parse_statement_csv, reconcile_statement, record_customer_payment
+
+
+def brute_force_aging(as_of):
+    """Receivable buckets from every invoice and its allocations, the slow way."""
+    totals = {key: Decimal("0.00") for key, _, _ in AGING_BUCKETS}
+    for invoice in CustomerInvoice.objects.prefetch_related("allocations"):
+        if invoice.invoice_status not in ("confirmed", "partially_paid", "paid") or invoice.invoice_date > as_of:
+            continue
+        paid = sum(
+            (a.allocated_amount + a.discount_amount_applied for a in invoice.allocations.all() if a.allocation_date <= as_of),
+            Decimal("0"),
+        )
+        balance = invoice.total_amount - paid
+        if balance <= 0:
+            continue
+        late = (as_of - invoice.due_date).days
+        key = next(
+            key for key, first, last in AGING_BUCKETS if (first is None or late >= first) and (last is None or late <= last)
+        )
+        totals[key] += balance
+    return totals
+
+
+class AgingReportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.customers = [
+            Contact.objects.create(contact_name=f"Aging {n}", contact_type="customer", email=f"aging-{n}@example.com", mobile="1")
+            for n in range(2)
+        ]
+        cls.user = User.objects.create_user(
+            username="aging", email="aging@example.com", password="x", user_role="internal", is_staff=True
+        )
+        term = PaymentTerm.objects.create(term_name="Net 30", net_days=30)
+        product = Product.objects.create(
+            product_name="Aging Tee", product_code="AGE-1", product_category="men", product_type="tshirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("60.00"),
+        )
+        cls.invoices = []
+        for n, days_late in enumerate((-5, 0, 10, 45, 75, 120, 10)):
+            lines = [{"product_id": product.pk, "quantity": Decimal(n + 1), "unit_price": Decimal("100"), "line_number": 1}]
+            invoice = create_checkout({"customer": cls.customers[n % 2], "payment_term": term, "lines": lines})[1]
+            due = cls.today - timedelta(days=days_late)
+            CustomerInvoice.objects.filter(pk=invoice.pk).update(due_date=due, invoice_date=due - timedelta(days=30))
+            cls.invoices.append(invoice)
+        # Paid in full this week, partly last month, and one issued today
+        record_customer_payment({cls.invoices[2].pk: cls.invoices[2].total_amount}, payment_date=cls.today - timedelta(days=3))
+        record_customer_payment({cls.invoices[4].pk: Decimal("50.00")}, payment_date=cls.today - timedelta(days=40))
+        CustomerInvoice.objects.filter(pk=cls.invoices[6].pk).update(invoice_date=cls.today)
+
+    def assertMatches(self, report, as_of):
+        expected = brute_force_aging(as_of)
+        self.assertEqual({key: report["totals"][key] for key in expected}, expected)
+        self.assertEqual(report["totals"]["total"], sum(expected.values()))
+        self.assertEqual(sum(row["total"] for row in report["contacts"]), report["totals"]["total"])
+
+    def test_buckets_match_a_full_recomputation(self):
+        report = aging_report()
+        self.assertMatches(report, self.today)
+        self.assertEqual(report["totals"]["documents"], 6)
+        self.assertEqual(report["totals"]["1_30"], self.invoices[6].total_amount)
+        self.assertEqual([row["total"] for row in report["contacts"]], sorted((row["total"] for row in report["contacts"]), reverse=True))
+
+    def test_as_of_adds_back_later_payments_and_drops_later_invoices(self):
+        for days_ago in (1, 5, 50):
+            as_of = self.today - timedelta(days=days_ago)
+            with self.assertNumQueries(3):
+                report = aging_report(as_of=as_of)
+            self.assertMatches(report, as_of)
+        report = aging_report(as_of=self.today - timedelta(days=5))
+        # invoices[2] was still open, invoices[6] not yet issued
+        self.assertEqual(report["totals"]["documents"], 7 - 1)
+        self.assertEqual(report["totals"]["1_30"], self.invoices[2].total_amount)
+
+    def test_endpoint_filters_and_limits(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/payments/aging/", {"contact_id": self.customers[1].pk, "limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row["contact_id"] for row in response.data["contacts"]], [self.customers[1].pk])
+        self.assertEqual(response.data["contacts"][0]["contact_name"], "Aging 1")
+        self.assertEqual(client.get("/api/payments/aging/", {"ledger": "stock"}).status_code, 400)
+        self.assertEqual(client.get("/api/payments/aging/", {"as_of": "yesterday"}).status_code, 400)
+
+
+class EarlyPaymentDiscountTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.customer = Contact.objects.create(
+            contact_name="Early Payer", contact_type="customer", email="early@example.com", mobile="1"
+        )
+        cls.term = PaymentTerm.objects.create(
+            term_name="2/10 Net 30", net_days=30, early_payment_discount=True, discount_percentage=Decimal("2"),
+            discount_days=10,
+        )
+        cls.product = Product.objects.create(
+            product_name="Early Tee", product_code="EPD-1", product_category="men", product_type="tshirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("60.00"),
+        )
+
+    def checkout(self):
+        lines = [{"product_id": self.product.pk, "quantity": Decimal("5"), "unit_price": Decimal("100"),
+                  "tax_percentage": Decimal("5"), "line_number": 1}]
+        return create_checkout({"customer": self.customer, "payment_term": self.term, "lines": lines})[1]
+
+    def test_checkout_offers_the_discount_and_payment_takes_it(self):
+        invoice = self.checkout()
+        # 2% of the 500.00 base, not of the 525.00 total
+        self.assertEqual(invoice.early_payment_discount_amount, Decimal("10.00"))
+        self.assertEqual(invoice.early_payment_deadline, self.today + timedelta(days=10))
+        self.assertTrue(invoice.early_payment_discount_applicable)
+
+        record_customer_payment({invoice.pk: Decimal("515.00")}, payment_date=self.today)
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.invoice_status, invoice.paid_amount), ("paid", Decimal("525.00")))
+        self.assertFalse(invoice.early_payment_discount_applicable)
+        allocation = PaymentAllocation.objects.get(customer_invoice=invoice)
+        self.assertEqual((allocation.allocated_amount, allocation.discount_amount_applied), (Decimal("515.00"), Decimal("10.00")))
+        self.assertTrue(allocation.early_payment_discount_applied)
+
+    def test_late_or_short_payments_get_no_discount(self):
+        late, short = self.checkout(), self.checkout()
+        record_customer_payment({late.pk: Decimal("515.00")}, payment_date=self.today + timedelta(days=11))
+        record_customer_payment({short.pk: Decimal("500.00")}, payment_date=self.today)
+        for invoice in (late, short):
+            invoice.refresh_from_db()
+            self.assertEqual(invoice.invoice_status, "partially_paid")
+            self.assertEqual(invoice.paid_amount, invoice.allocations.get().allocated_amount)
+        self.assertTrue(short.early_payment_discount_applicable)
+
+    def test_statement_lines_match_the_discounted_amount(self):
+        invoice = self.checkout()
+        report = reconcile_statement([{"amount": "515.00", "reference": "bank credit", "customer_id": self.customer.pk}])
+        self.assertEqual(report["matched"], 1)
+        self.assertEqual(report["results"][0]["allocations"][0]["discount"], Decimal("10.00"))
+        invoice.refresh_from_db()
+        self.assertEqual((invoice.invoice_status, invoice.paid_amount), ("paid", Decimal("525.00")))
+        self.assertEqual(aging_report(contact_ids=[self.customer.pk])["totals"]["total"], 0)
+
+    def test_recompute_and_nightly_expiry(self):
+        current, lapsed = self.checkout(), self.checkout()
+        CustomerInvoice.objects.filter(pk=lapsed.pk).update(invoice_date=self.today - timedelta(days=20))
+        PaymentTerm.objects.filter(pk=self.term.pk).update(early_pay_discount_computation="total_amount")
+        self.assertEqual(refresh_early_payment_discounts(), 2)
+        current.refresh_from_db()
+        lapsed.refresh_from_db()
+        self.assertEqual(current.early_payment_discount_amount, Decimal("10.50"))
+        self.assertFalse(lapsed.early_payment_discount_applicable)
+
+        out = StringIO()
+        call_command("expire_early_payment_discounts", "--date", str(self.today + timedelta(days=11)), stdout=out)
+        self.assertIn("1 early-payment discounts expired", out.getvalue())
+        self.assertFalse(CustomerInvoice.objects.filter(early_payment_discount_applicable=True).exists())
+
+
+class CustomerPaymentTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.user = User.objects.create_user(
+            username="cashier", email="cashier@example.com", password="x", user_role="internal", is_staff=True
+        )
+        term = PaymentTerm.objects.create(term_name="Net 15", net_days=15)
+        product = Product.objects.create(
+            product_name="Ledger Tee", product_code="LED-1", product_category="men", product_type="tshirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("60.00"),
+        )
+        cls.alice = Contact.objects.create(contact_name="Alice", contact_type="customer", email="alice@example.com", mobile="1")
+        cls.bob = Contact.objects.create(contact_name="Bob", contact_type="customer", email="bob@example.com", mobile="1")
+        # Alice owes 100.00, 200.00 and 300.00, oldest due first; Bob owes 50.00
+        cls.invoices = []
+        for customer, qty, days_late in ((cls.alice, 1, 10), (cls.alice, 2, 5), (cls.alice, 3, 0), (cls.bob, Decimal("0.5"), 0)):
+            lines = [{"product_id": product.pk, "quantity": Decimal(qty), "unit_price": Decimal("100"), "line_number": 1}]
+            invoice = create_checkout({"customer": customer, "payment_term": term, "lines": lines})[1]
+            CustomerInvoice.objects.filter(pk=invoice.pk).update(due_date=cls.today - timedelta(days=days_late))
+            cls.invoices.append(invoice)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def paid(self):
+        return [
+            (row.invoice_status, row.paid_amount)
+            for row in CustomerInvoice.objects.filter(pk__in=[i.pk for i in self.invoices]).order_by("pk")
+        ]
+
+    def test_payment_amounts_must_be_positive_and_within_the_balance(self):
+        url = "/api/payments/create/"
+        first, second = self.invoices[:2]
+        for body in (
+            {"invoice_id": first.pk, "amount": "0"},
+            {"invoice_id": first.pk, "amount": "-5"},
+            {"invoice_id": first.pk, "amount": "100.01"},
+            {"allocations": [{"invoice_id": first.pk, "amount": "60"}, {"invoice_id": first.pk, "amount": "60"}]},
+            {"allocations": [{"invoice_id": first.pk, "amount": "50"}, {"invoice_id": second.pk, "amount": "0"}]},
+        ):
+            response = self.client.post(url, body, format="json")
+            self.assertEqual(response.status_code, 400, body)
+        self.assertFalse(Payment.objects.exists())
+
+        self.assertEqual(self.client.post(url, {"invoice_id": first.pk, "amount": "60"}, format="json").status_code, 201)
+        response = self.client.post(url, {"invoice_id": first.pk, "amount": "40.01"}, format="json")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn(first.invoice_number, response.data["detail"])
+        self.assertEqual(self.client.post(url, {"invoice_id": first.pk, "amount": "40"}, format="json").status_code, 201)
+        self.assertEqual(self.paid()[0], ("paid", Decimal("100.00")))
+        with self.assertRaises(ValueError):
+            record_customer_payment({first.pk: Decimal("1")})
+
+    def test_statement_csv_columns_are_normalised(self):
+        lines = parse_statement_csv("Date,Amount, Reference ,Customer_ID\n2026-01-02, 100.00 ,Paid INV-1 ,\n,5,,7\n")
+        self.assertEqual(
+            lines,
+            [
+                {"date": "2026-01-02", "amount": "100.00", "reference": "Paid INV-1", "customer_id": "", "line": 2},
+                {"date": "", "amount": "5", "reference": "", "customer_id": "7", "line": 3},
+            ],
+        )
+
+    def test_lines_match_by_reference_exact_amount_and_email(self):
+        inv0, inv1, inv2, bob = self.invoices
+        raw = [
+            {"amount": "300.00", "reference": f"settles {inv2.invoice_number}"},
+            {"amount": "200.00", "reference": "transfer", "customer_id": self.alice.pk},
+            {"amount": "150.00", "reference": "from alice@example.com"},
+            {"amount": "10.00", "reference": "who is this"},
+            {"amount": "-5", "reference": "reversal"},
+            {"amount": "20", "reference": "bob", "customer_id": self.bob.pk, "date": "2026-13-01"},
+        ]
+        # Two valid lines per chunk: the email line is matched against balances posted by the previous chunk
+        report = reconcile_statement(raw, chunk_size=2, user=self.user)
+        self.assertEqual(
+            [report[key] for key in ("lines", "matched", "partial", "unmatched", "invalid")], [6, 2, 1, 1, 2]
+        )
+        self.assertEqual(report["applied_amount"], Decimal("600.00"))
+        by_line = {r["line"]: r for r in report["results"]}
+        self.assertEqual([a["invoice_number"] for a in by_line[1]["allocations"]], [inv2.invoice_number])
+        self.assertEqual([a["invoice_number"] for a in by_line[2]["allocations"]], [inv1.invoice_number])
+        self.assertEqual((by_line[3]["status"], by_line[3]["unapplied"]), ("partial", Decimal("50.00")))
+        self.assertEqual(by_line[4]["detail"], "No customer found")
+        self.assertEqual(by_line[5]["detail"], "amount must be a positive number")
+        self.assertEqual(by_line[6]["detail"], "date must be YYYY-MM-DD")
+        self.assertEqual(
+            self.paid(),
+            [("paid", Decimal("100.00")), ("paid", Decimal("200.00")), ("paid", Decimal("300.00")), ("confirmed", 0)],
+        )
+        self.assertEqual(Payment.objects.filter(created_by=self.user.pk).count(), 3)
+        self.assertEqual(PaymentAllocation.objects.count(), 3)
+
+        again = reconcile_statement([{"amount": "5", "customer_id": self.alice.pk}])
+        self.assertEqual(again["results"][0]["detail"], "No open invoices")
+
+    def test_one_line_settles_oldest_invoices_first(self):
+        report = reconcile_statement([{"amount": "250.00", "customer_id": self.alice.pk}], dry_run=True)
+        self.assertTrue(report["dry_run"])
+        self.assertEqual(
+            [(a["invoice_number"], a["amount"]) for a in report["results"][0]["allocations"]],
+            [(self.invoices[0].invoice_number, Decimal("100.00")), (self.invoices[1].invoice_number, Decimal("150.00"))],
+        )
+        self.assertFalse(Payment.objects.exists())
+
+        reconcile_statement([{"amount": "250.00", "customer_id": self.alice.pk}])
+        self.assertEqual(self.paid()[:3], [("paid", Decimal("100.00")), ("partially_paid", Decimal("150.00")), ("confirmed", 0)])
+
+    def test_reconcile_endpoint_echoes_only_unsettled_lines(self):
+        url = "/api/payments/reconcile/"
+        text = "date,amount,reference\n,50.00,bob@example.com\n,10.00,unknown\n"
+        upload = SimpleUploadedFile("statement.csv", text.encode("utf-8-sig"), content_type="text/csv")
+        response = self.client.post(f"{url}?dry_run=true", {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([r["line"] for r in response.data["results"]], [3])
+        self.assertFalse(Payment.objects.exists())
+
+        response = self.client.post(f"{url}?full=true", [{"amount": "50.00", "reference": "bob@example.com"}], format="json")
+        self.assertEqual((response.status_code, response.data["matched"]), (201, 1))
+        self.assertEqual(response.data["results"][0]["payment_number"], Payment.objects.get().payment_number)
+        self.assertEqual(self.client.post(url, {"rows": []}, format="json").status_code, 400)
 
-# Create your tests here.
+        response = self.client.post(f"{url}?full=true", ["50.00", None], format="json")
+        self.assertEqual((response.status_code, response.data["matched"]), (201, 0))
+        self.assertEqual(
+            [(r["line"], r["detail"]) for r in response.data["results"]],
+            [(1, "line must be an object"), (2, "line must be an object")],
+        )
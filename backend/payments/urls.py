@@ -1,7 +1,9 @@
 from django.urls import path
-from .views import PaymentListView, PaymentCreateView
+from .views import PaymentListView, PaymentCreateView, StatementReconcileView, AgingReportView
 
 urlpatterns = [
     path("", PaymentListView.as_view(), name="payments"),
     path("create/", PaymentCreateView.as_view(), name="payment-create"),
+    path("reconcile/", StatementReconcileView.as_view(), name="payment-reconcile"),
+    path("aging/", AgingReportView.as_view(), name="payment-aging"),
 ]
@@ -1,75 +1,136 @@
-from django.db import transaction
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+from accounts.permissions import IsVendorUser
 from sales.models import CustomerInvoice
-from .models import Payment, PaymentAllocation
+from .models import Payment
 from .serializers import PaymentSerializer
-from system.services import get_next_document_number
+from .aging import LEDGERS, aging_report
+from .services import record_customer_payment, reconcile_statement, parse_statement_csv
+from datetime import date
 from decimal import Decimal
 
 
+def _flag(request, name):
+    return request.query_params.get(name) in ("1", "true", "yes")
+
+
 class PaymentListView(generics.ListAPIView):
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Payment.objects.filter(contact__users=self.request.user).order_by("-created_at")
+        return (
+            Payment.objects.filter(contact_id=self.request.user.contact_id)
+            .prefetch_related("allocations")
+            .order_by("-created_at")
+        )
 
 
 class PaymentCreateView(generics.GenericAPIView):
+    """
+    Record a customer payment. Either invoice_id + amount, or
+    allocations: [{"invoice_id": .., "amount": ..}, ...] to split one payment
+    across several invoices of the same customer.
+    """
+
     serializer_class = PaymentSerializer
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
-        invoice_id = request.data.get("invoice_id")
-        amount = request.data.get("amount")
         payment_method = request.data.get("payment_method", "upi")
-        if not invoice_id or amount in (None, ""):
-            return Response(
-                {"detail": "invoice_id and amount required"}, status=status.HTTP_400_BAD_REQUEST
-            )
+        allocations = request.data.get("allocations")
+        if allocations is None:
+            invoice_id = request.data.get("invoice_id")
+            amount = request.data.get("amount")
+            if not invoice_id or amount in (None, ""):
+                return Response(
+                    {"detail": "invoice_id and amount required"}, status=status.HTTP_400_BAD_REQUEST
+                )
+            allocations = [{"invoice_id": invoice_id, "amount": amount}]
+        if not isinstance(allocations, list) or not allocations:
+            return Response({"detail": "allocations must be a non-empty list"}, status=status.HTTP_400_BAD_REQUEST)
 
+        invoice_amounts = {}
         try:
-            invoice = CustomerInvoice.objects.select_for_update().get(pk=invoice_id)
+            for item in allocations:
+                invoice_id = int(item["invoice_id"])
+                invoice_amounts[invoice_id] = invoice_amounts.get(invoice_id, Decimal("0")) + Decimal(
+                    str(item["amount"])
+                )
+        except Exception:
+            return Response({"detail": "Invalid amount"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            payment = record_customer_payment(
+                invoice_amounts,
+                payment_method=payment_method,
+                user=request.user,
+                reference_number=request.data.get("reference_number"),
+                transaction_id=request.data.get("transaction_id"),
+            )
         except CustomerInvoice.DoesNotExist:
             return Response({"detail": "Invoice not found"}, status=status.HTTP_404_NOT_FOUND)
+        except ValueError as exc:
+            return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            amount_dec = Decimal(str(amount))
-        except Exception:
-            return Response({"detail": "Invalid amount"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(PaymentSerializer(payment).data, status=status.HTTP_201_CREATED)
 
-        payment_number = get_next_document_number("payment")
-        payment = Payment.objects.create(
-            payment_number=payment_number,
-            payment_type="customer_payment",
-            contact=invoice.customer,
-            payment_date=invoice.invoice_date,
-            payment_method=payment_method,
-            payment_amount=amount_dec,
-            payment_status="completed",
-            created_by=getattr(request.user, "user_id", None),
-        )
-        PaymentAllocation.objects.create(
-            payment=payment,
-            customer_invoice=invoice,
-            allocated_amount=amount_dec,
-            allocation_date=invoice.invoice_date,
-        )
 
-        new_paid = (invoice.paid_amount or Decimal("0")) + amount_dec
-        invoice_status = "paid" if (invoice.total_amount or Decimal("0")) - new_paid <= 0 else "partially_paid"
-        # avoid touching generated columns like remaining_amount
-        from django.db import connection
+class StatementReconcileView(generics.GenericAPIView):
+    """
+    Reconcile a bank statement against open customer invoices.
+    Accepts a CSV upload (multipart "file") or a JSON list of lines with
+    date, amount, reference and optional customer_id. ?dry_run=true previews
+    the matching without posting. Only unmatched/partial/invalid lines are
+    echoed back unless ?full=true.
+    """
 
-        with connection.cursor() as cursor:
-            cursor.execute(
-                "UPDATE customer_invoices SET paid_amount=%s, invoice_status=%s WHERE customer_invoice_id=%s",
-                [new_paid, invoice_status, invoice.pk],
-            )
+    permission_classes = [IsVendorUser]
 
-        invoice.refresh_from_db()
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is not None:
+            lines = parse_statement_csv(upload.read().decode("utf-8-sig"))
+        else:
+            lines = request.data
+            if isinstance(lines, dict):
+                lines = lines.get("lines")
+        if not isinstance(lines, list):
+            return Response({"detail": "Send a list of statement lines or a CSV file"}, status=status.HTTP_400_BAD_REQUEST)
 
-        return Response(PaymentSerializer(payment).data, status=status.HTTP_201_CREATED)
+        report = reconcile_statement(lines, dry_run=_flag(request, "dry_run"), user=request.user)
+        if not _flag(request, "full"):
+            report["results"] = [r for r in report["results"] if r["status"] != "matched"]
+        return Response(report, status=status.HTTP_200_OK if report["dry_run"] else status.HTTP_201_CREATED)
+
+
+class AgingReportView(generics.GenericAPIView):
+    """
+    Receivable (default) or payable aging: ?ledger=receivable|payable,
+    ?as_of=YYYY-MM-DD for a past date, ?contact_id= for one contact and
+    ?limit= for the number of contacts listed (largest balances first).
+    Vendor users only see their own contact.
+    """
+
+    permission_classes = [IsVendorUser]
+
+    def get(self, request, *args, **kwargs):
+        ledger = request.query_params.get("ledger") or "receivable"
+        if ledger not in LEDGERS:
+            return Response({"detail": f"ledger must be one of: {', '.join(LEDGERS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            as_of = request.query_params.get("as_of")
+            as_of = date.fromisoformat(as_of) if as_of else None
+            contact_id = request.query_params.get("contact_id")
+            contact_ids = [int(contact_id)] if contact_id else None
+            limit = min(max(int(request.query_params.get("limit") or 100), 1), 1000)
+        except ValueError:
+            return Response({"detail": "Invalid as_of, contact_id or limit"}, status=status.HTTP_400_BAD_REQUEST)
+
+        user = request.user
+        if not (user.is_staff or user.is_superuser or user.user_role == "internal"):
+            if contact_ids and contact_ids != [user.contact_id]:
+                return Response({"detail": "Not allowed"}, status=status.HTTP_403_FORBIDDEN)
+            contact_ids = [user.contact_id]
+        return Response(aging_report(ledger, as_of=as_of, contact_ids=contact_ids, limit=limit))
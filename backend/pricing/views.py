@@ -15,6 +15,13 @@ from .serializers import (
     DiscountOfferCreateSerializer,
 )
 
+COUPON_BATCH_SIZE = 500
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
 
 class PaymentTermListView(generics.ListAPIView):
     queryset = PaymentTerm.objects.filter(is_active=True)
@@ -140,24 +147,40 @@ class CouponGenerateView(generics.GenericAPIView):
                 token = uuid4().hex[:4] + "-" + uuid4().hex[:4]
                 return token.upper()
 
-            created = []
             with transaction.atomic():
-                for i in range(quantity):
-                    contact = contacts[i] if contacts else None
-                    code = generate_code()
-                    while CouponCode.objects.filter(coupon_code=code).exists():
-                        code = generate_code()
-                    coupon = CouponCode.objects.create(
-                        discount_offer=offer,
-                        coupon_code=code,
-                        expiration_date=expiration_date,
-                        coupon_status="unused",
-                        contact=contact,
-                        usage_count=0,
-                        max_usage_count=max_usage,
-                        is_active=True,
+                # Draw every code up front; one query per chunk finds the (rare) collisions to redraw
+                codes = set()
+                while len(codes) < quantity:
+                    candidates = {generate_code() for _ in range(quantity - len(codes))} - codes
+                    for chunk in _chunks(list(candidates), COUPON_BATCH_SIZE):
+                        candidates -= set(
+                            CouponCode.objects.filter(coupon_code__in=chunk).values_list("coupon_code", flat=True)
+                        )
+                    codes |= candidates
+                codes = list(codes)
+                CouponCode.objects.bulk_create(
+                    [
+                        CouponCode(
+                            discount_offer=offer,
+                            coupon_code=code,
+                            expiration_date=expiration_date,
+                            coupon_status="unused",
+                            contact=contacts[i] if contacts else None,
+                            usage_count=0,
+                            max_usage_count=max_usage,
+                            is_active=True,
+                        )
+                        for i, code in enumerate(codes)
+                    ],
+                    batch_size=COUPON_BATCH_SIZE,
+                )
+                # Not every backend returns primary keys from bulk_create; read the rows back by code
+                created = []
+                for chunk in _chunks(codes, COUPON_BATCH_SIZE):
+                    created.extend(
+                        CouponCode.objects.filter(coupon_code__in=chunk).select_related("discount_offer", "contact")
                     )
-                    created.append(coupon)
+                created.sort(key=lambda coupon: coupon.coupon_id)
 
             return Response(
                 {
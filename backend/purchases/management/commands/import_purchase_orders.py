@@ -0,0 +1,38 @@
+import json
+import time
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from purchases.services import import_purchase_orders, parse_purchase_order_csv
+
+
+class Command(BaseCommand):
+    help = "Bulk-import purchase orders from a CSV or JSON file, reporting per-record errors"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV (one line per row, grouped by po_ref) or JSON array of orders")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        path = Path(options["path"]).resolve()
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        text = path.read_text(encoding="utf-8-sig")
+        if path.suffix.lower() == ".csv":
+            records = parse_purchase_order_csv(text)
+        else:
+            records = json.loads(text)
+            if isinstance(records, dict):
+                records = records.get("purchase_orders") or []
+
+        started = time.perf_counter()
+        report = import_purchase_orders(records, batch_size=options["batch_size"])
+        elapsed = time.perf_counter() - started
+
+        for result in report["results"]:
+            if "errors" in result:
+                self.stdout.write(self.style.ERROR(f"{result['ref']}: {json.dumps(result['errors'], default=str)}"))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created {report['created']} purchase orders, {report['failed']} failed in {elapsed:.2f}s"
+            )
+        )
@@ -0,0 +1,38 @@
+import time
+from datetime import date
+from django.core.management.base import BaseCommand, CommandError
+from purchases.services import create_vendor_bills, run_vendor_payments, unbilled_purchase_orders
+
+
+class Command(BaseCommand):
+    help = "Pay all due vendor bills in one run (one payment per vendor); optionally bill unbilled POs first"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--vendor", type=int, action="append", dest="vendor_ids", help="Limit to vendor id(s)")
+        parser.add_argument("--due-on-or-before", help="YYYY-MM-DD (default: today)")
+        parser.add_argument("--payment-method", default="bank_transfer")
+        parser.add_argument("--bill-unbilled", action="store_true", help="Create draft bills for unbilled POs first (paid once confirmed)")
+
+    def handle(self, *args, **options):
+        try:
+            due = date.fromisoformat(options["due_on_or_before"]) if options["due_on_or_before"] else None
+        except ValueError:
+            raise CommandError("--due-on-or-before must be YYYY-MM-DD")
+
+        if options["bill_unbilled"]:
+            started = time.perf_counter()
+            bills = create_vendor_bills(unbilled_purchase_orders(vendor_ids=options["vendor_ids"]))
+            self.stdout.write(f"Created {len(bills)} vendor bills in {time.perf_counter() - started:.2f}s")
+
+        started = time.perf_counter()
+        result = run_vendor_payments(
+            vendor_ids=options["vendor_ids"],
+            due_on_or_before=due,
+            payment_method=options["payment_method"],
+        )
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Paid {result['bill_count']} bills with {len(result['payments'])} payments "
+                f"totalling {result['total_paid']} in {time.perf_counter() - started:.2f}s"
+            )
+        )
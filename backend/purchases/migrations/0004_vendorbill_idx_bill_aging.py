@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("purchases", "0003_remove_purchaseorderline_created_at_and_more"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vendorbill",
+            index=models.Index(
+                fields=[
+                    "bill_status",
+                    "due_date",
+                    "vendor",
+                    "total_amount",
+                    "paid_amount",
+                ],
+                name="idx_bill_aging",
+            ),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("purchases", "0004_vendorbill_idx_bill_aging"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="vendorbill",
+            name="idx_bill_aging",
+        ),
+        migrations.AddIndex(
+            model_name="vendorbill",
+            index=models.Index(
+                fields=[
+                    "vendor",
+                    "bill_status",
+                    "due_date",
+                    "total_amount",
+                    "paid_amount",
+                ],
+                name="idx_bill_aging",
+            ),
+        ),
+    ]
@@ -108,6 +108,8 @@ class VendorBill(TimeStampedModel):
             models.Index(fields=["purchase_order"], name="idx_bill_po"),
             models.Index(fields=["bill_status"], name="idx_bill_status"),
             models.Index(fields=["invoice_date", "due_date"], name="idx_bill_dates"),
+            # Covers the aging report (payments.aging)
+            models.Index(fields=["vendor", "bill_status", "due_date", "total_amount", "paid_amount"], name="idx_bill_aging"),
         ]
 
     def __str__(self) -> str:
@@ -0,0 +1,396 @@
+import csv
+import io
+from datetime import date
+from decimal import Decimal
+from datetime import timedelta
+from django.db import connection, transaction, IntegrityError
+from django.db.models import F
+from django.utils import timezone
+from accounts.models import Contact
+from catalog.models import Product
+from payments.models import Payment, PaymentAllocation
+from system.services import reserve_document_numbers
+from .models import PurchaseOrder, PurchaseOrderLine, VendorBill
+from .serializers import PurchaseOrderCreateLine
+
+CSV_ORDER_FIELDS = ("vendor_id", "order_date", "expected_delivery_date", "notes")
+OPEN_BILL_STATUSES = ("confirmed", "partially_paid")
+
+
+def _line_amounts(line):
+    qty = Decimal(line["quantity"])
+    price = Decimal(line["unit_price"])
+    tax_pct = Decimal(line.get("tax_percentage") or 0)
+    line_sub = qty * price
+    line_tax = line_sub * tax_pct / Decimal("100")
+    return qty, price, tax_pct, line_sub, line_tax
+
+
+@transaction.atomic
+def create_purchase_orders(entries, user=None):
+    """
+    Insert validated purchase orders in bulk.
+
+    Each entry is a dict with vendor_id, lines and optional order_date,
+    expected_delivery_date and notes. Products are resolved with one
+    ``in_bulk`` call, missing products become placeholders through one
+    ``bulk_create``, and PO numbers come from the document sequence.
+    Returns the created orders in input order.
+    """
+    if not entries:
+        return []
+    today = timezone.localdate()
+    created_by = getattr(user, "user_id", None) if user else None
+    numbers = reserve_document_numbers("purchase_order", len(entries))
+
+    wanted_ids = {line["product_id"] for entry in entries for line in entry["lines"] if line.get("product_id")}
+    products = Product.objects.in_bulk(wanted_ids) if wanted_ids else {}
+
+    orders = []
+    for entry, number in zip(entries, numbers):
+        subtotal = Decimal("0")
+        tax_total = Decimal("0")
+        for line in entry["lines"]:
+            _, _, _, line_sub, line_tax = _line_amounts(line)
+            subtotal += line_sub
+            tax_total += line_tax
+        orders.append(
+            PurchaseOrder(
+                po_number=number,
+                vendor_id=entry["vendor_id"],
+                order_date=entry.get("order_date") or today,
+                expected_delivery_date=entry.get("expected_delivery_date") or None,
+                po_status="draft",
+                subtotal=subtotal,
+                tax_amount=tax_total,
+                total_amount=subtotal + tax_total,
+                notes=entry.get("notes") or "",
+                created_by=created_by,
+            )
+        )
+    PurchaseOrder.objects.bulk_create(orders)
+    # Not every backend returns primary keys from bulk_create; map them back by number.
+    po_ids = dict(PurchaseOrder.objects.filter(po_number__in=numbers).values_list("po_number", "purchase_order_id"))
+
+    placeholders = []
+    for entry, number in zip(entries, numbers):
+        for idx, line in enumerate(entry["lines"], start=1):
+            if line.get("product_id") in products:
+                continue
+            placeholders.append(
+                Product(
+                    product_name=line.get("product_name") or f"PO Item {idx}",
+                    product_code=f"PO-AUTO-{po_ids[number]}-{idx}",
+                    product_category="unisex",
+                    product_type="other",
+                    sales_price=line["unit_price"],
+                    purchase_price=line["unit_price"],
+                )
+            )
+    placeholder_ids = {}
+    if placeholders:
+        Product.objects.bulk_create(placeholders)
+        placeholder_ids = dict(
+            Product.objects.filter(product_code__in=[p.product_code for p in placeholders]).values_list(
+                "product_code", "product_id"
+            )
+        )
+
+    rows = []
+    for entry, number in zip(entries, numbers):
+        po_id = po_ids[number]
+        for idx, line in enumerate(entry["lines"], start=1):
+            pid = line.get("product_id")
+            if pid not in products:
+                pid = placeholder_ids[f"PO-AUTO-{po_id}-{idx}"]
+            qty, price, tax_pct, line_sub, line_tax = _line_amounts(line)
+            rows.append(
+                PurchaseOrderLine(
+                    purchase_order_id=po_id,
+                    product_id=pid,
+                    line_number=idx,
+                    quantity=qty,
+                    unit_price=price,
+                    tax_percentage=tax_pct,
+                    line_subtotal=line_sub,
+                    line_tax_amount=line_tax,
+                    line_total=line_sub + line_tax,
+                    received_quantity=0,
+                )
+            )
+    PurchaseOrderLine.objects.bulk_create(rows, batch_size=1000)
+
+    by_number = PurchaseOrder.objects.in_bulk(numbers, field_name="po_number")
+    return [by_number[n] for n in numbers]
+
+
+def parse_purchase_order_csv(text):
+    """
+    Group flat CSV rows into purchase order records.
+
+    Rows sharing a ``po_ref`` form one order; rows without one are orders of
+    their own. Order columns are vendor_id, order_date, expected_delivery_date
+    and notes; line columns are product_id, product_name, quantity, unit_price
+    and tax_percentage.
+    """
+    records = {}
+    for row_number, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        ref = row.get("po_ref") or f"row-{row_number}"
+        record = records.get(ref)
+        if record is None:
+            record = {field: row.get(field) or None for field in CSV_ORDER_FIELDS}
+            record.update({"po_ref": ref, "row": row_number, "lines": []})
+            records[ref] = record
+        line = {
+            "product_name": row.get("product_name") or "",
+            "quantity": row.get("quantity"),
+            "unit_price": row.get("unit_price"),
+            "tax_percentage": row.get("tax_percentage") or 0,
+        }
+        if row.get("product_id"):
+            line["product_id"] = row["product_id"]
+        record["lines"].append(line)
+    return list(records.values())
+
+
+def _validate_records(records):
+    """Return (valid entries, error results) without touching the database."""
+    valid, errors = [], []
+    for index, record in enumerate(records):
+        ref = record.get("po_ref", index) if isinstance(record, dict) else index
+        if not isinstance(record, dict):
+            errors.append({"index": index, "ref": ref, "errors": {"detail": "Expected an object"}})
+            continue
+        problems = {}
+        try:
+            vendor_id = int(record.get("vendor_id"))
+        except (TypeError, ValueError):
+            vendor_id = None
+            problems["vendor_id"] = "A valid vendor_id is required."
+        lines = PurchaseOrderCreateLine(data=record.get("lines") or [], many=True)
+        if not record.get("lines"):
+            problems["lines"] = "At least one line is required"
+        elif not lines.is_valid():
+            problems["lines"] = lines.errors
+        dates = {}
+        for field in ("order_date", "expected_delivery_date"):
+            value = record.get(field)
+            if value:
+                try:
+                    dates[field] = date.fromisoformat(value) if isinstance(value, str) else value
+                except ValueError:
+                    problems[field] = "Date must be YYYY-MM-DD."
+        if problems:
+            errors.append({"index": index, "ref": ref, "errors": problems})
+            continue
+        valid.append(
+            {
+                "index": index,
+                "ref": ref,
+                "vendor_id": vendor_id,
+                "notes": record.get("notes") or "",
+                "lines": lines.validated_data,
+                **dates,
+            }
+        )
+    return valid, errors
+
+
+def import_purchase_orders(records, batch_size=500, user=None):
+    """
+    Import many purchase orders, reporting per-record errors.
+
+    Invalid records and records with unknown vendors are skipped with an
+    error entry. Valid records are inserted ``batch_size`` at a time; if a
+    batch fails it is retried record by record so one bad order does not
+    discard the rest.
+    """
+    valid, results = _validate_records(records)
+    vendor_ids = set(
+        Contact.objects.filter(
+            contact_id__in={e["vendor_id"] for e in valid}, contact_type__in=["vendor", "both"]
+        ).values_list("contact_id", flat=True)
+    )
+    entries = []
+    for entry in valid:
+        if entry["vendor_id"] in vendor_ids:
+            entries.append(entry)
+        else:
+            results.append({"index": entry["index"], "ref": entry["ref"], "errors": {"vendor_id": "Vendor not found"}})
+
+    def _record(batch, orders):
+        for entry, po in zip(batch, orders):
+            results.append({"index": entry["index"], "ref": entry["ref"], "po_number": po.po_number})
+
+    for start in range(0, len(entries), batch_size):
+        batch = entries[start : start + batch_size]
+        try:
+            _record(batch, create_purchase_orders(batch, user=user))
+        except IntegrityError:
+            for entry in batch:
+                try:
+                    _record([entry], create_purchase_orders([entry], user=user))
+                except IntegrityError as exc:
+                    results.append({"index": entry["index"], "ref": entry["ref"], "errors": {"detail": str(exc)}})
+
+    results.sort(key=lambda r: r["index"])
+    created = sum(1 for r in results if "po_number" in r)
+    return {"created": created, "failed": len(results) - created, "results": results}
+
+
+@transaction.atomic
+def create_vendor_bills(purchase_orders, due_days=0):
+    """
+    Create one vendor bill per purchase order in a single multi-row insert.
+
+    Bill numbers come from the vendor_bill document sequence. Draft orders are
+    confirmed with one UPDATE. Returns the created bills in input order.
+    """
+    purchase_orders = list(purchase_orders)
+    if not purchase_orders:
+        return []
+    today = timezone.localdate()
+    due_date = today + timedelta(days=due_days)
+    numbers = reserve_document_numbers("vendor_bill", len(purchase_orders))
+    rows = []
+    for po, number in zip(purchase_orders, numbers):
+        # Defensive defaults so generated column constraints are satisfied
+        subtotal = po.subtotal or 0
+        tax_amount = po.tax_amount or 0
+        total_amount = po.total_amount or (subtotal + tax_amount)
+        rows.append(
+            [
+                number,
+                po.purchase_order_id,
+                po.vendor_id,
+                today,
+                due_date,
+                "draft",
+                subtotal,
+                tax_amount,
+                total_amount,
+                0,
+                po.po_number,
+            ]
+        )
+    # Use raw insert to avoid touching generated column remaining_amount
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            """
+            INSERT INTO vendor_bills
+            (bill_number, purchase_order_id, vendor_id, invoice_date, due_date,
+             bill_status, subtotal, tax_amount, total_amount, paid_amount, vendor_reference,
+             created_at, updated_at)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            """,
+            rows,
+        )
+    PurchaseOrder.objects.filter(
+        pk__in=[po.purchase_order_id for po in purchase_orders], po_status="draft"
+    ).update(po_status="confirmed")
+    by_number = VendorBill.objects.in_bulk(numbers, field_name="bill_number")
+    return [by_number[n] for n in numbers]
+
+
+def unbilled_purchase_orders(vendor_ids=None, statuses=("draft", "confirmed", "received")):
+    qs = PurchaseOrder.objects.filter(po_status__in=statuses, vendor_bills__isnull=True)
+    if vendor_ids:
+        qs = qs.filter(vendor_id__in=vendor_ids)
+    return qs.order_by("purchase_order_id")
+
+
+def due_vendor_bills(vendor_ids=None, due_on_or_before=None, statuses=OPEN_BILL_STATUSES, bill_ids=None):
+    """Open bills with an outstanding balance. Balance is total - paid, not the generated column."""
+    qs = VendorBill.objects.filter(bill_status__in=statuses, total_amount__gt=F("paid_amount"))
+    if vendor_ids:
+        qs = qs.filter(vendor_id__in=vendor_ids)
+    if due_on_or_before:
+        qs = qs.filter(due_date__lte=due_on_or_before)
+    if bill_ids:
+        qs = qs.filter(pk__in=bill_ids)
+    return qs
+
+
+@transaction.atomic
+def run_vendor_payments(
+    vendor_ids=None,
+    due_on_or_before=None,
+    statuses=OPEN_BILL_STATUSES,
+    bill_ids=None,
+    payment_method="bank_transfer",
+    payment_date=None,
+    user=None,
+    chunk_size=5000,
+):
+    """
+    Pay every selected bill in full with one payment per vendor.
+
+    Bills are locked and read once, payments and allocations are written
+    with bulk_create, and bills are settled with set-based UPDATEs. Payment
+    numbers are reserved as a block from the payment sequence.
+    """
+    payment_date = payment_date or timezone.localdate()
+    created_by = getattr(user, "user_id", None) if user else None
+    bills = list(
+        due_vendor_bills(vendor_ids, due_on_or_before, statuses, bill_ids)
+        .select_for_update()
+        .order_by("vendor_id", "due_date", "vendor_bill_id")
+        .values_list("vendor_bill_id", "vendor_id", "bill_number", "total_amount", "paid_amount")
+    )
+    if not bills:
+        return {"payments": [], "bill_count": 0, "total_paid": Decimal("0.00")}
+
+    by_vendor = {}
+    for bill_id, vendor_id, bill_number, total, paid in bills:
+        by_vendor.setdefault(vendor_id, []).append((bill_id, bill_number, total - paid))
+
+    numbers = reserve_document_numbers("payment", len(by_vendor))
+    payments = []
+    for (vendor_id, items), number in zip(by_vendor.items(), numbers):
+        refs = ", ".join(bill_number for _, bill_number, _ in items[:5])
+        more = f" (+{len(items) - 5} more)" if len(items) > 5 else ""
+        payments.append(
+            Payment(
+                payment_number=number,
+                payment_type="vendor_payment",
+                contact_id=vendor_id,
+                payment_date=payment_date,
+                payment_method=payment_method,
+                payment_amount=sum((due for _, _, due in items), Decimal("0")),
+                payment_status="completed",
+                notes=f"Payment run for bills {refs}{more}",
+                created_by=created_by,
+            )
+        )
+    Payment.objects.bulk_create(payments)
+    # Not every backend returns primary keys from bulk_create; map them back by number.
+    payment_ids = dict(Payment.objects.filter(payment_number__in=numbers).values_list("payment_number", "payment_id"))
+
+    allocations = [
+        PaymentAllocation(
+            payment_id=payment_ids[number],
+            vendor_bill_id=bill_id,
+            allocated_amount=due,
+            allocation_date=payment_date,
+        )
+        for (vendor_id, items), number in zip(by_vendor.items(), numbers)
+        for bill_id, _, due in items
+    ]
+    PaymentAllocation.objects.bulk_create(allocations, batch_size=chunk_size)
+
+    paid_ids = [bill_id for bill_id, *_ in bills]
+    for start in range(0, len(paid_ids), chunk_size):
+        # avoid touching generated columns like remaining_amount
+        VendorBill.objects.filter(pk__in=paid_ids[start : start + chunk_size]).update(
+            paid_amount=F("total_amount"), bill_status="paid", updated_at=timezone.now()
+        )
+
+    return {
+        "payments": [
+            {"payment_number": p.payment_number, "vendor_id": p.contact_id, "amount": p.payment_amount}
+            for p in payments
+        ],
+        "bill_count": len(bills),
+        "total_paid": sum((p.payment_amount for p in payments), Decimal("0")),
+    }
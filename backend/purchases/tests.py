@@ -1,3 +1,257 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Contact, User
+from catalog.models import Product
+from payments.models import Payment, PaymentAllocation
+from system.models import DocumentSequence
+from system.services import reserve_document_numbers
+from .models import PurchaseOrder, PurchaseOrderLine, VendorBill
+from .services import (
+    create_purchase_orders,
+    create_vendor_bills,
+    import_purchase_orders,
+    parse_purchase_order_csv,
+    run_vendor_payments,
+    unbilled_purchase_orders,
+)
+
+CSV_HEADER = "po_ref,vendor_id,order_date,expected_delivery_date,notes,product_id,product_name,quantity,unit_price,tax_percentage\n"
+
+
+class PurchaseOrderImportTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = Contact.objects.create(contact_name="Import Mill", contact_type="vendor", email="mill@example.com", mobile="1")
+        cls.customer = Contact.objects.create(contact_name="Not A Vendor", contact_type="customer", email="nv@example.com", mobile="1")
+        cls.product = Product.objects.create(
+            product_name="Import Tee", product_code="IMP-1", product_category="men", product_type="shirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("40.00"),
+        )
+        cls.user = User.objects.create_user(
+            username="importer", email="importer@example.com", password="x", user_role="internal", is_staff=True
+        )
+
+    def record(self, **overrides):
+        record = {"vendor_id": self.vendor.pk, "lines": [{"product_id": self.product.pk, "quantity": "2", "unit_price": "40"}]}
+        record.update(overrides)
+        return record
+
+    def test_csv_rows_group_by_po_ref(self):
+        text = CSV_HEADER + (
+            f"A, {self.vendor.pk} ,2026-01-05,,first,{self.product.pk},,2,40,5\n"
+            f"A,{self.vendor.pk},2026-01-05,,first,,Loose Button,10,1.50,\n"
+            f",{self.vendor.pk},,,,{self.product.pk},,1,40,\n"
+        )
+        records = parse_purchase_order_csv(text)
+        self.assertEqual([(r["po_ref"], r["row"], len(r["lines"])) for r in records], [("A", 2, 2), ("row-4", 4, 1)])
+        first = records[0]
+        self.assertEqual((first["vendor_id"], first["order_date"], first["expected_delivery_date"]), (str(self.vendor.pk), "2026-01-05", None))
+        self.assertEqual(first["lines"][1], {"product_name": "Loose Button", "quantity": "10", "unit_price": "1.50", "tax_percentage": 0})
+        self.assertNotIn("product_id", first["lines"][1])
+
+    def test_invalid_records_are_reported_per_row(self):
+        records = [
+            self.record(),
+            self.record(vendor_id="abc"),
+            self.record(lines=[]),
+            self.record(lines=[{"quantity": "many", "unit_price": "1"}]),
+            self.record(order_date="05/01/2026"),
+            self.record(vendor_id=self.customer.pk),
+            "not an object",
+        ]
+        report = import_purchase_orders(records)
+        self.assertEqual((report["created"], report["failed"]), (1, 6))
+        results = report["results"]
+        self.assertEqual([r["index"] for r in results], list(range(7)))
+        self.assertIn("po_number", results[0])
+        self.assertEqual(set(results[1]["errors"]), {"vendor_id"})
+        self.assertEqual(results[2]["errors"]["lines"], "At least one line is required")
+        self.assertIn("quantity", results[3]["errors"]["lines"][0])
+        self.assertEqual(results[4]["errors"], {"order_date": "Date must be YYYY-MM-DD."})
+        self.assertEqual(results[5]["errors"], {"vendor_id": "Vendor not found"})
+        self.assertEqual(results[6]["errors"], {"detail": "Expected an object"})
+        self.assertEqual(PurchaseOrder.objects.count(), 1)
+
+    def test_failed_batch_is_retried_one_record_at_a_time(self):
+        # The third number the sequence hands out is already taken, so the batch insert fails
+        DocumentSequence.objects.create(document_type="purchase_order", prefix="PO", next_number=1, padding=6)
+        PurchaseOrder.objects.create(po_number="PO-000003", vendor=self.vendor, order_date="2026-01-01")
+        records = [self.record(notes=f"order {n}") for n in range(3)]
+
+        report = import_purchase_orders(records, batch_size=10)
+        self.assertEqual((report["created"], report["failed"]), (2, 1))
+        self.assertEqual([r.get("po_number") for r in report["results"]], ["PO-000001", "PO-000002", None])
+        self.assertIn("detail", report["results"][2]["errors"])
+        self.assertEqual(
+            list(PurchaseOrder.objects.exclude(po_number="PO-000003").order_by("po_number").values_list("notes", flat=True)),
+            ["order 0", "order 1"],
+        )
+        self.assertEqual(PurchaseOrderLine.objects.count(), 2)
+
+    def test_import_endpoint_accepts_json_and_csv(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        url = "/api/purchases/purchase-orders/import/"
+
+        response = client.post(url, {"purchase_orders": [self.record(), self.record(vendor_id=0)]}, format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual((response.data["created"], response.data["failed"]), (1, 1))
+
+        text = CSV_HEADER + f"A,{self.vendor.pk},,,,,New Cloth,3,25,\nB,,,,,,,1,1,\n"
+        upload = SimpleUploadedFile("orders.csv", text.encode("utf-8-sig"), content_type="text/csv")
+        response = client.post(url, {"file": upload}, format="multipart")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r["ref"] for r in response.data["results"]], ["A", "B"])
+        self.assertIn("vendor_id", response.data["results"][1]["errors"])
+        self.assertTrue(Product.objects.filter(product_name="New Cloth").exists())
+
+        response = client.post(url, [self.record(vendor_id="x")], format="json")
+        self.assertEqual((response.status_code, response.data["created"]), (400, 0))
+        self.assertEqual(client.post(url, {"orders": []}, format="json").status_code, 400)
+        self.assertEqual(client.post(f"{url}?batch_size=lots", [self.record()], format="json").status_code, 400)
+
+    def test_create_endpoint_rejects_unknown_and_non_vendor_contacts(self):
+        url = "/api/purchases/purchase-orders/create/"
+        for vendor_id in (0, self.customer.pk):
+            response = APIClient().post(url, self.record(vendor_id=vendor_id), format="json")
+            self.assertEqual((response.status_code, response.data), (400, {"vendor_id": ["Vendor not found"]}))
+        self.assertFalse(PurchaseOrder.objects.exists())
+        response = APIClient().post(url, self.record(), format="json")
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data["vendor"], self.vendor.pk)
+
+
+class VendorBillingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.today = timezone.localdate()
+        cls.vendors = [
+            Contact.objects.create(contact_name=f"Mill {n}", contact_type="vendor", email=f"mill-{n}@example.com", mobile="1")
+            for n in range(2)
+        ]
+        cls.user = User.objects.create_user(
+            username="payables", email="payables@example.com", password="x", user_role="internal", is_staff=True
+        )
+        product = Product.objects.create(
+            product_name="Billing Tee", product_code="BILL-1", product_category="men", product_type="shirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("40.00"),
+        )
+        # Vendor 0 gets two orders, vendor 1 one; totals 210.00, 420.00 and 105.00 with 5% tax
+        cls.orders = create_purchase_orders(
+            [
+                {"vendor_id": vendor.pk, "lines": [{"product_id": product.pk, "quantity": qty, "unit_price": Decimal("100"), "tax_percentage": Decimal("5")}]}
+                for vendor, qty in ((cls.vendors[0], 2), (cls.vendors[0], 4), (cls.vendors[1], 1))
+            ]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_document_numbers_are_reserved_as_consecutive_blocks(self):
+        self.assertEqual(reserve_document_numbers("credit_note", 0), [])
+        self.assertEqual(reserve_document_numbers("credit_note", 2), ["CREDIT_NOTE-000001", "CREDIT_NOTE-000002"])
+        self.assertEqual(reserve_document_numbers("credit_note", 3), [f"CREDIT_NOTE-00000{n}" for n in (3, 4, 5)])
+        self.assertEqual(DocumentSequence.objects.get(document_type="credit_note").next_number, 6)
+
+    def test_bills_copy_order_totals_and_confirm_drafts(self):
+        PurchaseOrder.objects.filter(pk=self.orders[2].pk).update(po_status="received")
+        bills = create_vendor_bills(reversed(self.orders), due_days=15)
+        self.assertEqual([b.purchase_order_id for b in bills], [po.pk for po in reversed(self.orders)])
+        self.assertEqual([b.bill_number for b in bills], [f"VENDOR_BILL-00000{n}" for n in (1, 2, 3)])
+        self.assertEqual([b.total_amount for b in bills], [Decimal("105.00"), Decimal("420.00"), Decimal("210.00")])
+        for bill, po in zip(bills, reversed(self.orders)):
+            self.assertEqual((bill.vendor_id, bill.vendor_reference, bill.bill_status), (po.vendor_id, po.po_number, "draft"))
+            self.assertEqual((bill.paid_amount, bill.due_date), (0, self.today + timedelta(days=15)))
+        statuses = dict(PurchaseOrder.objects.values_list("pk", "po_status"))
+        self.assertEqual([statuses[po.pk] for po in self.orders], ["confirmed", "confirmed", "received"])
+        self.assertFalse(unbilled_purchase_orders().exists())
+        self.assertEqual(create_vendor_bills([]), [])
+
+    def test_generate_endpoint_bills_only_unbilled_orders(self):
+        url = "/api/purchases/vendor-bills/generate/"
+        response = self.client.post(url, {"vendor_ids": [self.vendors[0].pk], "due_days": 30}, format="json")
+        self.assertEqual((response.status_code, response.data["count"]), (201, 2))
+        self.assertEqual(set(VendorBill.objects.values_list("purchase_order_id", flat=True)), {self.orders[0].pk, self.orders[1].pk})
+
+        response = self.client.post(url, {"purchase_order_ids": [self.orders[0].pk, self.orders[2].pk]}, format="json")
+        self.assertEqual((response.status_code, response.data["count"]), (201, 1))
+        response = self.client.post(url, {}, format="json")
+        self.assertEqual((response.status_code, response.data["count"]), (200, 0))
+        self.assertEqual(self.client.post(url, {"due_days": "soon"}, format="json").status_code, 400)
+
+    def test_payment_run_pays_each_vendor_once_and_skips_paid_bills(self):
+        bills = create_vendor_bills(self.orders)
+        # Drafts are not payable until confirmed
+        self.assertEqual(run_vendor_payments()["bill_count"], 0)
+        VendorBill.objects.update(bill_status="confirmed")
+        # Vendor 0's larger bill is already part paid
+        VendorBill.objects.filter(pk=bills[1].pk).update(paid_amount=Decimal("120.00"), bill_status="partially_paid")
+
+        result = run_vendor_payments(user=self.user)
+        self.assertEqual((result["bill_count"], result["total_paid"]), (3, Decimal("615.00")))
+        self.assertEqual(
+            {p["vendor_id"]: p["amount"] for p in result["payments"]},
+            {self.vendors[0].pk: Decimal("510.00"), self.vendors[1].pk: Decimal("105.00")},
+        )
+        for payment in Payment.objects.all():
+            allocated = sum(a.allocated_amount for a in payment.allocations.all())
+            self.assertEqual(allocated, payment.payment_amount)
+            self.assertEqual(payment.created_by, self.user.pk)
+        self.assertEqual(
+            dict(PaymentAllocation.objects.values_list("vendor_bill_id", "allocated_amount")),
+            {bills[0].pk: Decimal("210.00"), bills[1].pk: Decimal("300.00"), bills[2].pk: Decimal("105.00")},
+        )
+        for bill in VendorBill.objects.all():
+            self.assertEqual((bill.bill_status, bill.paid_amount), ("paid", bill.total_amount))
+
+        # Running again finds nothing left to pay
+        self.assertEqual(run_vendor_payments()["bill_count"], 0)
+        self.assertEqual((Payment.objects.count(), PaymentAllocation.objects.count()), (2, 3))
+
+    def test_payment_run_endpoint(self):
+        bills = create_vendor_bills(self.orders)
+        VendorBill.objects.update(bill_status="confirmed")
+        VendorBill.objects.filter(pk=bills[0].pk).update(due_date=self.today + timedelta(days=10))
+        url = "/api/purchases/payment-runs/"
+        for statuses in (["draft"], ["confirmed", "paid"], "confirmed"):
+            self.assertEqual(self.client.post(url, {"statuses": statuses}, format="json").status_code, 400)
+
+        response = self.client.post(url, {"dry_run": True}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data["bill_count"], response.data["vendor_count"]), (2, 2))
+        self.assertEqual(Decimal(response.data["total_due"]), Decimal("525.00"))
+        self.assertFalse(Payment.objects.exists())
+
+        response = self.client.post(url, {"vendor_ids": [self.vendors[0].pk], "payment_method": "cash"}, format="json")
+        self.assertEqual((response.status_code, response.data["bill_count"]), (201, 1))
+        self.assertEqual(Payment.objects.get().payment_method, "cash")
+
+        due = str(self.today + timedelta(days=10))
+        response = self.client.post(url, {"due_on_or_before": due}, format="json")
+        self.assertEqual((response.status_code, response.data["bill_count"]), (201, 2))
+        response = self.client.post(url, {"due_on_or_before": due}, format="json")
+        self.assertEqual((response.status_code, response.data["bill_count"]), (200, 0))
+        self.assertEqual(self.client.post(url, {"due_on_or_before": "tomorrow"}, format="json").status_code, 400)
+
+    def test_pay_endpoint_explains_unpayable_bills(self):
+        bills = create_vendor_bills(self.orders)
+        VendorBill.objects.filter(pk=bills[1].pk).update(bill_status="cancelled")
+        VendorBill.objects.filter(pk=bills[2].pk).update(bill_status="confirmed")
+
+        def pay(bill):
+            return self.client.post(f"/api/purchases/vendor-bills/{bill.pk}/pay/", format="json")
 
-# Create your tests here.
+        self.assertEqual(pay(bills[0]).data["detail"], "Bill is not confirmed")
+        self.assertEqual(pay(bills[1]).data["detail"], "Bill is cancelled")
+        response = pay(bills[2])
+        self.assertEqual((response.status_code, response.data["bill"]["bill_status"]), (200, "paid"))
+        response = pay(bills[2])
+        self.assertEqual((response.status_code, response.data["detail"]), (400, "Bill already paid"))
+        self.assertEqual(Payment.objects.count(), 1)
@@ -2,17 +2,23 @@ from django.urls import path
 from .views import (
     PurchaseOrderListView,
     PurchaseOrderCreateView,
+    PurchaseOrderImportView,
     PurchaseOrderBillCreateView,
     VendorBillPayView,
     VendorBillListView,
     VendorListView,
+    VendorBillGenerateView,
+    PaymentRunView,
 )
 
 urlpatterns = [
     path("purchase-orders/", PurchaseOrderListView.as_view(), name="purchase-orders"),
     path("purchase-orders/create/", PurchaseOrderCreateView.as_view(), name="purchase-orders-create"),
+    path("purchase-orders/import/", PurchaseOrderImportView.as_view(), name="purchase-orders-import"),
     path("purchase-orders/<int:pk>/create-bill/", PurchaseOrderBillCreateView.as_view(), name="purchase-orders-create-bill"),
     path("vendor-bills/", VendorBillListView.as_view(), name="vendor-bills"),
     path("vendor-bills/<int:pk>/pay/", VendorBillPayView.as_view(), name="vendor-bills-pay"),
+    path("vendor-bills/generate/", VendorBillGenerateView.as_view(), name="vendor-bills-generate"),
+    path("payment-runs/", PaymentRunView.as_view(), name="payment-runs"),
     path("vendors/", VendorListView.as_view(), name="vendors"),
 ]
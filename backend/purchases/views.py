@@ -1,17 +1,27 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from django.db import transaction, connection
+from datetime import date
+from django.db.models import Count, F, Sum
 from django.utils import timezone
 from accounts.models import Contact
-from catalog.models import Product
-from .models import PurchaseOrder, VendorBill, PurchaseOrderLine
-from payments.models import Payment, PaymentAllocation
+from .models import PurchaseOrder, VendorBill
+from accounts.permissions import IsVendorUser
 from .serializers import (
     PurchaseOrderSerializer,
     VendorBillSerializer,
     PurchaseOrderCreateSerializer,
 )
+from .services import (
+    OPEN_BILL_STATUSES,
+    create_purchase_orders,
+    create_vendor_bills,
+    due_vendor_bills,
+    import_purchase_orders,
+    parse_purchase_order_csv,
+    run_vendor_payments,
+    unbilled_purchase_orders,
+)
 
 
 class PurchaseOrderListView(generics.ListAPIView):
@@ -20,7 +30,7 @@ class PurchaseOrderListView(generics.ListAPIView):
 
     def get_queryset(self):
         vendor_id = self.request.query_params.get("vendor_id")
-        qs = PurchaseOrder.objects.all().order_by("-created_at")
+        qs = PurchaseOrder.objects.prefetch_related("lines").order_by("-created_at")
         if vendor_id:
             qs = qs.filter(vendor_id=vendor_id)
         return qs
@@ -30,87 +40,44 @@ class PurchaseOrderCreateView(generics.GenericAPIView):
     serializer_class = PurchaseOrderCreateSerializer
     permission_classes = [AllowAny]  # user requested no auth block
 
-    @transaction.atomic
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
-        data = serializer.validated_data
         try:
-            vendor = Contact.objects.get(contact_id=data["vendor_id"])
-            order_date = data.get("order_date") or timezone.now().date()
-            expected_date = data.get("expected_delivery_date") or None
-            po_number = f"PO-{PurchaseOrder.objects.count() + 1:05d}"
-            po = PurchaseOrder.objects.create(
-                po_number=po_number,
-                vendor=vendor,
-                order_date=order_date,
-                expected_delivery_date=expected_date,
-                po_status="draft",
-                notes=data.get("notes") or "",
-            )
-
-            subtotal = 0
-            tax_total = 0
-            insert_rows = []
-            for idx, line in enumerate(data["lines"], start=1):
-                prod = None
-                pid = line.get("product_id")
-                if pid:
-                    prod = Product.objects.filter(pk=pid).first()
-                if not prod:
-                    # create placeholder product
-                    name = line.get("product_name") or f"PO Item {idx}"
-                    code = f"PO-AUTO-{po.purchase_order_id}-{idx}"
-                    prod = Product.objects.create(
-                        product_name=name,
-                        product_code=code,
-                        product_category="unisex",
-                        product_type="other",
-                        sales_price=line["unit_price"],
-                        purchase_price=line["unit_price"],
-                    )
-                qty = line["quantity"]
-                price = line["unit_price"]
-                tax_pct = line.get("tax_percentage") or 0
-                line_sub = qty * price
-                line_tax = line_sub * tax_pct / 100
-                line_total = line_sub + line_tax
-                subtotal += line_sub
-                tax_total += line_tax
-                insert_rows.append(
-                    (
-                        po.purchase_order_id,
-                        prod.product_id,
-                        idx,
-                        qty,
-                        price,
-                        tax_pct,
-                        line_sub,
-                        line_tax,
-                        line_total,
-                        0,  # received_quantity
-                    )
-                )
-
-            with connection.cursor() as cursor:
-                cursor.executemany(
-                    """
-                    INSERT INTO purchase_order_lines
-                    (purchase_order_id, product_id, line_number, quantity, unit_price, tax_percentage,
-                     line_subtotal, line_tax_amount, line_total, received_quantity)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    insert_rows,
-                )
-            po.subtotal = subtotal
-            po.tax_amount = tax_total
-            po.total_amount = subtotal + tax_total
-            po.save(update_fields=["subtotal", "tax_amount", "total_amount"])
+            po = create_purchase_orders([serializer.validated_data], user=request.user)[0]
             return Response(PurchaseOrderSerializer(po).data, status=status.HTTP_201_CREATED)
         except Exception as exc:  # defensive: surface as 400 instead of 500
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
 
 
+class PurchaseOrderImportView(generics.GenericAPIView):
+    """
+    Bulk-import purchase orders from a JSON array (or {"purchase_orders": [...]})
+    or an uploaded CSV file (multipart field "file"). Returns per-record results.
+    """
+
+    permission_classes = [IsVendorUser]
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get("file")
+        if upload is not None:
+            records = parse_purchase_order_csv(upload.read().decode("utf-8-sig"))
+        else:
+            records = request.data
+            if isinstance(records, dict):
+                records = records.get("purchase_orders")
+        if not isinstance(records, list):
+            return Response(
+                {"detail": "Send a list of purchase orders or a CSV file"}, status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            batch_size = max(1, int(request.query_params.get("batch_size", 500)))
+        except ValueError:
+            return Response({"detail": "batch_size must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        report = import_purchase_orders(records, batch_size=batch_size, user=request.user)
+        return Response(report, status=status.HTTP_201_CREATED if report["created"] else status.HTTP_400_BAD_REQUEST)
+
+
 class VendorBillListView(generics.ListAPIView):
     serializer_class = VendorBillSerializer
     permission_classes = [IsAuthenticated]
@@ -153,49 +120,7 @@ class PurchaseOrderBillCreateView(generics.GenericAPIView):
             return Response({"detail": "Purchase order not found"}, status=status.HTTP_404_NOT_FOUND)
 
         try:
-            # Defensive defaults so generated column constraints are satisfied
-            subtotal = po.subtotal or 0
-            tax_amount = po.tax_amount or 0
-            total_amount = po.total_amount or (subtotal + tax_amount)
-
-            # Generate the next bill number based on the latest bill_id to avoid collisions
-            last = VendorBill.objects.order_by("-vendor_bill_id").first()
-            next_num = (last.vendor_bill_id if last else 0) + 1
-            bill_number = f"BILL-{next_num:04d}"
-
-            today = timezone.now().date()
-
-            with transaction.atomic():
-                # Use raw insert to avoid touching generated column remaining_amount
-                with connection.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO vendor_bills
-                        (bill_number, purchase_order_id, vendor_id, invoice_date, due_date,
-                         bill_status, subtotal, tax_amount, total_amount, paid_amount, vendor_reference,
-                         created_at, updated_at)
-                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
-                        """,
-                        [
-                            bill_number,
-                            po.purchase_order_id,
-                            po.vendor_id,
-                            today,
-                            today,
-                            "draft",
-                            subtotal,
-                            tax_amount,
-                            total_amount,
-                            0,
-                            po.po_number,
-                        ],
-                    )
-                bill = VendorBill.objects.get(bill_number=bill_number)
-
-                if po.po_status == "draft":
-                    po.po_status = "confirmed"
-                    po.save(update_fields=["po_status"])
-
+            bill = create_vendor_bills([po])[0]
             return Response(VendorBillSerializer(bill).data, status=status.HTTP_201_CREATED)
         except Exception as exc:
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
@@ -209,38 +134,89 @@ class VendorBillPayView(generics.GenericAPIView):
     permission_classes = [AllowAny]  # per user request keep open
 
     def post(self, request, pk, *args, **kwargs):
-        try:
-            bill = VendorBill.objects.select_related("vendor").get(pk=pk)
-        except VendorBill.DoesNotExist:
+        if not VendorBill.objects.filter(pk=pk).exists():
             return Response({"detail": "Vendor bill not found"}, status=status.HTTP_404_NOT_FOUND)
 
-        amount_due = float(bill.remaining_amount or 0)
-        if amount_due <= 0:
-            return Response({"detail": "Bill already paid"}, status=status.HTTP_400_BAD_REQUEST)
-
-        payment_number = f"PAY-{Payment.objects.count() + 1:05d}"
-        today = timezone.now().date()
-
-        payment = Payment.objects.create(
-            payment_number=payment_number,
-            payment_type="vendor_payment",
-            contact=bill.vendor,
-            payment_date=today,
-            payment_method="bank_transfer",
-            payment_amount=amount_due,
-            payment_status="completed",
-            notes=f"Auto payment for bill {bill.bill_number}",
+        result = run_vendor_payments(bill_ids=[pk], user=request.user)
+        if not result["bill_count"]:
+            bill_status = VendorBill.objects.filter(pk=pk).values_list("bill_status", flat=True).get()
+            if bill_status == "cancelled":
+                detail = "Bill is cancelled"
+            elif bill_status == "draft":
+                detail = "Bill is not confirmed"
+            else:
+                detail = "Bill already paid"
+            return Response({"detail": detail}, status=status.HTTP_400_BAD_REQUEST)
+
+        bill = VendorBill.objects.select_related("vendor", "purchase_order").get(pk=pk)
+        return Response(
+            {"bill": VendorBillSerializer(bill).data, "payment_number": result["payments"][0]["payment_number"]}
         )
 
-        PaymentAllocation.objects.create(
-            payment=payment,
-            vendor_bill=bill,
-            allocated_amount=amount_due,
-            allocation_date=today,
+
+class VendorBillGenerateView(generics.GenericAPIView):
+    """
+    Create bills in bulk for purchase orders that have none yet.
+    Body: purchase_order_ids and/or vendor_ids (optional filters), due_days.
+    """
+
+    permission_classes = [IsVendorUser]
+
+    def post(self, request, *args, **kwargs):
+        qs = unbilled_purchase_orders(vendor_ids=request.data.get("vendor_ids") or None)
+        po_ids = request.data.get("purchase_order_ids")
+        if po_ids:
+            qs = qs.filter(pk__in=po_ids)
+        try:
+            due_days = int(request.data.get("due_days") or 0)
+        except (TypeError, ValueError):
+            return Response({"detail": "due_days must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        bills = create_vendor_bills(qs, due_days=due_days)
+        return Response(
+            {"count": len(bills), "bill_numbers": [b.bill_number for b in bills]},
+            status=status.HTTP_201_CREATED if bills else status.HTTP_200_OK,
         )
 
-        bill.paid_amount = (bill.paid_amount or 0) + amount_due
-        bill.bill_status = "paid"
-        bill.save(update_fields=["paid_amount", "bill_status"])
 
-        return Response({"bill": VendorBillSerializer(bill).data, "payment_number": payment.payment_number})
+class PaymentRunView(generics.GenericAPIView):
+    """
+    Pay all due vendor bills in one run.
+    Body: vendor_ids, due_on_or_before (YYYY-MM-DD), statuses, payment_method, dry_run.
+    """
+
+    permission_classes = [IsVendorUser]
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        due = data.get("due_on_or_before")
+        try:
+            due = date.fromisoformat(due) if due else timezone.localdate()
+        except ValueError:
+            return Response({"detail": "due_on_or_before must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+        vendor_ids = data.get("vendor_ids") or None
+        statuses = data.get("statuses") or list(OPEN_BILL_STATUSES)
+        if not isinstance(statuses, list) or not set(statuses) <= set(OPEN_BILL_STATUSES):
+            return Response(
+                {"detail": f"statuses must be a list of: {', '.join(OPEN_BILL_STATUSES)}"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        if data.get("dry_run"):
+            bills = due_vendor_bills(vendor_ids, due, statuses)
+            totals = bills.aggregate(count=Count("pk"), amount=Sum(F("total_amount") - F("paid_amount")))
+            return Response(
+                {
+                    "bill_count": totals["count"],
+                    "total_due": totals["amount"] or 0,
+                    "vendor_count": bills.values("vendor_id").distinct().count(),
+                }
+            )
+
+        result = run_vendor_payments(
+            vendor_ids=vendor_ids,
+            due_on_or_before=due,
+            statuses=statuses,
+            payment_method=data.get("payment_method") or "bank_transfer",
+            user=request.user,
+        )
+        return Response(result, status=status.HTTP_201_CREATED if result["bill_count"] else status.HTTP_200_OK)
@@ -0,0 +1,27 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.services import expire_early_payment_discounts, refresh_early_payment_discounts
+
+
+class Command(BaseCommand):
+    help = (
+        "Nightly job: switch off early-payment discounts whose deadline has passed. With --recompute, first "
+        "recompute the discount amount and deadline of every open invoice from its payment term (use after "
+        "changing a term or to backfill older invoices)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--date", help="Run as of this date, YYYY-MM-DD (default today)")
+        parser.add_argument("--recompute", action="store_true", help="Recompute all open invoices from their terms")
+
+    def handle(self, *args, **options):
+        try:
+            today = date.fromisoformat(options["date"]) if options["date"] else None
+        except ValueError:
+            raise CommandError("--date must be YYYY-MM-DD")
+        if options["recompute"]:
+            self.stdout.write(f"{refresh_early_payment_discounts(today)} open invoices recomputed")
+        expired = expire_early_payment_discounts(today)
+        self.stdout.write(self.style.SUCCESS(f"{expired} early-payment discounts expired"))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.services import sync_customer_summaries
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the customer portal summaries (order count, lifetime value, open balance, last order) from "
+        "orders and invoices and fix any that drifted. With --check nothing is written and drift makes the "
+        "command fail, so it can run as a consistency check."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--check", action="store_true", help="Report drift without writing; exit non-zero if any")
+        parser.add_argument("--contact", type=int, action="append", help="Only this contact id (repeatable)")
+
+    def handle(self, *args, **options):
+        result = sync_customer_summaries(options["contact"], dry_run=options["check"])
+        drift = result["created"] + result["updated"] + result["deleted"]
+        self.stdout.write(
+            f"{result['checked']} summaries checked: {result['created']} missing, {result['updated']} drifted, "
+            f"{result['deleted']} stale"
+        )
+        if options["check"] and drift:
+            raise CommandError(f"{drift} summaries out of date (e.g. contacts {', '.join(map(str, result['drifted']))})")
+        if drift:
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt {drift} summaries"))
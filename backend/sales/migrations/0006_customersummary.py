@@ -0,0 +1,45 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("sales", "0005_remove_salesorderline_created_at_and_more"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CustomerSummary",
+            fields=[
+                (
+                    "contact",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="summary",
+                        serialize=False,
+                        to="accounts.contact",
+                    ),
+                ),
+                ("order_count", models.IntegerField(default=0)),
+                (
+                    "lifetime_value",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                (
+                    "open_balance",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=15),
+                ),
+                ("open_invoice_count", models.IntegerField(default=0)),
+                ("last_order_date", models.DateField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                "db_table": "customer_summaries",
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("pricing", "0002_alter_discountoffer_created_by"),
+        ("sales", "0006_customersummary"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="customerinvoice",
+            index=models.Index(
+                fields=[
+                    "invoice_status",
+                    "due_date",
+                    "customer",
+                    "total_amount",
+                    "paid_amount",
+                ],
+                name="idx_invoice_aging",
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("accounts", "0002_address"),
+        ("pricing", "0002_alter_discountoffer_created_by"),
+        ("sales", "0007_customerinvoice_idx_invoice_aging"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="customerinvoice",
+            name="idx_invoice_aging",
+        ),
+        migrations.AddIndex(
+            model_name="customerinvoice",
+            index=models.Index(
+                fields=[
+                    "customer",
+                    "invoice_status",
+                    "due_date",
+                    "total_amount",
+                    "paid_amount",
+                ],
+                name="idx_invoice_aging",
+            ),
+        ),
+    ]
@@ -136,6 +136,10 @@ class CustomerInvoice(TimeStampedModel):
             models.Index(fields=["sales_order"], name="idx_invoice_sales_order"),
             models.Index(fields=["invoice_status"], name="idx_invoice_status"),
             models.Index(fields=["invoice_date", "due_date"], name="idx_invoice_dates"),
+            # Covers the aging report (payments.aging)
+            models.Index(
+                fields=["customer", "invoice_status", "due_date", "total_amount", "paid_amount"], name="idx_invoice_aging"
+            ),
         ]
 
     def __str__(self) -> str:
@@ -205,3 +209,26 @@ class CartItem(TimeStampedModel):
 
     def __str__(self) -> str:
         return f"{self.product} x {self.quantity}"
+
+
+class CustomerSummary(models.Model):
+    """
+    Portal totals per customer contact, kept current by checkout, order
+    cancellation and payment posting (sales.services). Orders count unless
+    cancelled; the open balance is total - paid over open invoices.
+    rebuild_customer_summaries recomputes them from orders and invoices.
+    """
+
+    contact = models.OneToOneField(Contact, on_delete=models.CASCADE, primary_key=True, related_name="summary")
+    order_count = models.IntegerField(default=0)
+    lifetime_value = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    open_balance = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+    open_invoice_count = models.IntegerField(default=0)
+    last_order_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "customer_summaries"
+
+    def __str__(self) -> str:
+        return f"Summary for contact {self.contact_id}"
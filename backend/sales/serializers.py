@@ -2,12 +2,18 @@ from rest_framework import serializers
 from django.utils import timezone
 from accounts.models import Contact
 from catalog.models import Product
+from catalog.services import PRIMARY_IMAGE_ORDERING
 from pricing.models import PaymentTerm, CouponCode
-from .models import SalesOrder, SalesOrderLine, CustomerInvoice, SalesOrderStatusLog, Cart, CartItem
+from .models import SalesOrder, SalesOrderLine, CustomerInvoice, SalesOrderStatusLog, Cart, CartItem, CustomerSummary
 import time
 from accounts.models import Address
 
 
+def _newest_first(logs):
+    # Sorted in Python so a prefetched status_logs is used instead of one query per order
+    return sorted(logs, key=lambda log: log.created_at, reverse=True)
+
+
 class SalesOrderLineSerializer(serializers.ModelSerializer):
     product_detail = serializers.SerializerMethodField()
 
@@ -50,7 +56,7 @@ class SalesOrderSerializer(serializers.ModelSerializer):
                 "changed_at": log.created_at,
                 "note": log.note,
             }
-            for log in obj.status_logs.order_by("-created_at")
+            for log in _newest_first(obj.status_logs.all())
         ]
 
 
@@ -75,6 +81,20 @@ class CustomerInvoiceSerializer(serializers.ModelSerializer):
         return obj.payment_term.term_name if obj.payment_term_id else None
 
 
+class CustomerSummarySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CustomerSummary
+        fields = (
+            "contact",
+            "order_count",
+            "lifetime_value",
+            "open_balance",
+            "open_invoice_count",
+            "last_order_date",
+            "updated_at",
+        )
+
+
 class SalesOrderDetailSerializer(serializers.ModelSerializer):
     lines = SalesOrderLineSerializer(many=True, read_only=True)
     invoices = CustomerInvoiceSerializer(many=True, read_only=True)
@@ -92,7 +112,7 @@ class SalesOrderDetailSerializer(serializers.ModelSerializer):
                 "changed_at": log.created_at,
                 "note": log.note,
             }
-            for log in obj.status_logs.order_by("-created_at")
+            for log in _newest_first(obj.status_logs.all())
         ]
 
 
@@ -128,27 +148,35 @@ class CheckoutSerializer(serializers.Serializer):
             else:
                 raise serializers.ValidationError("Customer is required for checkout")
         # ensure products exist, auto-create placeholders if missing
+        found = set(
+            Product.objects.filter(pk__in={line.get("product_id") for line in attrs["lines"]}).values_list("pk", flat=True)
+        )
+        placeholders = {}
         for line in attrs["lines"]:
             pid = line.get("product_id")
-            product = Product.objects.filter(pk=pid).first()
-            if not product:
+            if pid in found:
+                continue
+            if pid in placeholders:
+                line["product_id"] = placeholders[pid]
+                continue
+            suffix = str(int(time.time()))
+            code = f"AUTO-{pid}-{suffix}"
+            # ensure uniqueness
+            while Product.objects.filter(product_code=code).exists():
                 suffix = str(int(time.time()))
                 code = f"AUTO-{pid}-{suffix}"
-                # ensure uniqueness
-                while Product.objects.filter(product_code=code).exists():
-                    suffix = str(int(time.time()))
-                    code = f"AUTO-{pid}-{suffix}"
-                product = Product.objects.create(
-                    product_name=f"Auto Product {pid}",
-                    product_code=code,
-                    product_category="unisex",
-                    product_type="other",
-                    sales_price=line.get("unit_price", 0) or 0,
-                    sales_tax_percentage=line.get("tax_percentage", 0) or 0,
-                    purchase_price=line.get("unit_price", 0) or 0,
-                    purchase_tax_percentage=line.get("tax_percentage", 0) or 0,
-                )
-                line["product_id"] = product.product_id
+            product = Product.objects.create(
+                product_name=f"Auto Product {pid}",
+                product_code=code,
+                product_category="unisex",
+                product_type="other",
+                sales_price=line.get("unit_price", 0) or 0,
+                sales_tax_percentage=line.get("tax_percentage", 0) or 0,
+                purchase_price=line.get("unit_price", 0) or 0,
+                purchase_tax_percentage=line.get("tax_percentage", 0) or 0,
+            )
+            line["product_id"] = product.product_id
+            placeholders[pid] = product.product_id
 
         # Ensure contact and payment term exist
         try:
@@ -190,6 +218,9 @@ class CheckoutSerializer(serializers.Serializer):
         raise NotImplementedError("Use service layer to create checkout")
 
 
+CART_IMAGE_ORDERING = PRIMARY_IMAGE_ORDERING
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product_detail = serializers.SerializerMethodField()
 
@@ -206,7 +237,11 @@ class CartItemSerializer(serializers.ModelSerializer):
 
     def get_product_detail(self, obj):
         product = obj.product
-        first_image = product.images.first().image_url if hasattr(product, "images") and product.images.exists() else ""
+        # CartView prefetches the primary image into cart_images; fall back to one query
+        images = getattr(product, "cart_images", None)
+        if images is None:
+            images = list(product.images.order_by(*CART_IMAGE_ORDERING)[:1])
+        first_image = images[0].image_url if images else ""
         return {
             "name": product.product_name,
             "code": product.product_code,
@@ -1,12 +1,21 @@
-from datetime import date
-from decimal import Decimal
+from collections import defaultdict
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
 from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest, Round
 from django.utils import timezone
 from accounts.models import Contact, Address
 from catalog.models import Product
 from pricing.models import CouponCode, PaymentTerm
 from system.services import get_next_document_number
-from .models import SalesOrder, SalesOrderLine, CustomerInvoice, SalesOrderStatusLog
+from .models import SalesOrder, SalesOrderLine, CustomerInvoice, SalesOrderStatusLog, CustomerSummary
+
+OPEN_INVOICE_STATUSES = ("confirmed", "partially_paid")
+SUMMARY_COUNTERS = ("order_count", "lifetime_value", "open_balance", "open_invoice_count")
+SUMMARY_FIELDS = SUMMARY_COUNTERS + ("last_order_date",)
+ZERO = Decimal("0.00")
+_MONEY = DecimalField(max_digits=15, decimal_places=2)
 
 
 def _calculate_totals(lines):
@@ -62,12 +71,14 @@ def create_checkout(data, user=None):
         )
 
     created_by_id = getattr(user, "user_id", None) if user else None
+    # Business dates are local (TIME_ZONE); date.today() follows the server clock
+    today = timezone.localdate()
 
     order = SalesOrder.objects.create(
         so_number=so_number,
         customer=customer,
         payment_term=payment_term,
-        order_date=date.today(),
+        order_date=today,
         subtotal=subtotal,
         discount_amount=discount_amount,
         tax_amount=tax_amount,
@@ -80,49 +91,59 @@ def create_checkout(data, user=None):
         created_by=created_by_id,
     )
 
-    fallback_product = Product.objects.first()
     from django.db import connection
 
+    # One lookup for every line's product; the fallback is only needed for unknown ids
+    product_ids = set(Product.objects.filter(pk__in={line["product_id"] for line in lines}).values_list("pk", flat=True))
+    fallback_product = None
+    if any(line["product_id"] not in product_ids for line in lines):
+        fallback_product = Product.objects.first()
+
+    rows = []
     for line in lines:
-        product = Product.objects.filter(pk=line["product_id"]).first()
-        if not product:
+        product_id = line["product_id"]
+        if product_id not in product_ids:
             product = fallback_product
-        if not product:
-            # As a last resort, create a placeholder product so checkout doesn't fail
-            product = Product.objects.create(
-                product_name=f"Product {line['product_id']}",
-                product_code=f"AUTO-{line['product_id']}",
-                product_category="unisex",
-                product_type="other",
-                sales_price=Decimal(line["unit_price"]),
-                sales_tax_percentage=Decimal(line.get("tax_percentage", 0)),
-                purchase_price=Decimal(line["unit_price"]),
-                purchase_tax_percentage=Decimal(line.get("tax_percentage", 0)),
-            )
-        # insert via raw SQL to avoid generated column constraints
+            if not product:
+                # As a last resort, create a placeholder product so checkout doesn't fail
+                product = Product.objects.create(
+                    product_name=f"Product {line['product_id']}",
+                    product_code=f"AUTO-{line['product_id']}",
+                    product_category="unisex",
+                    product_type="other",
+                    sales_price=Decimal(line["unit_price"]),
+                    sales_tax_percentage=Decimal(line.get("tax_percentage", 0)),
+                    purchase_price=Decimal(line["unit_price"]),
+                    purchase_tax_percentage=Decimal(line.get("tax_percentage", 0)),
+                )
+            product_id = product.pk
         line_subtotal = Decimal(line["quantity"]) * Decimal(line["unit_price"])
         line_tax_amount = line_subtotal * Decimal(line.get("tax_percentage", 0)) / Decimal("100")
         line_total = line_subtotal + line_tax_amount
-        with connection.cursor() as cursor:
-            cursor.execute(
-                """
-                INSERT INTO sales_order_lines
-                (sales_order_id, product_id, line_number, quantity, unit_price, tax_percentage, line_subtotal, line_tax_amount, line_total, invoiced_quantity)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                [
-                    order.pk,
-                    product.pk,
-                    line["line_number"],
-                    line["quantity"],
-                    line["unit_price"],
-                    line.get("tax_percentage", 0),
-                    line_subtotal,
-                    line_tax_amount,
-                    line_total,
-                    Decimal("0"),
-                ],
-            )
+        rows.append(
+            [
+                order.pk,
+                product_id,
+                line["line_number"],
+                line["quantity"],
+                line["unit_price"],
+                line.get("tax_percentage", 0),
+                line_subtotal,
+                line_tax_amount,
+                line_total,
+                Decimal("0"),
+            ]
+        )
+    # insert via raw SQL to avoid generated column constraints; one executemany for all lines
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            """
+            INSERT INTO sales_order_lines
+            (sales_order_id, product_id, line_number, quantity, unit_price, tax_percentage, line_subtotal, line_tax_amount, line_total, invoiced_quantity)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            rows,
+        )
 
     invoice_number = get_next_document_number("customer_invoice")
     insert_invoice_sql = """
@@ -133,14 +154,17 @@ def create_checkout(data, user=None):
              created_by, created_at, updated_at)
             VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
             """
-    early_discount_applicable = bool(getattr(payment_term, "early_payment_discount", False))
+    invoice_date = today
+    early_discount_applicable, early_discount_amount, early_deadline = early_payment_discount(
+        payment_term, invoice_date, subtotal, discount_amount, total_amount
+    )
     invoice_params = [
         invoice_number,
         order.pk,
         customer.pk,
         payment_term.pk,
-        date.today(),
-        date.today(),
+        invoice_date,
+        invoice_date,
         "confirmed",
         subtotal,
         discount_amount,
@@ -149,8 +173,8 @@ def create_checkout(data, user=None):
         Decimal("0.00"),
         total_amount,
         early_discount_applicable,
-        Decimal("0.00"),
-        None,
+        early_discount_amount,
+        early_deadline,
         None,
         created_by_id,
     ]
@@ -168,7 +192,7 @@ def create_checkout(data, user=None):
         sales_order=order,
         previous_status="draft",
         new_status="confirmed",
-        changed_by=user,
+        changed_by_id=created_by_id,
         note="Order placed via checkout",
     )
 
@@ -179,4 +203,195 @@ def create_checkout(data, user=None):
         coupon.used_at = timezone.now()
         coupon.save(update_fields=["usage_count", "coupon_status", "used_at"])
 
+    deltas = {customer.pk: {"order_count": 1, "lifetime_value": invoice.total_amount, "last_order_date": order.order_date}}
+    add_open_balance_delta(
+        deltas, customer.pk, ZERO, invoice_open_balance(invoice.invoice_status, invoice.total_amount, invoice.paid_amount)
+    )
+    apply_customer_summary_deltas(deltas)
     return order, invoice
+
+
+def early_payment_discount(payment_term, invoice_date, subtotal, discount_amount, total_amount):
+    """
+    (applicable, amount, deadline) of ``payment_term``'s early-payment
+    discount on an invoice: discount_percentage of the base amount
+    (subtotal after discounts) or the total, if paid within discount_days.
+    """
+    if not payment_term.early_payment_discount or not payment_term.discount_percentage:
+        return False, ZERO, None
+    base = total_amount if payment_term.early_pay_discount_computation == "total_amount" else subtotal - discount_amount
+    amount = (Decimal(base) * Decimal(payment_term.discount_percentage) / 100).quantize(ZERO, ROUND_HALF_UP)
+    return amount > 0, amount, invoice_date + timedelta(days=payment_term.discount_days)
+
+
+def refresh_early_payment_discounts(today=None):
+    """
+    Recompute the early-payment discount of every open invoice from its
+    payment term with set-based UPDATEs: one per term and invoice date
+    still inside the discount window, then one switching off every other
+    open invoice's discount. Returns the number of invoices updated.
+    """
+    today = today or timezone.localdate()
+    now = timezone.now()
+    open_invoices = CustomerInvoice.objects.filter(
+        invoice_status__in=OPEN_INVOICE_STATUSES, total_amount__gt=F("paid_amount")
+    )
+    updated = 0
+    live = Q(pk__in=[])
+    for term in PaymentTerm.objects.filter(early_payment_discount=True, discount_percentage__gt=0):
+        window = open_invoices.filter(payment_term_id=term.pk, invoice_date__gte=today - timedelta(days=term.discount_days))
+        base = F("total_amount") if term.early_pay_discount_computation == "total_amount" else F("subtotal") - F("discount_amount")
+        amount = Round(base * Value(term.discount_percentage / 100), precision=2, output_field=_MONEY)
+        for invoice_date in window.order_by().values_list("invoice_date", flat=True).distinct():
+            updated += window.filter(invoice_date=invoice_date).update(
+                early_payment_discount_applicable=True,
+                early_payment_discount_amount=amount,
+                early_payment_deadline=invoice_date + timedelta(days=term.discount_days),
+                updated_at=now,
+            )
+        live |= Q(payment_term_id=term.pk, invoice_date__gte=today - timedelta(days=term.discount_days))
+    updated += open_invoices.filter(early_payment_discount_applicable=True).exclude(live).update(
+        early_payment_discount_applicable=False, updated_at=now
+    )
+    return updated
+
+
+def expire_early_payment_discounts(today=None):
+    """Switch off early-payment discounts whose deadline has passed, in one UPDATE. Returns how many lapsed."""
+    today = today or timezone.localdate()
+    return CustomerInvoice.objects.filter(
+        early_payment_discount_applicable=True, early_payment_deadline__lt=today
+    ).update(early_payment_discount_applicable=False, updated_at=timezone.now())
+
+
+def invoice_open_balance(status, total, paid):
+    """What an invoice adds to its customer's open balance: total - paid while it is open, else nothing."""
+    balance = (total or ZERO) - (paid or ZERO)
+    return balance if status in OPEN_INVOICE_STATUSES and balance > 0 else ZERO
+
+
+def add_open_balance_delta(deltas, customer_id, before, after):
+    """Record an invoice's open balance moving from ``before`` to ``after`` in summary ``deltas``."""
+    entry = deltas.setdefault(customer_id, {})
+    entry["open_balance"] = entry.get("open_balance", ZERO) + after - before
+    entry["open_invoice_count"] = entry.get("open_invoice_count", 0) + (after > 0) - (before > 0)
+
+
+def compute_customer_summaries(contact_ids=None):
+    """
+    {contact_id: summary values} recomputed from orders and open invoices
+    with two grouped queries. With ``contact_ids`` every one of them gets
+    an entry, zeros included; otherwise only contacts with activity.
+    """
+    orders = SalesOrder.objects.exclude(order_status="cancelled")
+    invoices = CustomerInvoice.objects.filter(
+        invoice_status__in=OPEN_INVOICE_STATUSES, total_amount__gt=F("paid_amount")
+    )
+    if contact_ids is not None:
+        contact_ids = list(contact_ids)
+        orders = orders.filter(customer_id__in=contact_ids)
+        invoices = invoices.filter(customer_id__in=contact_ids)
+    summaries = defaultdict(lambda: {"order_count": 0, "lifetime_value": ZERO, "open_balance": ZERO,
+                                     "open_invoice_count": 0, "last_order_date": None})
+    for contact_id in contact_ids or ():
+        summaries[contact_id]
+    for contact_id, count, value, last in (
+        orders.order_by().values("customer_id").annotate(n=Count("pk"), value=Sum("total_amount"), last=Max("order_date"))
+        .values_list("customer_id", "n", "value", "last")
+    ):
+        summaries[contact_id].update(order_count=count, lifetime_value=(value or ZERO).quantize(ZERO), last_order_date=last)
+    for contact_id, count, balance in (
+        invoices.order_by().values("customer_id").annotate(n=Count("pk"), balance=Sum(F("total_amount") - F("paid_amount")))
+        .values_list("customer_id", "n", "balance")
+    ):
+        summaries[contact_id].update(open_invoice_count=count, open_balance=(balance or ZERO).quantize(ZERO))
+    return dict(summaries)
+
+
+def sync_customer_summaries(contact_ids=None, dry_run=False, batch_size=1000):
+    """
+    Bring stored summaries in line with compute_customer_summaries():
+    create missing rows, fix drifted ones and (for a full run) delete rows
+    of contacts with no activity left. Returns counts and a few drifted ids.
+    """
+    expected = compute_customer_summaries(contact_ids)
+    stored_rows = CustomerSummary.objects.all()
+    if contact_ids is not None:
+        stored_rows = stored_rows.filter(pk__in=list(expected))
+    stored = {row[0]: dict(zip(SUMMARY_FIELDS, row[1:])) for row in stored_rows.values_list("pk", *SUMMARY_FIELDS)}
+
+    def drifted(current, wanted):
+        return any(
+            current[field] != wanted[field]
+            if field in ("order_count", "open_invoice_count", "last_order_date")
+            else (current[field] or ZERO).quantize(ZERO) != wanted[field]
+            for field in SUMMARY_FIELDS
+        )
+
+    create = [contact_id for contact_id in expected if contact_id not in stored]
+    update = [contact_id for contact_id in expected if contact_id in stored and drifted(stored[contact_id], expected[contact_id])]
+    delete = [contact_id for contact_id in stored if contact_id not in expected]
+    if not dry_run and (create or update or delete):
+        with transaction.atomic(savepoint=False):
+            CustomerSummary.objects.bulk_create(
+                [CustomerSummary(contact_id=contact_id, **expected[contact_id]) for contact_id in create],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+            CustomerSummary.objects.bulk_update(
+                [CustomerSummary(contact_id=contact_id, updated_at=timezone.now(), **expected[contact_id]) for contact_id in update],
+                [*SUMMARY_FIELDS, "updated_at"],
+                batch_size=batch_size,
+            )
+            for start in range(0, len(delete), batch_size):
+                CustomerSummary.objects.filter(pk__in=delete[start : start + batch_size]).delete()
+    return {
+        "checked": len(expected) + len(delete),
+        "created": len(create),
+        "updated": len(update),
+        "deleted": len(delete),
+        "drifted": (create + update + delete)[:20],
+    }
+
+
+def apply_customer_summary_deltas(deltas, chunk_size=500):
+    """
+    Add ``deltas`` ({contact_id: {counter: increment, "last_order_date": date}})
+    to the stored summaries: one UPDATE per chunk of contacts, increments
+    applied in the database.
+
+    Contacts without a row first get a zero row (ignore_conflicts), so two
+    transactions posting a contact's first change both land their
+    increment instead of one losing its insert. A zero row is only right
+    for a contact with no earlier history, so those contacts are then
+    recomputed with sync_customer_summaries(), which already includes the
+    change being posted.
+    """
+    deltas = {contact_id: delta for contact_id, delta in deltas.items() if contact_id}
+    if not deltas:
+        return
+    contacts = sorted(deltas)
+    missing = set(contacts) - set(CustomerSummary.objects.filter(pk__in=contacts).values_list("pk", flat=True))
+    if missing:
+        CustomerSummary.objects.bulk_create(
+            [CustomerSummary(contact_id=contact_id) for contact_id in sorted(missing)], ignore_conflicts=True
+        )
+    for start in range(0, len(contacts), chunk_size):
+        chunk = contacts[start : start + chunk_size]
+        changes = {}
+        for field in SUMMARY_COUNTERS:
+            output = CustomerSummary._meta.get_field(field)
+            whens = [When(pk=pk, then=Value(deltas[pk][field])) for pk in chunk if deltas[pk].get(field)]
+            if whens:
+                changes[field] = F(field) + Case(*whens, default=Value(0), output_field=output)
+        dates = [
+            When(pk=pk, then=Greatest(Coalesce(F("last_order_date"), Value(day)), Value(day)))
+            for pk in chunk
+            if (day := deltas[pk].get("last_order_date"))
+        ]
+        if dates:
+            changes["last_order_date"] = Case(*dates, default=F("last_order_date"))
+        if changes:
+            CustomerSummary.objects.filter(pk__in=chunk).update(**changes, updated_at=timezone.now())
+    if missing:
+        sync_customer_summaries(missing)
@@ -1,3 +1,207 @@
-from django.test import TestCase
+from datetime import date, datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import Contact, User
+from catalog.models import Product, ProductImage
+from payments.services import reconcile_statement, record_customer_payment
+from pricing.models import PaymentTerm
+from .models import Cart, CartItem, CustomerSummary
+from .services import compute_customer_summaries, create_checkout
+
+
+class CartQueryCountTests(TestCase):
+    """Cart reads and writes must cost the same number of queries for 2 or 20 lines."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(
+            username="cart-user", email="cart@example.com", password="x", user_role="portal"
+        )
+        Product.objects.bulk_create(
+            [
+                Product(
+                    product_name=f"Product {i}",
+                    product_code=f"CART-{i:03d}",
+                    product_category="unisex",
+                    product_type="shirt",
+                    sales_price=Decimal("100.00"),
+                    purchase_price=Decimal("60.00"),
+                )
+                for i in range(20)
+            ]
+        )
+        cls.products = list(Product.objects.filter(product_code__startswith="CART-").order_by("product_id"))
+        ProductImage.objects.bulk_create(
+            [
+                ProductImage(product=product, image_url=f"https://img.example.com/{product.pk}/{n}.jpg", display_order=n, is_primary=n == 1)
+                for product in cls.products
+                for n in range(3)
+            ]
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def fill_cart(self, count):
+        cart, _ = Cart.objects.get_or_create(user=self.user)
+        cart.items.all().delete()
+        CartItem.objects.bulk_create(
+            [CartItem(cart=cart, product=product, quantity=1, selected_size="M", selected_color="") for product in self.products[:count]]
+        )
+
+    def payload(self, count, quantity=2):
+        return {
+            "items": [
+                {"product_id": product.pk, "quantity": quantity, "selected_size": "M"} for product in self.products[:count]
+            ]
+        }
+
+    def test_get_cart_query_count_is_constant(self):
+        for count in (2, 20):
+            self.fill_cart(count)
+            with self.assertNumQueries(3):
+                response = self.client.get("/api/sales/cart/")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["items"]), count)
+        first = response.data["items"][0]["product_detail"]
+        self.assertEqual(first["image"], f"https://img.example.com/{self.products[0].pk}/1.jpg")
+
+    def test_post_cart_query_count_is_constant(self):
+        for count in (2, 20):
+            # One existing line is updated, the others inserted, the stale "S" line deleted
+            self.fill_cart(1)
+            CartItem.objects.create(cart=self.user.cart, product=self.products[0], quantity=1, selected_size="S", selected_color="")
+            with self.assertNumQueries(9):
+                response = self.client.post("/api/sales/cart/", self.payload(count), format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(response.data["items"]), count)
+            self.assertEqual({item["quantity"] for item in response.data["items"]}, {"2.000"})
+        self.assertEqual(CartItem.objects.filter(cart__user=self.user).count(), 20)
+
+    def test_post_cart_without_conflict_target_updates_then_inserts(self):
+        # MySQL cannot name the conflict target, so existing lines are updated and new ones inserted
+        self.fill_cart(2)
+        CartItem.objects.create(cart=self.user.cart, product=self.products[0], quantity=1, selected_size="S", selected_color="")
+        kept = dict(CartItem.objects.filter(selected_size="M").values_list("product_id", "pk"))
+        with mock.patch.object(connection.features, "supports_update_conflicts_with_target", False):
+            with self.assertNumQueries(11):
+                response = self.client.post("/api/sales/cart/", self.payload(5, quantity=3), format="json")
+        self.assertEqual(response.status_code, 200)
+        rows = CartItem.objects.filter(cart__user=self.user).order_by("product_id")
+        self.assertEqual([(row.product_id, row.selected_size, row.quantity) for row in rows], [(p.pk, "M", 3) for p in self.products[:5]])
+        # Lines that were already in the cart keep their rows
+        self.assertEqual({row.product_id: row.pk for row in rows[:2]}, kept)
+
+    def test_post_cart_rejects_unknown_product(self):
+        response = self.client.post(
+            "/api/sales/cart/", {"items": [{"product_id": 999999, "quantity": 1}]}, format="json"
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class CustomerSummaryTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Contact.objects.create(
+            contact_name="Summary Customer", contact_type="customer", email="summary@example.com", mobile="1"
+        )
+        cls.user = User.objects.create_user(
+            username="summary-user", email="summary-user@example.com", password="x", user_role="portal",
+            contact=cls.customer,
+        )
+        cls.term = PaymentTerm.objects.create(term_name="Net 30", net_days=30)
+        cls.product = Product.objects.create(
+            product_name="Summary Tee", product_code="SUM-1", product_category="men", product_type="tshirt",
+            sales_price=Decimal("100.00"), purchase_price=Decimal("60.00"),
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def checkout(self, quantity):
+        lines = [{"product_id": self.product.pk, "quantity": Decimal(quantity), "unit_price": Decimal("100"), "line_number": 1}]
+        return create_checkout({"customer": self.customer, "payment_term": self.term, "lines": lines}, user=self.user)
+
+    def summary(self):
+        response = self.client.get("/api/sales/me/summary/")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def assertMatchesRebuild(self):
+        stored = CustomerSummary.objects.filter(pk=self.customer.pk).values(
+            "order_count", "lifetime_value", "open_balance", "open_invoice_count", "last_order_date"
+        ).get()
+        self.assertEqual(stored, compute_customer_summaries([self.customer.pk])[self.customer.pk])
+
+    def test_checkout_payments_and_cancellation_keep_the_summary_current(self):
+        self.assertEqual(self.summary()["order_count"], 0)
+        order, first = self.checkout(1)
+        _, second = self.checkout(2)
+        self.assertMatchesRebuild()
+        summary = self.summary()
+        self.assertEqual(summary["order_count"], 2)
+        self.assertEqual(Decimal(summary["lifetime_value"]), first.total_amount + second.total_amount)
+        self.assertEqual(summary["open_invoice_count"], 2)
+        self.assertEqual(str(summary["last_order_date"]), str(order.order_date))
+
+        record_customer_payment({first.pk: first.total_amount}, user=self.user)
+        reconcile_statement([{"amount": "50", "reference": second.invoice_number}])
+        self.assertMatchesRebuild()
+        summary = self.summary()
+        self.assertEqual(summary["open_invoice_count"], 1)
+        self.assertEqual(Decimal(summary["open_balance"]), second.total_amount - Decimal("50"))
+
+        response = self.client.patch(f"/api/sales/orders/{order.pk}/status/", {"order_status": "cancelled"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertMatchesRebuild()
+        self.assertEqual(self.summary()["order_count"], 1)
+
+    def test_first_postings_racing_for_the_summary_row_both_count(self):
+        self.checkout(1)
+        CustomerSummary.objects.filter(pk=self.customer.pk).delete()
+        first_only = compute_customer_summaries([self.customer.pk])[self.customer.pk]
+        bulk_create = CustomerSummary.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Another transaction posting the first order commits its row after this one found none
+            if not CustomerSummary.objects.filter(pk=self.customer.pk).exists():
+                CustomerSummary.objects.create(contact=self.customer, **first_only)
+            return bulk_create(objs, **kwargs)
+
+        with mock.patch.object(CustomerSummary.objects, "bulk_create", side_effect=racing_bulk_create):
+            self.checkout(2)
+        self.assertMatchesRebuild()
+        self.assertEqual(CustomerSummary.objects.get(pk=self.customer.pk).order_count, 2)
+
+    def test_missing_row_of_a_customer_with_history_is_recomputed(self):
+        self.checkout(1)
+        CustomerSummary.objects.filter(pk=self.customer.pk).delete()
+        self.checkout(3)
+        self.assertMatchesRebuild()
+
+    def test_checkout_dates_follow_the_local_calendar(self):
+        # 20:00 UTC on 31 Jan is already 1 Feb in Asia/Kolkata
+        late = datetime(2026, 1, 31, 20, 0, tzinfo=dt_timezone.utc)
+        with override_settings(TIME_ZONE="Asia/Kolkata"), mock.patch("django.utils.timezone.now", return_value=late):
+            order, invoice = self.checkout(1)
+        self.assertEqual((order.order_date, invoice.invoice_date), (date(2026, 2, 1), date(2026, 2, 1)))
+        self.assertMatchesRebuild()
+
+    def test_rebuild_command_finds_and_fixes_drift(self):
+        self.checkout(1)
+        call_command("rebuild_customer_summaries", "--check", stdout=StringIO())
+        CustomerSummary.objects.filter(pk=self.customer.pk).update(order_count=7, open_balance=0)
+        with self.assertRaisesMessage(CommandError, "1 summaries out of date"):
+            call_command("rebuild_customer_summaries", "--check", stdout=StringIO())
+        call_command("rebuild_customer_summaries", "--contact", str(self.customer.pk), stdout=StringIO())
+        self.assertMatchesRebuild()
@@ -6,6 +6,7 @@ from .views import (
     VendorInvoiceListView,
     CheckoutView,
     PublicContactLookupView,
+    CustomerSummaryView,
     SalesOrderStatusUpdateView,
     CartView,
     CustomerListForOrdersView,
@@ -21,6 +22,7 @@ urlpatterns = [
     path("vendor/invoices/", VendorInvoiceListView.as_view(), name="vendor-invoices"),
     path("checkout/", CheckoutView.as_view(), name="checkout"),
     path("me/contact/", PublicContactLookupView.as_view(), name="contact-lookup"),
+    path("me/summary/", CustomerSummaryView.as_view(), name="customer-summary"),
     path("customers/", CustomerListForOrdersView.as_view(), name="order-customers"),
     path("cart/", CartView.as_view(), name="cart"),
     path("reports/invoices-bills.pdf", InvoiceReportPdfView.as_view(), name="invoice-bill-report"),
@@ -1,22 +1,26 @@
 from rest_framework import generics, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
-from django.db.models import Prefetch
+from django.db import connection, transaction
+from django.db.models import Prefetch, prefetch_related_objects
 from accounts.serializers import ContactSerializer
-from accounts.models import Contact
-from catalog.models import Product
+from accounts.models import Contact, User
+from catalog.models import Product, ProductImage
 from accounts.permissions import IsVendorUser
 from purchases.models import VendorBill, PurchaseOrderLine
-from .models import SalesOrder, CustomerInvoice, Cart, CartItem, SalesOrderLine
+from .models import SalesOrder, CustomerInvoice, Cart, CartItem, SalesOrderLine, CustomerSummary
 from .serializers import (
     SalesOrderSerializer,
     CustomerInvoiceSerializer,
     CheckoutSerializer,
     CartSerializer,
     SalesOrderDetailSerializer,
+    CustomerSummarySerializer,
+    CART_IMAGE_ORDERING,
 )
-from .services import create_checkout
+from .services import create_checkout, sync_customer_summaries
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
 from io import BytesIO
 from django.http import HttpResponse
 
@@ -36,7 +40,7 @@ class SalesOrderListView(generics.ListAPIView):
 
     def get_queryset(self):
         return (
-            SalesOrder.objects.filter(customer__users=self.request.user)
+            SalesOrder.objects.filter(customer_id=self.request.user.contact_id)
             .prefetch_related(
                 "lines",
                 "lines__product",
@@ -53,11 +57,11 @@ class SalesOrderDetailView(generics.RetrieveAPIView):
 
     def get_queryset(self):
         return (
-            SalesOrder.objects.filter(customer__users=self.request.user)
+            SalesOrder.objects.filter(customer_id=self.request.user.contact_id)
             .prefetch_related(
                 "lines",
                 "lines__product",
-                Prefetch("invoices"),
+                Prefetch("invoices", queryset=CustomerInvoice.objects.select_related("customer", "payment_term")),
                 Prefetch("status_logs"),
             )
             .order_by("-created_at")
@@ -69,7 +73,11 @@ class CustomerInvoiceListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return CustomerInvoice.objects.filter(customer__users=self.request.user).order_by("-created_at")
+        return (
+            CustomerInvoice.objects.filter(customer_id=self.request.user.contact_id)
+            .select_related("customer", "payment_term")
+            .order_by("-created_at")
+        )
 
 
 class VendorInvoiceListView(generics.ListAPIView):
@@ -110,8 +118,10 @@ class CheckoutView(generics.GenericAPIView):
                     email=request.user.email or f"user-{request.user.user_id}@example.com",
                     mobile="",
                 )
-                request.user.contact = contact
-                request.user.save(update_fields=["contact"])
+                # request.user may be a cached principal; save through the row so the cache is invalidated
+                user = User.objects.get(pk=request.user.pk)
+                user.contact = contact
+                user.save(update_fields=["contact"])
                 data["customer_id"] = contact.contact_id
         serializer = self.get_serializer(data=data)
         serializer.is_valid(raise_exception=True)
@@ -120,6 +130,7 @@ class CheckoutView(generics.GenericAPIView):
         except Exception as exc:  # pragma: no cover - defensive
             # Surface the error to the client instead of a 500
             return Response({"detail": str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        prefetch_related_objects([order], "lines__product", "status_logs")
         return Response(
             {
                 "order": SalesOrderSerializer(order).data,
@@ -138,6 +149,23 @@ class PublicContactLookupView(generics.GenericAPIView):
         return Response(ContactSerializer(request.user.contact).data)
 
 
+class CustomerSummaryView(generics.GenericAPIView):
+    """Portal dashboard totals for the current user's contact: one row read from customer_summaries."""
+
+    serializer_class = CustomerSummarySerializer
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        contact_id = request.user.contact_id
+        if contact_id is None:
+            return Response({"detail": "No contact linked to this user"}, status=status.HTTP_404_NOT_FOUND)
+        summary = CustomerSummary.objects.filter(pk=contact_id).first()
+        if summary is None:
+            sync_customer_summaries([contact_id])
+            summary = CustomerSummary.objects.get(pk=contact_id)
+        return Response(CustomerSummarySerializer(summary).data)
+
+
 class CustomerListForOrdersView(generics.ListAPIView):
     """
     For vendor/internal users to select any portal customer for sale orders.
@@ -161,7 +189,7 @@ class SalesOrderStatusUpdateView(generics.GenericAPIView):
 
     def patch(self, request, pk, *args, **kwargs):
         order = get_object_or_404(
-            SalesOrder.objects.filter(customer__users=request.user), pk=pk
+            SalesOrder.objects.filter(customer_id=request.user.contact_id), pk=pk
         )
         new_status = request.data.get("order_status")
         allowed = {"confirmed", "invoiced", "completed", "cancelled"}
@@ -177,9 +205,12 @@ class SalesOrderStatusUpdateView(generics.GenericAPIView):
             sales_order=order,
             previous_status=previous_status,
             new_status=new_status,
-            changed_by=request.user,
+            changed_by_id=request.user.pk,
             note="Updated by customer",
         )
+        if "cancelled" in (previous_status, new_status) and previous_status != new_status:
+            sync_customer_summaries([order.customer_id])
+        prefetch_related_objects([order], "lines__product", "status_logs")
         return Response(SalesOrderSerializer(order).data)
 
 
@@ -188,11 +219,22 @@ class CartView(generics.GenericAPIView):
     serializer_class = CartSerializer
 
     def get_cart(self, user):
-        cart, _ = Cart.objects.get_or_create(user=user)
+        cart, _ = Cart.objects.get_or_create(user_id=user.pk)
+        return cart
+
+    def load_items(self, cart):
+        """Items, products and each product's primary image in two queries, whatever the cart size."""
+        images = ProductImage.objects.only("image_id", "product_id", "image_url").order_by(*CART_IMAGE_ORDERING)
+        items = (
+            CartItem.objects.select_related("product")
+            .prefetch_related(Prefetch("product__images", queryset=images[:1], to_attr="cart_images"))
+            .order_by("cart_item_id")
+        )
+        prefetch_related_objects([cart], Prefetch("items", queryset=items))
         return cart
 
     def get(self, request, *args, **kwargs):
-        cart = self.get_cart(request.user)
+        cart = self.load_items(self.get_cart(request.user))
         return Response(CartSerializer(cart).data)
 
     def post(self, request, *args, **kwargs):
@@ -200,8 +242,9 @@ class CartView(generics.GenericAPIView):
         items = request.data.get("items")
         if items is None or not isinstance(items, list):
             return Response({"detail": "items must be a list"}, status=status.HTTP_400_BAD_REQUEST)
-        cart.items.all().delete()
-        created_items = []
+
+        # The payload is the whole cart; the last entry wins for a repeated product/size/color
+        wanted = {}
         for item in items:
             try:
                 product_id = int(item.get("product_id"))
@@ -210,21 +253,51 @@ class CartView(generics.GenericAPIView):
                 return Response({"detail": "Invalid product or quantity"}, status=status.HTTP_400_BAD_REQUEST)
             if not product_id or quantity is None:
                 return Response({"detail": "product_id and quantity are required"}, status=status.HTTP_400_BAD_REQUEST)
-            product = Product.objects.filter(pk=product_id).first()
-            if not product:
-                return Response({"detail": f"Product {product_id} not found"}, status=status.HTTP_400_BAD_REQUEST)
-            created_items.append(
-                CartItem(
-                    cart=cart,
-                    product=product,
-                    quantity=quantity,
-                    selected_size=item.get("selected_size") or "",
-                    selected_color=item.get("selected_color") or "",
+            key = (product_id, item.get("selected_size") or "", item.get("selected_color") or "")
+            wanted[key] = quantity
+
+        product_ids = {key[0] for key in wanted}
+        found = set(Product.objects.filter(pk__in=product_ids).values_list("pk", flat=True))
+        missing = sorted(product_ids - found)
+        if missing:
+            return Response({"detail": f"Product {missing[0]} not found"}, status=status.HTTP_400_BAD_REQUEST)
+
+        upsert = connection.features.supports_update_conflicts_with_target
+        with transaction.atomic():
+            if not upsert:
+                # Serialise writers to this cart so two requests cannot insert the same new line
+                list(Cart.objects.select_for_update().filter(pk=cart.pk).values_list("pk", flat=True))
+            existing = {
+                tuple(key): pk
+                for pk, *key in cart.items.values_list("pk", "product_id", "selected_size", "selected_color")
+            }
+            stale = [pk for key, pk in existing.items() if key not in wanted]
+            if stale:
+                CartItem.objects.filter(pk__in=stale).delete()
+            rows = [
+                CartItem(cart=cart, product_id=product_id, quantity=quantity, selected_size=size, selected_color=color)
+                for (product_id, size, color), quantity in wanted.items()
+            ]
+            if rows and upsert:
+                CartItem.objects.bulk_create(
+                    rows,
+                    update_conflicts=True,
+                    unique_fields=["cart", "product", "selected_size", "selected_color"],
+                    update_fields=["quantity", "updated_at"],
                 )
-            )
-        CartItem.objects.bulk_create(created_items)
-        cart.refresh_from_db()
-        return Response(CartSerializer(cart).data, status=status.HTTP_200_OK)
+            elif rows:
+                # No ON CONFLICT target (MySQL): update the lines read above, insert the rest
+                now = timezone.now()
+                kept = []
+                for row in rows:
+                    row.pk = existing.get((row.product_id, row.selected_size, row.selected_color))
+                    row.updated_at = now
+                    if row.pk is not None:
+                        kept.append(row)
+                if kept:
+                    CartItem.objects.bulk_update(kept, ["quantity", "updated_at"])
+                CartItem.objects.bulk_create([row for row in rows if row.pk is None])
+        return Response(CartSerializer(self.load_items(cart)).data, status=status.HTTP_200_OK)
 
 
 class InvoiceReportPdfView(generics.GenericAPIView):
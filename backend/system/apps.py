@@ -4,3 +4,13 @@ from django.apps import AppConfig
 class SystemConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "system"
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        from .audit import connect_audit_signals
+
+        connect_audit_signals()
+
+        from .metrics import install_drf_timing
+
+        install_drf_timing()
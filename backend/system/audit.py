@@ -0,0 +1,347 @@
+"""
+Audit trail for business documents.
+
+Model signals capture field-level diffs of the models in AUDITED_MODELS.
+Old values come from a snapshot taken when the instance is loaded, so no
+extra read is made. Events are released when their transaction
+commits; rolled-back changes are never audited. Released events go to an
+AuditWriter, which bulk_creates AuditLog rows from a background thread
+(AUDIT_LOG_MODE="async") or in the committing thread ("sync").
+
+Writes that bypass model signals (bulk_create, queryset.update, raw SQL)
+are not captured; services doing those can call audit_event() directly.
+In "sync" mode every row is its own INSERT, so it is meant for tests and
+debugging.
+
+A batch whose INSERT fails is retried on later flushes, up to
+AUDIT_LOG_MAX_ATTEMPTS writes, and then appended to AUDIT_LOG_SPILL_PATH
+as JSON lines, which `manage.py loaddata <file>` loads back. Rows are
+only lost if that file cannot be written either (logged as an error), or
+if the process dies with rows still queued.
+"""
+
+import atexit
+import collections
+import contextvars
+import datetime
+import decimal
+import logging
+import os
+import queue
+import threading
+import uuid
+
+from django.apps import apps
+from django.conf import settings
+from django.core import serializers
+from django.db import close_old_connections, connection, transaction
+from django.db.backends.utils import format_number
+from django.db.models import DecimalField
+from django.db.models.signals import post_delete, post_init, post_save
+from django.utils import timezone
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+# "app_label.Model" -> fields to track (None = every concrete field)
+AUDITED_MODELS = {
+    "sales.SalesOrder": None,
+    "sales.CustomerInvoice": None,
+    "purchases.PurchaseOrder": None,
+    "purchases.VendorBill": None,
+    "payments.Payment": None,
+    "payments.PaymentAllocation": None,
+    "pricing.CouponCode": None,
+    "inventory.StockMovement": None,
+    "catalog.Product": ("current_stock", "minimum_stock"),
+}
+# Bumped on every save; a diff of only these is not a change
+IGNORED_FIELDS = ("created_at", "updated_at")
+
+_request = contextvars.ContextVar("audit_request", default=None)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def set_audit_request(request):
+    """Attach the current HTTP request (user, IP, user agent) to events; returns a reset token."""
+    return _request.set(request)
+
+
+def reset_audit_request(token):
+    _request.reset(token)
+
+
+def _request_context():
+    request = _request.get()
+    if request is None:
+        return {}
+    user = getattr(request, "user", None)
+    forwarded = request.META.get("HTTP_X_FORWARDED_FOR", "")
+    return {
+        "changed_by": user.pk if user is not None and user.is_authenticated else None,
+        "ip_address": (forwarded.split(",")[0].strip() or request.META.get("REMOTE_ADDR") or "")[:45] or None,
+        "user_agent": request.META.get("HTTP_USER_AGENT") or None,
+    }
+
+
+def _jsonable(value):
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (bytes, memoryview)):
+        return None
+    return value
+
+
+class AuditWriter:
+    """
+    Bounded buffer of AuditLog rows flushed with bulk_create.
+
+    In async mode a daemon thread flushes every ``flush_seconds`` or once
+    ``batch_size`` rows are waiting. When the queue holds ``max_queue``
+    rows, a producer waits up to ``block_seconds`` for room. After that it
+    writes its own rows synchronously, so back-pressure slows writers down
+    instead of dropping audit rows.
+
+    A failed batch is kept and retried before newer rows on the next flush
+    (or the next sync submit). After ``max_attempts`` failed writes it is
+    appended to ``spill_path`` in the "jsonl" serialization format.
+    """
+
+    def __init__(
+        self,
+        batch_size=500,
+        flush_seconds=1.0,
+        max_queue=10000,
+        block_seconds=0.05,
+        max_attempts=5,
+        spill_path=None,
+    ):
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.block_seconds = block_seconds
+        self.max_attempts = max_attempts
+        self.spill_path = spill_path
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._failed = collections.deque()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._wake = threading.Event()
+        self.stats = {
+            "enqueued": 0, "written": 0, "batches": 0, "sync_writes": 0, "errors": 0, "spilled": 0, "dropped": 0,
+        }
+
+    def _ensure_thread(self):
+        # Started lazily, and again in a forked worker (threads do not survive fork)
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="audit-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, rows, mode="async"):
+        if not rows:
+            return
+        if mode == "sync":
+            self._retry_failed()
+            self._write(rows)
+            return
+        self._ensure_thread()
+        for index, row in enumerate(rows):
+            try:
+                self._queue.put(row, timeout=self.block_seconds)
+            except queue.Full:
+                self.stats["sync_writes"] += 1
+                self._write(rows[index:])
+                return
+            self.stats["enqueued"] += 1
+        if self._queue.qsize() >= self.batch_size:
+            self._wake.set()
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, rows, attempt=1):
+        try:
+            AuditLog.objects.bulk_create(rows, batch_size=self.batch_size)
+        except Exception:
+            self.stats["errors"] += 1
+            if attempt < self.max_attempts:
+                logger.warning(
+                    "Could not write %d audit rows (attempt %d of %d), retrying later",
+                    len(rows), attempt, self.max_attempts, exc_info=True,
+                )
+                self._failed.append((rows, attempt + 1))
+            else:
+                logger.exception("Could not write %d audit rows after %d attempts", len(rows), attempt)
+                self._spill(rows)
+            return
+        self.stats["written"] += len(rows)
+        self.stats["batches"] += 1
+
+    def _retry_failed(self):
+        # One pass: batches that fail again go to the back for the next flush
+        for _ in range(len(self._failed)):
+            try:
+                rows, attempt = self._failed.popleft()
+            except IndexError:
+                return
+            self._write(rows, attempt)
+
+    def _spill(self, rows):
+        if not self.spill_path:
+            self.stats["dropped"] += len(rows)
+            logger.error("Dropped %d audit rows: no spill file configured", len(rows))
+            return
+        now = timezone.now()
+        for row in rows:
+            row.pk = None
+            row.changed_at = row.changed_at or now
+        try:
+            data = serializers.serialize("jsonl", rows)
+            with self._spill_lock, open(self.spill_path, "a", encoding="utf-8") as fp:
+                fp.write(data)
+        except Exception:
+            self.stats["dropped"] += len(rows)
+            logger.exception("Dropped %d audit rows: could not append them to %s", len(rows), self.spill_path)
+            return
+        self.stats["spilled"] += len(rows)
+        logger.error("Spilled %d audit rows to %s; load them with `manage.py loaddata`", len(rows), self.spill_path)
+
+    def flush(self):
+        """Write everything queued so far, retrying failed batches (used at exit and in tests)."""
+        while True:
+            self._retry_failed()
+            batch = self._drain()
+            if batch:
+                self._write(batch)
+            elif not self._failed:
+                return
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_seconds)
+            self._wake.clear()
+            close_old_connections()
+            self._retry_failed()
+            while True:
+                batch = self._drain()
+                if not batch:
+                    break
+                self._write(batch)
+
+    def pending(self):
+        return self._queue.qsize() + sum(len(rows) for rows, _ in list(self._failed))
+
+
+writer = AuditWriter(
+    batch_size=_setting("AUDIT_LOG_BATCH_SIZE", 500),
+    flush_seconds=_setting("AUDIT_LOG_FLUSH_SECONDS", 1.0),
+    max_queue=_setting("AUDIT_LOG_MAX_QUEUE", 10000),
+    max_attempts=_setting("AUDIT_LOG_MAX_ATTEMPTS", 5),
+    spill_path=_setting("AUDIT_LOG_SPILL_PATH", None),
+)
+atexit.register(writer.flush)
+
+
+def audit_event(table_name, record_id, action_type, old_values=None, new_values=None, changed_by=None):
+    """
+    Queue one AuditLog row. It is handed to the writer when the current
+    transaction (or savepoint) commits and dropped if it rolls back.
+    """
+    mode = _setting("AUDIT_LOG_MODE", "async")
+    if mode == "off":
+        return
+    if mode == "async" and connection.vendor == "sqlite":
+        # SQLite has one writer; a second connection would make committing transactions fail with "locked"
+        mode = "sync"
+    context = _request_context()
+    if changed_by is not None:
+        context["changed_by"] = changed_by
+    row = AuditLog(
+        table_name=table_name,
+        record_id=record_id,
+        action_type=action_type,
+        old_values=old_values,
+        new_values=new_values,
+        **context,
+    )
+    transaction.on_commit(lambda: writer.submit([row], mode=mode))
+
+
+def _field_value(field, instance):
+    value = getattr(instance, field.attname)
+    if isinstance(field, DecimalField) and value is not None:
+        # 7 and Decimal("7.000") must not show up as a change
+        try:
+            return format_number(decimal.Decimal(value), field.max_digits, field.decimal_places)
+        except (decimal.InvalidOperation, TypeError, ValueError):
+            return str(value)
+    return _jsonable(value)
+
+
+def _tracked_values(instance, fields):
+    deferred = instance.get_deferred_fields()
+    return {f.attname: _field_value(f, instance) for f in fields if f.attname not in deferred}
+
+
+def _make_receivers(model, field_names):
+    fields = [
+        f
+        for f in model._meta.concrete_fields
+        if (field_names is None or f.name in field_names) and f.name not in IGNORED_FIELDS
+    ]
+    table = model._meta.db_table
+
+    def on_init(sender, instance, **kwargs):
+        instance._audit_snapshot = _tracked_values(instance, fields) if instance.pk is not None else None
+
+    def on_save(sender, instance, created, raw=False, **kwargs):
+        if raw:
+            return
+        new = _tracked_values(instance, fields)
+        old = getattr(instance, "_audit_snapshot", None)
+        if created or old is None:
+            if created:
+                audit_event(table, instance.pk, "INSERT", None, new)
+        else:
+            changed = [k for k, v in new.items() if k in old and old[k] != v]
+            if changed:
+                audit_event(table, instance.pk, "UPDATE", {k: old[k] for k in changed}, {k: new[k] for k in changed})
+        instance._audit_snapshot = new
+
+    def on_delete(sender, instance, **kwargs):
+        old = getattr(instance, "_audit_snapshot", None) or _tracked_values(instance, fields)
+        audit_event(table, instance.pk, "DELETE", old, None)
+
+    return on_init, on_save, on_delete
+
+
+def connect_audit_signals():
+    for label, field_names in AUDITED_MODELS.items():
+        try:
+            model = apps.get_model(label)
+        except LookupError:
+            continue
+        on_init, on_save, on_delete = _make_receivers(model, field_names)
+        post_init.connect(on_init, sender=model, weak=False, dispatch_uid=f"audit-init-{label}")
+        post_save.connect(on_save, sender=model, weak=False, dispatch_uid=f"audit-save-{label}")
+        post_delete.connect(on_delete, sender=model, weak=False, dispatch_uid=f"audit-delete-{label}")
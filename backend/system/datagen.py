@@ -0,0 +1,680 @@
+"""
+Synthetic data for benchmarks and load tests.
+
+Every generator draws from a seeded random.Random, so a seed always gives
+the same rows, and writes with bulk inserts in batches. Generated rows are
+tagged with a prefix derived from the seed (codes, emails, numbers), which
+lets a second run on the same database find and reuse them.
+
+generate_dataset() builds a production-shaped history for the
+generate_dataset command: product and customer popularity follow a Zipf
+law, daily volumes follow the season and the weekday, and days are played
+in order so stock ledgers, receipts, bills and payments line up. Keys are
+allocated up front so child rows need no lookups, and rows go in with COPY
+on PostgreSQL.
+"""
+
+import heapq
+import random
+import time
+from bisect import bisect
+from collections import Counter
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate, count
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.models import Contact, User
+from catalog.models import Product
+from catalog.services import write_product_batch, write_rows
+from inventory.models import StockMovement
+from payments.models import Payment, PaymentAllocation
+from pricing.models import CouponCode, DiscountOffer, PaymentTerm
+from purchases.models import PurchaseOrder, PurchaseOrderLine, VendorBill
+from sales.models import CustomerInvoice, CustomerSummary, SalesOrder, SalesOrderLine
+from sales.services import sync_customer_summaries
+
+BATCH_SIZE = 2000
+COLORS = ("Black", "White", "Navy", "Red", "Olive", "Grey", "Beige", "Maroon", "Mustard", "Teal")
+MATERIALS = ("Cotton", "Linen", "Denim", "Wool", "Polyester", "Silk", "Rayon")
+CITIES = ("Mumbai", "Delhi", "Bengaluru", "Pune", "Chennai", "Kolkata", "Hyderabad", "Ahmedabad", "Jaipur", "Surat")
+# Shared by every generated user; hashing once keeps user creation cheap
+DEFAULT_PASSWORD = "Bench#12345"
+# Relative order volume per calendar month: festive season (Oct-Nov), year-end and
+# mid-year sales above average, the post-festive lull below
+MONTH_WEIGHTS = (1.1, 0.8, 0.9, 0.9, 1.0, 1.1, 1.2, 1.0, 1.1, 1.6, 1.8, 1.3)
+WEEKEND_WEIGHT = 1.3
+# Zipf exponents: a few bestsellers and regulars carry most of the volume
+PRODUCT_SKEW = 1.1
+CUSTOMER_SKEW = 0.8
+CUSTOMER_METHODS = (("upi", 40), ("credit_card", 20), ("debit_card", 15), ("wallet", 10), ("bank_transfer", 10), ("cash", 5))
+
+
+def dataset_prefix(seed):
+    return f"LT{seed}"
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start : start + size]
+
+
+def _choices(model_choices):
+    return [value for value, _ in model_choices]
+
+
+def generate_contacts(count, rng, prefix, contact_type="customer", batch_size=BATCH_SIZE):
+    """Create ``count`` contacts; returns their ids in creation order."""
+    tag = prefix.lower()
+    emails = [f"{tag}-{contact_type}-{n}@example.com" for n in range(count)]
+    for chunk in _chunks(list(enumerate(emails)), batch_size):
+        Contact.objects.bulk_create(
+            [
+                Contact(
+                    contact_name=f"{contact_type.title()} {prefix}-{n}",
+                    contact_type=contact_type,
+                    email=email,
+                    mobile=f"9{rng.randrange(10**9):09d}",
+                    city=rng.choice(CITIES),
+                )
+                for n, email in chunk
+            ]
+        )
+    ids = {}
+    for chunk in _chunks(emails, batch_size):
+        ids.update(Contact.objects.filter(email__in=chunk).values_list("email", "pk"))
+    return [ids[email] for email in emails]
+
+
+def generate_users(contact_ids, prefix, user_role="portal", batch_size=BATCH_SIZE):
+    """One login per contact (username ``<prefix>-<role>-<n>``, password DEFAULT_PASSWORD); returns users."""
+    password = make_password(DEFAULT_PASSWORD)
+    tag = prefix.lower()
+    for chunk in _chunks(list(enumerate(contact_ids)), batch_size):
+        User.objects.bulk_create(
+            [
+                User(
+                    username=f"{tag}-{user_role}-{n}",
+                    email=f"{tag}-{user_role}-{n}@users.example.com",
+                    password=password,
+                    user_role=user_role,
+                    contact_id=contact_id,
+                    is_staff=user_role == "internal",
+                )
+                for n, contact_id in chunk
+            ]
+        )
+    return list(User.objects.filter(username__startswith=f"{tag}-{user_role}-").order_by("pk"))
+
+
+def generate_products(count, rng, prefix, batch_size=BATCH_SIZE):
+    """Published products with 1-4 colors and 1-3 images each; returns {product_id: sales_price}."""
+    categories = _choices(Product.CATEGORY_CHOICES)
+    types = _choices(Product.TYPE_CHOICES)
+    prices = {}
+    for chunk in _chunks(range(count), batch_size):
+        entries = []
+        for n in chunk:
+            price = Decimal(rng.randrange(299, 4999))
+            code = f"{prefix}-P{n:07d}"
+            entries.append(
+                {
+                    "product_name": f"{rng.choice(MATERIALS)} {rng.choice(types).title()} {n}",
+                    "product_code": code,
+                    "product_category": rng.choice(categories),
+                    "product_type": rng.choice(types),
+                    "material": rng.choice(MATERIALS),
+                    "sales_price": price,
+                    "sales_tax_percentage": Decimal("5.00"),
+                    "purchase_price": (price * Decimal("0.55")).quantize(Decimal("1.00")),
+                    "current_stock": Decimal(rng.randrange(0, 500)),
+                    "is_published": True,
+                    "colors": rng.sample(COLORS, rng.randint(1, 4)),
+                    "images": [f"https://img.example.com/{code}/{i}.jpg" for i in range(rng.randint(1, 3))],
+                }
+            )
+        ids = write_product_batch(entries, upsert=False)["ids"]
+        prices.update({ids[entry["product_code"]]: entry["sales_price"] for entry in entries})
+    return prices
+
+
+def generate_coupons(count, prefix, offer, contact_ids=(), batch_size=BATCH_SIZE):
+    """Coupons ``<prefix>-C<n>`` that can be used many times; returns their codes."""
+    codes = [f"{prefix}-C{n:07d}" for n in range(count)]
+    contacts = list(contact_ids)
+    for chunk in _chunks(list(enumerate(codes)), batch_size):
+        CouponCode.objects.bulk_create(
+            [
+                CouponCode(
+                    discount_offer=offer,
+                    coupon_code=code,
+                    expiration_date=offer.end_date,
+                    contact_id=contacts[n % len(contacts)] if contacts else None,
+                    max_usage_count=1_000_000,
+                )
+                for n, code in chunk
+            ]
+        )
+    return codes
+
+
+def generate_orders(count, rng, prefix, customer_ids, product_prices, term, max_lines=5, days=365,
+                    batch_size=BATCH_SIZE):
+    """
+    Confirmed website orders of 1..max_lines lines over the last ``days``
+    days, each with an open invoice. Returns the number of lines written.
+    """
+    product_ids = list(product_prices)
+    today = timezone.localdate()
+    line_count = 0
+    for chunk in _chunks(range(count), batch_size):
+        orders, lines, invoices = [], {}, []
+        for n in chunk:
+            number = f"{prefix}-SO{n:08d}"
+            picked = rng.sample(product_ids, min(len(product_ids), rng.randint(1, max_lines)))
+            order_lines = []
+            subtotal = tax = Decimal("0")
+            for line_number, product_id in enumerate(picked, start=1):
+                quantity = Decimal(rng.randint(1, 3))
+                price = product_prices[product_id]
+                line_subtotal = quantity * price
+                line_tax = (line_subtotal * Decimal("0.05")).quantize(Decimal("0.01"))
+                order_lines.append((product_id, line_number, quantity, price, line_subtotal, line_tax))
+                subtotal += line_subtotal
+                tax += line_tax
+            order_date = today - timedelta(days=rng.randrange(days))
+            orders.append(
+                SalesOrder(
+                    so_number=number,
+                    customer_id=rng.choice(customer_ids),
+                    payment_term=term,
+                    order_date=order_date,
+                    order_source="website",
+                    order_status="confirmed",
+                    subtotal=subtotal,
+                    tax_amount=tax,
+                    total_amount=subtotal + tax,
+                )
+            )
+            lines[number] = order_lines
+        with transaction.atomic():
+            SalesOrder.objects.bulk_create(orders)
+            ids = dict(SalesOrder.objects.filter(so_number__in=lines).values_list("so_number", "pk"))
+            SalesOrderLine.objects.bulk_create(
+                [
+                    SalesOrderLine(
+                        sales_order_id=ids[order.so_number],
+                        product_id=product_id,
+                        line_number=line_number,
+                        quantity=quantity,
+                        unit_price=price,
+                        tax_percentage=Decimal("5.00"),
+                        line_subtotal=line_subtotal,
+                        line_tax_amount=line_tax,
+                        line_total=line_subtotal + line_tax,
+                    )
+                    for order in orders
+                    for product_id, line_number, quantity, price, line_subtotal, line_tax in lines[order.so_number]
+                ],
+                batch_size=batch_size,
+            )
+            for order in orders:
+                invoices.append(
+                    CustomerInvoice(
+                        invoice_number=order.so_number.replace("-SO", "-INV"),
+                        sales_order_id=ids[order.so_number],
+                        customer_id=order.customer_id,
+                        payment_term=term,
+                        invoice_date=order.order_date,
+                        due_date=order.order_date + timedelta(days=term.net_days or 0),
+                        invoice_status="confirmed",
+                        subtotal=order.subtotal,
+                        tax_amount=order.tax_amount,
+                        total_amount=order.total_amount,
+                        remaining_amount=order.total_amount,
+                    )
+                )
+            CustomerInvoice.objects.bulk_create(invoices)
+        line_count += sum(len(order_lines) for order_lines in lines.values())
+    return line_count
+
+
+def generate_load_dataset(seed=1, customers=2000, products=5000, orders=5000, coupons=2000, users=50):
+    """
+    The dataset bench_api drives: customers (the first ``users`` of them
+    with logins), an internal user, a vendor, products, coupons and orders
+    with open invoices. Reuses the rows of an earlier run with the same seed.
+    Returns a summary with the ids and credentials the load test needs.
+    """
+    rng = random.Random(seed)
+    prefix = dataset_prefix(seed)
+    tag = prefix.lower()
+    term, _ = PaymentTerm.objects.get_or_create(term_name="Net 30", defaults={"net_days": 30})
+    today = timezone.localdate()
+    offer, _ = DiscountOffer.objects.get_or_create(
+        offer_name=f"{prefix} load test",
+        defaults={
+            "discount_percentage": Decimal("10"),
+            "start_date": today,
+            "end_date": today + timedelta(days=3650),
+            "available_on": "both",
+        },
+    )
+
+    if not Contact.objects.filter(email__startswith=f"{tag}-customer-").exists():
+        customer_ids = generate_contacts(customers, rng, prefix)
+        generate_users(customer_ids[:users], prefix)
+        vendor_ids = generate_contacts(1, rng, prefix, contact_type="vendor")
+        generate_users(vendor_ids, prefix, user_role="internal")
+        product_prices = generate_products(products, rng, prefix)
+        generate_coupons(coupons, prefix, offer, customer_ids)
+        generate_orders(orders, rng, prefix, customer_ids, product_prices, term)
+
+    customer_ids = list(
+        Contact.objects.filter(email__startswith=f"{tag}-customer-").order_by("pk").values_list("pk", flat=True)
+    )
+    return {
+        "prefix": prefix,
+        "customers": len(customer_ids),
+        "customer_users": list(User.objects.filter(username__startswith=f"{tag}-portal-").order_by("pk")),
+        "internal_user": User.objects.filter(username__startswith=f"{tag}-internal-").first(),
+        "vendor_id": Contact.objects.filter(email__startswith=f"{tag}-vendor-").values_list("pk", flat=True).first(),
+        "product_ids": list(
+            Product.objects.filter(product_code__startswith=f"{prefix}-P").order_by("pk").values_list("pk", flat=True)
+        ),
+        "coupon_codes": list(
+            CouponCode.objects.filter(coupon_code__startswith=f"{prefix}-C").values_list("coupon_code", flat=True)
+        ),
+        "open_invoice_ids": list(
+            CustomerInvoice.objects.filter(
+                invoice_number__startswith=f"{prefix}-INV", remaining_amount__gt=0
+            ).values_list("pk", flat=True)
+        ),
+        "payment_term_id": term.pk,
+    }
+
+
+class ZipfSampler:
+    """
+    Draws indexes in range(n) with P(rank k) proportional to 1 / k**s.
+    Ranks are shuffled onto indexes so popularity does not follow id order.
+    """
+
+    def __init__(self, n, s, rng):
+        self.cumulative = list(accumulate(1 / k**s for k in range(1, n + 1)))
+        self.ranked = list(range(n))
+        rng.shuffle(self.ranked)
+
+    def __call__(self, rng):
+        position = bisect(self.cumulative, rng.random() * self.cumulative[-1])
+        return self.ranked[min(position, len(self.ranked) - 1)]
+
+    def distinct(self, rng, k):
+        """Up to ``k`` different indexes (fewer if popular ones keep coming up)."""
+        picked = {}
+        for _ in range(k * 4):
+            picked.setdefault(self(rng), None)
+            if len(picked) == k:
+                break
+        return list(picked)
+
+
+def seasonal_counts(total, start, days, rng, growth=0.3):
+    """
+    Split ``total`` over ``days`` days from ``start`` by MONTH_WEIGHTS,
+    WEEKEND_WEIGHT and a linear ``growth`` over the period; returns daily counts.
+    """
+    weights = [
+        MONTH_WEIGHTS[day.month - 1] * (WEEKEND_WEIGHT if day.weekday() >= 5 else 1) * (1 + growth * i / days)
+        for i, day in enumerate(start + timedelta(days=i) for i in range(days))
+    ]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    cumulative = list(accumulate(weights))
+    for _ in range(total - sum(counts)):
+        counts[min(bisect(cumulative, rng.random() * cumulative[-1]), days - 1)] += 1
+    return counts
+
+
+def _money(paise):
+    return Decimal(paise).scaleb(-2)
+
+
+def _next_ids(model):
+    """Keys after the current maximum; rows carry explicit keys so children need no id lookups."""
+    top = model.objects.aggregate(top=Max(model._meta.pk.name))["top"] or 0
+    return count(top + 1)
+
+
+class _RowWriter:
+    """Buffers rows per model and writes them, parents first, once ``batch_size`` are pending."""
+
+    COLUMNS = {
+        Contact: ("contact_id", "contact_name", "contact_type", "email", "mobile", "city", "country", "is_active",
+                  "created_at", "updated_at"),
+        PurchaseOrder: ("purchase_order_id", "po_number", "vendor_id", "order_date", "expected_delivery_date",
+                        "po_status", "subtotal", "tax_amount", "total_amount", "confirmed_at", "created_at",
+                        "updated_at"),
+        PurchaseOrderLine: ("po_line_id", "purchase_order_id", "product_id", "line_number", "quantity", "unit_price",
+                            "tax_percentage", "line_subtotal", "line_tax_amount", "line_total", "received_quantity"),
+        # remaining_amount is computed by the database
+        VendorBill: ("vendor_bill_id", "bill_number", "purchase_order_id", "vendor_id", "invoice_date", "due_date",
+                     "bill_status", "subtotal", "tax_amount", "total_amount", "paid_amount", "vendor_reference",
+                     "created_at", "updated_at"),
+        SalesOrder: ("sales_order_id", "so_number", "customer_id", "payment_term_id", "order_date", "order_source",
+                     "order_status", "subtotal", "discount_amount", "tax_amount", "total_amount",
+                     "applied_discount_percentage", "shipping_city", "shipping_country", "confirmed_at", "created_at",
+                     "updated_at"),
+        SalesOrderLine: ("so_line_id", "sales_order_id", "product_id", "line_number", "quantity", "unit_price",
+                         "tax_percentage", "line_subtotal", "line_tax_amount", "line_total", "invoiced_quantity"),
+        CustomerInvoice: ("customer_invoice_id", "invoice_number", "sales_order_id", "customer_id", "payment_term_id",
+                          "invoice_date", "due_date", "invoice_status", "subtotal", "discount_amount", "tax_amount",
+                          "total_amount", "paid_amount", "remaining_amount", "early_payment_discount_applicable",
+                          "early_payment_discount_amount", "created_at", "updated_at"),
+        Payment: ("payment_id", "payment_number", "payment_type", "contact_id", "payment_date", "payment_method",
+                  "payment_amount", "payment_status", "created_at", "updated_at"),
+        PaymentAllocation: ("allocation_id", "payment_id", "customer_invoice_id", "vendor_bill_id", "allocated_amount",
+                            "allocation_date", "early_payment_discount_applied", "discount_amount_applied"),
+        StockMovement: ("movement_id", "product_id", "movement_type", "movement_date", "quantity", "movement_direction",
+                        "reference_type", "reference_id", "stock_before", "stock_after", "created_at", "updated_at"),
+    }
+
+    def __init__(self, batch_size, log=None):
+        self.batch_size = batch_size
+        self.log = log
+        self.rows = {model: [] for model in self.COLUMNS}
+        self.ids = {model: _next_ids(model) for model in self.COLUMNS}
+        self.pending = 0
+        self.written = Counter()
+        self.started = time.perf_counter()
+
+    def next_id(self, model):
+        return next(self.ids[model])
+
+    def add(self, model, row):
+        self.rows[model].append(row)
+        self.pending += 1
+
+    def flush(self, force=False):
+        if not self.pending or (self.pending < self.batch_size and not force):
+            return
+        with transaction.atomic():
+            for model, rows in self.rows.items():
+                write_rows(model._meta.db_table, self.COLUMNS[model], rows)
+                self.written[model._meta.db_table] += len(rows)
+                rows.clear()
+        self.pending = 0
+        if self.log:
+            total = sum(self.written.values())
+            self.log(f"  {total:,} rows ({total / (time.perf_counter() - self.started):,.0f}/s)")
+
+    def reset_sequences(self):
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(self.COLUMNS)):
+                cursor.execute(sql)
+
+
+class _History:
+    """Plays the dataset's days in order; see generate_dataset()."""
+
+    def __init__(self, rng, prefix, writer, customer_ids, vendor_ids, prices, terms, today):
+        self.rng = rng
+        self.prefix = prefix
+        self.writer = writer
+        self.customer_ids = customer_ids
+        self.vendor_ids = vendor_ids
+        self.product_ids = list(prices)
+        # product id -> (sales price, purchase price) in paise
+        self.prices = {
+            pk: (int(price * 100), int((price * Decimal("0.55")).quantize(Decimal("1.00")) * 100))
+            for pk, price in prices.items()
+        }
+        self.terms = terms
+        self.today = today
+        self.products = ZipfSampler(len(self.product_ids), PRODUCT_SKEW, rng)
+        self.customers = ZipfSampler(len(customer_ids), CUSTOMER_SKEW, rng)
+        self.methods, method_weights = zip(*CUSTOMER_METHODS)
+        self.method_weights = list(accumulate(method_weights))
+        self.stock = {}
+        # (day index, purchase order id, receipt) for received purchase orders, by arrival day
+        self.receipts = []
+        self.numbers = {kind: count(1) for kind in ("SO", "INV", "PO", "BILL", "PAY")}
+        self.stamps = {}
+
+    def number(self, kind):
+        return f"{self.prefix}-{kind}{next(self.numbers[kind]):09d}"
+
+    def stamp(self, day):
+        """created_at / updated_at for rows dated ``day`` (noon UTC), adapted for the database once per day."""
+        value = self.stamps.get(day)
+        if value is None:
+            value = self.stamps[day] = connection.ops.adapt_datetimefield_value(
+                datetime(day.year, day.month, day.day, 12, tzinfo=dt_timezone.utc)
+            )
+        return value
+
+    def _lines(self, size, price_index, quantity):
+        rng = self.rng
+        lines, subtotal, tax = [], 0, 0
+        for line_number, index in enumerate(self.products.distinct(rng, size), start=1):
+            product_id = self.product_ids[index]
+            qty = quantity(rng)
+            unit = self.prices[product_id][price_index]
+            line_subtotal = qty * unit
+            line_tax = (line_subtotal * 5 + 50) // 100
+            lines.append((product_id, line_number, qty, unit, line_subtotal, line_tax))
+            subtotal += line_subtotal
+            tax += line_tax
+        return lines, subtotal, tax
+
+    def move(self, product_id, quantity, direction, movement_type, reference_type, reference_id, day, stamp):
+        before = self.stock.get(product_id, 0)
+        after = before + quantity if direction == "in" else before - quantity
+        self.stock[product_id] = after
+        self.writer.add(
+            StockMovement,
+            (self.writer.next_id(StockMovement), product_id, movement_type, day, quantity, direction, reference_type,
+             reference_id, before, after, stamp, stamp),
+        )
+
+    def pay(self, payment_type, contact_id, amount, day, invoice_id=None, bill_id=None):
+        writer = self.writer
+        payment_id = writer.next_id(Payment)
+        if payment_type == "vendor_payment":
+            method = "bank_transfer"
+        else:
+            method = self.methods[bisect(self.method_weights, self.rng.random() * self.method_weights[-1])]
+        stamp = self.stamp(day)
+        writer.add(
+            Payment,
+            (payment_id, self.number("PAY"), payment_type, contact_id, day, method, _money(amount), "completed", stamp,
+             stamp),
+        )
+        writer.add(
+            PaymentAllocation,
+            (writer.next_id(PaymentAllocation), payment_id, invoice_id, bill_id, _money(amount), day, False, 0),
+        )
+
+    def settle(self, total, issued, net_days):
+        """(paid, payment date or None): most documents are paid in full around their terms, some in part."""
+        rng = self.rng
+        paid_on = issued + timedelta(days=int(rng.gammavariate(2.0, max(net_days, 4) / 2)))
+        if paid_on > self.today:
+            return 0, None
+        paid = total if rng.random() > 0.08 else total * rng.randint(30, 70) // 100
+        return paid, paid_on
+
+    def open_stock(self, day):
+        stamp = self.stamp(day)
+        for product_id in self.product_ids:
+            self.move(product_id, self.rng.randint(20, 200), "in", "adjustment", "adjustment", 0, day, stamp)
+
+    def purchase_order(self, day_index, day, stamp):
+        rng, writer = self.rng, self.writer
+        po_id = writer.next_id(PurchaseOrder)
+        number = self.number("PO")
+        vendor_id = rng.choice(self.vendor_ids)
+        lead = rng.randint(3, 21)
+        received = day + timedelta(days=lead) <= self.today
+        lines, subtotal, tax = self._lines(
+            min(10, 1 + int(rng.expovariate(0.4))), 1, lambda r: r.randint(2, 20) * 10
+        )
+        writer.add(
+            PurchaseOrder,
+            (po_id, number, vendor_id, day, day + timedelta(days=lead), "received" if received else "confirmed",
+             _money(subtotal), _money(tax), _money(subtotal + tax), stamp, stamp, stamp),
+        )
+        for product_id, line_number, qty, unit, line_subtotal, line_tax in lines:
+            writer.add(
+                PurchaseOrderLine,
+                (writer.next_id(PurchaseOrderLine), po_id, product_id, line_number, qty, _money(unit), 5,
+                 _money(line_subtotal), _money(line_tax), _money(line_subtotal + line_tax), qty if received else 0),
+            )
+        if received:
+            heapq.heappush(self.receipts, (day_index + lead, po_id, (number, vendor_id, lines, subtotal, tax)))
+
+    def receive(self, day, stamp):
+        _, po_id, (number, vendor_id, lines, subtotal, tax) = heapq.heappop(self.receipts)
+        for product_id, _, qty, *_ in lines:
+            self.move(product_id, qty, "in", "purchase", "purchase_order", po_id, day, stamp)
+        net_days = self.rng.choice((30, 45))
+        total = subtotal + tax
+        paid, paid_on = self.settle(total, day, net_days)
+        bill_id = self.writer.next_id(VendorBill)
+        self.writer.add(
+            VendorBill,
+            (bill_id, self.number("BILL"), po_id, vendor_id, day, day + timedelta(days=net_days),
+             "paid" if paid == total else "partially_paid" if paid else "confirmed", _money(subtotal), _money(tax),
+             _money(total), _money(paid), number, stamp, stamp),
+        )
+        if paid:
+            self.pay("vendor_payment", vendor_id, paid, paid_on, bill_id=bill_id)
+
+    def sales_order(self, day, stamp):
+        rng, writer = self.rng, self.writer
+        age = (self.today - day).days
+        so_id = writer.next_id(SalesOrder)
+        customer_id = self.customer_ids[self.customers(rng)]
+        term_id, net_days = rng.choice(self.terms)
+        lines, subtotal, tax = self._lines(min(8, 1 + int(rng.expovariate(0.7))), 0, lambda r: r.randint(1, 3))
+        total = subtotal + tax
+        roll = rng.random()
+        if roll < 0.03:
+            status = "cancelled"
+        elif age < 2 and roll < 0.08:
+            status = "draft"
+        elif age < 3:
+            status = "confirmed"
+        else:
+            status = "invoiced"
+        invoiced = status == "invoiced"
+
+        if invoiced:
+            issued = min(day + timedelta(days=rng.randint(0, 2)), self.today)
+            paid, paid_on = self.settle(total, issued, net_days)
+            if paid == total:
+                status = "completed"
+            invoice_id = writer.next_id(CustomerInvoice)
+            issued_stamp = self.stamp(issued)
+            writer.add(
+                CustomerInvoice,
+                (invoice_id, self.number("INV"), so_id, customer_id, term_id, issued, issued + timedelta(days=net_days),
+                 "paid" if paid == total else "partially_paid" if paid else "confirmed", _money(subtotal), 0,
+                 _money(tax), _money(total), _money(paid), _money(total - paid), False, 0, issued_stamp, issued_stamp),
+            )
+            if paid:
+                self.pay("customer_payment", customer_id, paid, paid_on, invoice_id=invoice_id)
+
+        writer.add(
+            SalesOrder,
+            (so_id, self.number("SO"), customer_id, term_id, day, "website" if rng.random() < 0.7 else "backend",
+             status, _money(subtotal), 0, _money(tax), _money(total), 0, rng.choice(CITIES), "India",
+             None if status in ("draft", "cancelled") else stamp, stamp, stamp),
+        )
+        for product_id, line_number, qty, unit, line_subtotal, line_tax in lines:
+            writer.add(
+                SalesOrderLine,
+                (writer.next_id(SalesOrderLine), so_id, product_id, line_number, qty, _money(unit), 5,
+                 _money(line_subtotal), _money(line_tax), _money(line_subtotal + line_tax), qty if invoiced else 0),
+            )
+            if status not in ("draft", "cancelled"):
+                short = qty - self.stock.get(product_id, 0)
+                if short > 0:
+                    self.move(product_id, short + rng.randint(10, 50), "in", "adjustment", "adjustment", 0, day, stamp)
+                self.move(product_id, qty, "out", "sale", "sales_order", so_id, day, stamp)
+
+
+def generate_dataset(seed=1, customers=100_000, vendors=2_000, products=50_000, orders=1_000_000,
+                     purchase_orders=50_000, days=730, batch_size=50_000, log=None):
+    """
+    A production-shaped history ending today: customers and vendors,
+    products with colors and images, ``orders`` sales orders (1-8 lines,
+    Zipf-popular products, seasonal dates) with invoices and payments,
+    ``purchase_orders`` purchase orders whose receipts become vendor bills,
+    payments and stock-in movements, and a stock ledger that never goes
+    negative (top-up adjustments cover shortfalls). Everything is tagged
+    ``DS<seed>`` and the same seed gives the same rows. Raises ValueError
+    if that dataset already exists. Returns rows written per table.
+    """
+    rng = random.Random(seed)
+    prefix = f"DS{seed}"
+    tag = prefix.lower()
+    if Contact.objects.filter(email__startswith=f"{tag}-").exists():
+        raise ValueError(f"Dataset {prefix} already exists; use another seed")
+    today = timezone.localdate()
+    start = today - timedelta(days=days - 1)
+    terms = list(PaymentTerm.objects.filter(is_active=True).order_by("pk").values_list("pk", "net_days"))
+    if not terms:
+        term, _ = PaymentTerm.objects.get_or_create(term_name="Net 30", defaults={"net_days": 30})
+        terms = [(term.pk, term.net_days)]
+
+    writer = _RowWriter(batch_size, log)
+    opened = connection.ops.adapt_datetimefield_value(timezone.now())
+    contact_ids = {}
+    for contact_type, total in (("customer", customers), ("vendor", vendors)):
+        contact_ids[contact_type] = []
+        for n in range(total):
+            pk = writer.next_id(Contact)
+            contact_ids[contact_type].append(pk)
+            writer.add(
+                Contact,
+                (pk, f"{contact_type.title()} {prefix}-{n}", contact_type, f"{tag}-{contact_type}-{n}@example.com",
+                 f"9{rng.randrange(10**9):09d}", rng.choice(CITIES), "India", True, opened, opened),
+            )
+    writer.flush(force=True)
+    prices = generate_products(products, rng, prefix, batch_size=min(batch_size, BATCH_SIZE))
+    writer.written[Product._meta.db_table] += len(prices)
+
+    history = _History(rng, prefix, writer, contact_ids["customer"], contact_ids["vendor"], prices, terms, today)
+    history.open_stock(start - timedelta(days=1))
+    order_counts = seasonal_counts(orders, start, days, rng)
+    po_counts = seasonal_counts(purchase_orders, start, days, rng)
+    for day_index in range(days):
+        day = start + timedelta(days=day_index)
+        stamp = history.stamp(day)
+        while history.receipts and history.receipts[0][0] <= day_index:
+            history.receive(day, stamp)
+        for _ in range(po_counts[day_index]):
+            history.purchase_order(day_index, day, stamp)
+        for _ in range(order_counts[day_index]):
+            history.sales_order(day, stamp)
+        writer.flush()
+    writer.flush(force=True)
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.executemany(
+            f"UPDATE {Product._meta.db_table} SET current_stock = %s WHERE product_id = %s",
+            [(quantity, pk) for pk, quantity in history.stock.items()],
+        )
+    writer.reset_sequences()
+    # Rows were written around sales.services, so build the portal summaries in one pass
+    if log:
+        log("Building customer summaries")
+    writer.written[CustomerSummary._meta.db_table] = sync_customer_summaries()["created"]
+    return dict(writer.written)
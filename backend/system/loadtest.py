@@ -0,0 +1,180 @@
+"""
+HTTP load generator used by bench_api.
+
+A scenario builds one request at a time (method, path, JSON body, bearer
+token). run_scenario() drives it with ``concurrency`` client threads, each
+on its own keep-alive connection, for a fixed duration after a warm-up,
+and summarize() turns the latencies into p50/p95/p99 and requests/sec.
+Results are plain dicts so they can be stored as JSON and compared.
+"""
+
+import http.client
+import json
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable
+from urllib.parse import urlsplit
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+
+
+@dataclass
+class Scenario:
+    name: str
+    # (rng, client index) -> (method, path, body or None, token or None)
+    build: Callable
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (0 < q <= 100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, statuses, errors, seconds):
+    """Summary of one scenario run; latencies are in seconds, reported in milliseconds."""
+    ordered = sorted(latencies)
+
+    def ms(value):
+        return round(value * 1000, 3) if value is not None else None
+
+    return {
+        "requests": len(ordered),
+        "errors": errors,
+        "seconds": round(seconds, 3),
+        "rps": round(len(ordered) / seconds, 2) if seconds else 0.0,
+        "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+        "p50_ms": ms(percentile(ordered, 50)),
+        "p95_ms": ms(percentile(ordered, 95)),
+        "p99_ms": ms(percentile(ordered, 99)),
+        "max_ms": ms(ordered[-1]) if ordered else None,
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+    }
+
+
+class _Client:
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.secure = parts.scheme == "https"
+        self.prefix = parts.path.rstrip("/")
+        self.timeout = timeout
+        self.connection = None
+
+    def request(self, method, path, body=None, token=None):
+        if self.connection is None:
+            factory = http.client.HTTPSConnection if self.secure else http.client.HTTPConnection
+            self.connection = factory(self.host, self.port, timeout=self.timeout)
+        headers = {"Accept": "application/json"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body)
+            headers["Content-Type"] = "application/json"
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        try:
+            self.connection.request(method, self.prefix + path, body=payload, headers=headers)
+            response = self.connection.getresponse()
+            response.read()
+        except (OSError, http.client.HTTPException):
+            self.close()
+            raise
+        if response.getheader("Connection", "").lower() == "close":
+            self.close()
+        return response.status
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def run_scenario(base_url, scenario, concurrency=8, duration=10.0, warmup=1.0, seed=1):
+    """Drive ``scenario`` with ``concurrency`` threads; only requests started after the warm-up count."""
+    start = time.perf_counter()
+    measure_from = start + warmup
+    stop_at = measure_from + duration
+    lock = threading.Lock()
+    latencies, statuses = [], {}
+    errors = 0
+
+    def worker(index):
+        nonlocal errors
+        rng = random.Random(seed * 1000 + index)
+        client = _Client(base_url)
+        mine, my_statuses, my_errors = [], {}, 0
+        try:
+            while True:
+                began = time.perf_counter()
+                if began >= stop_at:
+                    break
+                method, path, body, token = scenario.build(rng, index)
+                try:
+                    status = client.request(method, path, body, token)
+                except (OSError, http.client.HTTPException):
+                    status = None
+                elapsed = time.perf_counter() - began
+                if began < measure_from:
+                    continue
+                if status is None or status >= 500:
+                    my_errors += 1
+                else:
+                    mine.append(elapsed)
+                my_statuses[status or 0] = my_statuses.get(status or 0, 0) + 1
+        finally:
+            client.close()
+        with lock:
+            latencies.extend(mine)
+            errors += my_errors
+            for code, count in my_statuses.items():
+                statuses[code] = statuses.get(code, 0) + count
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, statuses, errors, time.perf_counter() - measure_from)
+
+
+def compare(current, baseline, threshold=10.0):
+    """
+    Lines describing each scenario's change from ``baseline`` (both are
+    bench_api result documents), and whether any p95 or rps moved the wrong
+    way by more than ``threshold`` percent.
+    """
+    lines, regressed = [], False
+    for name, result in current["results"].items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before.get("p95_ms") or not result.get("p95_ms"):
+            lines.append(f"{name:<24} no baseline")
+            continue
+        p95 = (result["p95_ms"] - before["p95_ms"]) / before["p95_ms"] * 100
+        rps = (result["rps"] - before["rps"]) / before["rps"] * 100 if before["rps"] else 0.0
+        bad = p95 > threshold or rps < -threshold
+        regressed |= bad
+        lines.append(
+            f"{name:<24} p95 {before['p95_ms']:8.1f} -> {result['p95_ms']:8.1f} ms ({p95:+6.1f}%)  "
+            f"rps {before['rps']:8.1f} -> {result['rps']:8.1f} ({rps:+6.1f}%){'  REGRESSION' if bad else ''}"
+        )
+    return lines, regressed
+
+
+class _QuietHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def serve(host="127.0.0.1", port=0):
+    """Start the project's WSGI app on a threaded dev server in a daemon thread; returns (server, base URL)."""
+    server = ThreadedWSGIServer((host, port), _QuietHandler, allow_reuse_address=True)
+    server.set_app(WSGIHandler())
+    thread = threading.Thread(target=server.serve_forever, name="bench-api-server", daemon=True)
+    thread.start()
+    return server, f"http://{host}:{server.server_address[1]}"
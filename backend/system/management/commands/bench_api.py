@@ -0,0 +1,180 @@
+import json
+import platform
+import subprocess
+from datetime import datetime
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from rest_framework_simplejwt.tokens import AccessToken
+
+from system.datagen import generate_load_dataset
+from system.loadtest import Scenario, compare, run_scenario, serve
+
+DEFAULT_OUTPUT_DIR = "bench-results"
+
+
+def build_scenarios(data):
+    """The endpoints under test, keyed by scenario name."""
+    products = data["product_ids"]
+    coupons = data["coupon_codes"] or ["NONE"]
+    invoices = data["open_invoice_ids"]
+    customer_tokens = [str(AccessToken.for_user(user)) for user in data["customer_users"]]
+    internal_token = str(AccessToken.for_user(data["internal_user"]))
+    pages = max(1, len(products) // 24)
+
+    def customer(index):
+        return customer_tokens[index % len(customer_tokens)]
+
+    def lines(rng, count):
+        return [
+            {"product_id": pid, "quantity": str(rng.randint(1, 3)), "unit_price": "499.00", "tax_percentage": "5",
+             "line_number": n}
+            for n, pid in enumerate(rng.sample(products, count), start=1)
+        ]
+
+    return {
+        scenario.name: scenario
+        for scenario in (
+            Scenario("catalog_list", lambda rng, i: ("GET", f"/api/catalog/products/?page={rng.randint(1, pages)}&page_size=24", None, None)),
+            Scenario("catalog_search", lambda rng, i: ("GET", f"/api/catalog/products/?search=Cotton&gender=men&page_size=24", None, None)),
+            Scenario("catalog_facets", lambda rng, i: ("GET", "/api/catalog/products/facets/?gender=women&page_size=24", None, None)),
+            Scenario("product_detail", lambda rng, i: ("GET", f"/api/catalog/products/{rng.choice(products)}/", None, None)),
+            Scenario("coupon_validate", lambda rng, i: ("POST", "/api/pricing/coupons/validate/", {"code": rng.choice(coupons)}, customer(i))),
+            Scenario("sales_orders", lambda rng, i: ("GET", "/api/sales/orders/", None, customer(i))),
+            Scenario(
+                "checkout",
+                lambda rng, i: (
+                    "POST",
+                    "/api/sales/checkout/",
+                    {"payment_term_id": data["payment_term_id"], "lines": lines(rng, rng.randint(1, 4)),
+                     **({"coupon_code": rng.choice(coupons)} if rng.random() < 0.3 else {})},
+                    customer(i),
+                ),
+            ),
+            Scenario(
+                "purchase_order_create",
+                lambda rng, i: (
+                    "POST",
+                    "/api/purchases/purchase-orders/create/",
+                    {"vendor_id": data["vendor_id"], "lines": [
+                        {"product_id": line["product_id"], "quantity": "10", "unit_price": "250.00"}
+                        for line in lines(rng, rng.randint(1, 5))
+                    ]},
+                    internal_token,
+                ),
+            ),
+            Scenario(
+                "payment_create",
+                lambda rng, i: ("POST", "/api/payments/create/", {"invoice_id": rng.choice(invoices), "amount": "1.00"}, internal_token),
+            ),
+        )
+    }
+
+
+def _git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5, cwd=settings.BASE_DIR
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the key API endpoints with concurrent HTTP clients and report p50/p95/p99 and requests/sec "
+        "per endpoint. Seeds (or reuses) a synthetic dataset first. Without --url the app is served in-process "
+        "by a threaded dev server, which shares the GIL with the clients; point --url at gunicorn for production-"
+        "like numbers. Writes create real rows: run it against a scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Base URL of a running server using this database (default: serve in-process)")
+        parser.add_argument("--scenarios", nargs="*", help="Subset of scenarios to run (default: all)")
+        parser.add_argument("--concurrency", type=int, default=8, help="Client threads per scenario")
+        parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per scenario")
+        parser.add_argument("--warmup", type=float, default=1.0, help="Unmeasured seconds before each scenario")
+        parser.add_argument("--seed", type=int, default=1, help="Dataset and request-mix seed")
+        parser.add_argument("--customers", type=int, default=2000)
+        parser.add_argument("--products", type=int, default=5000)
+        parser.add_argument("--orders", type=int, default=5000)
+        parser.add_argument("--coupons", type=int, default=2000)
+        parser.add_argument("--output", help=f"Result JSON path (default: {DEFAULT_OUTPUT_DIR}/bench_api-<timestamp>.json)")
+        parser.add_argument("--compare", help="Earlier result JSON to compare against")
+        parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent (p95 and rps)")
+        parser.add_argument("--fail-on-regression", action="store_true", help="Exit with an error if --compare finds one")
+
+    def handle(self, *args, **options):
+        self.stdout.write("Preparing dataset...")
+        data = generate_load_dataset(
+            seed=options["seed"],
+            customers=options["customers"],
+            products=options["products"],
+            orders=options["orders"],
+            coupons=options["coupons"],
+            users=max(options["concurrency"], 10),
+        )
+        scenarios = build_scenarios(data)
+        names = options["scenarios"] or list(scenarios)
+        unknown = sorted(set(names) - set(scenarios))
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(unknown)} (choose from {', '.join(scenarios)})")
+
+        server = None
+        base_url = options["url"]
+        if not base_url:
+            server, base_url = serve()
+        self.stdout.write(
+            f"{data['customers']} customers, {len(data['product_ids'])} products, {len(data['open_invoice_ids'])} open "
+            f"invoices; {options['concurrency']} clients x {options['duration']:.0f}s per scenario against {base_url}\n"
+        )
+
+        results = {}
+        try:
+            for name in names:
+                result = run_scenario(
+                    base_url,
+                    scenarios[name],
+                    concurrency=options["concurrency"],
+                    duration=options["duration"],
+                    warmup=options["warmup"],
+                    seed=options["seed"],
+                )
+                results[name] = result
+                self.stdout.write(
+                    f"{name:<24} {result['rps']:8.1f} req/s  p50 {result['p50_ms'] or 0:8.1f}  "
+                    f"p95 {result['p95_ms'] or 0:8.1f}  p99 {result['p99_ms'] or 0:8.1f} ms  "
+                    f"errors {result['errors']}  {result['statuses']}"
+                )
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+
+        document = {
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "git_commit": _git_commit(),
+            "database": connection.vendor,
+            "python": platform.python_version(),
+            "target": options["url"] or "in-process",
+            "options": {
+                key: options[key]
+                for key in ("concurrency", "duration", "warmup", "seed", "customers", "products", "orders", "coupons")
+            },
+            "results": results,
+        }
+        output = Path(options["output"] or Path(DEFAULT_OUTPUT_DIR) / f"bench_api-{datetime.now():%Y%m%d-%H%M%S}.json")
+        output.parent.mkdir(parents=True, exist_ok=True)
+        output.write_text(json.dumps(document, indent=2))
+        self.stdout.write(self.style.SUCCESS(f"\nResults written to {output}"))
+
+        if options["compare"]:
+            baseline = json.loads(Path(options["compare"]).read_text())
+            lines, regressed = compare(document, baseline, options["threshold"])
+            self.stdout.write(f"\nCompared with {options['compare']} ({baseline.get('git_commit') or 'unknown commit'}):")
+            for line in lines:
+                self.stdout.write(line)
+            if regressed and options["fail_on_regression"]:
+                raise CommandError(f"Regression above {options['threshold']}%")
@@ -0,0 +1,58 @@
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from catalog.models import Product
+from system.audit import writer
+from system.models import AuditLog
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure the latency of committed stock updates with the audit trail off, written synchronously "
+        "(one INSERT per event) and handed to the background writer. Rows it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--writes", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        product = Product.objects.create(
+            product_name="Audit bench",
+            product_code="BENCH-AUDIT",
+            product_category="unisex",
+            product_type="other",
+            sales_price=Decimal("1.00"),
+            purchase_price=Decimal("1.00"),
+        )
+        try:
+            base = None
+            for mode in ("off", "sync", "async"):
+                with override_settings(AUDIT_LOG_MODE=mode):
+                    elapsed = self._run(product.pk, options["writes"])
+                base = base or elapsed
+                self.stdout.write(
+                    f"{mode:<6} {elapsed / options['writes'] * 1e6:8.1f} us/commit  ({elapsed / base:.2f}x of off)"
+                )
+            start = time.perf_counter()
+            writer.flush()
+            self.stdout.write(f"drained the remaining queue in {(time.perf_counter() - start) * 1000:.1f} ms")
+            self.stdout.write(
+                f"audit rows written: {AuditLog.objects.filter(table_name='products', record_id=product.pk).count()} "
+                f"(writer stats {writer.stats})"
+            )
+        finally:
+            AuditLog.objects.filter(table_name="products", record_id=product.pk).delete()
+            Product.objects.filter(pk=product.pk).delete()
+
+    def _run(self, pk, writes):
+        start = time.perf_counter()
+        for i in range(writes):
+            with transaction.atomic():
+                product = Product.objects.select_for_update().get(pk=pk)
+                product.current_stock = Decimal(i)
+                product.save(update_fields=["current_stock"])
+        return time.perf_counter() - start
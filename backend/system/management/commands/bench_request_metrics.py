@@ -0,0 +1,48 @@
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test import Client
+from django.test.utils import override_settings
+
+METRICS_MIDDLEWARE = "system.metrics.RequestMetricsMiddleware"
+
+
+class Command(BaseCommand):
+    help = "Measure the per-request overhead of RequestMetricsMiddleware on a few endpoints (in-process test client)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=50, help="Requests per chunk")
+        parser.add_argument("--rounds", type=int, default=40, help="Alternating on/off chunks; medians are compared")
+        parser.add_argument(
+            "--path",
+            action="append",
+            help="Endpoint to request (repeatable; default health, settings and the catalog list)",
+        )
+
+    def _time(self, client, path, count):
+        start = time.perf_counter()
+        for _ in range(count):
+            client.get(path)
+        return (time.perf_counter() - start) / count
+
+    def handle(self, *args, **options):
+        paths = options["path"] or ["/api/system/health/", "/api/system/settings/", "/api/catalog/products/?page_size=50"]
+        without = [m for m in settings.MIDDLEWARE if m != METRICS_MIDDLEWARE]
+        with override_settings(ALLOWED_HOSTS=["testserver"]):
+            for path in paths:
+                on = Client()
+                with override_settings(MIDDLEWARE=without):
+                    off = Client()
+                    off.get(path)
+                on.get(path)
+                times_on, times_off = [], []
+                for _ in range(options["rounds"]):
+                    times_off.append(self._time(off, path, options["requests"]))
+                    times_on.append(self._time(on, path, options["requests"]))
+                median_on, median_off = statistics.median(times_on), statistics.median(times_off)
+                overhead = (median_on - median_off) / median_off * 100
+                self.stdout.write(
+                    f"{path:<45} off {median_off * 1e6:8.1f} us  on {median_on * 1e6:8.1f} us  overhead {overhead:+.2f}%"
+                )
@@ -0,0 +1,68 @@
+import gzip
+import json
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from system.models import AuditLog
+
+ARCHIVE_FIELDS = (
+    "audit_id",
+    "table_name",
+    "record_id",
+    "action_type",
+    "old_values",
+    "new_values",
+    "changed_by",
+    "changed_at",
+    "ip_address",
+    "user_agent",
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete audit_log rows older than the retention window, oldest first and in batches. "
+        "With --archive-dir the rows are first appended to one gzip'd JSON-lines file per month."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None, help="Retention (default AUDIT_LOG_RETENTION_DAYS)")
+        parser.add_argument("--archive-dir", default=None, help="Write audit_log-YYYY-MM.jsonl.gz files here")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument("--dry-run", action="store_true", help="Only count what would be removed")
+
+    def handle(self, *args, **options):
+        days = options["days"] if options["days"] is not None else getattr(settings, "AUDIT_LOG_RETENTION_DAYS", 365)
+        cutoff = timezone.now() - timedelta(days=days)
+        old = AuditLog.objects.filter(changed_at__lt=cutoff)
+        if options["dry_run"]:
+            self.stdout.write(f"{old.count()} audit rows older than {cutoff:%Y-%m-%d} would be removed")
+            return
+
+        archive_dir = Path(options["archive_dir"]) if options["archive_dir"] else None
+        if archive_dir:
+            archive_dir.mkdir(parents=True, exist_ok=True)
+        removed = 0
+        while True:
+            # changed_at is indexed; walk it oldest first
+            rows = list(old.order_by("changed_at", "audit_id").values(*ARCHIVE_FIELDS)[: options["batch_size"]])
+            if not rows:
+                break
+            if archive_dir:
+                self._archive(archive_dir, rows)
+            removed += AuditLog.objects.filter(pk__in=[row["audit_id"] for row in rows]).delete()[0]
+            self.stdout.write(f"  {removed} removed (up to {rows[-1]['changed_at']:%Y-%m-%d})")
+        self.stdout.write(self.style.SUCCESS(f"Removed {removed} audit rows older than {cutoff:%Y-%m-%d}"))
+
+    def _archive(self, archive_dir, rows):
+        by_month = {}
+        for row in rows:
+            by_month.setdefault(row["changed_at"].strftime("%Y-%m"), []).append(row)
+        for month, month_rows in by_month.items():
+            with gzip.open(archive_dir / f"audit_log-{month}.jsonl.gz", "at", encoding="utf-8") as fp:
+                for row in month_rows:
+                    fp.write(json.dumps({**row, "changed_at": row["changed_at"].isoformat()}) + "\n")
@@ -0,0 +1,275 @@
+"""
+In-process request metrics, exposed in Prometheus text format.
+
+RequestMetricsMiddleware times every request and, per (method, route),
+records a latency histogram, status counts, DB query count and time
+(connection.execute_wrapper), DRF serializer and renderer time, and
+response size. Requests slower than SLOW_REQUEST_SECONDS are sampled to
+the "appareldesk.slow_requests" logger together with their slowest SQL;
+only the SQL_SAMPLES slowest statements of a request are kept, so most
+queries cost a timer and a comparison.
+
+Counters live in the worker process; with several gunicorn workers each
+scrape sees the worker that served it.
+
+Timed directly around a no-op view, the middleware costs about 9us per
+request plus under 1us per SQL query. That is ~2% of the cheapest
+endpoint (/api/system/health/, ~0.5ms through the test client) and well
+under 1% of endpoints that touch the database; bench_request_metrics runs
+on the in-process client and varies by a few percent between runs.
+"""
+
+import bisect
+import contextvars
+import heapq
+import logging
+import random
+import threading
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connection
+
+slow_logger = logging.getLogger("appareldesk.slow_requests")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# Slowest SQL statements kept per request for the slow-request log
+SQL_SAMPLES = 10
+
+
+class RequestStats:
+    __slots__ = ("queries", "db_seconds", "serializer_seconds", "render_seconds", "sql", "sql_floor", "depth")
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.render_seconds = 0.0
+        self.sql = []  # min-heap of (seconds, sql), at most SQL_SAMPLES
+        self.sql_floor = -1.0  # a query must beat this to be kept
+        self.depth = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # connection.execute_wrapper hook; runs for every query, so keep it to a comparison
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = perf_counter() - start
+            self.queries += 1
+            self.db_seconds += elapsed
+            if elapsed > self.sql_floor:
+                self._sample(elapsed, sql)
+
+    def _sample(self, elapsed, sql):
+        if len(self.sql) < SQL_SAMPLES:
+            heapq.heappush(self.sql, (elapsed, sql))
+        else:
+            heapq.heapreplace(self.sql, (elapsed, sql))
+        if len(self.sql) == SQL_SAMPLES:
+            self.sql_floor = self.sql[0][0]
+
+
+_current = contextvars.ContextVar("request_stats", default=None)
+
+
+class _Endpoint:
+    __slots__ = ("buckets", "count", "seconds", "statuses", "queries", "db_seconds", "serializer_seconds",
+                 "render_seconds", "response_bytes", "slow")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.seconds = 0.0
+        self.statuses = {}
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.serializer_seconds = 0.0
+        self.render_seconds = 0.0
+        self.response_bytes = 0
+        self.slow = 0
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def observe(self, method, route, status, seconds, stats, response_bytes, slow):
+        with self._lock:
+            endpoint = self._endpoints.get((method, route))
+            if endpoint is None:
+                endpoint = self._endpoints[(method, route)] = _Endpoint()
+            endpoint.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+            endpoint.count += 1
+            endpoint.seconds += seconds
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+            endpoint.queries += stats.queries
+            endpoint.db_seconds += stats.db_seconds
+            endpoint.serializer_seconds += stats.serializer_seconds
+            endpoint.render_seconds += stats.render_seconds
+            endpoint.response_bytes += response_bytes
+            endpoint.slow += slow
+
+    def reset(self):
+        with self._lock:
+            self._endpoints = {}
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                key: {name: getattr(e, name) if name != "buckets" else list(e.buckets) for name in e.__slots__}
+                for key, e in self._endpoints.items()
+            }
+
+    def render_prometheus(self, extra=()):
+        """Prometheus text exposition (format 0.0.4). ``extra`` is (name, type, help, value) gauges/counters."""
+        data = self.snapshot()
+        lines = []
+
+        def family(name, kind, help_text):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+
+        def labels(method, route, **more):
+            pairs = {"method": method, "route": route, **more}
+            inner = ",".join(f'{k}="{_escape(str(v))}"' for k, v in pairs.items())
+            return "{" + inner + "}"
+
+        family("http_request_duration_seconds", "histogram", "Request latency by route")
+        for (method, route), e in sorted(data.items()):
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), e["buckets"]):
+                cumulative += n
+                lines.append(f"http_request_duration_seconds_bucket{labels(method, route, le=bound)} {cumulative}")
+            lines.append(f"http_request_duration_seconds_sum{labels(method, route)} {e['seconds']:.6f}")
+            lines.append(f"http_request_duration_seconds_count{labels(method, route)} {e['count']}")
+
+        family("http_requests_total", "counter", "Requests by route and status code")
+        for (method, route), e in sorted(data.items()):
+            for status, n in sorted(e["statuses"].items()):
+                lines.append(f"http_requests_total{labels(method, route, status=status)} {n}")
+
+        for name, field, help_text, fmt in (
+            ("http_db_queries_total", "queries", "Database queries run while serving the route", "{}"),
+            ("http_db_query_seconds_total", "db_seconds", "Time spent in database queries", "{:.6f}"),
+            ("http_serializer_seconds_total", "serializer_seconds", "Time spent in DRF serializer .data", "{:.6f}"),
+            ("http_render_seconds_total", "render_seconds", "Time spent rendering DRF responses", "{:.6f}"),
+            ("http_response_bytes_total", "response_bytes", "Response body bytes", "{}"),
+            ("http_slow_requests_total", "slow", "Requests slower than SLOW_REQUEST_SECONDS", "{}"),
+        ):
+            family(name, "counter", help_text)
+            for (method, route), e in sorted(data.items()):
+                lines.append(f"{name}{labels(method, route)} {fmt.format(e[field])}")
+
+        for name, kind, help_text, value in extra:
+            family(name, kind, help_text)
+            lines.append(f"{name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+def current_stats():
+    return _current.get()
+
+
+def _timed_property(prop, attribute):
+    getter = prop.fget
+
+    def timed(self):
+        stats = _current.get()
+        if stats is None or stats.depth:
+            return getter(self)
+        stats.depth += 1
+        start = perf_counter()
+        try:
+            return getter(self)
+        finally:
+            stats.depth -= 1
+            setattr(stats, attribute, getattr(stats, attribute) + perf_counter() - start)
+
+    timed.__wrapped__ = getter
+    return property(timed)
+
+
+_installed = False
+
+
+def install_drf_timing():
+    """Time BaseSerializer.data and Response.rendered_content for the request being measured (idempotent)."""
+    global _installed
+    if _installed:
+        return
+    from rest_framework.response import Response
+    from rest_framework.serializers import BaseSerializer
+
+    BaseSerializer.data = _timed_property(BaseSerializer.data, "serializer_seconds")
+    Response.rendered_content = _timed_property(Response.rendered_content, "render_seconds")
+    _installed = True
+
+
+def _route(request):
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unmatched"
+    return "/" + (match.route or "").lstrip("^")
+
+
+def _response_size(response):
+    if response.streaming:
+        return 0
+    length = response.get("Content-Length")
+    if length is not None and length.isdigit():
+        return int(length)
+    return len(response.content)
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, "SLOW_REQUEST_SECONDS", 1.0)
+        self.slow_sample_rate = getattr(settings, "SLOW_REQUEST_SAMPLE_RATE", 1.0)
+
+    def __call__(self, request):
+        stats = RequestStats()
+        token = _current.set(stats)
+        # Same as connection.execute_wrapper(stats) without the contextmanager overhead on every request
+        wrappers = connection.execute_wrappers
+        wrappers.append(stats)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            wrappers.pop()
+            _current.reset(token)
+        elapsed = perf_counter() - start
+
+        size = _response_size(response)
+        slow = elapsed >= self.slow_seconds
+        route = _route(request)
+        registry.observe(request.method, route, response.status_code, elapsed, stats, size, slow)
+        if slow and random.random() < self.slow_sample_rate:
+            self._log_slow(request, route, response, elapsed, stats)
+        return response
+
+    def _log_slow(self, request, route, response, elapsed, stats):
+        slowest = sorted(stats.sql, key=lambda item: item[0], reverse=True)
+        slow_logger.warning(
+            "Slow request %s %s (%s) status=%s %.0fms: %d queries in %.0fms, serializer %.0fms, render %.0fms\n%s",
+            request.method,
+            request.get_full_path(),
+            route,
+            response.status_code,
+            elapsed * 1000,
+            stats.queries,
+            stats.db_seconds * 1000,
+            stats.serializer_seconds * 1000,
+            stats.render_seconds * 1000,
+            "\n".join(f"  {seconds * 1000:8.1f}ms  {sql}" for seconds, sql in slowest),
+        )
@@ -0,0 +1,193 @@
+"""
+Query budgets and N+1 detection.
+
+query_budget(n) is a context manager / decorator that fails with
+QueryBudgetExceeded when the wrapped block runs more than ``n`` queries.
+
+QueryBudgetMiddleware applies the per-endpoint budgets in
+appareldesk/query_budgets.py to every request and flags SQL shapes (the
+statement with literals and IN lists collapsed) repeated
+QUERY_REPEAT_THRESHOLD or more times in one request, the usual sign of a
+query inside a loop. The stack of the first repeat is kept so the report
+points at the loop. QUERY_BUDGET_MODE is "warn" (log to
+appareldesk.query_budget), "raise" (the test runner's default) or "off".
+"""
+
+import logging
+import re
+import traceback
+from contextlib import ContextDecorator
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+
+logger = logging.getLogger("appareldesk.query_budget")
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_IN_LIST = re.compile(r"\bIN\s*\((?:\s*(?:%s|\?)\s*,?)+\)", re.IGNORECASE)
+_VALUES_LIST = re.compile(r"(\((?:\s*(?:%s|\?)\s*,?)+\))(?:\s*,\s*\((?:\s*(?:%s|\?)\s*,?)+\))+")
+# Transaction bookkeeping repeats legitimately
+_IGNORED_PREFIXES = ("SAVEPOINT", "RELEASE SAVEPOINT", "ROLLBACK TO SAVEPOINT", "BEGIN", "COMMIT", "ROLLBACK")
+# Middleware wrappers that sit on every stack and say nothing about where a query came from
+_PLUMBING = tuple(
+    str(Path(__file__).resolve().with_name(name)) for name in ("querybudget.py", "metrics.py", "middleware.py")
+)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def sql_shape(sql):
+    """``sql`` with literals and placeholder lists collapsed, so the same statement in a loop maps to one shape."""
+    shape = _STRING.sub("?", sql)
+    shape = _NUMBER.sub("?", shape)
+    shape = _IN_LIST.sub("IN (...)", shape)
+    shape = _VALUES_LIST.sub(r"\1, ...", shape)
+    return " ".join(shape.split())
+
+
+def _app_stack():
+    """Project and DRF frames (not Django internals or the middleware) leading to the current query."""
+    base = str(Path(settings.BASE_DIR).resolve())
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if (frame.filename.startswith(base) or "rest_framework" in frame.filename)
+        and not frame.filename.startswith(_PLUMBING)
+    ]
+    return "".join(traceback.format_list(frames[-8:]))
+
+
+class QueryRecorder:
+    """connection.execute_wrapper that counts queries per SQL shape."""
+
+    def __init__(self):
+        self.count = 0
+        # shape -> [count, first sql, stack of the first repeat]
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        shape = sql_shape(sql)
+        entry = self.shapes.get(shape)
+        if entry is None:
+            self.shapes[shape] = [1, sql, None]
+        else:
+            entry[0] += 1
+            if entry[2] is None:
+                entry[2] = _app_stack()
+        return execute(sql, params, many, context)
+
+    def repeated(self, threshold):
+        """[(count, sql, stack)] for shapes run at least ``threshold`` times, most repeated first."""
+        found = [
+            (count, sql, stack)
+            for shape, (count, sql, stack) in self.shapes.items()
+            if count >= threshold and not shape.upper().startswith(_IGNORED_PREFIXES)
+        ]
+        return sorted(found, key=lambda item: item[0], reverse=True)
+
+    def report(self, threshold):
+        lines = [f"{self.count} queries, {len(self.shapes)} distinct"]
+        for count, sql, stack in self.repeated(threshold):
+            lines.append(f"  {count}x {sql[:300]}")
+            if stack:
+                lines.append("    first repeated at:\n" + "".join(f"    {line}\n" for line in stack.splitlines()))
+        return "\n".join(lines)
+
+
+class query_budget(ContextDecorator):
+    """
+    Fail with QueryBudgetExceeded if the block runs more than ``max_queries``
+    queries, or (with ``repeat_threshold``) repeats one SQL shape that often.
+
+        with query_budget(5):
+            client.get("/api/sales/orders/")
+
+        @query_budget(3, label="cart")
+        def test_cart(self): ...
+    """
+
+    def __init__(self, max_queries, label="", repeat_threshold=None):
+        self.max_queries = max_queries
+        self.label = label
+        self.repeat_threshold = repeat_threshold
+        self.recorder = None
+
+    def __enter__(self):
+        self.recorder = QueryRecorder()
+        connection.execute_wrappers.append(self.recorder)
+        return self.recorder
+
+    def __exit__(self, exc_type, exc, tb):
+        connection.execute_wrappers.remove(self.recorder)
+        if exc_type is not None:
+            return False
+        threshold = self.repeat_threshold or _repeat_threshold()
+        over = self.recorder.count > self.max_queries
+        repeated = self.repeat_threshold is not None and self.recorder.repeated(threshold)
+        if over or repeated:
+            reason = f"over budget ({self.max_queries})" if over else "repeated queries"
+            raise QueryBudgetExceeded(
+                f"{self.label or 'block'}: {reason}, {self.recorder.report(threshold)}"
+            )
+        return False
+
+
+def _repeat_threshold():
+    return getattr(settings, "QUERY_REPEAT_THRESHOLD", 5)
+
+
+def budget_for(request):
+    """Budget of the resolved endpoint for the request's method, or None when it has none."""
+    from appareldesk.query_budgets import QUERY_BUDGETS
+
+    match = getattr(request, "resolver_match", None)
+    if match is None or not match.url_name:
+        return None
+    budget = QUERY_BUDGETS.get(match.url_name)
+    if isinstance(budget, dict):
+        return budget.get(request.method)
+    return budget
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, get_response):
+        self.mode = getattr(settings, "QUERY_BUDGET_MODE", "off")
+        if self.mode not in ("warn", "raise"):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.threshold = _repeat_threshold()
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        wrappers = connection.execute_wrappers
+        wrappers.append(recorder)
+        try:
+            response = self.get_response(request)
+        finally:
+            wrappers.remove(recorder)
+
+        match = getattr(request, "resolver_match", None)
+        if match is None or "admin" in match.namespaces:
+            return response
+        problems = []
+        budget = budget_for(request)
+        if budget is not None and recorder.count > budget:
+            problems.append(f"{recorder.count} queries, budget {budget}")
+        if recorder.repeated(self.threshold):
+            problems.append(f"SQL repeated {self.threshold}+ times")
+        response["X-Query-Count"] = str(recorder.count)
+        if problems:
+            message = (
+                f"{request.method} {request.path} ({match.url_name}): {'; '.join(problems)}\n"
+                f"{recorder.report(self.threshold)}"
+            )
+            if self.mode == "raise":
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
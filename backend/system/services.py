@@ -1,12 +1,25 @@
+import json
+import logging
+import threading
 import time
+from decimal import Decimal, InvalidOperation
+from django.conf import settings
 from django.db import transaction
-from django.db.models import F
+from django.db.models import Count, F, Max
 from django.db.utils import OperationalError, ProgrammingError
-from .models import DocumentSequence
+from .models import DocumentSequence, SystemSetting
+
+logger = logging.getLogger(__name__)
 
 
 @transaction.atomic
-def get_next_document_number(document_type: str) -> str:
+def reserve_document_numbers(document_type: str, count: int) -> list[str]:
+    """
+    Allocate ``count`` consecutive numbers for a document type with a single
+    locked update, so bulk writers do not take the sequence lock per document.
+    """
+    if count <= 0:
+        return []
     try:
         seq = (
             DocumentSequence.objects.select_for_update()
@@ -14,19 +27,175 @@ def get_next_document_number(document_type: str) -> str:
             .first()
         )
     except (OperationalError, ProgrammingError):
-        # Table missing or not migrated; fall back to timestamp-based number.
-        return f"{document_type.upper()}-{int(time.time())}"
+        # Table missing or not migrated; fall back to timestamp-based numbers.
+        stamp = f"{document_type.upper()}-{int(time.time())}"
+        return [stamp] if count == 1 else [f"{stamp}-{i}" for i in range(1, count + 1)]
 
     if not seq:
         seq = DocumentSequence.objects.create(
             document_type=document_type,
             prefix=document_type.upper(),
-            next_number=2,
+            next_number=count + 1,
             padding=6,
         )
-        number = f"{seq.prefix}-{str(1).zfill(seq.padding)}"
-        return number
+        start = 1
+    else:
+        start = seq.next_number
+        DocumentSequence.objects.filter(pk=seq.pk).update(next_number=F("next_number") + count)
+    return [f"{seq.prefix}-{str(n).zfill(seq.padding)}" for n in range(start, start + count)]
+
+
+def get_next_document_number(document_type: str) -> str:
+    return reserve_document_numbers(document_type, 1)[0]
+
+
+TRUE_VALUES = ("1", "true", "yes", "on")
+
+
+def _parse_setting(key, raw, setting_type):
+    if raw is None:
+        return None
+    try:
+        if setting_type == "number":
+            return Decimal(raw.strip())
+        if setting_type == "boolean":
+            return raw.strip().lower() in TRUE_VALUES
+        if setting_type == "json":
+            return json.loads(raw)
+    except (InvalidOperation, ValueError) as exc:
+        logger.warning("System setting %s is not a valid %s: %s", key, setting_type, exc)
+        return None
+    return raw
+
+
+class SettingsCache:
+    """
+    Per-process snapshot of the active system settings, parsed once by type.
+
+    Reads are dict lookups. At most every ``poll_seconds`` a read also runs
+    one aggregate query (row count + latest updated_at) and reloads the
+    snapshot when that fingerprint moved, so changes made by other workers
+    show up within the poll interval. Writes in this process (signals)
+    invalidate it immediately.
+    """
+
+    def __init__(self, poll_seconds=None):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.Lock()
+        self._values = None
+        self._version = None
+        self._checked_at = 0.0
+        self.loads = 0
+
+    def _interval(self):
+        if self.poll_seconds is not None:
+            return self.poll_seconds
+        return getattr(settings, "SYSTEM_SETTINGS_POLL_SECONDS", 5.0)
+
+    def _fingerprint(self):
+        stamp = SystemSetting.objects.aggregate(n=Count("pk"), latest=Max("updated_at"))
+        return stamp["n"], stamp["latest"]
+
+    def _load(self, version):
+        rows = SystemSetting.objects.filter(is_active=True).values_list("setting_key", "setting_value", "setting_type")
+        self._values = {key: _parse_setting(key, raw, kind) for key, raw, kind in rows}
+        self._version = version
+        self.loads += 1
+
+    def snapshot(self):
+        """The current {key: parsed value} dict. Treat it (and JSON values) as read-only."""
+        values = self._values
+        if values is not None and time.monotonic() - self._checked_at < self._interval():
+            return values
+        with self._lock:
+            if self._values is not None and time.monotonic() - self._checked_at < self._interval():
+                return self._values
+            try:
+                version = self._fingerprint()
+                if self._values is None or version != self._version:
+                    self._load(version)
+            except (OperationalError, ProgrammingError):
+                # Table missing or not migrated; behave as if no settings are configured
+                if self._values is None:
+                    self._values = {}
+            self._checked_at = time.monotonic()
+            return self._values
+
+    def invalidate(self):
+        with self._lock:
+            self._values = None
+            self._version = None
+            self._checked_at = 0.0
+
+
+settings_cache = SettingsCache()
+
+
+def get_setting(key, default=None):
+    value = settings_cache.snapshot().get(key)
+    return default if value is None else value
+
+
+def get_str_setting(key, default=""):
+    value = get_setting(key)
+    return default if value is None else str(value)
+
+
+def get_number_setting(key, default=None):
+    value = get_setting(key)
+    if value is None or isinstance(value, bool):
+        return default
+    if isinstance(value, Decimal):
+        return value
+    try:
+        return Decimal(str(value).strip())
+    except InvalidOperation:
+        return default
+
+
+def get_bool_setting(key, default=False):
+    value = get_setting(key)
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def get_json_setting(key, default=None):
+    """Parsed JSON setting. The object is shared by every caller in the worker; do not mutate it."""
+    value = get_setting(key)
+    return default if value is None else value
+
+
+def set_setting(key, value, setting_type=None, description=None, user_id=None):
+    """
+    Create or update a setting from a Python value. JSON values are
+    serialized, booleans stored as "true"/"false". Saving bumps updated_at,
+    which is what other workers poll for.
+    """
+    if setting_type is None:
+        if isinstance(value, bool):
+            setting_type = "boolean"
+        elif isinstance(value, (int, float, Decimal)):
+            setting_type = "number"
+        elif isinstance(value, (dict, list)):
+            setting_type = "json"
+        else:
+            setting_type = "string"
+    if setting_type == "json":
+        raw = json.dumps(value)
+    elif setting_type == "boolean":
+        raw = "true" if value else "false"
+    else:
+        raw = None if value is None else str(value)
+    defaults = {"setting_value": raw, "setting_type": setting_type, "is_active": True, "updated_by": user_id}
+    if description is not None:
+        defaults["description"] = description
+    setting, _ = SystemSetting.objects.update_or_create(setting_key=key, defaults=defaults)
+    return setting
+
+
+def invalidate_settings():
+    settings_cache.invalidate()
 
-    number = f"{seq.prefix}-{str(seq.next_number).zfill(seq.padding)}"
-    DocumentSequence.objects.filter(pk=seq.pk).update(next_number=F("next_number") + 1)
-    return number
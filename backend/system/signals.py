@@ -0,0 +1,14 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import SystemSetting
+from .services import invalidate_settings
+
+
+@receiver(post_save, sender=SystemSetting)
+@receiver(post_delete, sender=SystemSetting)
+def system_setting_changed(sender, **kwargs):
+    # Now, and again after commit so a snapshot taken mid-transaction is not kept
+    invalidate_settings()
+    transaction.on_commit(invalidate_settings)
@@ -1,3 +1,576 @@
-from django.test import TestCase
+import gzip
+import json
+import random
+import shutil
+import tempfile
+from collections import Counter
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
 
-# Create your tests here.
+from django.core.management import call_command
+from django.db import DatabaseError, transaction
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from django.urls import URLResolver, get_resolver
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import Address, Contact, User
+from appareldesk.query_budgets import QUERY_BUDGETS
+from catalog.models import Product, ProductColor, ProductImage
+from inventory.models import StockMovement
+from inventory.services import update_stock_from_purchase
+from payments.services import record_customer_payment
+from pricing.models import CouponCode, DiscountOffer, PaymentTerm
+from purchases.models import PurchaseOrder, VendorBill
+from purchases.services import create_purchase_orders, create_vendor_bills
+from sales.models import SalesOrder
+from sales.services import create_checkout
+from .audit import AuditWriter, reset_audit_request, set_audit_request
+from .datagen import ZipfSampler, generate_dataset, generate_load_dataset, seasonal_counts
+from .loadtest import compare, percentile, summarize
+from .metrics import SQL_SAMPLES, RequestStats, registry
+from .models import AuditLog, SystemSetting
+from .querybudget import QueryBudgetExceeded, query_budget, sql_shape
+from .services import (
+    SettingsCache,
+    get_bool_setting,
+    get_json_setting,
+    get_number_setting,
+    get_str_setting,
+    invalidate_settings,
+    set_setting,
+)
+
+
+class SettingsCacheTests(TestCase):
+    def setUp(self):
+        invalidate_settings()
+        self.addCleanup(invalidate_settings)
+        SystemSetting.objects.bulk_create(
+            [
+                SystemSetting(setting_key="automatic_invoicing", setting_value="true", setting_type="boolean"),
+                SystemSetting(setting_key="stock_warning_threshold", setting_value="10", setting_type="number"),
+                SystemSetting(setting_key="checkout", setting_value='{"max_lines": 50}', setting_type="json"),
+                SystemSetting(setting_key="default_currency", setting_value="INR"),
+                SystemSetting(setting_key="retired", setting_value="x", is_active=False),
+            ]
+        )
+
+    def test_typed_reads_hit_the_snapshot(self):
+        with self.assertNumQueries(2):
+            self.assertIs(get_bool_setting("automatic_invoicing"), True)
+        with self.assertNumQueries(0):
+            self.assertEqual(get_number_setting("stock_warning_threshold"), Decimal("10"))
+            self.assertEqual(get_json_setting("checkout"), {"max_lines": 50})
+            self.assertIs(get_json_setting("checkout"), get_json_setting("checkout"))
+            self.assertEqual(get_str_setting("default_currency"), "INR")
+            self.assertEqual(get_str_setting("retired", "gone"), "gone")
+            self.assertEqual(get_number_setting("default_currency", Decimal("1")), Decimal("1"))
+
+    def test_local_writes_invalidate_immediately(self):
+        get_str_setting("default_currency")
+        set_setting("default_currency", "USD")
+        set_setting("checkout", {"max_lines": 10})
+        self.assertEqual(get_str_setting("default_currency"), "USD")
+        self.assertEqual(get_json_setting("checkout"), {"max_lines": 10})
+        self.assertEqual(SystemSetting.objects.get(setting_key="checkout").setting_type, "json")
+
+    def test_changes_from_other_workers_are_polled(self):
+        cache = SettingsCache(poll_seconds=60)
+        self.assertEqual(cache.snapshot()["default_currency"], "INR")
+        # Another worker's write: no signal reaches this process
+        SystemSetting.objects.filter(setting_key="default_currency").update(
+            setting_value="EUR", updated_at=timezone.now() + timedelta(seconds=1)
+        )
+        self.assertEqual(cache.snapshot()["default_currency"], "INR")
+        cache.poll_seconds = 0
+        with self.assertNumQueries(2):
+            self.assertEqual(cache.snapshot()["default_currency"], "EUR")
+        # Unchanged fingerprint: one cheap query, no reload
+        with self.assertNumQueries(1):
+            cache.snapshot()
+        self.assertEqual(cache.loads, 2)
+
+
+@override_settings(AUDIT_LOG_MODE="sync")
+class AuditLogTests(TestCase):
+    def make_product(self):
+        return Product.objects.create(
+            product_name="Audited", product_code="AUD-1", product_category="men", product_type="shirt",
+            sales_price=Decimal("10"), purchase_price=Decimal("5"),
+        )
+
+    def test_diffs_are_written_on_commit_only(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            product = self.make_product()
+        with self.captureOnCommitCallbacks(execute=True):
+            product = Product.objects.get(pk=product.pk)
+            product.current_stock = Decimal("7")
+            product.product_name = "Renamed"  # not a tracked field
+            product.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                product.current_stock = Decimal("99")
+                product.save()
+                raise RuntimeError
+        rows = list(AuditLog.objects.filter(table_name="products").order_by("audit_id"))
+        self.assertEqual([r.action_type for r in rows], ["INSERT", "UPDATE"])
+        self.assertEqual(rows[1].old_values, {"current_stock": "0.000"})
+        self.assertEqual(rows[1].new_values, {"current_stock": "7.000"})
+
+    def test_request_user_is_recorded(self):
+        user = User.objects.create_user(username="auditor", email="a@example.com", password="x")
+        request = RequestFactory().post("/", HTTP_USER_AGENT="tests", REMOTE_ADDR="10.0.0.1")
+        request.user = user
+        token = set_audit_request(request)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.make_product().delete()
+        finally:
+            reset_audit_request(token)
+        row = AuditLog.objects.get(action_type="DELETE")
+        self.assertEqual((row.changed_by, row.ip_address, row.user_agent), (user.pk, "10.0.0.1", "tests"))
+
+    def test_full_queue_falls_back_to_synchronous_writes(self):
+        class ManualWriter(AuditWriter):
+            def _ensure_thread(self):
+                pass
+
+        writer = ManualWriter(batch_size=10, max_queue=2, block_seconds=0)
+        writer.submit([AuditLog(table_name="t", record_id=i, action_type="INSERT") for i in range(5)])
+        self.assertEqual(AuditLog.objects.count(), 3)
+        self.assertEqual((writer.pending(), writer.stats["sync_writes"]), (2, 1))
+        writer.flush()
+        self.assertEqual(AuditLog.objects.count(), 5)
+
+    def test_failed_batches_are_retried_then_spilled(self):
+        class ManualWriter(AuditWriter):
+            def _ensure_thread(self):
+                pass
+
+        spill = Path(tempfile.mkdtemp()) / "spill.jsonl"
+        self.addCleanup(shutil.rmtree, spill.parent, ignore_errors=True)
+        writer = ManualWriter(batch_size=10, max_attempts=3, spill_path=str(spill))
+        bulk_create = AuditLog.objects.bulk_create
+        outages = [DatabaseError("gone away")]
+
+        def flaky_bulk_create(objs, **kwargs):
+            if outages:
+                raise outages.pop()
+            return bulk_create(objs, **kwargs)
+
+        def rows(start):
+            return [AuditLog(table_name="t", record_id=i, action_type="INSERT") for i in range(start, start + 2)]
+
+        # Fails once, then the next sync submit writes the kept batch first
+        with patch.object(AuditLog.objects, "bulk_create", side_effect=flaky_bulk_create), self.assertLogs("system.audit"):
+            writer.submit(rows(0), mode="sync")
+            self.assertEqual((AuditLog.objects.count(), writer.pending()), (0, 2))
+            writer.submit(rows(2), mode="sync")
+        self.assertEqual(sorted(AuditLog.objects.values_list("record_id", flat=True)), [0, 1, 2, 3])
+
+        with patch.object(AuditLog.objects, "bulk_create", side_effect=DatabaseError("gone away")) as failing:
+            with self.assertLogs("system.audit") as logs:
+                writer.submit(rows(4))
+                writer.flush()
+        self.assertEqual(failing.call_count, 3)
+        self.assertIn(f"Spilled 2 audit rows to {spill}", logs.output[-1])
+        self.assertEqual((writer.pending(), writer.stats["errors"], writer.stats["spilled"]), (0, 4, 2))
+        self.assertEqual(AuditLog.objects.count(), 4)
+
+        call_command("loaddata", str(spill), verbosity=0)
+        self.assertEqual(sorted(AuditLog.objects.values_list("record_id", flat=True)), [0, 1, 2, 3, 4, 5])
+        self.assertFalse(AuditLog.objects.filter(changed_at__isnull=True).exists())
+
+    def test_prune_archives_by_month(self):
+        AuditLog.objects.bulk_create([AuditLog(table_name="t", record_id=i, action_type="INSERT") for i in range(4)])
+        old = timezone.now() - timedelta(days=400)
+        AuditLog.objects.filter(record_id__lt=3).update(changed_at=old)
+        with tempfile.TemporaryDirectory() as tmp:
+            call_command("prune_audit_log", days=365, archive_dir=tmp, batch_size=2, stdout=StringIO())
+            with gzip.open(Path(tmp) / f"audit_log-{old:%Y-%m}.jsonl.gz", "rt") as fp:
+                archived = [json.loads(line)["record_id"] for line in fp]
+        self.assertEqual(sorted(archived), [0, 1, 2])
+        self.assertEqual(list(AuditLog.objects.values_list("record_id", flat=True)), [3])
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        registry.reset()
+
+    def test_metrics_cover_latency_queries_and_serialization(self):
+        SystemSetting.objects.create(setting_key="default_currency", setting_value="INR")
+        self.client.get("/api/system/settings/")
+        self.client.get("/api/system/settings/")
+        self.client.get("/api/system/health/")
+
+        endpoint = registry.snapshot()[("GET", "/api/system/settings/")]
+        self.assertEqual((endpoint["count"], endpoint["statuses"]), (2, {200: 2}))
+        self.assertEqual(endpoint["queries"], 4)  # count + page, twice
+        self.assertGreater(endpoint["serializer_seconds"], 0)
+        self.assertGreater(endpoint["render_seconds"], 0)
+        self.assertGreater(endpoint["response_bytes"], 0)
+
+        with override_settings(METRICS_SCRAPE_TOKEN="scrape-me"):
+            response = self.client.get("/api/system/metrics/", HTTP_AUTHORIZATION="Bearer scrape-me")
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response["Content-Type"].startswith("text/plain; version=0.0.4"))
+        body = response.content.decode()
+        self.assertIn('http_request_duration_seconds_count{method="GET",route="/api/system/settings/"} 2', body)
+        self.assertIn('http_request_duration_seconds_bucket{method="GET",route="/api/system/health/",le="+Inf"} 1', body)
+        self.assertIn('http_db_queries_total{method="GET",route="/api/system/settings/"} 4', body)
+        self.assertIn("audit_log_queue_depth 0", body)
+
+    @override_settings(METRICS_SCRAPE_TOKEN="scrape-me")
+    def test_metrics_need_an_internal_user_or_the_scrape_token(self):
+        url = "/api/system/metrics/"
+        customer = User.objects.create_user(username="shopper", email="s@example.com", password="x", user_role="portal")
+        staff = User.objects.create_user(username="ops", email="o@example.com", password="x", user_role="internal")
+        self.assertEqual(self.client.get(url).status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer wrong").status_code, 401)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer scrape-me").status_code, 200)
+        for user, expected in ((customer, 403), (staff, 200)):
+            response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(user)}")
+            self.assertEqual(response.status_code, expected, user.username)
+        with override_settings(METRICS_SCRAPE_TOKEN=""):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer ").status_code, 401)
+
+    def test_only_the_slowest_sql_is_kept(self):
+        durations = [(n * 7) % 31 / 1000 for n in range(SQL_SAMPLES * 3)]
+        clock = [value for seconds in durations for value in (0.0, seconds)]
+        stats = RequestStats()
+        with patch("system.metrics.perf_counter", side_effect=clock):
+            for n in range(len(durations)):
+                stats(lambda sql, params, many, context: None, f"SELECT {n}", None, False, {})
+        self.assertEqual((stats.queries, round(stats.db_seconds, 6)), (len(durations), round(sum(durations), 6)))
+        self.assertEqual(sorted(seconds for seconds, _ in stats.sql), sorted(durations)[-SQL_SAMPLES:])
+        self.assertEqual(stats.sql_floor, min(stats.sql)[0])
+
+    @override_settings(SLOW_REQUEST_SECONDS=0)
+    def test_slow_requests_log_their_sql(self):
+        with self.assertLogs("appareldesk.slow_requests", level="WARNING") as logs:
+            self.client.get("/api/system/settings/")
+        self.assertIn("system_settings", logs.output[0])
+        self.assertEqual(registry.snapshot()[("GET", "/api/system/settings/")]["slow"], 1)
+
+
+class QueryBudgetTests(TestCase):
+    """Every endpoint has a budget, and the read endpoints meet theirs with several rows per list."""
+
+    ROWS = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = Contact.objects.create(
+            contact_name="Budget Customer", contact_type="customer", email="budget-customer@example.com", mobile="1"
+        )
+        cls.vendor = Contact.objects.create(
+            contact_name="Budget Vendor", contact_type="vendor", email="budget-vendor@example.com", mobile="2"
+        )
+        for n in range(cls.ROWS):
+            Contact.objects.create(
+                contact_name=f"Other {n}", contact_type="customer", email=f"other-{n}@example.com", mobile="3"
+            )
+        cls.user = User.objects.create_user(
+            username="budget", email="budget@example.com", password="x", user_role="internal", is_staff=True,
+            contact=cls.customer,
+        )
+        Address.objects.create(contact=cls.customer, address_line1="1 Main St", city="Pune")
+        cls.term = PaymentTerm.objects.create(term_name="Net 15", net_days=15)
+        today = timezone.now().date()
+        offer = DiscountOffer.objects.create(
+            offer_name="Budget", discount_percentage=Decimal("10"), start_date=today,
+            end_date=today + timedelta(days=30), available_on="both",
+        )
+        CouponCode.objects.bulk_create(
+            [
+                CouponCode(discount_offer=offer, coupon_code=f"BUDGET-{n}", expiration_date=offer.end_date,
+                           contact=cls.customer)
+                for n in range(cls.ROWS)
+            ]
+        )
+        Product.objects.bulk_create(
+            [
+                Product(product_name=f"Budget {n}", product_code=f"BUDGET-{n}", product_category="men",
+                        product_type="shirt", sales_price=Decimal("100"), purchase_price=Decimal("60"), is_published=True)
+                for n in range(cls.ROWS)
+            ]
+        )
+        cls.products = list(Product.objects.filter(product_code__startswith="BUDGET-").order_by("pk"))
+        ProductImage.objects.bulk_create(
+            [ProductImage(product=p, image_url=f"https://img.example.com/{p.pk}.jpg", is_primary=True) for p in cls.products]
+        )
+        ProductColor.objects.bulk_create(
+            [ProductColor(product=p, color_name="Red", color_code="#ff0000") for p in cls.products]
+        )
+        lines = [
+            {"product_id": p.pk, "quantity": Decimal("1"), "unit_price": Decimal("100"), "line_number": n}
+            for n, p in enumerate(cls.products, start=1)
+        ]
+        cls.invoices = [
+            create_checkout({"customer": cls.customer, "payment_term": cls.term, "lines": lines}, user=cls.user)[1]
+            for _ in range(cls.ROWS)
+        ]
+        for invoice in cls.invoices:
+            record_customer_payment({invoice.pk: Decimal("10")}, user=cls.user)
+        purchase_orders = create_purchase_orders(
+            [
+                {"vendor_id": cls.vendor.pk, "lines": [{"product_id": p.pk, "quantity": 2, "unit_price": 60} for p in cls.products]}
+                for _ in range(cls.ROWS)
+            ]
+        )
+        create_vendor_bills(purchase_orders[1:])
+        VendorBill.objects.update(bill_status="confirmed")
+        cls.purchase_order = purchase_orders[0]
+        for purchase_order in purchase_orders:
+            update_stock_from_purchase(purchase_order.pk)
+
+    def setUp(self):
+        # A real bearer token, so the JWT user lookup counts as it does in production
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_every_endpoint_has_a_budget(self):
+        def names(patterns):
+            for pattern in patterns:
+                if isinstance(pattern, URLResolver):
+                    if pattern.namespace != "admin":
+                        yield from names(pattern.url_patterns)
+                elif pattern.name:
+                    yield pattern.name
+
+        missing = sorted(set(names(get_resolver().url_patterns)) - set(QUERY_BUDGETS))
+        self.assertEqual(missing, [])
+
+    def test_read_endpoints_stay_within_budget(self):
+        order = self.invoices[0].sales_order_id
+        urls = [
+            "/api/auth/profile/",
+            "/api/auth/addresses/",
+            "/api/users/portal/",
+            f"/api/users/portal/{self.customer.pk}/",
+            "/api/contacts/customers/",
+            "/api/contacts/vendors/",
+            "/api/catalog/products/",
+            "/api/catalog/products/?fields=summary",
+            "/api/catalog/products/facets/",
+            f"/api/catalog/products/{self.products[0].pk}/",
+            "/api/catalog/vendor/products/",
+            "/api/pricing/payment-terms/",
+            "/api/pricing/offers/",
+            "/api/pricing/coupons/",
+            "/api/sales/orders/",
+            f"/api/sales/orders/{order}/",
+            "/api/sales/invoices/",
+            "/api/sales/vendor/invoices/",
+            "/api/sales/me/contact/",
+            "/api/sales/me/summary/",
+            "/api/sales/customers/",
+            "/api/sales/cart/",
+            "/api/sales/reports/summary/",
+            "/api/sales/reports/summary/?group_by=contact",
+            "/api/sales/reports/summary/?group_by=product",
+            "/api/purchases/purchase-orders/",
+            "/api/purchases/vendor-bills/",
+            "/api/purchases/vendors/",
+            "/api/payments/",
+            "/api/payments/aging/",
+            f"/api/payments/aging/?ledger=payable&as_of={timezone.now().date() - timedelta(days=1)}",
+            "/api/inventory/movements/",
+            f"/api/inventory/stock-at/?product_id={self.products[0].pk}&date={timezone.now().date()}",
+            "/api/inventory/valuation/?detail=1",
+            "/api/inventory/reorder/",
+            "/api/system/settings/",
+            "/api/system/health/",
+            "/api/system/metrics/",
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200, response.content[:200])
+
+    def test_write_endpoints_stay_within_budget(self):
+        client = APIClient()
+        today = str(timezone.now().date())
+        invoice = self.invoices[0]
+        bill_po = self.purchase_order
+        address = Address.objects.get(contact=self.customer)
+        lines = [
+            {"product_id": p.pk, "quantity": "1", "unit_price": "100", "line_number": n}
+            for n, p in enumerate(self.products, start=1)
+        ]
+        login = client.post("/api/auth/login/", {"username": "budget", "password": "x"}, format="json")
+        self.assertEqual(login.status_code, 200)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {login.data['access']}")
+        requests = [
+            ("post", "/api/auth/refresh/", {"refresh": login.data["refresh"]}),
+            ("post", "/api/auth/register/", {"username": "new", "email": "new@example.com", "password": "Budget#123",
+                                            "contact_name": "New"}),
+            ("post", "/api/auth/vendor/register/", {"username": "newv", "email": "newv@example.com",
+                                                   "password": "Budget#123", "contact_name": "New Vendor"}),
+            ("get", "/api/auth/profile/", None),
+            ("post", "/api/auth/addresses/", {"address_line1": "2 Side St", "city": "Pune"}),
+            ("patch", f"/api/auth/addresses/{address.pk}/", {"city": "Mumbai"}),
+            ("patch", f"/api/users/portal/{self.customer.pk}/", {"city": "Mumbai"}),
+            ("post", "/api/catalog/vendor/products/", {"product_name": "Budget Tee", "product_category": "men",
+                                                      "product_type": "tshirt", "sales_price": "10", "purchase_price": "5"}),
+            ("post", "/api/catalog/vendor/products/bulk/", [
+                {"product_name": f"Bulk {n}", "product_category": "men", "product_type": "tshirt", "sales_price": "10",
+                 "purchase_price": "5"} for n in range(self.ROWS)
+            ]),
+            ("post", "/api/pricing/coupons/validate/", {"code": "BUDGET-0"}),
+            ("post", "/api/pricing/offers/create/", {"offer_name": "New", "discount_percentage": "5", "start_date": today,
+                                                    "end_date": today, "available_on": "both"}),
+            ("post", "/api/pricing/coupons/generate/", {"discount_offer_id": DiscountOffer.objects.get().pk,
+                                                       "for_type": "anonymous", "quantity": 20}),
+            ("post", "/api/pricing/coupons/generate/", {"discount_offer_id": DiscountOffer.objects.get().pk,
+                                                       "for_type": "all"}),
+            ("post", "/api/sales/checkout/", {"payment_term_id": self.term.pk, "coupon_code": "BUDGET-1", "lines": lines}),
+            ("patch", f"/api/sales/orders/{invoice.sales_order_id}/status/", {"order_status": "completed"}),
+            ("post", "/api/sales/cart/", {"items": [{"product_id": p.pk, "quantity": 1} for p in self.products]}),
+            ("post", "/api/purchases/purchase-orders/create/", {"vendor_id": self.vendor.pk, "lines": [
+                {"product_id": p.pk, "quantity": "1", "unit_price": "60"} for p in self.products
+            ]}),
+            ("post", "/api/purchases/purchase-orders/import/", [
+                {"vendor_id": self.vendor.pk, "lines": [{"product_id": p.pk, "quantity": "1", "unit_price": "60"}]}
+                for p in self.products
+            ]),
+            ("post", f"/api/purchases/purchase-orders/{bill_po.pk}/create-bill/", {}),
+            ("post", f"/api/purchases/vendor-bills/{VendorBill.objects.order_by('pk').first().pk}/pay/", {}),
+            ("post", "/api/purchases/vendor-bills/generate/", {}),
+            ("post", "/api/purchases/payment-runs/", {"dry_run": True}),
+            ("post", "/api/purchases/payment-runs/", {}),
+            ("post", "/api/payments/create/", {"allocations": [{"invoice_id": i.pk, "amount": "5"} for i in self.invoices]}),
+            ("post", "/api/payments/reconcile/", [
+                {"date": today, "amount": "5", "reference": i.invoice_number} for i in self.invoices
+            ]),
+            ("post", "/api/inventory/reorder/purchase-orders/", {}),
+        ]
+        for method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                response = getattr(client, method)(url, data, format="json")
+                self.assertLess(response.status_code, 300, response.content[:300])
+
+    def test_checkout_and_coupon_cost_does_not_grow_with_size(self):
+        offer = DiscountOffer.objects.get()
+        counts = []
+        for size in (1, self.ROWS):
+            lines = [
+                {"product_id": p.pk, "quantity": "1", "unit_price": "100", "line_number": n}
+                for n, p in enumerate(self.products[:size], start=1)
+            ]
+            with query_budget(QUERY_BUDGETS["checkout"]) as checkout:
+                response = self.client.post("/api/sales/checkout/", {"payment_term_id": self.term.pk, "lines": lines},
+                                            format="json")
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(len(response.data["order"]["lines"]), size)
+            with query_budget(QUERY_BUDGETS["coupon-generate"]) as coupons:
+                response = self.client.post("/api/pricing/coupons/generate/",
+                                            {"discount_offer_id": offer.pk, "quantity": size * 10}, format="json")
+            self.assertEqual(response.data["count"], size * 10)
+            counts.append((checkout.count, coupons.count))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_repeated_sql_is_reported_with_its_stack(self):
+        self.assertEqual(
+            sql_shape("SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x' LIMIT 21"),
+            "SELECT * FROM t WHERE id IN (...) AND name = ? LIMIT ?",
+        )
+        with self.assertRaises(QueryBudgetExceeded) as caught:
+            with query_budget(50, label="loop", repeat_threshold=3):
+                for product in self.products:
+                    Product.objects.filter(pk=product.pk).exists()
+        message = str(caught.exception)
+        self.assertIn(f"{self.ROWS}x SELECT", message)
+        self.assertIn("system/tests.py", message)
+
+    def test_warn_mode_logs_instead_of_failing(self):
+        with override_settings(QUERY_BUDGET_MODE="warn"), patch.dict(QUERY_BUDGETS, {"system-settings": 0}):
+            client = APIClient()
+            with self.assertLogs("appareldesk.query_budget", level="WARNING") as logs:
+                response = client.get("/api/system/settings/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("(system-settings): 1 queries, budget 0", logs.output[0])
+
+
+class LoadTestTests(TestCase):
+    def test_summary_percentiles_and_comparison(self):
+        self.assertEqual([percentile(list(range(1, 101)), q) for q in (50, 95, 99, 100)], [50, 95, 99, 100])
+        self.assertIsNone(percentile([], 50))
+        summary = summarize([0.001 * n for n in range(1, 101)], {200: 100, 500: 2}, 2, 2.0)
+        self.assertEqual((summary["requests"], summary["rps"], summary["p95_ms"]), (100, 50.0, 95.0))
+        self.assertEqual(summary["statuses"], {"200": 100, "500": 2})
+
+        baseline = {"results": {"list": {"p95_ms": 100.0, "rps": 50.0}}}
+        lines, regressed = compare({"results": {"list": {"p95_ms": 105.0, "rps": 48.0}}}, baseline, threshold=10)
+        self.assertFalse(regressed)
+        lines, regressed = compare(
+            {"results": {"list": {"p95_ms": 130.0, "rps": 50.0}, "new": {"p95_ms": 1.0, "rps": 1.0}}}, baseline
+        )
+        self.assertTrue(regressed)
+        self.assertIn("REGRESSION", lines[0])
+        self.assertIn("no baseline", lines[1])
+
+    def test_dataset_is_deterministic_and_reused(self):
+        sizes = {"customers": 6, "products": 8, "orders": 5, "coupons": 4, "users": 3}
+
+        def generated_rows():
+            with transaction.atomic():
+                data = generate_load_dataset(seed=7, **sizes)
+                rows = (
+                    list(Product.objects.filter(pk__in=data["product_ids"]).values_list("product_code", "sales_price")),
+                    list(SalesOrder.objects.filter(so_number__startswith="LT7-").values_list("customer__email", "total_amount")),
+                )
+                transaction.set_rollback(True)
+            return rows
+
+        self.assertEqual(generated_rows(), generated_rows())
+
+        data = generate_load_dataset(seed=7, **sizes)
+        self.assertEqual((data["customers"], len(data["customer_users"])), (6, 3))
+        self.assertEqual((len(data["product_ids"]), len(data["coupon_codes"])), (8, 4))
+        self.assertEqual(len(data["open_invoice_ids"]), 5)
+        self.assertEqual(data["internal_user"].user_role, "internal")
+        products = Product.objects.count()
+        again = generate_load_dataset(seed=7, **sizes)
+        self.assertEqual(again["product_ids"], data["product_ids"])
+        self.assertEqual(Product.objects.count(), products)
+
+    def test_generated_history_is_consistent_and_repeatable(self):
+        rng = random.Random(3)
+        sampler = ZipfSampler(100, 1.1, rng)
+        draws = Counter(sampler(rng) for _ in range(5000))
+        self.assertGreater(draws.most_common(1)[0][1], 5000 * 0.1)
+        counts = seasonal_counts(1000, timezone.now().date(), 365, rng)
+        self.assertEqual(sum(counts), 1000)
+
+        sizes = {"customers": 20, "vendors": 3, "products": 15, "orders": 120, "purchase_orders": 10, "days": 60}
+
+        def generated():
+            with transaction.atomic():
+                written = generate_dataset(seed=5, batch_size=100, **sizes)
+                rows = (
+                    written,
+                    list(SalesOrder.objects.order_by("pk").values_list("customer__email", "order_date", "total_amount")),
+                    list(VendorBill.objects.order_by("pk").values_list("invoice_date", "total_amount", "paid_amount")),
+                )
+                self.assertFalse(StockMovement.objects.filter(stock_after__lt=0).exists())
+                for product in Product.objects.filter(product_code__startswith="DS5-"):
+                    last = StockMovement.objects.filter(product=product).order_by("-movement_date", "-pk").first()
+                    self.assertEqual(last.stock_after, product.current_stock)
+                self.assertEqual(
+                    PurchaseOrder.objects.filter(po_status="received").count(), VendorBill.objects.count()
+                )
+                with self.assertRaises(ValueError):
+                    generate_dataset(seed=5, **sizes)
+                transaction.set_rollback(True)
+            return rows
+
+        first = generated()
+        self.assertEqual(first[0]["sales_orders"], 120)
+        self.assertEqual(first, generated())
@@ -1,7 +1,8 @@
 from django.urls import path
-from .views import SystemSettingListView, HealthCheckView
+from .views import SystemSettingListView, HealthCheckView, MetricsView
 
 urlpatterns = [
     path("settings/", SystemSettingListView.as_view(), name="system-settings"),
     path("health/", HealthCheckView.as_view(), name="health"),
+    path("metrics/", MetricsView.as_view(), name="metrics"),
 ]
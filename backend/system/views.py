@@ -1,13 +1,25 @@
+import hmac
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
 from rest_framework import generics
+from rest_framework.authentication import BaseAuthentication
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
 from rest_framework.response import Response
 from rest_framework.views import APIView
+
+from accounts.authentication import CachedJWTAuthentication
+from accounts.permissions import IsInternalUser
+from .audit import writer as audit_writer
+from .metrics import registry
 from .models import SystemSetting
 from .serializers import SystemSettingSerializer
+from .services import settings_cache
 
 
 class SystemSettingListView(generics.ListAPIView):
-    queryset = SystemSetting.objects.filter(is_active=True)
+    queryset = SystemSetting.objects.filter(is_active=True).order_by("setting_key")
     serializer_class = SystemSettingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
 
@@ -17,3 +29,51 @@ class HealthCheckView(APIView):
 
     def get(self, request, *args, **kwargs):
         return Response({"status": "ok"})
+
+
+METRICS_SCRAPE_AUTH = "metrics-scrape-token"
+
+
+class MetricsScrapeTokenAuthentication(BaseAuthentication):
+    """
+    Accepts "Authorization: Bearer <METRICS_SCRAPE_TOKEN>" so a Prometheus
+    scraper needs no user account. Any other bearer value is left to the
+    JWT authentication that follows.
+    """
+
+    def authenticate(self, request):
+        token = getattr(settings, "METRICS_SCRAPE_TOKEN", "")
+        header = request.META.get("HTTP_AUTHORIZATION", "")
+        if not token or not header.startswith("Bearer "):
+            return None
+        if not hmac.compare_digest(header[len("Bearer "):].strip().encode(), token.encode()):
+            return None
+        return AnonymousUser(), METRICS_SCRAPE_AUTH
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
+
+
+class CanReadMetrics(IsInternalUser):
+    def has_permission(self, request, view):
+        return request.auth == METRICS_SCRAPE_AUTH or super().has_permission(request, view)
+
+
+class MetricsView(APIView):
+    """
+    Request metrics of this worker process in Prometheus text format.
+    Internal users only, or a scraper sending METRICS_SCRAPE_TOKEN.
+    """
+
+    authentication_classes = [MetricsScrapeTokenAuthentication, CachedJWTAuthentication]
+    permission_classes = [CanReadMetrics]
+
+    def get(self, request, *args, **kwargs):
+        extra = (
+            ("audit_log_queue_depth", "gauge", "Audit rows waiting for the background writer", audit_writer.pending()),
+            ("audit_log_rows_written_total", "counter", "Audit rows written", audit_writer.stats["written"]),
+            ("audit_log_sync_writes_total", "counter", "Audit submits written synchronously because the queue was full", audit_writer.stats["sync_writes"]),
+            ("audit_log_write_errors_total", "counter", "Failed audit row batches", audit_writer.stats["errors"]),
+            ("system_settings_loads_total", "counter", "System settings snapshot reloads", settings_cache.loads),
+        )
+        return HttpResponse(registry.render_prometheus(extra), content_type="text/plain; version=0.0.4; charset=utf-8")